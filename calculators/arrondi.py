@@ -0,0 +1,20 @@
+import numpy as np
+
+# Écart au demi-centime en deçà duquel l'arrondi vectoriel peut diverger de round()
+_TOLERANCE_DEMI_CENTIME = 1e-6
+
+
+def arrondir_centimes(valeurs: np.ndarray) -> np.ndarray:
+    """
+    Arrondit au centime, à l'identique de round(valeur, 2) élément par élément.
+
+    Hors des cas proches d'un demi-centime, l'entier de centimes est sans ambiguïté
+    et sa division par 100 donne le même flottant que round() ; les cas limites
+    sont délégués à round().
+    """
+    centimes = valeurs * 100
+    arrondis = np.rint(centimes) / 100
+    ambigus = np.flatnonzero(np.abs(np.abs(centimes - np.floor(centimes)) - 0.5) < _TOLERANCE_DEMI_CENTIME)
+    for indice in ambigus.tolist():
+        arrondis[indice] = round(float(valeurs[indice]), 2)
+    return arrondis
@@ -0,0 +1,69 @@
+import os
+import sys
+from typing import Optional, Tuple
+
+# Clés des caches de calcul : distances et minutes d'attente sont arrondies au millionième
+# (1 mm, 0,06 ms). C'est bien en deçà du centime facturé, et suffit à absorber le bruit
+# flottant des moteurs d'itinéraire (25.500000001 km) sans confondre des distances
+# réellement différentes.
+DECIMALES_CLE = 6
+# Demi-largeur d'une classe de valeurs partageant la même clé, légèrement élargie
+# pour couvrir l'erreur d'arrondi de round()
+_DEMI_CLASSE = 0.6 * 10 ** -DECIMALES_CLE
+
+TAILLE_CACHE_TAXI = int(os.environ.get("CACHE_TAXI_TAILLE", 1000))
+TAILLE_CACHE_CPAM = int(os.environ.get("CACHE_CPAM_TAILLE", 500))
+
+
+def canoniser(valeur: float) -> float:
+    """Forme canonique d'une distance ou d'une durée, utilisée comme clé de cache"""
+    return round(valeur, DECIMALES_CLE)
+
+
+def bornes_classe(canonique: float) -> Tuple[float, float]:
+    """
+    Plus petite et plus grande valeur ayant cette forme canonique (bornes élargies,
+    sans passer sous zéro). Les montants calculés étant croissants en distance et en
+    attente, un résultat identique aux deux bornes vaut pour toute la classe.
+    """
+    bas = canonique - _DEMI_CLASSE
+    if canonique >= 0 > bas:
+        bas = 0.0
+    return bas, canonique + _DEMI_CLASSE
+
+
+def _taille_approchee(objet) -> int:
+    taille = sys.getsizeof(objet)
+    if isinstance(objet, dict):
+        # Les clés sont des chaînes internées partagées entre les entrées
+        taille += sum(_taille_approchee(valeur) for valeur in objet.values())
+    elif isinstance(objet, (tuple, list)):
+        taille += sum(_taille_approchee(valeur) for valeur in objet)
+    return taille
+
+
+def octets_par_entree(arguments: tuple, resultat: Optional[dict]) -> int:
+    """Estimation de la mémoire d'une entrée lru_cache : clé, résultat et maillon de la liste LRU"""
+    return _taille_approchee(arguments) + _taille_approchee(resultat) + sys.getsizeof([None] * 4) + 3 * 8
+
+
+def statistiques_lru(fonction_cachee, calculs_exacts: int, exemple: Optional[tuple]) -> dict:
+    """
+    Compteurs d'un cache lru_cache. `calculs_exacts` compte les calculs faits hors cache parce
+    que la classe canonique chevauchait un arrondi au centime ; `exemple` est un couple
+    (arguments, résultat) servant à estimer la mémoire occupée.
+    """
+    info = fonction_cachee.cache_info()
+    appels = info.hits + info.misses
+    octets = octets_par_entree(*exemple) if exemple is not None else 0
+    return {
+        "succes": info.hits,
+        "echecs": info.misses,
+        # Chaque échec insère une entrée : tout ce qui dépasse la taille actuelle a été évincé
+        "evictions": info.misses - info.currsize,
+        "taille": info.currsize,
+        "taille_max": info.maxsize,
+        "taux_succes": round(info.hits / appels, 4) if appels else 0.0,
+        "calculs_exacts": calculs_exacts,
+        "octets_estimes": info.currsize * octets
+    }
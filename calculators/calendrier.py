@@ -0,0 +1,338 @@
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+import pytz
+
+FUSEAU_FRANCE = pytz.timezone('Europe/Paris')
+
+# Règle européenne : heure d'été du dernier dimanche de mars 03h00 au dernier
+# dimanche d'octobre 02h00 (heure locale). Hors de cette plage, on délègue à pytz.
+ANNEE_MIN_REGLE_UE = 1996
+ANNEE_MAX_REGLE_UE = 2037
+
+_HEURE_HIVER = timezone(timedelta(hours=1))
+_HEURE_ETE = timezone(timedelta(hours=2))
+
+MICROSECONDES_PAR_JOUR = 86_400_000_000
+MINUTES_PAR_JOUR = 1440
+_ORDINAL_EPOQUE = date(1970, 1, 1).toordinal()
+
+# Années couvertes par la table des jours fériés ; au-delà, calcul à la demande
+PREMIERE_ANNEE_TABLE = 1990
+DERNIERE_ANNEE_TABLE = 2069
+_ORDINAL_TABLE = date(PREMIERE_ANNEE_TABLE, 1, 1).toordinal()
+
+# Périodes tarifaires
+JOUR = 0
+NUIT = 1
+DIMANCHE_FERIE = 2
+
+
+class HorodatagesLot(NamedTuple):
+    """Horodatages d'un lot de courses, décomposés en colonnes (heure locale murale)"""
+    jours: np.ndarray  # jours depuis le 1er janvier 1970
+    jours_semaine: np.ndarray  # 0 = lundi, 6 = dimanche
+    microsecondes_jour: np.ndarray  # depuis minuit
+    iso: List[str]  # identique à datetime.isoformat() après localisation
+
+    def extraire(self, positions: np.ndarray) -> "HorodatagesLot":
+        """Sous-lot des éléments aux positions données"""
+        return HorodatagesLot(self.jours[positions], self.jours_semaine[positions],
+                              self.microsecondes_jour[positions], [self.iso[p] for p in positions.tolist()])
+
+
+# --- Heure légale ---
+
+class DateHorsLimites(ValueError):
+    """Date sans fuseau trop proche des bornes de datetime pour être rapportée à l'heure française"""
+    def __init__(self, date_heure: datetime, indice: Optional[int] = None):
+        self.date_heure = date_heure
+        self.indice = indice
+        course = f" (course {indice})" if indice is not None else ""
+        super().__init__(f"Date hors des limites du calendrier : {date_heure.isoformat()}{course}")
+
+
+def _dernier_dimanche(annee: int, mois: int) -> datetime:
+    suivant = datetime(annee + 1, 1, 1) if mois == 12 else datetime(annee, mois + 1, 1)
+    dernier_jour = suivant - timedelta(days=1)
+    return dernier_jour - timedelta(days=(dernier_jour.weekday() - 6) % 7)
+
+
+@lru_cache(maxsize=None)
+def bornes_heure_ete(annee: int) -> Tuple[datetime, datetime]:
+    """Début (inclus) et fin (exclue) de l'heure d'été en heure locale murale"""
+    debut = _dernier_dimanche(annee, 3).replace(hour=3)
+    fin = _dernier_dimanche(annee, 10).replace(hour=2)
+    return debut, fin
+
+
+def localiser_france(date_heure: datetime) -> datetime:
+    """
+    Attache l'heure légale française à une date sans fuseau, comme
+    FUSEAU_FRANCE.localize() mais sans recherche dans les tables pytz.
+    """
+    if ANNEE_MIN_REGLE_UE <= date_heure.year <= ANNEE_MAX_REGLE_UE:
+        debut, fin = bornes_heure_ete(date_heure.year)
+        return date_heure.replace(tzinfo=_HEURE_ETE if debut <= date_heure < fin else _HEURE_HIVER)
+    try:
+        return FUSEAU_FRANCE.localize(date_heure)
+    except OverflowError:
+        raise DateHorsLimites(date_heure) from None
+
+
+def verifier_date(date_heure: Optional[datetime]) -> Optional[datetime]:
+    """Validation des dates reçues : lève DateHorsLimites si la date ne peut pas être localisée"""
+    if date_heure is not None and date_heure.tzinfo is None and date_heure.year < ANNEE_MIN_REGLE_UE:
+        localiser_france(date_heure)
+    return date_heure
+
+
+# --- Jours fériés ---
+
+def _paques(annee: int) -> date:
+    """Dimanche de Pâques (algorithme de Meeus/Jones/Butcher, calendrier grégorien)"""
+    a = annee % 19
+    b, c = divmod(annee, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mois, jour = divmod(h + l - 7 * m + 114, 31)
+    return date(annee, mois, jour + 1)
+
+
+@lru_cache(maxsize=None)
+def jours_feries(annee: int) -> FrozenSet[date]:
+    """Jours fériés légaux en France métropolitaine"""
+    paques = _paques(annee)
+    return frozenset((
+        date(annee, 1, 1),                  # Jour de l'an
+        paques + timedelta(days=1),         # Lundi de Pâques
+        date(annee, 5, 1),                  # Fête du travail
+        date(annee, 5, 8),                  # Victoire 1945
+        paques + timedelta(days=39),        # Ascension
+        paques + timedelta(days=50),        # Lundi de Pentecôte
+        date(annee, 7, 14),                 # Fête nationale
+        date(annee, 8, 15),                 # Assomption
+        date(annee, 11, 1),                 # Toussaint
+        date(annee, 11, 11),                # Armistice
+        date(annee, 12, 25),                # Noël
+    ))
+
+
+def table_feries() -> bytes:
+    """Un octet par jour de PREMIERE_ANNEE_TABLE à DERNIERE_ANNEE_TABLE : 1 si férié"""
+    table = bytearray(date(DERNIERE_ANNEE_TABLE + 1, 1, 1).toordinal() - _ORDINAL_TABLE)
+    for annee in range(PREMIERE_ANNEE_TABLE, DERNIERE_ANNEE_TABLE + 1):
+        for jour in jours_feries(annee):
+            table[jour.toordinal() - _ORDINAL_TABLE] = 1
+    return bytes(table)
+
+
+# Remplacée par la table projetée depuis le fichier partagé des workers (utiliser_tables)
+_feries = memoryview(table_feries())
+_feries_np = np.frombuffer(_feries, dtype=np.uint8)
+
+
+def est_ferie(jour: date) -> bool:
+    indice = jour.toordinal() - _ORDINAL_TABLE
+    if 0 <= indice < len(_feries):
+        return _feries[indice] == 1
+    return jour in jours_feries(jour.year)
+
+
+@lru_cache(maxsize=None)
+def _jours_feries_epoque(annee: int) -> np.ndarray:
+    return np.array(sorted(jour.toordinal() - _ORDINAL_EPOQUE for jour in jours_feries(annee)), dtype=np.int64)
+
+
+def _feries_lot(jours: np.ndarray) -> np.ndarray:
+    """Indique pour chaque jour (depuis le 1er janvier 1970) s'il est férié"""
+    indices = jours - (_ORDINAL_TABLE - _ORDINAL_EPOQUE)
+    if not len(indices) or (indices.min() >= 0 and indices.max() < len(_feries_np)):
+        return _feries_np[indices] == 1
+    annees = (jours.astype("datetime64[D]").astype("datetime64[Y]").astype(np.int64) + 1970)
+    feries = np.concatenate([_jours_feries_epoque(annee) for annee in np.unique(annees).tolist()])
+    return np.isin(jours, feries)
+
+
+# --- Tables partagées ---
+
+def nom_table_minutes(debut_nuit: time, fin_nuit: time) -> str:
+    return f"minutes_{debut_nuit:%H%M}_{fin_nuit:%H%M}"
+
+
+def table_minutes(debut_nuit: time, fin_nuit: time) -> bytes:
+    """Période tarifaire de chaque minute de la semaine (lundi 00h00 en premier)"""
+    minute_debut = debut_nuit.hour * 60 + debut_nuit.minute
+    minute_fin = fin_nuit.hour * 60 + fin_nuit.minute
+    table = bytearray(7 * MINUTES_PAR_JOUR)
+    for jour_semaine in range(7):
+        for minute in range(MINUTES_PAR_JOUR):
+            if jour_semaine == 6:
+                periode = DIMANCHE_FERIE
+            elif minute >= minute_debut or minute < minute_fin:
+                periode = NUIT
+            else:
+                periode = JOUR
+            table[jour_semaine * MINUTES_PAR_JOUR + minute] = periode
+    return bytes(table)
+
+
+_tables_minutes: Dict[str, memoryview] = {}
+
+
+def utiliser_tables(tables: Mapping[str, memoryview]):
+    """
+    Substitue aux tables construites par ce processus celles d'un fichier partagé
+    (voir calculators.tables_partagees) : jours fériés, et tables minute-de-semaine des
+    calendriers partagés, déjà créés (obtenir_calendrier) ou créés ensuite.
+    """
+    global _feries, _feries_np
+    if "feries" in tables:
+        _feries = tables["feries"]
+        _feries_np = np.frombuffer(_feries, dtype=np.uint8)
+    _tables_minutes.update((nom, table) for nom, table in tables.items() if nom.startswith("minutes_"))
+    for (debut_nuit, fin_nuit), calendrier in _calendriers.items():
+        table = _tables_minutes.get(nom_table_minutes(debut_nuit, fin_nuit))
+        if table is not None:
+            calendrier._utiliser_table(table)
+
+
+# --- Calendrier tarifaire ---
+
+class CalendrierTarifaire:
+    """
+    Détermine la période tarifaire (jour, nuit, dimanche/férié) d'un instant en heure
+    locale murale, par lecture d'une table minute-de-semaine et des jours fériés.
+    Les bornes de nuit suivent la convention des calculateurs : debut <= heure ou heure <= fin.
+    """
+    def __init__(self, debut_nuit: time, fin_nuit: time):
+        if debut_nuit.second or debut_nuit.microsecond or fin_nuit.second or fin_nuit.microsecond:
+            raise ValueError("Les bornes de nuit doivent tomber sur une minute entière")
+        self.debut_nuit = debut_nuit
+        self.fin_nuit = fin_nuit
+        # La minute de fin de nuit n'est en nuit qu'à son instant exact (hh:mm:00.000000)
+        self._minute_fin_nuit = fin_nuit.hour * 60 + fin_nuit.minute
+        table = _tables_minutes.get(nom_table_minutes(debut_nuit, fin_nuit))
+        self._utiliser_table(table if table is not None else table_minutes(debut_nuit, fin_nuit))
+
+    def _utiliser_table(self, table):
+        self._table = table
+        self._table_np = np.frombuffer(table, dtype=np.uint8)
+
+    def periode(self, date_heure: datetime) -> int:
+        """Période tarifaire d'un instant (heure murale de la date fournie)"""
+        if est_ferie(date_heure.date()):
+            return DIMANCHE_FERIE
+        minute = date_heure.hour * 60 + date_heure.minute
+        periode = self._table[date_heure.weekday() * MINUTES_PAR_JOUR + minute]
+        if (periode == JOUR and minute == self._minute_fin_nuit
+                and not date_heure.second and not date_heure.microsecond):
+            return NUIT
+        return periode
+
+    def _periode_minute(self, jour: date, minute: int) -> int:
+        """Période de l'intérieur d'une minute (hors instant exact de fin de nuit)"""
+        if est_ferie(jour):
+            return DIMANCHE_FERIE
+        return self._table[jour.weekday() * MINUTES_PAR_JOUR + minute]
+
+    def prochain_changement(self, date_heure: datetime, horizon_jours: int = 8) -> datetime:
+        """
+        Premier instant après date_heure (avec fuseau) où la période tarifaire change,
+        arrondi par défaut à la minute ; borné à horizon_jours.
+        """
+        periode = self.periode(date_heure)
+        jour = date_heure.date()
+        minute = date_heure.hour * 60 + date_heure.minute
+        if self._periode_minute(jour, minute) != periode:
+            # Instant exact de fin de nuit : le jour commence immédiatement après
+            return date_heure
+        for _ in range(horizon_jours * MINUTES_PAR_JOUR):
+            minute += 1
+            if minute == MINUTES_PAR_JOUR:
+                minute = 0
+                jour += timedelta(days=1)
+            if self._periode_minute(jour, minute) != periode:
+                break
+        murale = datetime.combine(jour, time(minute // 60, minute % 60))
+        return localiser_france(murale)
+
+    def periodes_lot(self, horodatages: HorodatagesLot) -> np.ndarray:
+        """Période tarifaire de chaque élément d'un lot"""
+        minutes = horodatages.microsecondes_jour // 60_000_000
+        periodes = self._table_np[horodatages.jours_semaine * MINUTES_PAR_JOUR + minutes]
+        instant_fin_nuit = horodatages.microsecondes_jour == self._minute_fin_nuit * 60_000_000
+        periodes = np.where((periodes == JOUR) & instant_fin_nuit, NUIT, periodes)
+        return np.where(_feries_lot(horodatages.jours), DIMANCHE_FERIE, periodes)
+
+
+_calendriers: Dict[Tuple[time, time], CalendrierTarifaire] = {}
+
+
+def obtenir_calendrier(debut_nuit: time, fin_nuit: time) -> CalendrierTarifaire:
+    """Calendrier partagé pour des bornes de nuit données (construit une seule fois)"""
+    calendrier = _calendriers.get((debut_nuit, fin_nuit))
+    if calendrier is None:
+        calendrier = _calendriers.setdefault((debut_nuit, fin_nuit), CalendrierTarifaire(debut_nuit, fin_nuit))
+    return calendrier
+
+
+def preparer_horodatages(dates_heures: Sequence[Optional[datetime]]) -> HorodatagesLot:
+    """
+    Prépare les colonnes calendaires d'un lot. Les dates sans fuseau sont
+    interprétées en heure française, comme dans les calculs unitaires ; une date
+    impossible à localiser lève DateHorsLimites avec la position de la course.
+    """
+    maintenant = None
+    murales = []
+    iso: List[Optional[str]] = []
+    naives = []
+    for indice, date_heure in enumerate(dates_heures):
+        if date_heure is None:
+            if maintenant is None:
+                maintenant = datetime.now(FUSEAU_FRANCE)
+            date_heure = maintenant
+        if date_heure.tzinfo is None:
+            naives.append(indice)
+            murales.append(date_heure)
+            iso.append(None)
+        else:
+            murales.append(date_heure.replace(tzinfo=None))
+            iso.append(date_heure.isoformat())
+
+    colonne = np.array(murales, dtype="datetime64[us]").astype(np.int64)
+    jours = colonne // MICROSECONDES_PAR_JOUR
+    # Le 1er janvier 1970 était un jeudi (3)
+    jours_semaine = (jours + 3) % 7
+    microsecondes_jour = colonne - jours * MICROSECONDES_PAR_JOUR
+
+    if naives:
+        indices = np.array(naives)
+        annees = colonne[indices].astype("datetime64[us]").astype("datetime64[Y]").astype(np.int64) + 1970
+        ete = np.zeros(len(indices), dtype=bool)
+        for annee in np.unique(annees).tolist():
+            selection = annees == annee
+            if ANNEE_MIN_REGLE_UE <= annee <= ANNEE_MAX_REGLE_UE:
+                debut, fin = bornes_heure_ete(annee)
+                valeurs = colonne[indices[selection]]
+                ete[selection] = ((valeurs >= np.datetime64(debut, "us").astype(np.int64)) &
+                                  (valeurs < np.datetime64(fin, "us").astype(np.int64)))
+            else:
+                # Hors règle européenne, décalage de pytz (heure de Paris avant 1911, etc.)
+                for position in np.flatnonzero(selection).tolist():
+                    indice = naives[position]
+                    try:
+                        iso[indice] = FUSEAU_FRANCE.localize(murales[indice]).isoformat()
+                    except OverflowError:
+                        raise DateHorsLimites(murales[indice], indice) from None
+        for indice, est_ete in zip(naives, ete.tolist()):
+            if iso[indice] is None:
+                iso[indice] = murales[indice].isoformat() + ("+02:00" if est_ete else "+01:00")
+
+    return HorodatagesLot(jours, jours_semaine, microsecondes_jour, iso)
@@ -1,61 +1,78 @@
 from datetime import datetime, time, date
-from typing import Optional
+from typing import List, Optional, Sequence
 from functools import lru_cache
+from collections import OrderedDict, defaultdict
+import os
+import threading
+import numpy as np
 import pytz
-from models.cpam import TypeTransport
+from models.cpam import CourseCPAMRequete, TypeTransport
+from calculators.arrondi import arrondir_centimes
+from calculators.cache_calculs import TAILLE_CACHE_CPAM, bornes_classe, canoniser, statistiques_lru
+from calculators.calendrier import JOUR, HorodatagesLot, est_ferie, localiser_france, preparer_horodatages
+from calculators.grilles import GrilleCPAM, ReferentielTarifs, referentiel_tarifs
+from calculators.resultats import BaseTarifCPAM, DetailsCPAM, TarifCPAM
+from geographie.communes import estimer_distance_km, referentiel_communes
+from geographie.texte import plier
+
+
+def _libelle_hospitalisation(grille: GrilleCPAM, courte: bool) -> str:
+    seuil = f"{grille.seuil_hospitalisation_longue_km:g}km"
+    return f"hospitalisation ({'<' if courte else '>='}{seuil})"
 
 
 class CalculateurTarifsCPAM:
-    def __init__(self, departement: str = "85"):
+    def __init__(self, departement: str = "85", taille_cache: int = TAILLE_CACHE_CPAM,
+                 referentiel: Optional[ReferentielTarifs] = None):
         self.departement = departement
-        self.forfait_prise_charge = 13.0
-        self.forfait_grande_ville = 15.0
-
-        self.villes_grande_ville = [
-            "marseille", "paris", "nice", "toulouse", "lyon", "strasbourg",
-            "montpellier", "rennes", "bordeaux", "lille", "grenoble", "nantes"
-        ]
-        self.departements_grande_ville = ["92", "93", "94"]
-
-        self.tarifs_km = {
-            "85": 1.07
-        }
-
-        self.supplement_tpmr = 30.0
-        self.supplement_drom = 3.0
-        self.departements_drom = ["971", "972", "973", "974", "976"]
-
-        self.majoration_nuit_weekend = 0.5
-        self.majoration_hospitalisation_courte = 0.25
-        self.majoration_hospitalisation_longue = 0.50
-
-        self.abattements_partage = {
-            2: 0.23,
-            3: 0.35,
-            4: 0.37
-        }
-
-        self.debut_nuit = time(20, 0)
-        self.fin_nuit = time(8, 0)
-
-    @lru_cache(maxsize=500)
-    def _calculer_base_cpam(self, distance_km: float, ville_depart: str, ville_arrivee: str,
-                           tarif_nuit: bool, type_transport: str, nb_patients: int,
-                           tpmr: bool, peages: float):
-        """Calcul de base CPAM avec cache (paramètres hashables uniquement)"""
-        total = self.forfait_prise_charge
+        # Grilles officielles versionnées (calculators/tarifs.json), rechargées à chaud
+        self.referentiel = referentiel or referentiel_tarifs
+
+        # Cache propre à l'instance : un lru_cache posé sur la méthode de classe
+        # inclurait `self` dans la clé et serait partagé par toutes les instances
+        self._calculer_base_cpam = lru_cache(maxsize=taille_cache)(self._calculer_base_cpam)
+        self.calculs_exacts = 0
+        self._exemple_cache = None
+
+    def grille_active(self) -> GrilleCPAM:
+        """Grille en vigueur aujourd'hui"""
+        return self.referentiel.catalogue.cpam.active()
+
+    def _calculer_base_cpam(self, grille: GrilleCPAM, distance_km: float, *parametres):
+        """
+        Calcul de base CPAM avec cache (paramètres hashables uniquement, distance canonique).
+        Retourne le résultat commun à toutes les distances de même forme canonique, ou None
+        si un arrondi au centime tombe dans la classe (le calcul est alors fait exactement).
+        """
+        distance_bas, distance_haut = bornes_classe(distance_km)
+        bas = self._calculer_base_cpam_exact(grille, distance_bas, *parametres)
+        haut = self._calculer_base_cpam_exact(grille, distance_haut, *parametres)
+        resultat = bas if bas == haut else None
+        if self._exemple_cache is None:
+            self._exemple_cache = ((grille, distance_km) + parametres, resultat)
+        return resultat
+
+    def _grande_ville(self, grille: GrilleCPAM, ville_depart: str, ville_arrivee: str) -> bool:
+        """Forfait grande ville dû : département listé, ou ville de départ ou d'arrivée listée (noms pliés)"""
+        return (self.departement in grille.departements_grande_ville or
+                plier(ville_depart) in grille.villes_grande_ville or
+                plier(ville_arrivee) in grille.villes_grande_ville)
+
+    def _calculer_base_cpam_exact(self, grille: GrilleCPAM, distance_km: float, grande_ville: bool,
+                                  tarif_nuit: bool, type_transport: str, nb_patients: int,
+                                  tpmr: bool, peages: float):
+        """Calcul de base CPAM (par version de grille)"""
+        total = grille.forfait_prise_charge
 
         # Forfait grande ville
         forfait_gv = 0.0
-        if (ville_depart.lower() in self.villes_grande_ville or
-            ville_arrivee.lower() in self.villes_grande_ville or
-            self.departement in self.departements_grande_ville):
-            forfait_gv = self.forfait_grande_ville
+        if grande_ville:
+            forfait_gv = grille.forfait_grande_ville
             total += forfait_gv
 
         # Calcul kilométrique
-        km_facturables = max(0.0, distance_km - 4)
-        tarif_km = self.tarifs_km.get(self.departement, 1.07)
+        km_facturables = max(0.0, distance_km - grille.km_franchise)
+        tarif_km = grille.tarif_km(self.departement)
         cout_km = km_facturables * tarif_km
         total += cout_km
 
@@ -66,18 +83,19 @@ class CalculateurTarifsCPAM:
         type_majoration = ""
 
         if tarif_nuit:
-            majoration_appliquee = self.majoration_nuit_weekend
+            majoration_appliquee = grille.majoration_nuit_weekend
             type_majoration = "nuit/weekend"
 
         if type_transport == TypeTransport.HOSPITALISATION.value:
-            if distance_km < 50:
-                maj_hosp = self.majoration_hospitalisation_courte
+            courte = distance_km < grille.seuil_hospitalisation_longue_km
+            if courte:
+                maj_hosp = grille.majoration_hospitalisation_courte
             else:
-                maj_hosp = self.majoration_hospitalisation_longue
+                maj_hosp = grille.majoration_hospitalisation_longue
 
             if maj_hosp > majoration_appliquee:
                 majoration_appliquee = maj_hosp
-                type_majoration = f"hospitalisation ({'<50km' if distance_km < 50 else '>=50km'})"
+                type_majoration = _libelle_hospitalisation(grille, courte)
 
         montant_majoration = base_tarifaire * majoration_appliquee
         total += montant_majoration
@@ -85,9 +103,9 @@ class CalculateurTarifsCPAM:
         # Suppléments
         supplements = 0.0
         if tpmr:
-            supplements += self.supplement_tpmr
-        if self.departement in self.departements_drom:
-            supplements += self.supplement_drom
+            supplements += grille.supplement_tpmr
+        if self.departement in grille.departements_drom:
+            supplements += grille.supplement_drom
         supplements += peages
 
         # Transport partagé
@@ -97,39 +115,44 @@ class CalculateurTarifsCPAM:
         if nb_patients > 1:
             total_avant_supplements = total * nb_patients
             total = total_avant_supplements + supplements
-            base_abattement = total - supplements + (self.supplement_tpmr if tpmr else 0)
-            abattement_taux = self.abattements_partage.get(min(nb_patients, 4), self.abattements_partage[4])
+            base_abattement = total - supplements + (grille.supplement_tpmr if tpmr else 0)
+            abattement_taux = grille.taux_abattement(nb_patients)
             abattement_montant = base_abattement * abattement_taux
             total -= abattement_montant
         else:
             total += supplements
 
-        return {
-            "total": round(total, 2),
-            "forfait_prise_charge": self.forfait_prise_charge,
-            "forfait_grande_ville": forfait_gv,
-            "km_facturables": round(km_facturables, 2),
-            "tarif_km": tarif_km,
-            "cout_kilometrique": round(cout_km, 2),
-            "base_tarifaire": round(base_tarifaire, 2),
-            "majoration_taux": majoration_appliquee,
-            "majoration_type": type_majoration,
-            "majoration_montant": round(montant_majoration, 2),
-            "supplement_tpmr": self.supplement_tpmr if tpmr else 0.0,
-            "supplement_drom": self.supplement_drom if self.departement in self.departements_drom else 0.0,
-            "peages": peages,
-            "total_supplements": round(supplements, 2),
-            "abattement_partage_taux": abattement_taux,
-            "abattement_partage_montant": round(abattement_montant, 2)
-        }
+        return BaseTarifCPAM(
+            total=round(total, 2),
+            forfait_prise_charge=grille.forfait_prise_charge,
+            forfait_grande_ville=forfait_gv,
+            km_facturables=round(km_facturables, 2),
+            tarif_km=tarif_km,
+            cout_kilometrique=round(cout_km, 2),
+            base_tarifaire=round(base_tarifaire, 2),
+            majoration_taux=majoration_appliquee,
+            majoration_type=type_majoration,
+            majoration_montant=round(montant_majoration, 2),
+            supplement_tpmr=grille.supplement_tpmr if tpmr else 0.0,
+            supplement_drom=grille.supplement_drom if self.departement in grille.departements_drom else 0.0,
+            peages=peages,
+            total_supplements=round(supplements, 2),
+            abattement_partage_taux=abattement_taux,
+            abattement_partage_montant=round(abattement_montant, 2)
+        )
+
+    def statistiques_cache(self) -> dict:
+        """Retourne les compteurs du cache de calcul (succès, échecs, évictions, mémoire estimée)"""
+        return statistiques_lru(self._calculer_base_cpam, self.calculs_exacts, self._exemple_cache)
 
     def est_tarif_nuit(self, heure: time) -> bool:
-        return heure >= self.debut_nuit or heure <= self.fin_nuit
+        grille = self.grille_active()
+        return heure >= grille.debut_nuit or heure <= grille.fin_nuit
 
     @staticmethod
     def est_weekend_ou_ferie(date_transport: date) -> bool:
         jour_semaine = date_transport.weekday()
-        return jour_semaine == 6
+        return jour_semaine == 6 or est_ferie(date_transport)
 
     def calculer_tarif_cpam(self,
                            distance_km: float,
@@ -140,51 +163,271 @@ class CalculateurTarifsCPAM:
                            type_transport: TypeTransport = TypeTransport.SIMPLE,
                            nb_patients: int = 1,
                            tpmr: bool = False,
-                           peages: float = 0.0):
+                           peages: float = 0.0) -> TarifCPAM:
         if date_heure_transport is None:
             date_heure_transport = datetime.now(pytz.timezone('Europe/Paris'))
         elif date_heure_transport.tzinfo is None:
-            date_heure_transport = pytz.timezone('Europe/Paris').localize(date_heure_transport)
+            date_heure_transport = localiser_france(date_heure_transport)
 
-        # Déterminer si c'est tarif nuit (priorité au paramètre explicite)
+        # Grille en vigueur à la date du transport
+        grille = self.referentiel.catalogue.cpam.grille_au(date_heure_transport.date())
+
+        # Déterminer si c'est tarif nuit (priorité au paramètre explicite) : nuit, dimanche ou jour férié
         tarif_nuit_effectif = tarif_nuit
         if not tarif_nuit and date_heure_transport:
-            tarif_nuit_effectif = (self.est_tarif_nuit(date_heure_transport.time()) or
-                                 CalculateurTarifsCPAM.est_weekend_ou_ferie(date_heure_transport.date()))
-
-        # Utiliser la méthode cachée pour le calcul de base
-        resultat_cache = self._calculer_base_cpam(
-            distance_km=distance_km,
-            ville_depart=ville_depart,
-            ville_arrivee=ville_arrivee,
-            tarif_nuit=tarif_nuit_effectif,
-            type_transport=type_transport.value,
-            nb_patients=nb_patients,
-            tpmr=tpmr,
-            peages=peages
+            tarif_nuit_effectif = grille.calendrier.periode(date_heure_transport) != JOUR
+
+        # Utiliser la méthode cachée pour le calcul de base (distance canonique). Les villes
+        # n'y figurent que par le forfait grande ville : toutes les autres partagent les entrées
+        grande_ville = self._grande_ville(grille, ville_depart, ville_arrivee)
+        parametres = (grande_ville, tarif_nuit_effectif, type_transport.value, nb_patients, tpmr, peages)
+        resultat_cache = self._calculer_base_cpam(grille, canoniser(distance_km), *parametres)
+        if resultat_cache is None:
+            self.calculs_exacts += 1
+            resultat_cache = self._calculer_base_cpam_exact(grille, distance_km, *parametres)
+
+        # Le résultat en cache est immuable : il est référencé, pas recopié
+        return TarifCPAM(
+            resultat_cache.total,
+            DetailsCPAM(
+                resultat_cache,
+                distance_km,
+                nb_patients,
+                self.departement,
+                date_heure_transport.isoformat()
+            )
         )
 
-        return {
-            "total": resultat_cache["total"],
-            "details": {
-                "distance_km": distance_km,
-                "nb_patients": nb_patients,
-                "forfait_prise_charge": resultat_cache["forfait_prise_charge"],
-                "forfait_grande_ville": resultat_cache["forfait_grande_ville"],
-                "km_facturables": resultat_cache["km_facturables"],
-                "tarif_km": resultat_cache["tarif_km"],
-                "cout_kilometrique": resultat_cache["cout_kilometrique"],
-                "base_tarifaire": resultat_cache["base_tarifaire"],
-                "majoration_taux": resultat_cache["majoration_taux"],
-                "majoration_type": resultat_cache["majoration_type"],
-                "majoration_montant": resultat_cache["majoration_montant"],
-                "supplement_tpmr": resultat_cache["supplement_tpmr"],
-                "supplement_drom": resultat_cache["supplement_drom"],
-                "peages": resultat_cache["peages"],
-                "total_supplements": resultat_cache["total_supplements"],
-                "abattement_partage_taux": resultat_cache["abattement_partage_taux"],
-                "abattement_partage_montant": resultat_cache["abattement_partage_montant"],
-                "departement": self.departement,
-                "date_heure_transport": date_heure_transport.isoformat()
-            }
-        }
\ No newline at end of file
+    def calculer_tarifs_cpam_lot(self,
+                                 distances_km: Sequence[float],
+                                 villes_depart: Sequence[str],
+                                 villes_arrivee: Sequence[str],
+                                 tarifs_nuit: Sequence[bool],
+                                 dates_heures_transport: Sequence[Optional[datetime]],
+                                 types_transport: Sequence[TypeTransport],
+                                 nb_patients: Sequence[int],
+                                 tpmr: Sequence[bool],
+                                 peages: Sequence[float]) -> List[dict]:
+        """
+        Calcule un lot de transports du département en colonnes. Les résultats sont
+        identiques, au centime près, à ceux de calculer_tarif_cpam course par course.
+        """
+        colonnes = (
+            np.asarray(distances_km, dtype=np.float64),
+            np.asarray(nb_patients, dtype=np.int64),
+            np.asarray(tpmr, dtype=bool),
+            np.asarray(peages, dtype=np.float64),
+            np.array([t == TypeTransport.HOSPITALISATION for t in types_transport], dtype=bool),
+            np.asarray(tarifs_nuit, dtype=bool),
+            list(villes_depart),
+            list(villes_arrivee)
+        )
+        horodatages = preparer_horodatages(dates_heures_transport)
+
+        # Chaque transport est calculé avec la grille en vigueur à sa date
+        chronologie = self.referentiel.catalogue.cpam
+        indices_grilles = chronologie.indices_lot(horodatages.jours)
+        if not len(indices_grilles) or indices_grilles.min() == indices_grilles.max():
+            grille = chronologie.grilles[indices_grilles[0] if len(indices_grilles) else 0]
+            return self._calculer_lot_grille(grille, horodatages, *colonnes)
+
+        resultats: List[Optional[dict]] = [None] * len(indices_grilles)
+        for indice in np.unique(indices_grilles).tolist():
+            positions = np.flatnonzero(indices_grilles == indice)
+            liste_positions = positions.tolist()
+            resultats_grille = self._calculer_lot_grille(
+                chronologie.grilles[indice], horodatages.extraire(positions),
+                *(colonne[positions] if isinstance(colonne, np.ndarray) else [colonne[p] for p in liste_positions]
+                  for colonne in colonnes)
+            )
+            for position, resultat in zip(liste_positions, resultats_grille):
+                resultats[position] = resultat
+        return resultats
+
+    def _calculer_lot_grille(self, grille: GrilleCPAM, horodatages: HorodatagesLot,
+                             distances: np.ndarray, patients: np.ndarray, avec_tpmr: np.ndarray,
+                             frais_peages: np.ndarray, hospitalisation: np.ndarray, tarifs_nuit: np.ndarray,
+                             villes_depart: List[str], villes_arrivee: List[str]) -> List[dict]:
+        """Calcul en colonnes de transports relevant tous de la même grille"""
+        nuit = tarifs_nuit | (grille.calendrier.periodes_lot(horodatages) != JOUR)
+
+        # Forfait grande ville
+        if self.departement in grille.departements_grande_ville:
+            grande_ville = np.ones(len(distances), dtype=bool)
+        else:
+            grande_ville = np.array([self._grande_ville(grille, depart, arrivee)
+                                     for depart, arrivee in zip(villes_depart, villes_arrivee)], dtype=bool)
+        forfaits_gv = np.where(grande_ville, grille.forfait_grande_ville, 0.0)
+
+        # Calcul kilométrique (mêmes opérations, dans le même ordre, que le calcul unitaire)
+        km_facturables = np.maximum(0.0, distances - grille.km_franchise)
+        tarif_km = grille.tarif_km(self.departement)
+        couts_km = km_facturables * tarif_km
+        bases = grille.forfait_prise_charge + forfaits_gv + couts_km
+
+        # Majorations : la plus élevée entre nuit/weekend et hospitalisation
+        courte = distances < grille.seuil_hospitalisation_longue_km
+        taux_nuit = np.where(nuit, grille.majoration_nuit_weekend, 0.0)
+        taux_hosp = np.where(courte, grille.majoration_hospitalisation_courte, grille.majoration_hospitalisation_longue)
+        majoration_hosp = hospitalisation & (taux_hosp > taux_nuit)
+        taux_majoration = np.where(majoration_hosp, taux_hosp, taux_nuit)
+        montants_majoration = bases * taux_majoration
+        totaux = bases + montants_majoration
+
+        # Suppléments
+        drom = self.departement in grille.departements_drom
+        supplements = np.where(avec_tpmr, grille.supplement_tpmr, 0.0)
+        if drom:
+            supplements = supplements + grille.supplement_drom
+        supplements = supplements + frais_peages
+
+        # Transport partagé
+        partage = patients > 1
+        taux_abattement = np.where(
+            partage,
+            np.array(grille.abattements_partage)[np.minimum(patients, len(grille.abattements_partage) - 1)],
+            0.0
+        )
+        totaux_partage = totaux * patients + supplements
+        bases_abattement = totaux_partage - supplements + np.where(avec_tpmr, grille.supplement_tpmr, 0.0)
+        montants_abattement = np.where(partage, bases_abattement * taux_abattement, 0.0)
+        totaux = np.where(partage, totaux_partage - montants_abattement, totaux + supplements)
+
+        supplement_drom = grille.supplement_drom if drom else 0.0
+        resultats = []
+        for (distance, nb, tp, peage, maj_hosp, court, gv, km, cout_km, base, taux, montant_maj,
+             supp, taux_abatt, montant_abatt, total, iso) in zip(
+                distances.tolist(), patients.tolist(), avec_tpmr.tolist(), frais_peages.tolist(),
+                majoration_hosp.tolist(), courte.tolist(), forfaits_gv.tolist(),
+                arrondir_centimes(km_facturables).tolist(), arrondir_centimes(couts_km).tolist(),
+                arrondir_centimes(bases).tolist(), taux_majoration.tolist(),
+                arrondir_centimes(montants_majoration).tolist(), arrondir_centimes(supplements).tolist(),
+                taux_abattement.tolist(), arrondir_centimes(montants_abattement).tolist(),
+                arrondir_centimes(totaux).tolist(), horodatages.iso):
+            if maj_hosp:
+                type_majoration = _libelle_hospitalisation(grille, court)
+            elif taux:
+                type_majoration = "nuit/weekend"
+            else:
+                type_majoration = ""
+
+            resultats.append({
+                "total": total,
+                "details": {
+                    "distance_km": distance,
+                    "nb_patients": nb,
+                    "forfait_prise_charge": grille.forfait_prise_charge,
+                    "forfait_grande_ville": gv,
+                    "km_facturables": km,
+                    "tarif_km": tarif_km,
+                    "cout_kilometrique": cout_km,
+                    "base_tarifaire": base,
+                    "majoration_taux": taux,
+                    "majoration_type": type_majoration,
+                    "majoration_montant": montant_maj,
+                    "supplement_tpmr": grille.supplement_tpmr if tp else 0.0,
+                    "supplement_drom": supplement_drom,
+                    "peages": peage,
+                    "total_supplements": supp,
+                    "abattement_partage_taux": taux_abatt,
+                    "abattement_partage_montant": montant_abatt,
+                    "departement": self.departement,
+                    "date_heure_transport": iso
+                }
+            })
+        return resultats
+
+
+# --- Registre des calculateurs par département ---
+
+TAILLE_MAX_REGISTRE = int(os.environ.get("CACHE_CPAM_DEPARTEMENTS", 128))
+
+_registre_calculateurs: "OrderedDict[str, CalculateurTarifsCPAM]" = OrderedDict()
+_verrou_registre = threading.Lock()
+_calculateurs_evinces = 0
+
+
+def obtenir_calculateur_cpam(departement: str = "85") -> CalculateurTarifsCPAM:
+    """
+    Retourne le calculateur partagé du département, créé à la première demande.
+    Le registre est borné (LRU) car le département provient de la requête.
+    """
+    global _calculateurs_evinces
+    with _verrou_registre:
+        calculateur = _registre_calculateurs.get(departement)
+        if calculateur is not None:
+            _registre_calculateurs.move_to_end(departement)
+            return calculateur
+
+        calculateur = CalculateurTarifsCPAM(departement=departement)
+        _registre_calculateurs[departement] = calculateur
+        if len(_registre_calculateurs) > TAILLE_MAX_REGISTRE:
+            _registre_calculateurs.popitem(last=False)
+            _calculateurs_evinces += 1
+        return calculateur
+
+
+def statistiques_registre_cpam() -> dict:
+    """Compteurs du registre et des caches de chaque département"""
+    with _verrou_registre:
+        calculateurs = list(_registre_calculateurs.items())
+        evinces = _calculateurs_evinces
+    return {
+        "taille_registre": len(calculateurs),
+        "taille_max_registre": TAILLE_MAX_REGISTRE,
+        "calculateurs_evinces": evinces,
+        "departements": {dep: calc.statistiques_cache() for dep, calc in calculateurs}
+    }
+
+
+def completer_course_cpam(requete: CourseCPAMRequete, numero: Optional[int] = None) -> CourseCPAMRequete:
+    """
+    Complète un transport à partir du référentiel des communes : département de la ville
+    de départ s'il n'est pas précisé, distance estimée entre les deux villes si elle est
+    absente. Lève ValueError si la distance manque et qu'une ville est introuvable.
+    """
+    departement_absent = "departement" not in requete.model_fields_set
+    if requete.distance_km is not None and not (departement_absent and requete.ville_depart):
+        return requete
+
+    communes = referentiel_communes()
+    depart = communes.resoudre(requete.ville_depart, None if departement_absent else requete.departement)
+    mise_a_jour = {}
+    if departement_absent and depart is not None:
+        mise_a_jour["departement"] = depart.departement
+    if requete.distance_km is None:
+        arrivee = communes.resoudre(requete.ville_arrivee)
+        for ville, commune in ((requete.ville_depart, depart), (requete.ville_arrivee, arrivee)):
+            if commune is None:
+                course = f" (course {numero})" if numero is not None else ""
+                raise ValueError(f"distance_km absente et ville introuvable : {ville!r}{course}.")
+        mise_a_jour["distance_km"] = estimer_distance_km(depart, arrivee)
+    return requete.model_copy(update=mise_a_jour)
+
+
+def calculer_courses_cpam(courses: Sequence) -> List[dict]:
+    """
+    Calcule un lot de transports (objets CourseCPAMRequete) de départements quelconques :
+    les transports sont regroupés par département puis calculés en colonnes.
+    """
+    indices_par_departement = defaultdict(list)
+    for indice, course in enumerate(courses):
+        indices_par_departement[course.departement].append(indice)
+
+    resultats: List[Optional[dict]] = [None] * len(courses)
+    for departement, indices in indices_par_departement.items():
+        groupe = [courses[indice] for indice in indices]
+        resultats_departement = obtenir_calculateur_cpam(departement).calculer_tarifs_cpam_lot(
+            distances_km=[course.distance_km for course in groupe],
+            villes_depart=[course.ville_depart for course in groupe],
+            villes_arrivee=[course.ville_arrivee for course in groupe],
+            tarifs_nuit=[course.tarif_nuit for course in groupe],
+            dates_heures_transport=[course.date_heure_transport for course in groupe],
+            types_transport=[course.type_transport for course in groupe],
+            nb_patients=[course.nb_patients for course in groupe],
+            tpmr=[course.tpmr for course in groupe],
+            peages=[course.peages for course in groupe]
+        )
+        for indice, resultat in zip(indices, resultats_departement):
+            resultats[indice] = resultat
+    return resultats
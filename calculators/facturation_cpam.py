@@ -0,0 +1,283 @@
+"""
+Facturation mensuelle CPAM : les transports sanitaires d'un mois (export CSV ou NDJSON)
+sont validés, complétés et tarifés par paquets en colonnes (calculer_courses_cpam), les
+paquets étant répartis entre des processus, puis totalisés par patient (une facture
+chacun), par véhicule et par jour.
+
+Les montants sont cumulés en centimes entiers : les totaux ne dépendent ni du découpage
+en paquets ni de l'ordre d'arrivée des résultats, et chaque transport est facturé au
+centime près du montant de /calculer-tarif-cpam.
+"""
+import itertools
+import math
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from pydantic import ValidationError
+from models.cpam import TransportFacturationCPAM
+from calculators.calendrier import FUSEAU_FRANCE, localiser_france
+from calculators.cpam_calculator import calculer_courses_cpam, completer_course_cpam
+from calculators.reprise_tarifs import FORMATS, calculer_avec_repli, lire_csv, lire_ndjson, message_validation
+from serveur.environnement import entier_env
+from serveur.processus import creer_executeur
+
+# Transports tarifés ensemble dans un processus
+TAILLE_PAQUET_FACTURATION = entier_env("FACTURATION_TAILLE_PAQUET", 10000)
+# Processus de tarification (défaut : nombre de cœurs ; 1 pour tout calculer dans le processus courant)
+PROCESSUS_FACTURATION = entier_env("FACTURATION_PROCESSUS", 0) or os.cpu_count() or 1
+
+_MOIS = re.compile(r"[0-9]{4}-(0[1-9]|1[0-2])")
+
+
+class TransportFacture(NamedTuple):
+    ligne: int
+    patient: str
+    vehicule: str
+    date_heure_transport: str  # heure légale française, ISO 8601
+    type_transport: str
+    distance_km: float
+    nb_patients: int
+    # Montants en centimes
+    montant: int
+    majoration: int
+    abattement_partage: int
+    supplements: int
+
+
+def _centimes(montant: float) -> int:
+    return round(montant * 100)
+
+
+def _heure_france(date_heure: str) -> str:
+    """
+    Date ISO 8601 d'un transport en heure légale française : le mois et le jour facturés
+    sont ceux de Paris, quel que soit le décalage horaire de l'export.
+    """
+    instant = datetime.fromisoformat(date_heure)
+    if instant.tzinfo is None:
+        instant = localiser_france(instant)
+    return instant.astimezone(FUSEAU_FRANCE).isoformat()
+
+
+def tarifer_paquet(mois: str, paquet: List[Tuple[int, object]]) -> Tuple[List[TransportFacture], List[Tuple[int, str]]]:
+    """
+    Valide, complète et tarife un paquet de lignes (numéro, enregistrement) ; retourne les
+    transports facturés et les lignes en erreur. Exécutable dans un processus séparé.
+    """
+    erreurs = []
+    valides = []
+    for numero, enregistrement in paquet:
+        if isinstance(enregistrement, Exception):
+            erreurs.append((numero, str(enregistrement)))
+            continue
+        try:
+            transport = completer_course_cpam(TransportFacturationCPAM.model_validate(enregistrement))
+        except ValidationError as e:
+            erreurs.append((numero, message_validation(e)))
+            continue
+        except ValueError as e:
+            erreurs.append((numero, str(e)))
+            continue
+        valides.append((numero, transport))
+
+    transports = []
+    resultats = calculer_avec_repli(calculer_courses_cpam, [transport for _, transport in valides]) if valides else []
+    for (numero, transport), resultat in zip(valides, resultats):
+        if isinstance(resultat, Exception):
+            erreurs.append((numero, str(resultat)))
+            continue
+        details = resultat["details"]
+        try:
+            date_heure = _heure_france(details["date_heure_transport"])
+        except (ValueError, OverflowError) as e:
+            erreurs.append((numero, str(e)))
+            continue
+        if not date_heure.startswith(mois):
+            erreurs.append((numero, f"Transport hors du mois facturé {mois} ({date_heure[:10]})"))
+            continue
+        transports.append(TransportFacture(
+            numero, transport.patient, transport.vehicule, date_heure, transport.type_transport.value,
+            details["distance_km"], details["nb_patients"], _centimes(resultat["total"]),
+            _centimes(details["majoration_montant"]), _centimes(details["abattement_partage_montant"]),
+            _centimes(details["total_supplements"])
+        ))
+    return transports, erreurs
+
+
+class Cumul:
+    """Totaux d'un ensemble de transports (montants en centimes)"""
+    __slots__ = ("nombre", "montant", "majorations", "abattements_partage", "supplements", "distances")
+
+    def __init__(self):
+        self.nombre = 0
+        self.montant = 0
+        self.majorations = 0
+        self.abattements_partage = 0
+        self.supplements = 0
+        self.distances: List[float] = []
+
+    def ajouter(self, transport: TransportFacture):
+        self.nombre += 1
+        self.montant += transport.montant
+        self.majorations += transport.majoration
+        self.abattements_partage += transport.abattement_partage
+        self.supplements += transport.supplements
+        self.distances.append(transport.distance_km)
+
+    def en_dict(self) -> dict:
+        return {
+            "nombre_transports": self.nombre,
+            "montant_total": self.montant / 100,
+            "majorations": self.majorations / 100,
+            "abattements_partage": self.abattements_partage / 100,
+            "supplements": self.supplements / 100,
+            # Somme exactement arrondie : indépendante de l'ordre des transports
+            "distance_km": round(math.fsum(self.distances), 2),
+        }
+
+
+def _ligne_facture(transport: TransportFacture) -> dict:
+    return {
+        "ligne": transport.ligne,
+        "date_heure_transport": transport.date_heure_transport,
+        "vehicule": transport.vehicule,
+        "type_transport": transport.type_transport,
+        "distance_km": transport.distance_km,
+        "nb_patients": transport.nb_patients,
+        "montant": transport.montant / 100,
+        "majoration": transport.majoration / 100,
+        "abattement_partage": transport.abattement_partage / 100,
+        "supplements": transport.supplements / 100,
+    }
+
+
+class Facturation:
+    """Totaux d'un mois, alimentés paquet par paquet dans n'importe quel ordre"""
+    def __init__(self, mois: str):
+        self.mois = mois
+        self.total = Cumul()
+        self.par_type: Dict[str, Cumul] = {}
+        self.par_patient: Dict[str, Cumul] = {}
+        self.par_vehicule: Dict[str, Cumul] = {}
+        self.par_jour: Dict[str, Cumul] = {}
+        self.transports_par_patient: Dict[str, List[TransportFacture]] = {}
+        self.partages = 0
+        self.erreurs: List[Tuple[int, str]] = []
+
+    def ajouter(self, transports: List[TransportFacture], erreurs: List[Tuple[int, str]]):
+        for transport in transports:
+            self.total.ajouter(transport)
+            for cumuls, cle in ((self.par_type, transport.type_transport), (self.par_patient, transport.patient),
+                                (self.par_vehicule, transport.vehicule), (self.par_jour, transport.date_heure_transport[:10])):
+                cumul = cumuls.get(cle)
+                if cumul is None:
+                    cumul = cumuls[cle] = Cumul()
+                cumul.ajouter(transport)
+            self.transports_par_patient.setdefault(transport.patient, []).append(transport)
+            self.partages += transport.nb_patients > 1
+        self.erreurs.extend(erreurs)
+
+    def rapport(self, lignes: bool = True) -> dict:
+        """Synthèse, factures par patient (avec leurs transports si `lignes`), totaux par véhicule et par jour"""
+        factures = []
+        for patient in sorted(self.par_patient):
+            facture = {"patient": patient, **self.par_patient[patient].en_dict()}
+            if lignes:
+                transports = sorted(self.transports_par_patient[patient],
+                                    key=lambda transport: (transport.date_heure_transport, transport.ligne))
+                facture["transports"] = [_ligne_facture(transport) for transport in transports]
+            factures.append(facture)
+        return {
+            "mois": self.mois,
+            "synthese": {
+                **self.total.en_dict(),
+                "transports_partages": self.partages,
+                "lignes_en_erreur": len(self.erreurs),
+                "patients": len(self.par_patient),
+                "vehicules": len(self.par_vehicule),
+                "jours": len(self.par_jour),
+                "par_type_transport": {type_transport: self.par_type[type_transport].en_dict()
+                                       for type_transport in sorted(self.par_type)},
+            },
+            "factures": factures,
+            "vehicules": [{"vehicule": vehicule, **self.par_vehicule[vehicule].en_dict()}
+                          for vehicule in sorted(self.par_vehicule)],
+            "jours": [{"jour": jour, **self.par_jour[jour].en_dict()} for jour in sorted(self.par_jour)],
+            "erreurs": [{"ligne": numero, "erreur": erreur} for numero, erreur in sorted(self.erreurs)],
+        }
+
+
+# --- Répartition entre processus ---
+
+_executeur: Optional[ProcessPoolExecutor] = None
+_verrou_executeur = threading.Lock()
+
+
+def _obtenir_executeur(processus: int) -> ProcessPoolExecutor:
+    global _executeur
+    with _verrou_executeur:
+        if _executeur is None:
+            _executeur = creer_executeur(processus)
+        return _executeur
+
+
+def arreter():
+    """Arrête les processus de tarification (fin du serveur ou de la commande)"""
+    global _executeur
+    with _verrou_executeur:
+        if _executeur is not None:
+            _executeur.shutdown(cancel_futures=True)
+            _executeur = None
+
+
+def _paquets(enregistrements: Iterable[Tuple[int, object]], taille_paquet: int) -> Iterator[List[Tuple[int, object]]]:
+    paquet = []
+    for element in enregistrements:
+        paquet.append(element)
+        if len(paquet) >= taille_paquet:
+            yield paquet
+            paquet = []
+    if paquet:
+        yield paquet
+
+
+def facturer_mois(enregistrements: Iterable[Tuple[int, object]], mois: str, lignes: bool = True,
+                  processus: int = PROCESSUS_FACTURATION, taille_paquet: int = TAILLE_PAQUET_FACTURATION) -> dict:
+    """
+    Facture les transports d'un mois (« AAAA-MM ») lus par lire_csv ou lire_ndjson. Les
+    paquets sont tarifés par `processus` processus au fil de la lecture (deux paquets en
+    attente par processus au plus) ; un lot d'un seul paquet est tarifé sur place.
+    Le rapport est identique quel que soit le nombre de processus.
+    """
+    if not _MOIS.fullmatch(mois):
+        raise ValueError(f"Mois invalide : {mois!r} (format AAAA-MM attendu)")
+    facturation = Facturation(mois)
+    paquets = _paquets(enregistrements, taille_paquet)
+    premiers = list(itertools.islice(paquets, 2))
+    if len(premiers) < 2 or processus <= 1:
+        for paquet in itertools.chain(premiers, paquets):
+            facturation.ajouter(*tarifer_paquet(mois, paquet))
+        return facturation.rapport(lignes)
+
+    executeur = _obtenir_executeur(processus)
+    en_cours = deque()
+    for paquet in itertools.chain(premiers, paquets):
+        en_cours.append(executeur.submit(tarifer_paquet, mois, paquet))
+        if len(en_cours) >= 2 * processus:
+            facturation.ajouter(*en_cours.popleft().result())
+    while en_cours:
+        facturation.ajouter(*en_cours.popleft().result())
+    return facturation.rapport(lignes)
+
+
+def facturer_fichier(lignes: Iterable[str], mois: str, format_fichier: str = "csv", lignes_factures: bool = True,
+                     processus: int = PROCESSUS_FACTURATION, taille_paquet: int = TAILLE_PAQUET_FACTURATION) -> dict:
+    """Facture un export de transports CSV (avec en-tête) ou NDJSON lu ligne par ligne"""
+    if format_fichier not in FORMATS:
+        raise ValueError(f"Format inconnu : {format_fichier} ({', '.join(FORMATS)})")
+    lecteur = lire_ndjson if format_fichier == "ndjson" else lire_csv
+    return facturer_mois(lecteur(lignes), mois, lignes=lignes_factures, processus=processus, taille_paquet=taille_paquet)
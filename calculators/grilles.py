@@ -0,0 +1,355 @@
+import hashlib
+import json
+import os
+import threading
+import time as horloge
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Generic, Mapping, Optional, Sequence, Tuple, TypeVar
+import numpy as np
+from calculators.calendrier import FUSEAU_FRANCE, CalendrierTarifaire, obtenir_calendrier, utiliser_tables
+from calculators.tables_partagees import ouvrir_tables
+from geographie.texte import plier
+
+FICHIER_TARIFS_DEFAUT = Path(__file__).with_name("tarifs.json")
+
+# Intervalle minimal entre deux vérifications de la date de modification du fichier
+INTERVALLE_VERIFICATION_DEFAUT = 5.0
+
+_ORDINAL_EPOQUE = date(1970, 1, 1).toordinal()
+
+
+# --- Grilles compilées ---
+# Objets immuables construits une fois par version. Leur identité sert de clé dans les
+# caches de calcul : une version inchangée après rechargement garde le même objet,
+# donc les mêmes entrées en cache.
+
+@dataclass(frozen=True, eq=False)
+class GrilleTaxi:
+    version: str
+    debut: date
+    empreinte: str
+    prix_base: float
+    tarif_a_jour: float  # €/km aller-retour jour
+    tarif_b_nuit: float  # €/km aller-retour nuit/dimanche/fériés
+    tarif_c_jour: float  # €/km aller simple jour
+    tarif_d_nuit: float  # €/km aller simple nuit/dimanche/fériés
+    prix_par_minute_attente: float
+    debut_nuit: time
+    fin_nuit: time
+    tarif_minimum: float
+    calendrier: CalendrierTarifaire
+
+
+@dataclass(frozen=True, eq=False)
+class GrilleCPAM:
+    version: str
+    debut: date
+    empreinte: str
+    forfait_prise_charge: float
+    forfait_grande_ville: float
+    villes_grande_ville: FrozenSet[str]  # noms pliés (geographie.texte.plier)
+    departements_grande_ville: FrozenSet[str]
+    km_franchise: float
+    tarifs_km: Mapping[str, float]
+    tarif_km_defaut: float
+    supplement_tpmr: float
+    supplement_drom: float
+    departements_drom: FrozenSet[str]
+    majoration_nuit_weekend: float
+    seuil_hospitalisation_longue_km: float
+    majoration_hospitalisation_courte: float
+    majoration_hospitalisation_longue: float
+    # Taux d'abattement indexé par nombre de patients ; le dernier vaut pour les suivants
+    abattements_partage: Tuple[float, ...]
+    debut_nuit: time
+    fin_nuit: time
+    calendrier: CalendrierTarifaire
+
+    def tarif_km(self, departement: str) -> float:
+        return self.tarifs_km.get(departement, self.tarif_km_defaut)
+
+    def taux_abattement(self, nb_patients: int) -> float:
+        return self.abattements_partage[min(nb_patients, len(self.abattements_partage) - 1)]
+
+
+G = TypeVar("G", GrilleTaxi, GrilleCPAM)
+
+
+class Chronologie(Generic[G]):
+    """
+    Versions successives d'une grille, triées par date d'entrée en vigueur. Une version
+    s'applique de sa date de début jusqu'à la veille de la suivante ; la plus ancienne
+    s'applique aussi aux dates antérieures.
+    """
+    __slots__ = ("grilles", "_debuts", "_debuts_epoque")
+
+    def __init__(self, grilles: Sequence[G]):
+        self.grilles: Tuple[G, ...] = tuple(grilles)
+        self._debuts = [grille.debut.toordinal() for grille in self.grilles]
+        self._debuts_epoque = np.array(self._debuts, dtype=np.int64) - _ORDINAL_EPOQUE
+
+    def grille_au(self, jour: date) -> G:
+        """Grille en vigueur à une date"""
+        return self.grilles[max(bisect_right(self._debuts, jour.toordinal()) - 1, 0)]
+
+    def prochain_debut(self, jour: date) -> Optional[date]:
+        """Date d'entrée en vigueur de la première version postérieure à jour, ou None"""
+        indice = bisect_right(self._debuts, jour.toordinal())
+        return self.grilles[indice].debut if indice < len(self.grilles) else None
+
+    def active(self) -> G:
+        """Grille en vigueur aujourd'hui (date française)"""
+        return self.grille_au(datetime.now(FUSEAU_FRANCE).date())
+
+    def indices_lot(self, jours: np.ndarray) -> np.ndarray:
+        """Indice dans self.grilles de la grille en vigueur pour chaque jour (depuis le 1er janvier 1970)"""
+        if len(self.grilles) == 1:
+            return np.zeros(len(jours), dtype=np.intp)
+        return np.maximum(np.searchsorted(self._debuts_epoque, jours, side="right") - 1, 0)
+
+
+@dataclass(frozen=True, eq=False)
+class CatalogueTarifs:
+    """Ensemble cohérent des grilles chargées depuis un même fichier"""
+    version: str
+    empreinte: str
+    taxi: Chronologie[GrilleTaxi]
+    cpam: Chronologie[GrilleCPAM]
+
+    def resume(self) -> dict:
+        return {
+            "version": self.version,
+            "empreinte": self.empreinte,
+            "taxi": [{"version": g.version, "debut": g.debut.isoformat()} for g in self.taxi.grilles],
+            "cpam": [{"version": g.version, "debut": g.debut.isoformat()} for g in self.cpam.grilles]
+        }
+
+
+# --- Lecture et validation du fichier ---
+
+def _empreinte(donnees) -> str:
+    return hashlib.sha256(json.dumps(donnees, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _lire_heure(valeur: str) -> time:
+    heure = time.fromisoformat(valeur)
+    if heure.second or heure.microsecond:
+        raise ValueError(f"heure au format HH:MM attendue, reçu {valeur}")
+    return heure
+
+
+def _montant(entree: dict, champ: str) -> float:
+    valeur = entree[champ]
+    if isinstance(valeur, bool) or not isinstance(valeur, (int, float)) or valeur < 0:
+        raise ValueError(f"{champ} doit être un nombre positif")
+    return float(valeur)
+
+
+def _compiler_taxi(entree: dict, empreinte: str) -> GrilleTaxi:
+    debut_nuit = _lire_heure(entree["debut_nuit"])
+    fin_nuit = _lire_heure(entree["fin_nuit"])
+    return GrilleTaxi(
+        version=str(entree["version"]),
+        debut=date.fromisoformat(entree["debut"]),
+        empreinte=empreinte,
+        prix_base=_montant(entree, "prix_base"),
+        tarif_a_jour=_montant(entree, "tarif_a_jour"),
+        tarif_b_nuit=_montant(entree, "tarif_b_nuit"),
+        tarif_c_jour=_montant(entree, "tarif_c_jour"),
+        tarif_d_nuit=_montant(entree, "tarif_d_nuit"),
+        prix_par_minute_attente=_montant(entree, "prix_heure_attente") / 60,
+        debut_nuit=debut_nuit,
+        fin_nuit=fin_nuit,
+        tarif_minimum=_montant(entree, "tarif_minimum"),
+        calendrier=obtenir_calendrier(debut_nuit, fin_nuit)
+    )
+
+
+def _compiler_cpam(entree: dict, empreinte: str) -> GrilleCPAM:
+    debut_nuit = _lire_heure(entree["debut_nuit"])
+    fin_nuit = _lire_heure(entree["fin_nuit"])
+    abattements = {int(nb): float(taux) for nb, taux in entree["abattements_partage"].items()}
+    if not abattements or min(abattements) < 2:
+        raise ValueError("abattements_partage doit porter sur 2 patients ou plus")
+    tarifs_km = {str(dep): float(tarif) for dep, tarif in entree["tarifs_km"].items()}
+    return GrilleCPAM(
+        version=str(entree["version"]),
+        debut=date.fromisoformat(entree["debut"]),
+        empreinte=empreinte,
+        forfait_prise_charge=_montant(entree, "forfait_prise_charge"),
+        forfait_grande_ville=_montant(entree, "forfait_grande_ville"),
+        villes_grande_ville=frozenset(plier(ville) for ville in entree["villes_grande_ville"]),
+        departements_grande_ville=frozenset(entree["departements_grande_ville"]),
+        km_franchise=_montant(entree, "km_franchise"),
+        tarifs_km=MappingProxyType(tarifs_km),
+        tarif_km_defaut=_montant(entree, "tarif_km_defaut"),
+        supplement_tpmr=_montant(entree, "supplement_tpmr"),
+        supplement_drom=_montant(entree, "supplement_drom"),
+        departements_drom=frozenset(entree["departements_drom"]),
+        majoration_nuit_weekend=_montant(entree, "majoration_nuit_weekend"),
+        seuil_hospitalisation_longue_km=_montant(entree, "seuil_hospitalisation_longue_km"),
+        majoration_hospitalisation_courte=_montant(entree, "majoration_hospitalisation_courte"),
+        majoration_hospitalisation_longue=_montant(entree, "majoration_hospitalisation_longue"),
+        abattements_partage=tuple(abattements.get(nb, 0.0) for nb in range(max(abattements) + 1)),
+        debut_nuit=debut_nuit,
+        fin_nuit=fin_nuit,
+        calendrier=obtenir_calendrier(debut_nuit, fin_nuit)
+    )
+
+
+def _compiler_chronologie(regime: str, entrees, compiler, existantes: Dict[str, object]) -> Chronologie:
+    if not isinstance(entrees, list) or not entrees:
+        raise ValueError(f"{regime}: au moins une version de grille est requise")
+    grilles = []
+    for position, entree in enumerate(entrees):
+        try:
+            empreinte = _empreinte(entree)
+            # Une version au contenu inchangé réutilise la grille déjà compilée
+            grille = existantes.get(empreinte) or compiler(entree, empreinte)
+        except KeyError as e:
+            raise ValueError(f"{regime}[{position}]: champ manquant {e}") from None
+        except (TypeError, ValueError, AttributeError) as e:
+            raise ValueError(f"{regime}[{position}]: {e}") from None
+        grilles.append(grille)
+
+    grilles.sort(key=lambda grille: grille.debut)
+    versions = [grille.version for grille in grilles]
+    if len(set(versions)) != len(versions):
+        raise ValueError(f"{regime}: noms de version en double")
+    for precedente, suivante in zip(grilles, grilles[1:]):
+        if precedente.debut == suivante.debut:
+            raise ValueError(f"{regime}: {precedente.version} et {suivante.version} commencent le même jour")
+    return Chronologie(grilles)
+
+
+def charger_catalogue(chemin, precedent: Optional[CatalogueTarifs] = None) -> CatalogueTarifs:
+    """
+    Lit, valide et compile un fichier de tarifs. Lève ValueError si le fichier est invalide.
+    Les grilles identiques à celles de `precedent` sont reprises telles quelles.
+    """
+    try:
+        with open(chemin, "rb") as f:
+            donnees = json.load(f)
+    except OSError as e:
+        raise ValueError(f"Fichier de tarifs illisible: {e}") from None
+    except ValueError as e:
+        raise ValueError(f"Fichier de tarifs invalide: {e}") from None
+    if not isinstance(donnees, dict):
+        raise ValueError("Le fichier de tarifs doit contenir un objet JSON")
+
+    existantes: Dict[str, object] = {}
+    if precedent is not None:
+        for grille in precedent.taxi.grilles + precedent.cpam.grilles:
+            existantes[grille.empreinte] = grille
+
+    taxi = _compiler_chronologie("taxi", donnees.get("taxi"), _compiler_taxi,
+                                 {e: g for e, g in existantes.items() if isinstance(g, GrilleTaxi)})
+    cpam = _compiler_chronologie("cpam", donnees.get("cpam"), _compiler_cpam,
+                                 {e: g for e, g in existantes.items() if isinstance(g, GrilleCPAM)})
+    return CatalogueTarifs(
+        version=str(donnees.get("version", "")),
+        empreinte=_empreinte(donnees),
+        taxi=taxi,
+        cpam=cpam
+    )
+
+
+# --- Rechargement à chaud ---
+
+class ReferentielTarifs:
+    """
+    Catalogue de tarifs en vigueur, rechargé à chaud quand le fichier change. Chaque
+    processus vérifie la date de modification du fichier au plus une fois par
+    intervalle, à la lecture du catalogue : une mise à jour du fichier atteint tous
+    les workers sans redémarrage. Le nouveau catalogue est compilé à part puis
+    substitué en une seule affectation ; un calcul en cours garde celui qu'il a lu.
+    Un fichier invalide est refusé et le catalogue précédent reste en service.
+    """
+    def __init__(self, chemin, intervalle_verification: float = INTERVALLE_VERIFICATION_DEFAUT):
+        self.chemin = Path(chemin)
+        self.intervalle_verification = intervalle_verification
+        self._verrou = threading.Lock()
+        self._signature = self._signature_fichier()
+        self._catalogue = charger_catalogue(self.chemin)
+        self._prochaine_verification = horloge.monotonic() + intervalle_verification
+        self.rechargements = 0
+        self.derniere_erreur: Optional[str] = None
+
+    def _signature_fichier(self) -> Optional[Tuple[int, int]]:
+        try:
+            etat = os.stat(self.chemin)
+        except OSError:
+            return None
+        return etat.st_mtime_ns, etat.st_size
+
+    @property
+    def catalogue(self) -> CatalogueTarifs:
+        if self.intervalle_verification > 0 and horloge.monotonic() >= self._prochaine_verification:
+            self._verifier()
+        return self._catalogue
+
+    def _verifier(self):
+        # Un seul fil vérifie ; les autres continuent avec le catalogue courant
+        if not self._verrou.acquire(blocking=False):
+            return
+        try:
+            self._prochaine_verification = horloge.monotonic() + self.intervalle_verification
+            signature = self._signature_fichier()
+            if signature is not None and signature != self._signature:
+                # Retenue même en cas d'échec : un fichier invalide n'est relu qu'après modification
+                self._signature = signature
+                try:
+                    self._remplacer()
+                except ValueError:
+                    pass
+        finally:
+            self._verrou.release()
+
+    def _remplacer(self) -> CatalogueTarifs:
+        try:
+            catalogue = charger_catalogue(self.chemin, precedent=self._catalogue)
+        except ValueError as e:
+            self.derniere_erreur = str(e)
+            raise
+        self.derniere_erreur = None
+        if catalogue.empreinte != self._catalogue.empreinte:
+            self._catalogue = catalogue
+            self.rechargements += 1
+        return self._catalogue
+
+    def recharger(self) -> CatalogueTarifs:
+        """Recharge immédiatement le fichier ; lève ValueError s'il est invalide"""
+        with self._verrou:
+            self._signature = self._signature_fichier()
+            self._prochaine_verification = horloge.monotonic() + self.intervalle_verification
+            return self._remplacer()
+
+    def statistiques(self) -> dict:
+        return {
+            **self._catalogue.resume(),
+            "fichier": str(self.chemin),
+            "rechargements": self.rechargements,
+            "derniere_erreur": self.derniere_erreur
+        }
+
+
+_fichier_tarifs = os.environ.get("TARIFS_FICHIER") or FICHIER_TARIFS_DEFAUT
+
+
+def partager_tables(chemin: str):
+    """Projette les tables calendaires communes aux workers depuis `chemin` (voir gunicorn.conf.py)"""
+    utiliser_tables(ouvrir_tables(chemin, _fichier_tarifs))
+
+
+# Tables déjà construites par un autre processus (sans préchargement par gunicorn)
+if os.environ.get("TABLES_PARTAGEES"):
+    partager_tables(os.environ["TABLES_PARTAGEES"])
+
+referentiel_tarifs = ReferentielTarifs(
+    _fichier_tarifs,
+    float(os.environ.get("TARIFS_VERIFICATION_SECONDES", INTERVALLE_VERIFICATION_DEFAUT))
+)
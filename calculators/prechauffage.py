@@ -0,0 +1,89 @@
+import itertools
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, Optional
+from models.cpam import TypeTransport
+from calculators.calendrier import JOUR, FUSEAU_FRANCE
+from calculators.cpam_calculator import obtenir_calculateur_cpam
+from calculators.taxi_calculator import calculateur_taxi
+from geographie.communes import referentiel_communes
+
+FICHIER_COURSES_DEFAUT = Path(__file__).with_name("courses_frequentes.json")
+# Préchauffage des caches de calcul au démarrage (PRECHAUFFAGE=false pour le désactiver)
+PRECHAUFFAGE_ACTIF = os.environ.get("PRECHAUFFAGE", "true").strip().lower() not in ("0", "false", "non")
+FICHIER_COURSES = os.environ.get("PRECHAUFFAGE_FICHIER") or FICHIER_COURSES_DEFAUT
+
+# Bilan du dernier préchauffage de ce processus (exposé par /admin/caches)
+dernier_prechauffage: Optional[dict] = None
+
+
+def _combinaisons(modele: dict) -> Iterator[dict]:
+    """Toutes les courses d'un modèle dont les champs sont des valeurs ou des listes de valeurs"""
+    champs = list(modele)
+    valeurs = [modele[champ] if isinstance(modele[champ], list) else [modele[champ]] for champ in champs]
+    for combinaison in itertools.product(*valeurs):
+        yield dict(zip(champs, combinaison))
+
+
+def _dates_reference(maintenant: datetime):
+    """Un horaire de jour ouvré (10h) et un horaire de nuit (22h) proches d'aujourd'hui"""
+    calendrier = calculateur_taxi.grille_active().calendrier
+    jour = maintenant.replace(hour=10, minute=0, second=0, microsecond=0, tzinfo=None)
+    while calendrier.periode(jour) != JOUR:
+        jour += timedelta(days=1)
+    return jour, jour.replace(hour=22)
+
+
+def prechauffer(chemin=None) -> dict:
+    """
+    Calcule les courses les plus fréquentes (fichier `chemin`, par défaut
+    calculators/courses_frequentes.json) pour que les premières requêtes trouvent
+    leurs résultats en cache, et retourne le bilan du préchauffage.
+    """
+    global dernier_prechauffage
+    debut = time.perf_counter()
+    with open(chemin or FICHIER_COURSES, encoding="utf-8") as fichier:
+        courses = json.load(fichier)
+
+    jour, nuit = _dates_reference(datetime.now(FUSEAU_FRANCE))
+    calculs_taxi = 0
+    for modele in courses.get("taxi", []):
+        for course in _combinaisons(modele):
+            calculateur_taxi.calculer_tarif_course(
+                course["distance_km"],
+                minutes_attente=course.get("minutes_attente", 0),
+                date_heure_depart=nuit if course.get("periode") == "nuit" else jour,
+                aller_retour=course.get("aller_retour", False)
+            )
+            calculs_taxi += 1
+
+    calculs_cpam = 0
+    for modele in courses.get("cpam", []):
+        for course in _combinaisons(modele):
+            obtenir_calculateur_cpam(str(course.get("departement", "85"))).calculer_tarif_cpam(
+                course["distance_km"],
+                ville_depart=course.get("ville_depart", ""),
+                ville_arrivee=course.get("ville_arrivee", ""),
+                tarif_nuit=course.get("tarif_nuit", False),
+                date_heure_transport=jour,
+                type_transport=TypeTransport(course.get("type_transport", "simple")),
+                nb_patients=course.get("nb_patients", 1),
+                tpmr=course.get("tpmr", False),
+                peages=course.get("peages", 0.0)
+            )
+            calculs_cpam += 1
+
+    # Référentiel des communes chargé avant la première résolution de ville
+    communes = len(referentiel_communes().communes)
+
+    dernier_prechauffage = {
+        "fichier": str(chemin or FICHIER_COURSES),
+        "courses_taxi": calculs_taxi,
+        "courses_cpam": calculs_cpam,
+        "communes": communes,
+        "duree_ms": round((time.perf_counter() - debut) * 1000, 2),
+    }
+    return dernier_prechauffage
@@ -0,0 +1,211 @@
+import csv
+import io
+import json
+import re
+from typing import Callable, Iterable, Iterator, List, Tuple, Type, TypeVar, Union
+from pydantic import BaseModel, ValidationError
+from models.taxi import CourseRequete, CourseReponse
+from models.cpam import CourseCPAMRequete, DetailsCPAMReponse
+from calculators.taxi_calculator import calculateur_taxi
+from calculators.cpam_calculator import calculer_courses_cpam, completer_course_cpam
+
+GRILLES = ("taxi", "cpam")
+FORMATS = ("csv", "ndjson")
+
+# Nombre de lignes calculées ensemble : borne la mémoire quelle que soit la taille du fichier
+TAILLE_PAQUET_DEFAUT = 1000
+
+ENCODAGE_INVALIDE = "Encodage invalide (UTF-8 attendu)"
+_SUBSTITUTS = re.compile("[\udc80-\udcff]")
+
+C = TypeVar("C")
+R = TypeVar("R")
+
+
+def colonnes_sortie(grille: str) -> List[str]:
+    """Colonnes du fichier CSV produit pour une grille"""
+    if grille == "taxi":
+        champs = list(CourseReponse.model_fields)
+    else:
+        champs = ["total"] + list(DetailsCPAMReponse.model_fields)
+    return ["ligne", "statut", "erreur"] + champs
+
+
+def message_validation(erreur: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(partie) for partie in detail['loc'])}: {detail['msg']}"
+        for detail in erreur.errors()
+    )
+
+
+def _encodage_invalide(texte: str) -> bool:
+    """Octets non UTF-8, conservés par le décodage errors="surrogateescape" des fichiers reçus"""
+    return _SUBSTITUTS.search(texte) is not None
+
+
+def lire_csv(lignes: Iterable[str]) -> Iterator[Tuple[int, object]]:
+    """
+    Lit un CSV avec en-tête ligne par ligne ; les cellules vides sont ignorées. Un
+    enregistrement illisible (CSV mal formé, encodage invalide) devient une erreur.
+    """
+    lecteur = csv.DictReader(lignes)
+    while True:
+        debut = lecteur.line_num
+        try:
+            enregistrement = next(lecteur)
+        except StopIteration:
+            return
+        except (csv.Error, UnicodeDecodeError) as e:
+            yield debut + 1, ValueError(f"CSV illisible: {e}")
+            continue
+        valeurs = {cle: valeur for cle, valeur in enregistrement.items() if cle is not None and valeur not in (None, "")}
+        if any(isinstance(valeur, str) and _encodage_invalide(valeur) for valeur in valeurs.values()):
+            yield lecteur.line_num, ValueError(ENCODAGE_INVALIDE)
+            continue
+        yield lecteur.line_num, valeurs
+
+
+def lire_ndjson(lignes: Iterable[str]) -> Iterator[Tuple[int, object]]:
+    """Lit un flux NDJSON ligne par ligne ; une ligne illisible devient une erreur"""
+    for numero, ligne in enumerate(lignes, start=1):
+        if not ligne.strip():
+            continue
+        if _encodage_invalide(ligne):
+            yield numero, ValueError(ENCODAGE_INVALIDE)
+            continue
+        try:
+            enregistrement = json.loads(ligne)
+        except ValueError as e:
+            yield numero, ValueError(f"JSON invalide: {e}")
+            continue
+        if not isinstance(enregistrement, dict):
+            yield numero, ValueError("Chaque ligne doit être un objet JSON")
+            continue
+        yield numero, enregistrement
+
+
+def _tarifer_paquet(grille: str, paquet: List[Tuple[int, object]]) -> List[dict]:
+    """Valide puis calcule un paquet de lignes ; retourne une sortie par ligne, dans l'ordre"""
+    modele: Type[BaseModel] = CourseRequete if grille == "taxi" else CourseCPAMRequete
+    sorties = []
+    valides = []
+    for numero, enregistrement in paquet:
+        sortie = {"ligne": numero, "statut": "ok", "erreur": ""}
+        sorties.append(sortie)
+        if isinstance(enregistrement, Exception):
+            sortie.update(statut="erreur", erreur=str(enregistrement))
+            continue
+        try:
+            course = modele.model_validate(enregistrement)
+        except ValidationError as e:
+            sortie.update(statut="erreur", erreur=message_validation(e))
+            continue
+        if grille == "taxi" and course.distance_km < 0:
+            sortie.update(statut="erreur", erreur="La distance ne peut pas etre negative.")
+            continue
+        if grille == "cpam":
+            try:
+                course = completer_course_cpam(course)
+            except ValueError as e:
+                sortie.update(statut="erreur", erreur=str(e))
+                continue
+        valides.append((sortie, course))
+
+    if valides:
+        resultats = calculer_avec_repli(lambda courses: _calculer(grille, courses), [course for _, course in valides])
+        for (sortie, _), resultat in zip(valides, resultats):
+            if isinstance(resultat, Exception):
+                sortie.update(statut="erreur", erreur=str(resultat))
+            else:
+                sortie["resultat"] = resultat
+    return sorties
+
+
+def calculer_avec_repli(calculer: Callable[[List[C]], List[R]], courses: List[C]) -> List[Union[R, Exception]]:
+    """
+    Calcule les courses d'un paquet en un seul appel à `calculer`. Si le calcul en colonnes
+    refuse le paquet, chaque course est recalculée seule : celle qui échoue reçoit son
+    exception à la place du résultat, sans emporter les autres.
+    """
+    try:
+        return calculer(courses)
+    except (ValueError, ArithmeticError):
+        resultats: List[Union[R, Exception]] = []
+        for course in courses:
+            try:
+                resultats.append(calculer([course])[0])
+            except (ValueError, ArithmeticError) as e:
+                resultats.append(e)
+        return resultats
+
+
+def _calculer(grille: str, courses: List[BaseModel]) -> List[dict]:
+    if grille == "taxi":
+        return calculateur_taxi.calculer_tarifs_lot(
+            distances_km=[course.distance_km for course in courses],
+            minutes_attente=[course.minutes_attente for course in courses],
+            dates_heures_depart=[course.date_heure_depart for course in courses],
+            allers_retours=[course.aller_retour for course in courses]
+        )
+    return calculer_courses_cpam(courses)
+
+
+def _aplatir(grille: str, sortie: dict) -> dict:
+    resultat = sortie.get("resultat")
+    ligne = {"ligne": sortie["ligne"], "statut": sortie["statut"], "erreur": sortie["erreur"]}
+    if resultat is not None:
+        if grille == "taxi":
+            ligne.update(resultat)
+        else:
+            ligne["total"] = resultat["total"]
+            ligne.update(resultat["details"])
+    return ligne
+
+
+def reprendre_tarifs(lignes: Iterable[str],
+                     grille: str = "taxi",
+                     format_fichier: str = "csv",
+                     taille_paquet: int = TAILLE_PAQUET_DEFAUT) -> Iterator[str]:
+    """
+    Recalcule un export de courses au fil de l'eau. Les lignes sont lues, calculées
+    et restituées par paquets : seul le paquet en cours est gardé en mémoire.
+    Une ligne invalide produit une ligne en erreur sans interrompre le traitement.
+    """
+    if grille not in GRILLES:
+        raise ValueError(f"Grille inconnue: {grille}")
+    if format_fichier not in FORMATS:
+        raise ValueError(f"Format inconnu: {format_fichier}")
+
+    lecteur = lire_csv(lignes) if format_fichier == "csv" else lire_ndjson(lignes)
+    tampon = io.StringIO()
+    ecrivain = None
+    if format_fichier == "csv":
+        ecrivain = csv.DictWriter(tampon, fieldnames=colonnes_sortie(grille), extrasaction="ignore")
+        ecrivain.writeheader()
+
+    paquet: List[Tuple[int, object]] = []
+
+    def vider() -> str:
+        for sortie in _tarifer_paquet(grille, paquet):
+            if ecrivain is not None:
+                ecrivain.writerow(_aplatir(grille, sortie))
+            else:
+                if sortie["statut"] == "ok":
+                    enregistrement = {"ligne": sortie["ligne"], "resultat": sortie["resultat"]}
+                else:
+                    enregistrement = {"ligne": sortie["ligne"], "erreur": sortie["erreur"]}
+                tampon.write(json.dumps(enregistrement, ensure_ascii=False))
+                tampon.write("\n")
+        paquet.clear()
+        contenu = tampon.getvalue()
+        tampon.seek(0)
+        tampon.truncate()
+        return contenu
+
+    for element in lecteur:
+        paquet.append(element)
+        if len(paquet) >= taille_paquet:
+            yield vider()
+    contenu = vider()
+    if contenu:
+        yield contenu
@@ -0,0 +1,77 @@
+from operator import attrgetter
+from typing import NamedTuple
+
+# Résultats des calculs unitaires : tuples nommés, immuables et compacts. La partie
+# indépendante de la requête (base) est partagée telle quelle depuis les caches de
+# calcul ; le résultat complet la référence, sans recopie, et expose ses champs par
+# attribut, ce qui suffit aux modèles de réponse (validation from_attributes) et à la
+# sérialisation rapide.
+
+
+def _deleguer(classe, champs):
+    """Expose les champs de `base` comme attributs en lecture seule de `classe`"""
+    for champ in champs:
+        if not hasattr(classe, champ):
+            setattr(classe, champ, property(attrgetter(f"base.{champ}")))
+
+
+# --- Taxi ---
+
+class BaseTarifTaxi(NamedTuple):
+    prix_base: float
+    distance_facturable: float
+    cout_distance: float
+    cout_attente: float
+    type_tarif: str
+    tarif_km: float
+    tarif_minimum_applique: bool
+    total: float
+
+
+class TarifCourse(NamedTuple):
+    base: BaseTarifTaxi
+    distance_km: float
+    minutes_attente: float
+    type_tarif: str  # détaillé selon la période (nuit ou dimanche/férié)
+    aller_retour: bool
+    date_heure_depart: str
+
+
+_deleguer(TarifCourse, BaseTarifTaxi._fields)
+
+
+# --- CPAM ---
+
+class BaseTarifCPAM(NamedTuple):
+    total: float
+    forfait_prise_charge: float
+    forfait_grande_ville: float
+    km_facturables: float
+    tarif_km: float
+    cout_kilometrique: float
+    base_tarifaire: float
+    majoration_taux: float
+    majoration_type: str
+    majoration_montant: float
+    supplement_tpmr: float
+    supplement_drom: float
+    peages: float
+    total_supplements: float
+    abattement_partage_taux: float
+    abattement_partage_montant: float
+
+
+class DetailsCPAM(NamedTuple):
+    base: BaseTarifCPAM
+    distance_km: float
+    nb_patients: int
+    departement: str
+    date_heure_transport: str
+
+
+_deleguer(DetailsCPAM, BaseTarifCPAM._fields)
+
+
+class TarifCPAM(NamedTuple):
+    total: float
+    details: DetailsCPAM
@@ -0,0 +1,115 @@
+"""
+Tables précalculées du calendrier tarifaire (jours fériés, périodes minute par minute)
+écrites une seule fois dans un fichier puis projetées en mémoire, en lecture seule, par
+chaque worker : leurs pages sont communes à tous les processus, y compris aux workers
+relancés, au lieu d'être reconstruites et dupliquées par chacun.
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Mapping
+from datetime import time
+from typing import Dict, Iterator
+from calculators.calendrier import nom_table_minutes, table_feries, table_minutes
+
+FORMAT_TABLES = 1
+SIGNATURE = b"TAXITABL"
+# Signature, version du format, longueur de l'index JSON
+_ENTETE = struct.Struct("<8sII")
+# Début de chaque table aligné sur une ligne de cache
+ALIGNEMENT = 64
+
+
+def _bornes_nuit(chemin_tarifs) -> set:
+    """Bornes de nuit des grilles du fichier de tarifs (vide s'il est illisible)"""
+    try:
+        with open(chemin_tarifs, "rb") as fichier:
+            donnees = json.load(fichier)
+        return {
+            (time.fromisoformat(entree["debut_nuit"]), time.fromisoformat(entree["fin_nuit"]))
+            for regime in ("taxi", "cpam") for entree in donnees.get(regime, [])
+        }
+    except (OSError, ValueError, TypeError, KeyError, AttributeError):
+        # Le chargement du catalogue signalera l'erreur ; les calendriers seront construits localement
+        return set()
+
+
+def construire_tables(chemin_tarifs) -> Dict[str, bytes]:
+    """Table des jours fériés et table minute-de-semaine de chaque calendrier du fichier de tarifs"""
+    tables = {"feries": table_feries()}
+    for debut_nuit, fin_nuit in sorted(_bornes_nuit(chemin_tarifs)):
+        tables[nom_table_minutes(debut_nuit, fin_nuit)] = table_minutes(debut_nuit, fin_nuit)
+    return tables
+
+
+def ecrire_tables(chemin: str, tables: Dict[str, bytes]):
+    """Écrit les tables dans `chemin`, remplacé en une seule opération"""
+    index = {}
+    position = 0
+    for nom, table in tables.items():
+        index[nom] = [position, len(table)]
+        position += -(-len(table) // ALIGNEMENT) * ALIGNEMENT
+    index_json = json.dumps(index).encode()
+    debut_donnees = -(-(_ENTETE.size + len(index_json)) // ALIGNEMENT) * ALIGNEMENT
+
+    descripteur, temporaire = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(chemin)), prefix=".tables-")
+    with os.fdopen(descripteur, "wb") as fichier:
+        fichier.write(_ENTETE.pack(SIGNATURE, FORMAT_TABLES, len(index_json)) + index_json)
+        for nom, table in tables.items():
+            fichier.seek(debut_donnees + index[nom][0])
+            fichier.write(table)
+    os.replace(temporaire, chemin)
+
+
+class TablesPartagees(Mapping):
+    """Tables d'un fichier projeté en mémoire, accessibles par nom (memoryview en lecture seule)"""
+    def __init__(self, chemin: str):
+        self.chemin = chemin
+        with open(chemin, "rb") as fichier:
+            self._projection = mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ)
+        signature, version, longueur_index = _ENTETE.unpack_from(self._projection)
+        if signature != SIGNATURE or version != FORMAT_TABLES:
+            raise ValueError(f"{chemin} n'est pas un fichier de tables au format {FORMAT_TABLES}")
+        index = json.loads(self._projection[_ENTETE.size:_ENTETE.size + longueur_index])
+        debut_donnees = -(-(_ENTETE.size + longueur_index) // ALIGNEMENT) * ALIGNEMENT
+        vue = memoryview(self._projection)
+        self._tables = {
+            nom: vue[debut_donnees + position:debut_donnees + position + longueur]
+            for nom, (position, longueur) in index.items()
+        }
+
+    def __getitem__(self, nom: str) -> memoryview:
+        return self._tables[nom]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._tables)
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    @property
+    def octets(self) -> int:
+        return len(self._projection)
+
+
+def ouvrir_tables(chemin: str, chemin_tarifs) -> TablesPartagees:
+    """
+    Projette le fichier de tables, après l'avoir (re)construit s'il manque, n'est pas au
+    format courant ou ne couvre pas toutes les grilles du fichier de tarifs. Un verrou
+    garantit qu'un seul processus le construit quand les workers démarrent ensemble.
+    """
+    import fcntl
+
+    attendues = {"feries"} | {nom_table_minutes(*bornes) for bornes in _bornes_nuit(chemin_tarifs)}
+    with open(f"{chemin}.verrou", "w") as verrou:
+        fcntl.flock(verrou, fcntl.LOCK_EX)
+        try:
+            tables = TablesPartagees(chemin)
+        except (OSError, ValueError, struct.error):
+            tables = None
+        if tables is None or not attendues <= set(tables):
+            ecrire_tables(chemin, construire_tables(chemin_tarifs))
+            tables = TablesPartagees(chemin)
+    return tables
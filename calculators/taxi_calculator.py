@@ -1,32 +1,38 @@
 from datetime import datetime, time, date
-from typing import Optional
+from typing import List, Optional, Sequence
 from functools import lru_cache
+import numpy as np
 import pytz
+from calculators.arrondi import arrondir_centimes
+from calculators.cache_calculs import TAILLE_CACHE_TAXI, bornes_classe, canoniser, statistiques_lru
+from calculators.calendrier import JOUR, DIMANCHE_FERIE, HorodatagesLot, localiser_france, preparer_horodatages
+from calculators.grilles import GrilleTaxi, ReferentielTarifs, referentiel_tarifs
+from calculators.resultats import BaseTarifTaxi, TarifCourse
 
 
 class CalculateurTarifsTaxi:
     """
-    Calcule les tarifs de taxi selon la reglementation Vendee 2025.
+    Calcule les tarifs de taxi selon la reglementation Vendee, avec la grille
+    en vigueur a la date de chaque course.
     """
-    def __init__(self):
-        # Tarifs officiels Vendee 2025
-        self.prix_base = 2.94  # Prise en charge
-        # Tarifs aller simple (de base)
-        self.tarif_c_jour = 2.16  # €/km aller simple jour (Tarif C)
-        self.tarif_d_nuit = 3.24  # €/km aller simple nuit/dimanche/feries (Tarif D)
-        # Tarifs aller-retour
-        self.tarif_a_jour = 1.08  # €/km aller-retour jour (Tarif A)
-        self.tarif_b_nuit = 1.62  # €/km aller-retour nuit/dimanche/feries (Tarif B)
-        self.prix_par_minute_attente = 29.44 / 60  # €/minute d'attente (29,44€/heure)
-        self.debut_nuit = time(19, 0)  # 19h00
-        self.fin_nuit = time(7, 0)  # 7h00
-        self.tarif_minimum = 8.0  # Tarif minimum
+    def __init__(self, referentiel: Optional[ReferentielTarifs] = None, taille_cache: int = TAILLE_CACHE_TAXI):
+        # Grilles officielles versionnées (calculators/tarifs.json), rechargées à chaud
+        self.referentiel = referentiel or referentiel_tarifs
         # Fuseau horaire français avec gestion automatique été/hiver
         self.fuseau_france = pytz.timezone('Europe/Paris')
+        # Cache propre à l'instance, à clés canoniques (voir calculators.cache_calculs)
+        self._calculer_tarif_core = lru_cache(maxsize=taille_cache)(self._calculer_tarif_core)
+        self.calculs_exacts = 0
+        self._exemple_cache = None
+
+    def grille_active(self) -> GrilleTaxi:
+        """Grille en vigueur aujourd'hui"""
+        return self.referentiel.catalogue.taxi.active()
 
     def est_tarif_nuit(self, date_heure_depart: time) -> bool:
-        """Determine si c'est un tarif de nuit (19h-7h) ou dimanche/ferie"""
-        return date_heure_depart >= self.debut_nuit or date_heure_depart <= self.fin_nuit
+        """Determine si c'est un tarif de nuit (19h-7h selon la grille en vigueur)"""
+        grille = self.grille_active()
+        return date_heure_depart >= grille.debut_nuit or date_heure_depart <= grille.fin_nuit
 
     def est_dimanche(self, date_depart: date) -> bool:
         """Verifie si c'est dimanche"""
@@ -36,24 +42,38 @@ class CalculateurTarifsTaxi:
         """Retourne l'heure actuelle en France avec gestion automatique été/hiver"""
         return datetime.now(self.fuseau_france)
 
-    @lru_cache(maxsize=1000)
-    def _calculer_tarif_core(self, distance_km: float, minutes_attente: float, est_nuit_ou_dimanche: bool, aller_retour: bool):
-        """Version cachée du calcul de base (sans date pour le cache)"""
-        total = self.prix_base
+    def _calculer_tarif_core(self, grille: GrilleTaxi, distance_km: float, minutes_attente: float, est_nuit_ou_dimanche: bool, aller_retour: bool):
+        """
+        Version cachée du calcul de base, pour une distance et une attente canoniques.
+        Retourne le résultat commun à toutes les valeurs de même forme canonique, ou None
+        si un arrondi au centime tombe dans la classe (le calcul est alors fait exactement).
+        """
+        distance_bas, distance_haut = bornes_classe(distance_km)
+        attente_bas, attente_haut = bornes_classe(minutes_attente)
+        bas = self._calculer_tarif_exact(grille, distance_bas, attente_bas, est_nuit_ou_dimanche, aller_retour)
+        haut = self._calculer_tarif_exact(grille, distance_haut, attente_haut, est_nuit_ou_dimanche, aller_retour)
+        resultat = bas if bas == haut else None
+        if self._exemple_cache is None:
+            self._exemple_cache = ((grille, distance_km, minutes_attente, est_nuit_ou_dimanche, aller_retour), resultat)
+        return resultat
+
+    def _calculer_tarif_exact(self, grille: GrilleTaxi, distance_km: float, minutes_attente: float, est_nuit_ou_dimanche: bool, aller_retour: bool):
+        """Calcul de base (sans date, par version de grille)"""
+        total = grille.prix_base
 
         if aller_retour:
             if est_nuit_ou_dimanche:
-                tarif_km = self.tarif_b_nuit
+                tarif_km = grille.tarif_b_nuit
                 type_tarif = "nuit aller-retour (tarif B)"
             else:
-                tarif_km = self.tarif_a_jour
+                tarif_km = grille.tarif_a_jour
                 type_tarif = "jour aller-retour (tarif A)"
         else:
             if est_nuit_ou_dimanche:
-                tarif_km = self.tarif_d_nuit
+                tarif_km = grille.tarif_d_nuit
                 type_tarif = "nuit aller simple (tarif D)"
             else:
-                tarif_km = self.tarif_c_jour
+                tarif_km = grille.tarif_c_jour
                 type_tarif = "jour aller simple (tarif C)"
 
         # Calcul de la distance facturable
@@ -61,51 +81,154 @@ class CalculateurTarifsTaxi:
         cout_distance = distance_facturable * tarif_km
         total += cout_distance
 
-        cout_attente = minutes_attente * self.prix_par_minute_attente
+        cout_attente = minutes_attente * grille.prix_par_minute_attente
         total += cout_attente
 
-        tarif_minimum_applique = total < self.tarif_minimum
+        tarif_minimum_applique = total < grille.tarif_minimum
         if tarif_minimum_applique:
-            total = self.tarif_minimum
-
-        return {
-            "prix_base": round(self.prix_base, 2),
-            "distance_facturable": round(distance_facturable, 2),
-            "cout_distance": round(cout_distance, 2),
-            "cout_attente": round(cout_attente, 2),
-            "type_tarif": type_tarif,
-            "tarif_km": round(tarif_km, 2),
-            "tarif_minimum_applique": tarif_minimum_applique,
-            "total": round(total, 2)
-        }
-
-    def calculer_tarif_course(self, distance_km: float, minutes_attente: float = 0, date_heure_depart: Optional[datetime] = None, aller_retour: bool = False):
+            total = grille.tarif_minimum
+
+        return BaseTarifTaxi(
+            prix_base=round(grille.prix_base, 2),
+            distance_facturable=round(distance_facturable, 2),
+            cout_distance=round(cout_distance, 2),
+            cout_attente=round(cout_attente, 2),
+            type_tarif=type_tarif,
+            tarif_km=round(tarif_km, 2),
+            tarif_minimum_applique=tarif_minimum_applique,
+            total=round(total, 2)
+        )
+
+    def statistiques_cache(self) -> dict:
+        """Retourne les compteurs du cache de calcul (succès, échecs, évictions, mémoire estimée)"""
+        return statistiques_lru(self._calculer_tarif_core, self.calculs_exacts, self._exemple_cache)
+
+    def calculer_tarif_course(self, distance_km: float, minutes_attente: float = 0, date_heure_depart: Optional[datetime] = None, aller_retour: bool = False) -> TarifCourse:
         """Calcule le tarif total de la course (utilise le cache pour les calculs répétitifs)"""
         if date_heure_depart is None:
             date_heure_depart = self.obtenir_heure_france()
         # Si une heure est fournie sans timezone, on assume qu'elle est en heure française
         elif date_heure_depart.tzinfo is None:
-            date_heure_depart = self.fuseau_france.localize(date_heure_depart)
+            date_heure_depart = localiser_france(date_heure_depart)
 
-        est_nuit_ou_dimanche = self.est_dimanche(date_heure_depart.date()) or self.est_tarif_nuit(date_heure_depart.time())
+        # Grille en vigueur à la date de la course
+        grille = self.referentiel.catalogue.taxi.grille_au(date_heure_depart.date())
+        periode = grille.calendrier.periode(date_heure_depart)
+        est_nuit_ou_dimanche = periode != JOUR
 
         # Utilise le cache pour le calcul de base
-        resultat_cache = self._calculer_tarif_core(distance_km, minutes_attente, est_nuit_ou_dimanche, aller_retour)
+        resultat_cache = self._calculer_tarif_core(
+            grille, canoniser(distance_km), canoniser(minutes_attente), est_nuit_ou_dimanche, aller_retour
+        )
+        if resultat_cache is None:
+            self.calculs_exacts += 1
+            resultat_cache = self._calculer_tarif_exact(grille, distance_km, minutes_attente, est_nuit_ou_dimanche, aller_retour)
 
         # Ajout des informations non-cachables (date, type de tarif détaillé)
         if est_nuit_ou_dimanche:
             if aller_retour:
-                type_tarif = "dimanche/ferie aller-retour (tarif B)" if self.est_dimanche(date_heure_depart.date()) else "nuit aller-retour (tarif B)"
+                type_tarif = "dimanche/ferie aller-retour (tarif B)" if periode == DIMANCHE_FERIE else "nuit aller-retour (tarif B)"
             else:
-                type_tarif = "dimanche/ferie aller simple (tarif D)" if self.est_dimanche(date_heure_depart.date()) else "nuit aller simple (tarif D)"
+                type_tarif = "dimanche/ferie aller simple (tarif D)" if periode == DIMANCHE_FERIE else "nuit aller simple (tarif D)"
         else:
-            type_tarif = resultat_cache["type_tarif"]
-
-        return {
-            **resultat_cache,
-            "distance_km": distance_km,
-            "minutes_attente": minutes_attente,
-            "type_tarif": type_tarif,
-            "aller_retour": aller_retour,
-            "date_heure_depart": date_heure_depart.isoformat()
-        }
\ No newline at end of file
+            type_tarif = resultat_cache.type_tarif
+
+        # Le résultat en cache est immuable : il est référencé, pas recopié
+        return TarifCourse(
+            resultat_cache,
+            distance_km,
+            minutes_attente,
+            type_tarif,
+            aller_retour,
+            date_heure_depart.isoformat()
+        )
+
+    def calculer_tarifs_lot(self,
+                            distances_km: Sequence[float],
+                            minutes_attente: Sequence[float],
+                            dates_heures_depart: Sequence[Optional[datetime]],
+                            allers_retours: Sequence[bool]) -> List[dict]:
+        """
+        Calcule un lot de courses en colonnes. Les résultats sont identiques,
+        au centime près, à ceux de calculer_tarif_course appelé course par course.
+        """
+        distances = np.asarray(distances_km, dtype=np.float64)
+        attentes = np.asarray(minutes_attente, dtype=np.float64)
+        aller_retour = np.asarray(allers_retours, dtype=bool)
+        horodatages = preparer_horodatages(dates_heures_depart)
+
+        # Chaque course est calculée avec la grille en vigueur à sa date
+        chronologie = self.referentiel.catalogue.taxi
+        indices_grilles = chronologie.indices_lot(horodatages.jours)
+        if not len(indices_grilles) or indices_grilles.min() == indices_grilles.max():
+            grille = chronologie.grilles[indices_grilles[0] if len(indices_grilles) else 0]
+            return self._calculer_lot_grille(grille, distances, attentes, aller_retour, horodatages)
+
+        resultats: List[Optional[dict]] = [None] * len(distances)
+        for indice in np.unique(indices_grilles).tolist():
+            positions = np.flatnonzero(indices_grilles == indice)
+            resultats_grille = self._calculer_lot_grille(
+                chronologie.grilles[indice], distances[positions], attentes[positions],
+                aller_retour[positions], horodatages.extraire(positions)
+            )
+            for position, resultat in zip(positions.tolist(), resultats_grille):
+                resultats[position] = resultat
+        return resultats
+
+    def _calculer_lot_grille(self, grille: GrilleTaxi, distances: np.ndarray, attentes: np.ndarray,
+                             aller_retour: np.ndarray, horodatages: HorodatagesLot) -> List[dict]:
+        """Calcul en colonnes de courses relevant toutes de la même grille"""
+        periodes = grille.calendrier.periodes_lot(horodatages)
+        dimanche = periodes == DIMANCHE_FERIE
+        nuit_ou_dimanche = periodes != JOUR
+
+        tarifs_km = np.where(aller_retour,
+                             np.where(nuit_ou_dimanche, grille.tarif_b_nuit, grille.tarif_a_jour),
+                             np.where(nuit_ou_dimanche, grille.tarif_d_nuit, grille.tarif_c_jour))
+        distances_facturables = np.where(aller_retour, distances * 2, distances)
+        couts_distance = distances_facturables * tarifs_km
+        couts_attente = attentes * grille.prix_par_minute_attente
+        # Même ordre d'additions que le calcul unitaire pour un résultat identique
+        totaux = grille.prix_base + couts_distance + couts_attente
+        minimum_applique = totaux < grille.tarif_minimum
+        totaux = np.where(minimum_applique, grille.tarif_minimum, totaux)
+
+        prix_base = round(grille.prix_base, 2)
+        resultats = []
+        for (distance, attente, ar, dim, nd, facturable, cout_distance, cout_attente,
+             tarif_km, minimum, total, iso) in zip(
+                distances.tolist(), attentes.tolist(), aller_retour.tolist(), dimanche.tolist(),
+                nuit_ou_dimanche.tolist(), arrondir_centimes(distances_facturables).tolist(),
+                arrondir_centimes(couts_distance).tolist(), arrondir_centimes(couts_attente).tolist(),
+                arrondir_centimes(tarifs_km).tolist(), minimum_applique.tolist(),
+                arrondir_centimes(totaux).tolist(), horodatages.iso):
+            if ar:
+                if nd:
+                    type_tarif = "dimanche/ferie aller-retour (tarif B)" if dim else "nuit aller-retour (tarif B)"
+                else:
+                    type_tarif = "jour aller-retour (tarif A)"
+            else:
+                if nd:
+                    type_tarif = "dimanche/ferie aller simple (tarif D)" if dim else "nuit aller simple (tarif D)"
+                else:
+                    type_tarif = "jour aller simple (tarif C)"
+
+            resultats.append({
+                "prix_base": prix_base,
+                "distance_facturable": facturable,
+                "cout_distance": cout_distance,
+                "cout_attente": cout_attente,
+                "type_tarif": type_tarif,
+                "tarif_km": tarif_km,
+                "tarif_minimum_applique": minimum,
+                "total": total,
+                "distance_km": distance,
+                "minutes_attente": attente,
+                "aller_retour": ar,
+                "date_heure_depart": iso
+            })
+        return resultats
+
+
+# Calculateur partagé par les routes et la reprise de tarifs
+calculateur_taxi = CalculateurTarifsTaxi()
@@ -0,0 +1,152 @@
+"""
+Test de charge en boucle ouverte contre l'API lancée localement sous uvicorn.
+
+Exemples :
+    python -m cli.charge --rampe 50:400:50 --duree-palier 10 --workers 1,2,4 --sortie charge/
+    python -m cli.charge --debits 100,200 --melange calculer-tarif=8,compresser-image=2
+    python -m cli.charge --url http://127.0.0.1:8000 --debits 500 --arrivees poisson
+    python -m cli.charge --serveur gunicorn --workers 1,2,4 --rampe 100:1000:100
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List
+from performances.charge import (
+    CIBLES, GenerateurCharge, Palier, ServeurLocal, genou, rampe, rapport_charge
+)
+from performances.suite import environnement
+
+MELANGE_DEFAUT = "calculer-tarif=60,calculer-tarif-cpam=25,estimation-rapide=10,compresser-image=5"
+
+
+def _melange(texte: str) -> Dict[str, float]:
+    melange = {}
+    for element in texte.split(","):
+        nom, _, poids = element.partition("=")
+        nom = nom.strip()
+        if nom not in CIBLES:
+            raise argparse.ArgumentTypeError(f"cible inconnue {nom!r} (parmi : {', '.join(CIBLES)})")
+        try:
+            melange[nom] = float(poids) if poids else 1.0
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"poids invalide pour {nom} : {poids!r}")
+        if melange[nom] <= 0:
+            raise argparse.ArgumentTypeError(f"le poids de {nom} doit être positif")
+    return melange
+
+
+def _entiers(texte: str) -> List[int]:
+    try:
+        valeurs = [int(valeur) for valeur in texte.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"liste d'entiers attendue : {texte!r}")
+    if any(valeur < 1 for valeur in valeurs):
+        raise argparse.ArgumentTypeError("les valeurs doivent être >= 1")
+    return valeurs
+
+
+def _debits(texte: str) -> List[float]:
+    try:
+        valeurs = [float(valeur) for valeur in texte.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"liste de débits attendue : {texte!r}")
+    if any(valeur <= 0 for valeur in valeurs):
+        raise argparse.ArgumentTypeError("les débits doivent être positifs")
+    return valeurs
+
+
+def _afficher(workers, resume: dict):
+    latence = resume["global"]["latence_ms"]
+    print(f"workers={workers or '-'} {resume['debit_vise']:>8.0f} req/s visées -> "
+          f"{resume['global']['debit']:>8.1f} obtenues  p50 {latence['p50']:>9.2f} ms  "
+          f"p99 {latence['p99']:>9.2f} ms  p99.9 {latence['p999']:>9.2f} ms  "
+          f"erreurs {resume['global']['erreurs']:>6}  {' '.join(resume['saturation']) or 'ok'}",
+          file=sys.stderr, flush=True)
+
+
+def _ecrire_histogrammes(repertoire: str, workers, numero: int, resultat):
+    for nom, histogramme in resultat.histogrammes.items():
+        fichier = f"w{workers or 0}_palier{numero:02d}_{resultat.resume['debit_vise']:g}rps_{nom}.hgrm"
+        with open(os.path.join(repertoire, fichier), "w", encoding="utf-8") as sortie:
+            sortie.write(histogramme.exporter_hgrm())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Charge à débit fixé (boucle ouverte) avec histogrammes de latence corrigés.")
+    debits = parser.add_mutually_exclusive_group(required=True)
+    debits.add_argument("--debits", type=_debits, help="Débits des paliers en requêtes/s, par ex. 100,200,400")
+    debits.add_argument("--rampe", help="Rampe DEBUT:FIN:PAS en requêtes/s, par ex. 50:500:50")
+    parser.add_argument("--duree-palier", type=float, default=10.0, help="Durée de chaque palier en secondes")
+    parser.add_argument("--echauffement", type=float, default=2.0,
+                        help="Secondes de charge non comptées au premier débit, avant les paliers")
+    parser.add_argument("--melange", type=_melange, default=_melange(MELANGE_DEFAUT),
+                        help=f"Cibles et poids relatifs (défaut : {MELANGE_DEFAUT})")
+    parser.add_argument("--arrivees", choices=("constantes", "poisson"), default="constantes",
+                        help="Intervalles entre requêtes constants ou exponentiels")
+    parser.add_argument("--workers", type=_entiers, default=[1],
+                        help="Nombres de workers à tester, une série de paliers chacun (par ex. 1,2,4)")
+    parser.add_argument("--serveur", choices=("uvicorn", "gunicorn"), default="uvicorn",
+                        help="Serveur lancé localement (gunicorn : configuration de production gunicorn.conf.py)")
+    parser.add_argument("--url", help="Serveur déjà démarré à charger (pas de lancement local)")
+    parser.add_argument("--connexions", type=int, default=256, help="Connexions HTTP simultanées au plus")
+    parser.add_argument("--delai", type=float, default=30.0, help="Délai maximal d'une requête en secondes")
+    parser.add_argument("--slo-p99-ms", type=float, help="p99 au-delà duquel un palier est considéré saturé")
+    parser.add_argument("--graine", type=int, default=1, help="Graine du tirage des requêtes et des arrivées")
+    parser.add_argument("--sortie", help="Répertoire du rapport JSON et des histogrammes .hgrm")
+    args = parser.parse_args(argv)
+
+    if args.rampe:
+        try:
+            debut, fin, pas = (float(valeur) for valeur in args.rampe.split(":"))
+            paliers = rampe(debut, fin, pas, args.duree_palier)
+        except ValueError as e:
+            parser.error(f"--rampe : {e}")
+    else:
+        paliers = [Palier(debit, args.duree_palier) for debit in args.debits]
+    if args.sortie:
+        os.makedirs(args.sortie, exist_ok=True)
+
+    series = []
+    for workers in ([None] if args.url else args.workers):
+        generateur_options = dict(melange=args.melange, connexions=args.connexions, delai=args.delai,
+                                  poisson=args.arrivees == "poisson", graine=args.graine)
+        if args.url:
+            resultats = GenerateurCharge(args.url, **generateur_options).executer(paliers, args.echauffement)
+        else:
+            with ServeurLocal(workers, gunicorn=args.serveur == "gunicorn") as serveur:
+                resultats = GenerateurCharge(serveur.url, **generateur_options).executer(paliers, args.echauffement)
+
+        for numero, resultat in enumerate(resultats):
+            _afficher(workers, resultat.resume)
+            if args.sortie:
+                _ecrire_histogrammes(args.sortie, workers, numero, resultat)
+        resumes = [resultat.resume for resultat in resultats]
+        series.append({"workers": workers, "genou_req_s": genou(resumes, args.slo_p99_ms), "paliers": resumes})
+        print(f"workers={workers or '-'} : débit tenu avant saturation {series[-1]['genou_req_s']} req/s",
+              file=sys.stderr, flush=True)
+
+    rapport = rapport_charge(series, {
+        "url": args.url,
+        "serveur": None if args.url else args.serveur,
+        "melange": args.melange,
+        "arrivees": args.arrivees,
+        "paliers": [palier._asdict() for palier in paliers],
+        "echauffement_s": args.echauffement,
+        "connexions": args.connexions,
+        "delai_s": args.delai,
+        "slo_p99_ms": args.slo_p99_ms,
+        "graine": args.graine,
+    }, environnement())
+    if args.sortie:
+        with open(os.path.join(args.sortie, "rapport.json"), "w", encoding="utf-8") as fichier:
+            json.dump(rapport, fichier, ensure_ascii=False, indent=2)
+            fichier.write("\n")
+    else:
+        json.dump(rapport, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Construit le référentiel des communes (geographie/communes.csv.gz, ou COMMUNES_FICHIER)
+à partir d'un fichier CSV officiel, par exemple la table des communes de France publiée
+sur data.gouv.fr, qui fournit les codes INSEE absents du référentiel livré.
+
+Exemples :
+    python -m cli.communes communes-france-2025.csv
+    python -m cli.communes communes.csv --separateur ";" --colonne nom=libelle --population-min 0
+"""
+import argparse
+import csv
+import sys
+from geographie.communes import COLONNES, FICHIER_COMMUNES_DEFAUT, Commune, ecrire_communes
+
+# Colonnes du fichier « communes-france » de data.gouv.fr correspondant à celles du référentiel
+CORRESPONDANCE_DEFAUT = {
+    "code_insee": "code_insee",
+    "nom": "nom_standard",
+    "departement": "dep_code",
+    "latitude": "latitude_centre",
+    "longitude": "longitude_centre",
+    "population": "population",
+}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Construit le référentiel des communes à partir d'un fichier CSV.")
+    parser.add_argument("entree", help="Fichier CSV avec en-tête")
+    parser.add_argument("-o", "--sortie", default=str(FICHIER_COMMUNES_DEFAUT),
+                        help="Fichier à écrire, compressé s'il finit par .gz (défaut : référentiel livré)")
+    parser.add_argument("--separateur", default=",", help="Séparateur du fichier d'entrée")
+    parser.add_argument("--colonne", action="append", default=[], metavar="CHAMP=COLONNE",
+                        help=f"Colonne du fichier pour un champ ({', '.join(COLONNES)}) ; répétable")
+    parser.add_argument("--population-min", type=int, default=0,
+                        help="Ignorer les communes moins peuplées")
+    args = parser.parse_args(argv)
+
+    correspondance = dict(CORRESPONDANCE_DEFAUT)
+    for option in args.colonne:
+        champ, _, colonne = option.partition("=")
+        if champ not in correspondance or not colonne:
+            parser.error(f"--colonne {option!r} : attendu CHAMP=COLONNE avec CHAMP parmi {', '.join(COLONNES)}")
+        correspondance[champ] = colonne
+
+    communes, ignorees = [], 0
+    with open(args.entree, encoding="utf-8-sig", newline="") as fichier:
+        lecteur = csv.DictReader(fichier, delimiter=args.separateur)
+        manquantes = set(correspondance.values()) - set(lecteur.fieldnames or ())
+        if manquantes:
+            parser.error(f"{args.entree} : colonnes manquantes {', '.join(sorted(manquantes))}")
+        for ligne in lecteur:
+            try:
+                commune = Commune(
+                    ligne[correspondance["code_insee"]].strip(),
+                    ligne[correspondance["nom"]].strip(),
+                    ligne[correspondance["departement"]].strip(),
+                    round(float(ligne[correspondance["latitude"]]), 5),
+                    round(float(ligne[correspondance["longitude"]]), 5),
+                    int(float(ligne[correspondance["population"]] or 0)),
+                )
+            except ValueError:
+                # Coordonnées absentes (communes déléguées, collectivités sans centre connu...)
+                ignorees += 1
+                continue
+            if commune.population >= args.population_min:
+                communes.append(commune)
+
+    ecrire_communes(args.sortie, communes)
+    print(f"{len(communes)} communes écrites dans {args.sortie} ({ignorees} lignes ignorées)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
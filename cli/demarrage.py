@@ -0,0 +1,82 @@
+"""
+Rapport de démarrage à froid : temps d'import de l'application, délai jusqu'à la
+première réponse d'uvicorn et durée des premières requêtes, avec comparaison à un
+rapport de référence pour suivre le démarrage d'une version à l'autre.
+
+Exemples :
+    python -m cli.demarrage --enregistrer performances/demarrage.json
+    python -m cli.demarrage --reference performances/demarrage.json --repetitions 9
+    PRECHAUFFAGE=false python -m cli.demarrage
+"""
+import argparse
+import json
+import sys
+from performances.demarrage import comparer_demarrage, executer_demarrage
+from performances.suite import TOLERANCE_DEFAUT, differences_environnement
+
+
+def _afficher(rapport: dict):
+    print(f"import main                {rapport['import']['total_ms']:>9.1f} ms "
+          f"({rapport['import']['modules']} modules)", file=sys.stderr)
+    for paquet, duree in rapport["import"]["paquets_ms"].items():
+        print(f"  {paquet:<24} {duree:>9.1f} ms", file=sys.stderr)
+    print(f"serveur prêt               {rapport['serveur']['pret_ms']:>9.1f} ms", file=sys.stderr)
+    for nom, durees in rapport["serveur"]["requetes"].items():
+        print(f"  {nom:<24} {durees['premiere_ms']:>9.1f} ms  puis {durees['seconde_ms']:>7.1f} ms",
+              file=sys.stderr)
+
+
+def _progression(numero: int, repetitions: int):
+    print("passage d'amorçage terminé" if numero == 0 else f"mesure {numero}/{repetitions} terminée",
+          file=sys.stderr, flush=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Mesure le démarrage à froid de l'API (import et premières réponses).")
+    parser.add_argument("--repetitions", type=int, default=5, help="Démarrages mesurés (médiane retenue)")
+    parser.add_argument("--reference", help="Rapport JSON de référence auquel comparer les mesures")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE_DEFAUT,
+                        help="Dégradation relative tolérée avant de signaler une régression")
+    parser.add_argument("--enregistrer", help="Écrit le rapport JSON dans ce fichier")
+    args = parser.parse_args(argv)
+
+    if args.repetitions < 1:
+        parser.error("--repetitions doit être >= 1")
+    reference = None
+    if args.reference:
+        with open(args.reference, encoding="utf-8") as fichier:
+            reference = json.load(fichier)
+
+    rapport = executer_demarrage(args.repetitions, progression=_progression)
+    _afficher(rapport)
+
+    if args.enregistrer:
+        with open(args.enregistrer, "w", encoding="utf-8") as fichier:
+            json.dump(rapport, fichier, ensure_ascii=False, indent=2)
+            fichier.write("\n")
+    else:
+        json.dump(rapport, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+
+    if reference is None:
+        return 0
+
+    differences = differences_environnement(rapport, reference)
+    if differences:
+        print("Attention, environnement différent de la référence :", file=sys.stderr)
+        for difference in differences:
+            print(f"  {difference}", file=sys.stderr)
+
+    regressions = comparer_demarrage(rapport, reference, args.tolerance)
+    if not regressions:
+        print(f"Aucune régression au-delà de {args.tolerance:.0%} par rapport à la référence.", file=sys.stderr)
+        return 0
+    print(f"{len(regressions)} régression(s) au-delà de {args.tolerance:.0%} :", file=sys.stderr)
+    for regression in regressions:
+        print(f"  {regression.scenario} {regression.indicateur} : {regression.reference:g} ms -> "
+              f"{regression.mesure:g} ms (+{regression.ecart:.0%})", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
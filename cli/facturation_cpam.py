@@ -0,0 +1,62 @@
+"""
+Facturation mensuelle CPAM hors ligne d'un export de transports (CSV ou NDJSON).
+
+Exemple :
+    python -m cli.facturation_cpam transports.csv --mois 2025-03 -o facturation_2025-03.json
+"""
+import argparse
+import json
+import sys
+import time
+from calculators.facturation_cpam import facturer_fichier, arreter, PROCESSUS_FACTURATION, TAILLE_PAQUET_FACTURATION
+from calculators.reprise_tarifs import FORMATS
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Facture un mois de transports sanitaires CPAM : factures par patient, "
+                                                 "totaux par véhicule et par jour.")
+    parser.add_argument("entree", help="Fichier CSV (avec en-tête) ou NDJSON ; '-' pour l'entrée standard")
+    parser.add_argument("--mois", required=True, help="Mois facturé (AAAA-MM)")
+    parser.add_argument("-o", "--sortie", default="-", help="Rapport JSON ('-' pour la sortie standard)")
+    parser.add_argument("--format", dest="format_fichier", choices=FORMATS,
+                        help="Format du fichier (déduit de l'extension par défaut)")
+    parser.add_argument("--processus", type=int, default=PROCESSUS_FACTURATION,
+                        help="Processus de tarification (1 : dans le processus courant)")
+    parser.add_argument("--taille-paquet", type=int, default=TAILLE_PAQUET_FACTURATION,
+                        help="Nombre de transports tarifés ensemble")
+    parser.add_argument("--sans-lignes", action="store_true", help="Factures sans le détail des transports")
+    args = parser.parse_args(argv)
+
+    format_fichier = args.format_fichier
+    if format_fichier is None:
+        format_fichier = "ndjson" if args.entree.lower().endswith((".ndjson", ".jsonl")) else "csv"
+
+    debut = time.perf_counter()
+    entree = sys.stdin if args.entree == "-" else open(args.entree, encoding="utf-8-sig", errors="surrogateescape", newline="")
+    try:
+        rapport = facturer_fichier(entree, args.mois, format_fichier, lignes_factures=not args.sans_lignes,
+                                   processus=args.processus, taille_paquet=args.taille_paquet)
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        if entree is not sys.stdin:
+            entree.close()
+        arreter()
+
+    sortie = sys.stdout if args.sortie == "-" else open(args.sortie, "w", encoding="utf-8")
+    try:
+        json.dump(rapport, sortie, ensure_ascii=False, indent=2)
+        sortie.write("\n")
+    finally:
+        if sortie is not sys.stdout:
+            sortie.close()
+
+    synthese = rapport["synthese"]
+    print(f"{synthese['nombre_transports']} transports facturés, {synthese['lignes_en_erreur']} lignes en erreur, "
+          f"{synthese['patients']} factures, {synthese['montant_total']:.2f} € "
+          f"en {time.perf_counter() - debut:.2f} s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
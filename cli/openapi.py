@@ -0,0 +1,28 @@
+"""
+Génère le schéma OpenAPI de l'API dans un fichier relu au démarrage, à exécuter à la
+construction (image Docker, build Render) : le schéma n'est alors pas reconstruit par
+chaque worker. Un fichier qui ne correspond plus aux sources est ignoré.
+
+Exemples :
+    python -m cli.openapi
+    python -m cli.openapi --sortie /tmp/openapi.json
+"""
+import argparse
+import sys
+from serveur.openapi import FICHIER_OPENAPI, generer
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Génère le schéma OpenAPI pré-calculé de l'API.")
+    parser.add_argument("--sortie", default=FICHIER_OPENAPI,
+                        help=f"Fichier à écrire (défaut : OPENAPI_FICHIER ou {FICHIER_OPENAPI})")
+    args = parser.parse_args(argv)
+
+    from main import app
+    generer(app, args.sortie)
+    print(f"Schéma OpenAPI écrit dans {args.sortie}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
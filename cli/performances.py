@@ -0,0 +1,84 @@
+"""
+Mesures de performance locales : calculateurs, routes de l'API (transport ASGI, sans
+réseau) et pipeline d'images, avec comparaison à un rapport de référence.
+
+Exemples :
+    python -m cli.performances --enregistrer performances/reference.json
+    python -m cli.performances --reference performances/reference.json
+    python -m cli.performances --categorie calculs --scenario 'calculs.taxi_*' --facteur 0.1
+"""
+import argparse
+import json
+import sys
+from performances.scenarios import CATEGORIES
+from performances.suite import (
+    selectionner, executer_suite, comparer, differences_environnement, TOLERANCE_DEFAUT
+)
+
+
+def _afficher(nom: str, mesure: dict):
+    print(f"{nom:<32} p50 {mesure['p50_us']:>11.1f} µs  p95 {mesure['p95_us']:>11.1f} µs  "
+          f"p99 {mesure['p99_us']:>11.1f} µs  retenus {mesure['octets_retenus_par_appel']:>9.0f} o/appel  "
+          f"pic {mesure['pic_octets']:>10} o  pic RSS {mesure.get('pic_rss_octets', 0) / 2**20:>7.1f} Mio",
+          file=sys.stderr, flush=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Mesure les performances de l'API dans ce processus, hors ligne.")
+    parser.add_argument("--categorie", action="append", choices=CATEGORIES,
+                        help="Catégorie de scénarios à exécuter (répétable ; toutes par défaut)")
+    parser.add_argument("--scenario", action="append", default=[],
+                        help="Motif de noms de scénarios, par ex. 'asgi.*' (répétable)")
+    parser.add_argument("--facteur", type=float, default=1.0,
+                        help="Multiplie le nombre d'itérations de chaque scénario")
+    parser.add_argument("--reference", help="Rapport JSON de référence auquel comparer les mesures")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE_DEFAUT,
+                        help="Dégradation relative tolérée avant de signaler une régression")
+    parser.add_argument("--enregistrer", help="Écrit le rapport JSON dans ce fichier")
+    parser.add_argument("--lister", action="store_true", help="Liste les scénarios sans les exécuter")
+    args = parser.parse_args(argv)
+
+    if args.facteur <= 0:
+        parser.error("--facteur doit être strictement positif")
+    scenarios = selectionner(args.categorie or CATEGORIES, args.scenario)
+    if not scenarios:
+        parser.error("aucun scénario ne correspond")
+    if args.lister:
+        for scenario in scenarios:
+            print(f"{scenario.nom}  ({scenario.iterations} itérations)")
+        return 0
+
+    reference = None
+    if args.reference:
+        with open(args.reference, encoding="utf-8") as fichier:
+            reference = json.load(fichier)
+
+    rapport = executer_suite(scenarios, facteur=args.facteur, progression=_afficher)
+
+    if args.enregistrer:
+        with open(args.enregistrer, "w", encoding="utf-8") as fichier:
+            json.dump(rapport, fichier, ensure_ascii=False, indent=2)
+            fichier.write("\n")
+
+    if reference is None:
+        return 0
+
+    differences = differences_environnement(rapport, reference)
+    if differences:
+        print("Attention, environnement différent de la référence :", file=sys.stderr)
+        for difference in differences:
+            print(f"  {difference}", file=sys.stderr)
+
+    regressions = comparer(rapport, reference, args.tolerance)
+    if not regressions:
+        print(f"Aucune régression au-delà de {args.tolerance:.0%} par rapport à la référence.", file=sys.stderr)
+        return 0
+    print(f"{len(regressions)} régression(s) au-delà de {args.tolerance:.0%} :", file=sys.stderr)
+    for regression in regressions:
+        print(f"  {regression.scenario} {regression.indicateur} : {regression.reference:g} -> "
+              f"{regression.mesure:g} (+{regression.ecart:.0%})", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
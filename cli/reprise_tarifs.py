@@ -0,0 +1,42 @@
+"""
+Recalcul hors ligne d'un export de courses (CSV ou NDJSON).
+
+Exemple :
+    python -m cli.reprise_tarifs courses.csv --grille cpam -o courses_recalculees.csv
+"""
+import argparse
+import sys
+from calculators.reprise_tarifs import reprendre_tarifs, GRILLES, FORMATS, TAILLE_PAQUET_DEFAUT
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Recalcule un export de courses avec les grilles taxi Vendée 2025 ou CPAM.")
+    parser.add_argument("entree", help="Fichier CSV (avec en-tête) ou NDJSON ; '-' pour l'entrée standard")
+    parser.add_argument("-o", "--sortie", default="-", help="Fichier de sortie ('-' pour la sortie standard)")
+    parser.add_argument("--grille", choices=GRILLES, default="taxi", help="Grille tarifaire à appliquer")
+    parser.add_argument("--format", dest="format_fichier", choices=FORMATS,
+                        help="Format du fichier (déduit de l'extension par défaut)")
+    parser.add_argument("--taille-paquet", type=int, default=TAILLE_PAQUET_DEFAUT,
+                        help="Nombre de lignes calculées ensemble")
+    args = parser.parse_args(argv)
+
+    format_fichier = args.format_fichier
+    if format_fichier is None:
+        format_fichier = "ndjson" if args.entree.lower().endswith((".ndjson", ".jsonl")) else "csv"
+
+    entree = sys.stdin if args.entree == "-" else open(args.entree, encoding="utf-8-sig", errors="surrogateescape", newline="")
+    sortie = sys.stdout if args.sortie == "-" else open(args.sortie, "w", encoding="utf-8", newline="")
+    try:
+        for morceau in reprendre_tarifs(entree, grille=args.grille, format_fichier=format_fichier,
+                                        taille_paquet=args.taille_paquet):
+            sortie.write(morceau)
+    finally:
+        if entree is not sys.stdin:
+            entree.close()
+        if sortie is not sys.stdout:
+            sortie.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
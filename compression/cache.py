@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from compression.pipeline import VERSION_PIPELINE, ImageCompressee
+
+
+class CacheImages:
+    """
+    Cache adressé par contenu des images compressées : la clé est une empreinte des
+    octets reçus et de tous les paramètres d'encodage. Niveau mémoire LRU borné en
+    octets, niveau disque optionnel borné lui aussi en octets (fichiers les moins
+    récemment utilisés supprimés), et coalescence des demandes identiques
+    simultanées (une seule compression, les autres attendent son résultat).
+    """
+    def __init__(self, octets_max: int, repertoire: Optional[str] = None, octets_max_disque: int = 0):
+        self.octets_max = octets_max
+        self.repertoire = repertoire
+        self.octets_max_disque = octets_max_disque
+        self._entrees: "OrderedDict[str, ImageCompressee]" = OrderedDict()
+        self._octets = 0
+        self._verrou = threading.Lock()
+        self._en_vol: Dict[str, asyncio.Future] = {}
+        # Octets du répertoire estimés par ce processus (None : pas encore parcouru)
+        self._octets_disque: Optional[int] = None
+        self._verrou_disque = threading.Lock()
+        self.evictions_disque = 0
+        self.succes = 0
+        self.succes_disque = 0
+        self.echecs = 0
+        self.coalescences = 0
+        self.evictions = 0
+
+    @staticmethod
+    def cle(empreinte_contenu: "hashlib.blake2b", *parametres) -> str:
+        """
+        Clé du cache : empreinte blake2b des octets reçus (calculée pendant la réception,
+        voir compression.televersement) prolongée de la version du rendu et des paramètres
+        """
+        empreinte = empreinte_contenu.copy()
+        empreinte.update(repr((VERSION_PIPELINE,) + parametres).encode())
+        return empreinte.hexdigest()
+
+    # --- Niveau mémoire ---
+
+    def _lire_memoire(self, cle: str) -> Optional[ImageCompressee]:
+        with self._verrou:
+            valeur = self._entrees.get(cle)
+            if valeur is not None:
+                self._entrees.move_to_end(cle)
+            return valeur
+
+    def _ecrire_memoire(self, cle: str, valeur: ImageCompressee):
+        if len(valeur.donnees) > self.octets_max:
+            return
+        with self._verrou:
+            if cle in self._entrees:
+                return
+            self._entrees[cle] = valeur
+            self._octets += len(valeur.donnees)
+            while self._octets > self.octets_max:
+                _, evincee = self._entrees.popitem(last=False)
+                self._octets -= len(evincee.donnees)
+                self.evictions += 1
+
+    # --- Niveau disque ---
+
+    def _chemin(self, cle: str) -> str:
+        return os.path.join(self.repertoire, cle[:2], cle)
+
+    def _lire_disque(self, cle: str) -> Optional[ImageCompressee]:
+        # Format : une ligne JSON de métadonnées, puis l'image
+        chemin = self._chemin(cle)
+        try:
+            with open(chemin, "rb") as f:
+                metadonnees = json.loads(f.readline())
+                valeur = ImageCompressee(donnees=f.read(), **metadonnees)
+        except (OSError, ValueError, TypeError):
+            return None
+        try:
+            # Date de modification = dernière utilisation, pour l'élagage
+            os.utime(chemin)
+        except OSError:
+            pass
+        return valeur
+
+    def _ecrire_disque(self, cle: str, valeur: ImageCompressee):
+        chemin = self._chemin(cle)
+        try:
+            os.makedirs(os.path.dirname(chemin), exist_ok=True)
+            # Écriture atomique : un lecteur ne voit jamais un fichier partiel
+            descripteur, temporaire = tempfile.mkstemp(dir=os.path.dirname(chemin))
+            with os.fdopen(descripteur, "wb") as f:
+                metadonnees = {"qualite": valeur.qualite, "effort": valeur.effort,
+                               "duree_encodage_ms": valeur.duree_encodage_ms}
+                f.write(json.dumps(metadonnees).encode() + b"\n")
+                f.write(valeur.donnees)
+                taille = f.tell()
+            os.replace(temporaire, chemin)
+        except OSError:
+            return
+        if self.octets_max_disque:
+            self._compter_disque(taille)
+
+    def _fichiers_disque(self):
+        """(date de modification, taille, chemin) de chaque fichier du répertoire"""
+        fichiers = []
+        try:
+            sous_repertoires = [entree.path for entree in os.scandir(self.repertoire) if entree.is_dir()]
+        except OSError:
+            return fichiers
+        for sous_repertoire in sous_repertoires:
+            try:
+                for entree in os.scandir(sous_repertoire):
+                    try:
+                        if entree.is_file():
+                            etat = entree.stat()
+                            fichiers.append((etat.st_mtime, etat.st_size, entree.path))
+                    except OSError:
+                        pass
+            except OSError:
+                pass
+        return fichiers
+
+    def _compter_disque(self, taille: int):
+        with self._verrou_disque:
+            if self._octets_disque is not None:
+                self._octets_disque += taille
+                if self._octets_disque <= self.octets_max_disque:
+                    return
+            # Premier passage, ou limite franchie : le répertoire (partagé par les workers)
+            # est parcouru, et élagué des fichiers les moins récemment utilisés jusqu'à 90 %
+            fichiers = self._fichiers_disque()
+            octets = sum(taille for _, taille, _ in fichiers)
+            if octets > self.octets_max_disque:
+                fichiers.sort()
+                for _, taille, chemin in fichiers:
+                    if octets <= self.octets_max_disque * 0.9:
+                        break
+                    try:
+                        os.unlink(chemin)
+                    except OSError:
+                        continue
+                    octets -= taille
+                    self.evictions_disque += 1
+            self._octets_disque = octets
+
+    # --- Accès ---
+
+    async def obtenir(self, cle: str,
+                      produire: Callable[[], Awaitable[ImageCompressee]]) -> Tuple[ImageCompressee, str]:
+        """
+        Retourne (image, statut) avec statut HIT, HIT-DISK, COALESCED ou MISS.
+        Une erreur de production est propagée à toutes les demandes coalescées. La
+        production est une tâche à part : l'annulation de la demande qui l'a lancée
+        (client déconnecté) n'interrompt ni elle ni les demandes qui l'attendent.
+        """
+        valeur = self._lire_memoire(cle)
+        if valeur is not None:
+            self.succes += 1
+            return valeur, "HIT"
+
+        tache = self._en_vol.get(cle)
+        if tache is not None:
+            self.coalescences += 1
+            valeur, _ = await asyncio.shield(tache)
+            return valeur, "COALESCED"
+
+        tache = asyncio.ensure_future(self._produire(cle, produire))
+        self._en_vol[cle] = tache
+        tache.add_done_callback(partial(self._terminer, cle))
+        return await asyncio.shield(tache)
+
+    async def _produire(self, cle: str, produire: Callable[[], Awaitable[ImageCompressee]]) -> Tuple[ImageCompressee, str]:
+        boucle = asyncio.get_running_loop()
+        valeur = None
+        if self.repertoire:
+            valeur = await boucle.run_in_executor(None, self._lire_disque, cle)
+        if valeur is not None:
+            self.succes_disque += 1
+            statut = "HIT-DISK"
+        else:
+            self.echecs += 1
+            valeur = await produire()
+            statut = "MISS"
+            if self.repertoire:
+                boucle.run_in_executor(None, self._ecrire_disque, cle, valeur)
+        self._ecrire_memoire(cle, valeur)
+        return valeur, statut
+
+    def _terminer(self, cle: str, tache: asyncio.Future):
+        if self._en_vol.get(cle) is tache:
+            del self._en_vol[cle]
+        # Évite l'avertissement « exception never retrieved » quand plus personne n'attend
+        if not tache.cancelled():
+            tache.exception()
+
+    def apres_production(self, cle: str, action: Callable[[], None]):
+        """
+        Exécute `action` à la fin de la production en cours pour la clé, ou tout de suite
+        s'il n'y en a pas : un fichier reçu reste lisible tant que sa compression se poursuit.
+        """
+        tache = self._en_vol.get(cle)
+        if tache is None or tache.done():
+            action()
+        else:
+            tache.add_done_callback(lambda _: action())
+
+    async def consulter(self, cle: str) -> Tuple[Optional[ImageCompressee], str]:
+        """
+        Image déjà produite (mémoire, puis disque) et statut HIT, HIT-DISK ou MISS, sans
+        la produire : pour les traitements qui en produisent plusieurs à la fois.
+        """
+        valeur = self._lire_memoire(cle)
+        if valeur is not None:
+            self.succes += 1
+            return valeur, "HIT"
+        if self.repertoire:
+            valeur = await asyncio.get_running_loop().run_in_executor(None, self._lire_disque, cle)
+            if valeur is not None:
+                self.succes_disque += 1
+                self._ecrire_memoire(cle, valeur)
+                return valeur, "HIT-DISK"
+        self.echecs += 1
+        return None, "MISS"
+
+    def enregistrer(self, cle: str, valeur: ImageCompressee):
+        """Ajoute une image produite hors de obtenir() (écriture sur disque en arrière-plan)"""
+        self._ecrire_memoire(cle, valeur)
+        if self.repertoire:
+            asyncio.get_running_loop().run_in_executor(None, self._ecrire_disque, cle, valeur)
+
+    def statistiques(self) -> dict:
+        with self._verrou:
+            entrees, octets = len(self._entrees), self._octets
+        return {
+            "succes": self.succes,
+            "succes_disque": self.succes_disque,
+            "echecs": self.echecs,
+            "coalescences": self.coalescences,
+            "evictions": self.evictions,
+            "evictions_disque": self.evictions_disque,
+            "taille": entrees,
+            "octets": octets,
+            "octets_max": self.octets_max,
+            "repertoire_disque": self.repertoire,
+            "octets_disque": self._octets_disque,
+            "octets_max_disque": self.octets_max_disque
+        }
+
+
+cache_images = CacheImages(
+    octets_max=int(os.getenv("COMPRESSION_CACHE_OCTETS") or 64 * 1024 * 1024),
+    repertoire=os.getenv("COMPRESSION_CACHE_DISQUE") or None,
+    # 0 : répertoire non borné
+    octets_max_disque=int(os.getenv("COMPRESSION_CACHE_DISQUE_OCTETS") or 1024 * 1024 * 1024)
+)
@@ -0,0 +1,128 @@
+"""
+Déclinaisons d'une image (vignette, aperçu, pleine taille...) en WebP, AVIF ou JPEG à partir
+d'un seul décodage. L'image est décodée et préparée une fois, à la taille de la plus grande
+déclinaison ; chacune des suivantes est réduite depuis la précédente, de la plus grande à la
+plus petite. Chaque image est encodée dès qu'elle est prête, dans un fil d'exécution séparé
+(Pillow libère le GIL pendant l'encodage), pendant que les réductions suivantes se poursuivent.
+"""
+import io
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, NamedTuple, Optional, Sequence, Tuple, Union
+from compression.pipeline import EFFORT_MAX, ImageCompressee, preparer_image, taille_reduite
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Format : (format Pillow, type de média, extension)
+FORMATS = {
+    "webp": ("WEBP", "image/webp", "webp"),
+    "avif": ("AVIF", "image/avif", "avif"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+}
+# Format choisi d'après l'en-tête Accept de la requête
+FORMAT_AUTO = "auto"
+DECLINAISONS_DEFAUT = ("vignette:320x320", "apercu:1280x1280", "complete")
+DECLINAISONS_MAX = 8
+# Encodages simultanés au plus dans un processus de compression
+FILS_ENCODAGE = int(os.getenv("COMPRESSION_FILS_DECLINAISONS") or 4)
+
+_NOM = re.compile(r"[A-Za-z0-9_-]{1,32}")
+_BOITE = re.compile(r"([0-9]*)x([0-9]*)")
+
+
+class Declinaison(NamedTuple):
+    nom: str
+    max_largeur: Optional[int]
+    max_hauteur: Optional[int]
+    format: str  # clé de FORMATS, ou FORMAT_AUTO tant que la négociation n'est pas faite
+    qualite: Optional[int]  # None : qualité de la requête
+
+
+def analyser_declinaison(texte: str) -> Declinaison:
+    """
+    Lit une déclinaison « nom[:LARGEURxHAUTEUR][:format][:qualite] », par exemple
+    « vignette:320x320 », « apercu:1280x:avif:60 » ou « complete:jpeg ». Lève ValueError.
+    """
+    nom, *options = texte.strip().split(":")
+    if not _NOM.fullmatch(nom):
+        raise ValueError(f"Nom de déclinaison invalide : {nom!r} (lettres, chiffres, - et _, 32 au plus)")
+    max_largeur = max_hauteur = qualite = None
+    format_ = FORMAT_AUTO
+    for option in options:
+        boite = _BOITE.fullmatch(option)
+        if boite and any(boite.groups()):
+            max_largeur, max_hauteur = (int(valeur) if valeur else None for valeur in boite.groups())
+            if max_largeur == 0 or max_hauteur == 0:
+                raise ValueError(f"Dimensions nulles dans la déclinaison {texte!r}")
+        elif option.lower() in FORMATS or option.lower() == FORMAT_AUTO:
+            format_ = option.lower()
+        elif option.isdigit() and 1 <= int(option) <= 100:
+            qualite = int(option)
+        else:
+            raise ValueError(f"Option inconnue {option!r} dans la déclinaison {texte!r} "
+                             f"(dimensions LARGEURxHAUTEUR, format {', '.join(FORMATS)} ou qualité 1-100)")
+    return Declinaison(nom, max_largeur, max_hauteur, format_, qualite)
+
+
+def _encoder(image: "Image.Image", format_: str, qualite: int, effort: int) -> ImageCompressee:
+    debut = time.perf_counter()
+    tampon = io.BytesIO()
+    if format_ == "webp":
+        image.save(tampon, format="WEBP", quality=qualite, method=effort)
+    elif format_ == "avif":
+        # Vitesse libavif de 10 (effort 0) à 4 (effort 6) ; un seul fil par image, les
+        # déclinaisons étant déjà encodées en parallèle
+        image.save(tampon, format="AVIF", quality=qualite, speed=10 - effort, max_threads=1)
+    else:
+        image.save(tampon, format="JPEG", quality=qualite, optimize=effort > 0, progressive=True)
+    return ImageCompressee(tampon.getvalue(), qualite, effort, (time.perf_counter() - debut) * 1000)
+
+
+def _encoder_groupe(image: "Image.Image", declinaisons: Sequence[Declinaison], effort: int) -> List[ImageCompressee]:
+    # Déclinaisons de même taille : une même image, encodée dans un seul fil (save() modifie
+    # l'objet image, qui ne doit pas être encodé par deux fils à la fois)
+    return [_encoder(image, declinaison.format, declinaison.qualite, effort) for declinaison in declinaisons]
+
+
+def _boite_englobante(declinaisons: Sequence[Declinaison]) -> Tuple[Optional[int], Optional[int]]:
+    """Boîte dans laquelle l'image préparée est au moins aussi grande que chaque déclinaison"""
+    largeurs = [declinaison.max_largeur for declinaison in declinaisons]
+    hauteurs = [declinaison.max_hauteur for declinaison in declinaisons]
+    return (None if None in largeurs else max(largeurs)), (None if None in hauteurs else max(hauteurs))
+
+
+def decliner_image(source: Union[bytes, str], declinaisons: Sequence[Declinaison],
+                   effort: int = EFFORT_MAX) -> List[ImageCompressee]:
+    """
+    Décode une fois l'image (octets ou chemin de fichier) et produit chaque déclinaison,
+    dont le format et la qualité sont résolus. Retourne les images dans l'ordre des
+    déclinaisons. Fonction pure, exécutable dans un processus séparé.
+    """
+    from PIL import Image
+    image = preparer_image(source, *_boite_englobante(declinaisons))
+
+    tailles = [taille_reduite(image.size, declinaison.max_largeur, declinaison.max_hauteur) or image.size
+               for declinaison in declinaisons]
+    # De la plus grande à la plus petite, les déclinaisons de même taille regroupées
+    groupes: List[Tuple[Tuple[int, int], List[int]]] = []
+    for indice in sorted(range(len(declinaisons)), key=lambda indice: tailles[indice][0] * tailles[indice][1], reverse=True):
+        if groupes and groupes[-1][0] == tailles[indice]:
+            groupes[-1][1].append(indice)
+        else:
+            groupes.append((tailles[indice], [indice]))
+
+    resultats: List[Optional[ImageCompressee]] = [None] * len(declinaisons)
+    with ThreadPoolExecutor(max_workers=max(1, min(FILS_ENCODAGE, len(groupes)))) as fils:
+        taches = []
+        for taille, indices in groupes:
+            if image.size != taille:
+                # Réduction depuis la déclinaison précédente, déjà plus petite que l'original
+                image = image.resize(taille, Image.Resampling.LANCZOS, reducing_gap=3.0)
+            taches.append(fils.submit(_encoder_groupe, image, [declinaisons[indice] for indice in indices], effort))
+        for (_, indices), tache in zip(groupes, taches):
+            for indice, resultat in zip(indices, tache.result()):
+                resultats[indice] = resultat
+    return resultats
@@ -0,0 +1,246 @@
+from typing import TYPE_CHECKING, NamedTuple, Optional, Tuple, Union
+import io
+import os
+import time
+
+# Pillow n'est importé qu'au premier traitement, dans les processus de compression :
+# le serveur démarre sans le charger
+if TYPE_CHECKING:
+    from PIL import Image
+
+# À incrémenter à chaque changement du rendu : invalide les images déjà en cache
+VERSION_PIPELINE = 3
+
+# Pixels décodés au plus par image (après réduction au décodage des JPEG) : au-delà,
+# l'image est refusée avant le chargement de ses pixels (4 octets par pixel en mémoire)
+PIXELS_MAX = int(os.getenv("COMPRESSION_PIXELS_MAX") or 50_000_000)
+
+# Effort d'encodage WebP (paramètre method de libwebp) : 0 = le plus rapide, 6 = le plus compact
+EFFORT_MAX = 6
+
+# Sonde sur laquelle est cherchée la qualité d'une taille cible : mosaïque de
+# TUILES_SONDE x TUILES_SONDE extraits de l'image, à résolution native pour
+# conserver la densité de détails (une réduction d'échelle la lisserait)
+TUILES_SONDE = 4
+COTE_TUILE_SONDE = 128
+# Réencodages complets au plus si l'estimation faite sur la sonde dépasse la taille cible
+CORRECTIONS_TAILLE_MAX = 2
+
+
+class ImageCompressee(NamedTuple):
+    donnees: bytes
+    qualite: int
+    effort: int
+    duree_encodage_ms: float
+
+
+class ImageRefusee(ValueError):
+    """Image dépassant les limites de taille (octets reçus ou pixels à décoder)"""
+
+
+# Balise EXIF Orientation (0x0112)
+BALISE_ORIENTATION = 0x0112
+# Orientation EXIF -> transposition qui redresse l'image (valeurs de PIL.Image.Transpose :
+# FLIP_LEFT_RIGHT, FLIP_TOP_BOTTOM, ROTATE_90, ROTATE_180, ROTATE_270, TRANSPOSE, TRANSVERSE)
+TRANSPOSITIONS = {2: 0, 3: 3, 4: 1, 5: 5, 6: 4, 7: 6, 8: 2}
+# Orientations EXIF dont la correction échange largeur et hauteur
+ORIENTATIONS_QUART_DE_TOUR = (5, 6, 7, 8)
+
+
+def _lire_orientation(image: "Image.Image") -> Optional[int]:
+    """Retourne la valeur de la balise EXIF Orientation, ou None"""
+    try:
+        return image.getexif().get(BALISE_ORIENTATION)
+    except (AttributeError, KeyError, IndexError, ValueError, OSError):
+        # EXIF absent ou illisible : image traitée telle quelle
+        return None
+
+
+def taille_reduite(taille: Tuple[int, int], max_largeur: Optional[int], max_hauteur: Optional[int]) -> Optional[Tuple[int, int]]:
+    """Taille réduite conservant les proportions, ou None si l'image tient déjà dans la boîte"""
+    largeur, hauteur = taille
+    echelle = min(
+        max_largeur / largeur if max_largeur else 1.0,
+        max_hauteur / hauteur if max_hauteur else 1.0
+    )
+    if echelle >= 1.0:
+        return None
+    return max(1, round(largeur * echelle)), max(1, round(hauteur * echelle))
+
+
+def _encoder(image: "Image.Image", qualite: int, effort: int) -> bytes:
+    tampon = io.BytesIO()
+    image.save(tampon, format="WEBP", quality=qualite, method=effort)
+    # Le tampon n'est plus utilisé : getvalue() rend son contenu sans le recopier
+    return tampon.getvalue()
+
+
+def _taille_encodage(image: "Image.Image", qualite: int, effort: int, tampon: io.BytesIO) -> int:
+    """Taille de l'encodage WebP, dans un tampon réutilisé d'un essai à l'autre (rien n'est recopié)"""
+    tampon.seek(0)
+    tampon.truncate()
+    image.save(tampon, format="WEBP", quality=qualite, method=effort)
+    return tampon.tell()
+
+
+def _sonde(image: "Image.Image") -> "Image.Image":
+    """Mosaïque d'extraits répartis sur l'image, ou l'image elle-même si elle est petite"""
+    from PIL import Image
+    cote = TUILES_SONDE * COTE_TUILE_SONDE
+    if image.width <= cote or image.height <= cote:
+        return image
+    sonde = Image.new(image.mode, (cote, cote))
+    for ligne in range(TUILES_SONDE):
+        for colonne in range(TUILES_SONDE):
+            # Extraits centrés dans chaque case d'une grille couvrant toute l'image
+            x = (2 * colonne + 1) * image.width // (2 * TUILES_SONDE) - COTE_TUILE_SONDE // 2
+            y = (2 * ligne + 1) * image.height // (2 * TUILES_SONDE) - COTE_TUILE_SONDE // 2
+            tuile = image.crop((x, y, x + COTE_TUILE_SONDE, y + COTE_TUILE_SONDE))
+            sonde.paste(tuile, (colonne * COTE_TUILE_SONDE, ligne * COTE_TUILE_SONDE))
+    return sonde
+
+
+def _encoder_taille_cible(image: "Image.Image", octets_max: int, qualite_max: int, effort: int) -> Tuple[bytes, int]:
+    """
+    Cherche la plus haute qualité (<= qualite_max) dont l'encodage tient dans octets_max.
+    La dichotomie porte sur une mosaïque d'extraits de l'image (sonde) ; un premier encodage
+    complet calibre le rapport de taille image/sonde, puis la dichotomie est reprise
+    avec ce rapport. Deux encodages complets suffisent en général.
+    """
+    pixels = image.width * image.height
+    sonde = _sonde(image)
+
+    tailles_sonde = {}
+    tampon_sonde = io.BytesIO()
+
+    def taille_sonde(qualite: int) -> int:
+        if qualite not in tailles_sonde:
+            tailles_sonde[qualite] = _taille_encodage(sonde, qualite, effort, tampon_sonde)
+        return tailles_sonde[qualite]
+
+    def dichotomie(budget_sonde: float) -> int:
+        bas, haut, qualite = 1, qualite_max, 1
+        while bas <= haut:
+            milieu = (bas + haut) // 2
+            if taille_sonde(milieu) <= budget_sonde:
+                qualite, bas = milieu, milieu + 1
+            else:
+                haut = milieu - 1
+        return qualite
+
+    # Première estimation : taille proportionnelle à la surface
+    qualite = dichotomie(octets_max * (sonde.width * sonde.height) / pixels)
+    donnees = _encoder(image, qualite, effort)
+    if sonde is not image:
+        # Calibration sur l'encodage complet, puis nouvelle estimation
+        rapport = len(donnees) / taille_sonde(qualite)
+        qualite_calibree = dichotomie(octets_max / rapport)
+        if qualite_calibree != qualite:
+            donnees_calibrees = _encoder(image, qualite_calibree, effort)
+            # On garde la plus haute qualité qui tient dans la cible (ou, à défaut, la plus petite image)
+            tient, tient_calibree = len(donnees) <= octets_max, len(donnees_calibrees) <= octets_max
+            if (tient_calibree and (not tient or qualite_calibree > qualite)) or (
+                    not tient and not tient_calibree and len(donnees_calibrees) < len(donnees)):
+                donnees, qualite = donnees_calibrees, qualite_calibree
+
+    for _ in range(CORRECTIONS_TAILLE_MAX):
+        if len(donnees) <= octets_max or qualite == 1:
+            break
+        # La taille décroît à peu près proportionnellement à la qualité dans cette zone
+        qualite = max(1, min(qualite - 1, int(qualite * octets_max / len(donnees))))
+        donnees = _encoder(image, qualite, effort)
+    return donnees, qualite
+
+
+def _ouvrir(source: Union[bytes, str]) -> "Image.Image":
+    """Image à décoder depuis des octets ou, pour les envois volumineux, depuis leur fichier temporaire"""
+    from PIL import Image
+    # La limite de Pillow porte sur la taille annoncée ; PIXELS_MAX, sur la taille réellement décodée
+    Image.MAX_IMAGE_PIXELS = None
+    return Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+
+
+def _normaliser(image: "Image.Image") -> "Image.Image":
+    """Image en RGB, ou en RGBA si elle comporte de la transparence"""
+    if image.mode == "P":
+        # Palette : couche alpha seulement si une couleur est déclarée transparente
+        return image.convert("RGBA" if "transparency" in image.info else "RGB")
+    if image.mode in ("LA", "PA", "La", "RGBa"):
+        return image.convert("RGBA")
+    return image if image.mode in ("RGB", "RGBA") else image.convert("RGB")
+
+
+def _aplatir(image: "Image.Image") -> "Image.Image":
+    """Transparence éventuelle posée sur un fond blanc"""
+    from PIL import Image
+    if image.mode != "RGBA":
+        return image
+    fond = Image.new("RGB", image.size, (255, 255, 255))
+    # L'image sert elle-même de masque (sa couche alpha) : pas de split() en quatre couches
+    fond.paste(image, mask=image)
+    return fond
+
+
+def preparer_image(source: Union[bytes, str], max_largeur: Optional[int] = None,
+                   max_hauteur: Optional[int] = None) -> "Image.Image":
+    """
+    Décode une image (octets, ou chemin du fichier où elle a été reçue), la réduit si
+    besoin à max_largeur x max_hauteur (boîte s'entendant après correction de
+    l'orientation), aplatit la transparence sur fond blanc et corrige son orientation
+    EXIF. Lève ImageRefusee au-delà de PIXELS_MAX pixels décodés.
+    """
+    from PIL import Image
+    with _ouvrir(source) as originale:
+        orientation = _lire_orientation(originale)
+
+        cible = None
+        if max_largeur or max_hauteur:
+            # La boîte demandée s'entend après correction de l'orientation
+            if orientation in ORIENTATIONS_QUART_DE_TOUR:
+                max_largeur, max_hauteur = max_hauteur, max_largeur
+            cible = taille_reduite(originale.size, max_largeur, max_hauteur)
+            if cible is not None:
+                # JPEG : décodage directement à 1/2, 1/4 ou 1/8 de la résolution
+                # (jamais en dessous de la cible), avant tout chargement des pixels
+                originale.draft("RGB", cible)
+
+        largeur, hauteur = originale.size
+        if largeur * hauteur > PIXELS_MAX:
+            raise ImageRefusee(f"Image trop grande : {largeur}x{hauteur} pixels ({PIXELS_MAX} au plus)")
+
+        image = _normaliser(originale)
+        if cible is not None and image.size != cible:
+            # reduce() par facteur entier tant que l'écart le permet, puis Lanczos sur le reste ;
+            # avant l'aplatissement, qui ne porte plus que sur l'image réduite
+            image = image.resize(cible, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        # Pixels chargés avant la fermeture du fichier (image sans aucune transformation)
+        image.load()
+    if image is not originale:
+        # Image décodée à pleine résolution libérée dès qu'elle ne sert plus
+        originale.close()
+
+    image = _aplatir(image)
+    # Redressement selon l'orientation EXIF, par transposition (sans rééchantillonnage)
+    if orientation in TRANSPOSITIONS:
+        image = image.transpose(TRANSPOSITIONS[orientation])
+    return image
+
+
+def compresser_webp(source: Union[bytes, str], qualite: int,
+                    max_largeur: Optional[int] = None, max_hauteur: Optional[int] = None,
+                    taille_cible_ko: Optional[int] = None, effort: int = EFFORT_MAX) -> ImageCompressee:
+    """
+    Prépare une image (preparer_image) et l'encode en WebP, à la qualité demandée ou à la
+    plus haute qualité tenant dans taille_cible_ko. Fonction pure, exécutable dans un
+    processus séparé.
+    """
+    image = preparer_image(source, max_largeur, max_hauteur)
+
+    # Compression en WebP
+    debut = time.perf_counter()
+    if taille_cible_ko:
+        donnees, qualite = _encoder_taille_cible(image, taille_cible_ko * 1024, qualite, effort)
+    else:
+        donnees = _encoder(image, qualite, effort)
+    duree_encodage_ms = (time.perf_counter() - debut) * 1000
+    return ImageCompressee(donnees, qualite, effort, duree_encodage_ms)
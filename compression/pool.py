@@ -0,0 +1,92 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+from serveur.environnement import entier_env, flottant_env
+from serveur.processus import creer_executeur
+
+
+class PoolSaturee(Exception):
+    """Aucune place disponible dans la file de compression"""
+    def __init__(self, message: str, reessayer_apres: int):
+        super().__init__(message)
+        self.reessayer_apres = reessayer_apres
+
+
+class PoolCompression:
+    """
+    Exécute les traitements d'images dans un pool de processus borné, hors de la
+    boucle d'événements. Au-delà de processus + file_attente tâches en cours, les
+    nouvelles demandes sont refusées immédiatement (PoolSaturee).
+    """
+    def __init__(self, processus: int, file_attente: int, delai_max: float):
+        self.processus = processus
+        self.capacite = processus + file_attente
+        self.delai_max = delai_max
+        self._executeur: Optional[ProcessPoolExecutor] = None
+        self._verrou = threading.Lock()
+        self._en_cours = 0
+
+    def _obtenir_executeur(self) -> ProcessPoolExecutor:
+        with self._verrou:
+            if self._executeur is None:
+                self._executeur = creer_executeur(self.processus)
+            return self._executeur
+
+    def _liberer(self, _future=None):
+        with self._verrou:
+            self._en_cours -= 1
+
+    @property
+    def en_cours(self) -> int:
+        return self._en_cours
+
+    async def executer(self, fonction: Callable, *args):
+        """Soumet un traitement ; lève PoolSaturee si la file est pleine ou le délai dépassé"""
+        with self._verrou:
+            if self._en_cours >= self.capacite:
+                raise PoolSaturee("Trop d'images en cours de compression", reessayer_apres=1)
+            self._en_cours += 1
+
+        try:
+            future = self._obtenir_executeur().submit(fonction, *args)
+        except BrokenProcessPool:
+            self._liberer()
+            self._reinitialiser()
+            raise PoolSaturee("Le pool de compression redémarre", reessayer_apres=1)
+        except BaseException:
+            self._liberer()
+            raise
+        # La place n'est rendue qu'à la fin réelle du traitement, même après un dépassement de délai
+        future.add_done_callback(self._liberer)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.delai_max)
+        except asyncio.TimeoutError:
+            raise PoolSaturee("La compression a dépassé le délai maximal", reessayer_apres=max(1, int(self.delai_max)))
+        except BrokenProcessPool:
+            # Un processus est mort (mémoire, signal) : on repart d'un pool neuf
+            self._reinitialiser()
+            raise PoolSaturee("Le pool de compression redémarre", reessayer_apres=1)
+
+    def _reinitialiser(self):
+        with self._verrou:
+            executeur, self._executeur = self._executeur, None
+        if executeur is not None:
+            executeur.shutdown(wait=False)
+
+    def arreter(self):
+        with self._verrou:
+            executeur, self._executeur = self._executeur, None
+        if executeur is not None:
+            executeur.shutdown(wait=True)
+
+
+_processus = entier_env("COMPRESSION_PROCESSUS", os.cpu_count() or 1)
+pool_compression = PoolCompression(
+    processus=_processus,
+    file_attente=entier_env("COMPRESSION_FILE_ATTENTE", 2 * _processus),
+    delai_max=flottant_env("COMPRESSION_DELAI_MAX", 30.0)
+)
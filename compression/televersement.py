@@ -0,0 +1,80 @@
+"""
+Réception des images envoyées : le fichier reçu est lu par blocs dans un tampon réutilisé,
+haché au passage (l'empreinte sert de clé au cache) et borné en octets. Les petites images
+restent en mémoire ; au-delà de SEUIL_FICHIER, elles sont recopiées dans un fichier
+temporaire nommé que le processus de compression décode directement, au lieu de
+transiter en entier par la mémoire du serveur puis par le canal du pool.
+"""
+import hashlib
+import io
+import os
+import tempfile
+from typing import BinaryIO, Union
+from compression.pipeline import ImageRefusee
+
+# Au-delà, l'image est transmise au pool par un fichier temporaire plutôt qu'en octets
+SEUIL_FICHIER = 1024 * 1024
+TAILLE_BLOC = 256 * 1024
+# Octets au plus par image, et par requête de lot (toutes images et archives comprises)
+OCTETS_MAX = int(os.getenv("COMPRESSION_OCTETS_MAX") or 20 * 1024 * 1024)
+OCTETS_MAX_LOT = int(os.getenv("COMPRESSION_OCTETS_MAX_LOT") or 256 * 1024 * 1024)
+# Répertoire des fichiers temporaires (défaut du système si vide)
+REPERTOIRE_TEMPORAIRE = os.getenv("COMPRESSION_REPERTOIRE_TEMPORAIRE") or None
+
+
+class Televersement:
+    """Image reçue : octets ou chemin d'un fichier temporaire, taille et empreinte blake2b du contenu"""
+    __slots__ = ("source", "taille", "empreinte")
+
+    def __init__(self, source: Union[bytes, str], taille: int, empreinte: "hashlib.blake2b"):
+        self.source = source
+        self.taille = taille
+        self.empreinte = empreinte
+
+    def supprimer(self):
+        """Supprime le fichier temporaire éventuel"""
+        if isinstance(self.source, str):
+            try:
+                os.unlink(self.source)
+            except OSError:
+                pass
+
+
+def recevoir(flux: BinaryIO, octets_max: int = OCTETS_MAX) -> Televersement:
+    """
+    Lit `flux` jusqu'au bout (fonction bloquante, à exécuter hors de la boucle d'événements).
+    Lève ImageRefusee dès que `octets_max` est dépassé, sans lire la suite.
+    """
+    empreinte = hashlib.blake2b(digest_size=20)
+    bloc = bytearray(TAILLE_BLOC)
+    vue = memoryview(bloc)
+    memoire = io.BytesIO()
+    fichier = None
+    taille = 0
+    try:
+        while True:
+            lus = flux.readinto(vue)
+            if not lus:
+                break
+            taille += lus
+            if taille > octets_max:
+                raise ImageRefusee(f"Image trop volumineuse : plus de {octets_max} octets")
+            empreinte.update(vue[:lus])
+            if fichier is None and taille > SEUIL_FICHIER:
+                fichier = tempfile.NamedTemporaryFile(prefix="taxi-image-", dir=REPERTOIRE_TEMPORAIRE, delete=False)
+                fichier.write(memoire.getbuffer())
+                memoire = None
+            if fichier is not None:
+                fichier.write(vue[:lus])
+            else:
+                memoire.write(vue[:lus])
+    except BaseException:
+        if fichier is not None:
+            fichier.close()
+            os.unlink(fichier.name)
+        raise
+    if fichier is not None:
+        fichier.close()
+        return Televersement(fichier.name, taille, empreinte)
+    return Televersement(memoire.getvalue(), taille, empreinte)
+
@@ -0,0 +1,47 @@
+import io
+import time
+import zipfile
+
+
+class _TamponSortie(io.RawIOBase):
+    """Flux non repositionnable : zipfile écrit alors des descripteurs de données"""
+    def __init__(self):
+        self._morceaux = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, donnees) -> int:
+        self._morceaux.append(bytes(donnees))
+        self._position += len(donnees)
+        return len(donnees)
+
+    def tell(self) -> int:
+        return self._position
+
+    def vider(self) -> bytes:
+        contenu = b"".join(self._morceaux)
+        self._morceaux.clear()
+        return contenu
+
+
+class FluxZip:
+    """
+    Construit une archive ZIP entrée par entrée et restitue, après chaque ajout,
+    les octets à envoyer : seule l'entrée en cours est gardée en mémoire.
+    """
+    def __init__(self):
+        self._tampon = _TamponSortie()
+        self._archive = zipfile.ZipFile(self._tampon, "w")
+
+    def ajouter(self, nom: str, donnees: bytes, compresser: bool = False) -> bytes:
+        info = zipfile.ZipInfo(nom, date_time=time.localtime()[:6])
+        # Les images WebP sont déjà compressées : stockage direct
+        info.compress_type = zipfile.ZIP_DEFLATED if compresser else zipfile.ZIP_STORED
+        self._archive.writestr(info, donnees)
+        return self._tampon.vider()
+
+    def fermer(self) -> bytes:
+        self._archive.close()
+        return self._tampon.vider()
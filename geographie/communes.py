@@ -0,0 +1,244 @@
+import csv
+import gzip
+import io
+import math
+import os
+from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from geographie.texte import plier
+
+FICHIER_COMMUNES_DEFAUT = Path(__file__).with_name("communes.csv.gz")
+FICHIER_COMMUNES = os.environ.get("COMMUNES_FICHIER") or FICHIER_COMMUNES_DEFAUT
+# Rapport moyen entre distance routière et distance à vol d'oiseau
+COEFFICIENT_ROUTIER = float(os.environ.get("COMMUNES_COEFFICIENT_ROUTIER") or 1.3)
+
+RAYON_TERRE_KM = 6371.0088
+# Côté des cellules de l'index spatial, en degrés (environ 11 km en latitude)
+PAS_GRILLE = 0.1
+# Au-delà, une recherche de voisinage renonce (environ 1 100 km)
+ANNEAUX_MAX = 100
+# Mots par lesquels une recherche ne commence pas : « roche » trouve « La Roche-sur-Yon »,
+# mais « sur » ne propose pas toutes les communes en « -sur- »
+MOTS_VIDES = frozenset(("l", "la", "le", "les", "d", "de", "du", "des", "sur", "sous", "en", "et", "au", "aux", "lez"))
+# Article initial facultatif : « rochelle » propose La Rochelle parmi les noms, pas après eux
+ARTICLES = frozenset(("l", "la", "le", "les"))
+COLONNES = ("code_insee", "nom", "departement", "latitude", "longitude", "population")
+
+
+class Commune(NamedTuple):
+    code_insee: str  # vide si le fichier ne le fournit pas
+    nom: str
+    departement: str
+    latitude: float
+    longitude: float
+    population: int  # 0 si inconnue
+
+
+def distance_orthodromique_km(depart: Commune, arrivee: Commune) -> float:
+    """Distance à vol d'oiseau entre deux communes (formule de haversine)"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (depart.latitude, depart.longitude, arrivee.latitude, arrivee.longitude))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAYON_TERRE_KM * math.asin(math.sqrt(a))
+
+
+def estimer_distance_km(depart: Commune, arrivee: Commune) -> float:
+    """Distance routière estimée : vol d'oiseau multiplié par COEFFICIENT_ROUTIER, au dixième de km"""
+    return round(distance_orthodromique_km(depart, arrivee) * COEFFICIENT_ROUTIER, 1)
+
+
+class ReferentielCommunes:
+    """
+    Communes indexées par nom et par position :
+    - par nom plié (sans accents, casse ni ponctuation) dans une table de hachage ;
+    - par préfixe, dans un tableau trié des noms pliés et de leurs fins à partir de chaque
+      mot (forme aplatie d'un arbre préfixe : les clés d'un même préfixe sont contiguës et
+      leur intervalle se trouve par dichotomie) ;
+    - par position, dans une grille de cellules de PAS_GRILLE degrés.
+    """
+    def __init__(self, communes: Sequence[Commune]):
+        # Les plus peuplées d'abord : à nom égal, la première est la plus probable
+        self.communes: Tuple[Commune, ...] = tuple(sorted(communes, key=lambda commune: -commune.population))
+        self._populations = np.array([commune.population for commune in self.communes], dtype=np.int64)
+        self._latitudes = np.radians([commune.latitude for commune in self.communes])
+        self._longitudes = np.radians([commune.longitude for commune in self.communes])
+
+        par_nom: Dict[str, List[int]] = defaultdict(list)
+        self._par_code: Dict[str, int] = {}
+        cles = []
+        for indice, commune in enumerate(self.communes):
+            nom = plier(commune.nom)
+            par_nom[nom].append(indice)
+            if commune.code_insee:
+                self._par_code[commune.code_insee] = indice
+            mots = nom.split()
+            cles.append((nom, indice))
+            for position in range(1, len(mots)):
+                if mots[position] not in MOTS_VIDES:
+                    # Rang décalé de len(communes) : après les noms commençant par le préfixe
+                    secondaire = position > 1 or mots[0] not in ARTICLES
+                    cles.append((" ".join(mots[position:]), indice + len(self.communes) * secondaire))
+        self._par_nom = {nom: tuple(indices) for nom, indices in par_nom.items()}
+        cles.sort()
+        self._cles = [cle for cle, _ in cles]
+        self._rangs_cles = np.array([rang for _, rang in cles], dtype=np.int32)
+
+        grille: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for indice, commune in enumerate(self.communes):
+            grille[self._cellule(commune.latitude, commune.longitude)].append(indice)
+        self._grille = {cellule: np.array(indices, dtype=np.int32) for cellule, indices in grille.items()}
+
+        # Résultats d'autocomplétion par préfixe : les premières frappes reviennent sans cesse
+        self.autocompleter = lru_cache(maxsize=4096)(self._autocompleter)
+
+    @classmethod
+    def charger(cls, chemin=FICHIER_COMMUNES) -> "ReferentielCommunes":
+        """Lit un fichier CSV (séparateur « ; », éventuellement compressé en gzip) aux colonnes COLONNES"""
+        with open(chemin, "rb") as fichier:
+            contenu = fichier.read()
+        if contenu[:2] == b"\x1f\x8b":
+            contenu = gzip.decompress(contenu)
+        lecteur = csv.reader(io.StringIO(contenu.decode("utf-8")), delimiter=";")
+        entete = next(lecteur, [])
+        manquantes = set(COLONNES) - set(entete)
+        if manquantes:
+            raise ValueError(f"{chemin}: colonnes manquantes {', '.join(sorted(manquantes))}")
+        code, nom, departement, latitude, longitude, population = (entete.index(colonne) for colonne in COLONNES)
+        return cls([
+            Commune(ligne[code], ligne[nom], ligne[departement], float(ligne[latitude]),
+                    float(ligne[longitude]), int(ligne[population] or 0))
+            for ligne in lecteur
+        ])
+
+    # --- Recherche par nom ---
+
+    def _intervalle(self, prefixe: str) -> Tuple[int, int]:
+        """Positions dans self._cles des clés commençant par `prefixe`"""
+        return bisect_left(self._cles, prefixe), bisect_left(self._cles, prefixe + "￿")
+
+    def resoudre(self, texte: str, departement: Optional[str] = None) -> Optional[Commune]:
+        """
+        Commune désignée par un nom libre (ou un code INSEE) : nom plié exact, sinon nom
+        dont une fin à partir d'un mot correspond exactement (« Roche-sur-Yon »). Parmi les
+        homonymes, celle du département demandé, sinon la plus peuplée. None si inconnue.
+        """
+        texte = texte.strip()
+        if texte in self._par_code:
+            return self.communes[self._par_code[texte]]
+        nom = plier(texte)
+        if not nom:
+            return None
+        indices = self._par_nom.get(nom)
+        if indices is None:
+            debut, fin = self._intervalle(nom)
+            indices = sorted(int(rang) % len(self.communes) for position, rang in
+                             zip(range(debut, fin), self._rangs_cles[debut:fin]) if self._cles[position] == nom)
+            if not indices:
+                return None
+        if departement is not None:
+            for indice in indices:
+                if self.communes[indice].departement == departement:
+                    return self.communes[indice]
+        return self.communes[indices[0]]
+
+    def _autocompleter(self, prefixe: str, limite: int = 10, departement: Optional[str] = None) -> Tuple[Commune, ...]:
+        prefixe = plier(prefixe)
+        if not prefixe:
+            return ()
+        debut, fin = self._intervalle(prefixe)
+        # Noms commençant par le préfixe puis noms dont un mot y commence, chacun par
+        # population décroissante (rangs croissants)
+        resultats = {}
+        for rang in np.unique(self._rangs_cles[debut:fin]).tolist():
+            commune = self.communes[rang % len(self.communes)]
+            if departement is None or commune.departement == departement:
+                resultats[commune] = None
+                if len(resultats) == limite:
+                    break
+        return tuple(resultats)
+
+    # --- Recherche par position ---
+
+    @staticmethod
+    def _cellule(latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / PAS_GRILLE), math.floor(longitude / PAS_GRILLE)
+
+    @staticmethod
+    def _anneau(ligne: int, colonne: int, anneau: int):
+        """Cellules à exactement `anneau` cellules (distance de Tchebychev) de (ligne, colonne)"""
+        if anneau == 0:
+            yield ligne, colonne
+            return
+        for decalage in range(-anneau, anneau + 1):
+            yield ligne - anneau, colonne + decalage
+            yield ligne + anneau, colonne + decalage
+        for decalage in range(-anneau + 1, anneau):
+            yield ligne + decalage, colonne - anneau
+            yield ligne + decalage, colonne + anneau
+
+    def _distances_km(self, indices: np.ndarray, latitude: float, longitude: float) -> np.ndarray:
+        lat, lon = math.radians(latitude), math.radians(longitude)
+        a = (np.sin((self._latitudes[indices] - lat) / 2) ** 2
+             + math.cos(lat) * np.cos(self._latitudes[indices]) * np.sin((self._longitudes[indices] - lon) / 2) ** 2)
+        return 2 * RAYON_TERRE_KM * np.arcsin(np.sqrt(a))
+
+    def plus_proches(self, latitude: float, longitude: float, nombre: int = 5) -> List[Tuple[Commune, float]]:
+        """
+        Communes les plus proches d'un point, avec leur distance à vol d'oiseau en km. Les
+        cellules sont parcourues par anneaux autour de celle du point, jusqu'à ce que les
+        `nombre` meilleures soient plus proches que tout anneau restant.
+        """
+        ligne, colonne = self._cellule(latitude, longitude)
+        # Plus petite largeur d'une cellule, en km, sur la bande de latitude parcourue
+        largeur_km = math.radians(PAS_GRILLE) * RAYON_TERRE_KM * math.cos(math.radians(min(abs(latitude) + 10, 89)))
+        candidats: List[np.ndarray] = []
+        meilleurs = np.empty(0, dtype=np.int32)
+        distances = np.empty(0)
+        for anneau in range(ANNEAUX_MAX + 1):
+            for cellule in self._anneau(ligne, colonne, anneau):
+                indices = self._grille.get(cellule)
+                if indices is not None:
+                    candidats.append(indices)
+            if not candidats:
+                continue
+            indices = np.concatenate(candidats)
+            distances = self._distances_km(indices, latitude, longitude)
+            ordre = np.argsort(distances, kind="stable")[:nombre]
+            meilleurs, distances = indices[ordre], distances[ordre]
+            # Un point hors des anneaux parcourus est à plus de anneau * largeur_km
+            if len(meilleurs) == nombre and distances[-1] <= anneau * largeur_km:
+                break
+        return [(self.communes[indice], round(float(distance), 3)) for indice, distance in zip(meilleurs.tolist(), distances)]
+
+    def statistiques(self) -> dict:
+        return {
+            "communes": len(self.communes),
+            "noms": len(self._par_nom),
+            "cles_prefixes": len(self._cles),
+            "cellules": len(self._grille),
+            "departements": len({commune.departement for commune in self.communes}),
+            "autocompletion_cache": self.autocompleter.cache_info()._asdict(),
+        }
+
+
+def ecrire_communes(chemin, communes: Sequence[Commune]):
+    """Écrit des communes au format lu par ReferentielCommunes.charger (compressé si `chemin` finit par .gz)"""
+    tampon = io.StringIO()
+    ecrivain = csv.writer(tampon, delimiter=";", lineterminator="\n")
+    ecrivain.writerow(COLONNES)
+    for commune in sorted(communes, key=lambda commune: (commune.departement, plier(commune.nom))):
+        ecrivain.writerow(commune)
+    contenu = tampon.getvalue().encode("utf-8")
+    if str(chemin).endswith(".gz"):
+        contenu = gzip.compress(contenu, compresslevel=9, mtime=0)
+    with open(chemin, "wb") as fichier:
+        fichier.write(contenu)
+
+
+@lru_cache(maxsize=None)
+def referentiel_communes() -> ReferentielCommunes:
+    """Référentiel partagé, chargé à la première demande (ou au préchauffage)"""
+    return ReferentielCommunes.charger(FICHIER_COMMUNES)
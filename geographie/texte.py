@@ -0,0 +1,19 @@
+import unicodedata
+from functools import lru_cache
+
+# Accents (marques combinantes après décomposition NFKD) supprimés, ponctuation remplacée par
+# des espaces, ligatures développées : « Saint-Étienne » et « saint etienne » se confondent
+_TABLE_PLIAGE = str.maketrans({
+    **{chr(code): None for code in range(0x300, 0x370)},
+    **{caractere: " " for caractere in "-‐–—'’‘`´.,;:/()_\"«»"},
+    "œ": "oe",
+    "æ": "ae",
+})
+_ABREVIATIONS = {"st": "saint", "ste": "sainte", "sts": "saints", "stes": "saintes"}
+
+
+@lru_cache(maxsize=8192)
+def plier(texte: str) -> str:
+    """Forme de comparaison d'un nom de lieu : minuscules, sans accents ni ponctuation"""
+    mots = unicodedata.normalize("NFKD", texte.casefold()).translate(_TABLE_PLIAGE).split()
+    return " ".join(_ABREVIATIONS.get(mot, mot) for mot in mots)
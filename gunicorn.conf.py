@@ -0,0 +1,86 @@
+"""
+Configuration de production multi-workers : gunicorn -c gunicorn.conf.py main:app
+
+L'application est importée une fois par le processus maître (preload) puis héritée par
+les workers uvicorn : grilles compilées, tables calendaires et modules sont partagés en
+copie sur écriture. Les tables calendaires sont en outre projetées depuis un fichier
+commun (TABLES_PARTAGEES) et les métriques agrégées via METRIQUES_REPERTOIRE.
+"""
+import gc
+import os
+import shutil
+import tempfile
+
+
+def coeurs_disponibles() -> int:
+    """Cœurs réellement utilisables : affinité du processus et quota CPU du cgroup (conteneur)"""
+    try:
+        coeurs = len(os.sched_getaffinity(0))
+    except AttributeError:
+        coeurs = os.cpu_count() or 1
+    try:
+        # cgroup v2 : "quota période" ou "max 100000"
+        with open("/sys/fs/cgroup/cpu.max") as fichier:
+            quota, periode = fichier.read().split()
+        if quota != "max":
+            coeurs = min(coeurs, max(1, int(int(quota) / int(periode) + 0.5)))
+    except (OSError, ValueError):
+        pass
+    return coeurs
+
+
+# Lu par gunicorn avant le changement de répertoire (--chdir) : sans import du projet ici
+def _entier_env(nom: str, defaut: int) -> int:
+    valeur = os.getenv(nom)
+    return int(valeur) if valeur else defaut
+
+
+COEURS = coeurs_disponibles()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn_worker.UvicornWorker"
+# Un worker asynchrone par cœur ; WEB_CONCURRENCY pour imposer un nombre
+workers = _entier_env("WEB_CONCURRENCY", COEURS)
+preload_app = True
+
+# Recyclage progressif : chaque worker est remplacé après ~MAX_REQUETES_WORKER requêtes
+# (à ±10 % près pour ne pas les relancer tous ensemble), après avoir fini ses requêtes en cours
+max_requests = _entier_env("MAX_REQUETES_WORKER", 20000)
+max_requests_jitter = max_requests // 10
+graceful_timeout = _entier_env("ARRET_GRACIEUX_SECONDES", 30)
+timeout = _entier_env("DELAI_WORKER_SECONDES", 60)
+keepalive = 5
+
+# Répertoire des fichiers communs aux workers de ce maître, créé au démarrage et supprimé à l'arrêt
+_repertoire = None
+# Processus de compression d'images répartis entre les workers plutôt que cpu_count() chacun
+os.environ.setdefault("COMPRESSION_PROCESSUS", str(max(1, COEURS // workers)))
+
+
+def on_starting(server):
+    global _repertoire
+    _repertoire = tempfile.mkdtemp(prefix="taxi-api-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    os.environ.setdefault("TABLES_PARTAGEES", os.path.join(_repertoire, "tables.bin"))
+    os.environ.setdefault("METRIQUES_REPERTOIRE", os.path.join(_repertoire, "metriques"))
+    if server.cfg.preload_app:
+        # L'application, déjà importée par le maître, adopte les fichiers communs avant le
+        # lancement des workers ; sans préchargement, ceux-ci les trouvent dans l'environnement
+        from calculators.grilles import partager_tables
+        from serveur.metriques import registre
+
+        partager_tables(os.environ["TABLES_PARTAGEES"])
+        registre.repertoire = os.environ["METRIQUES_REPERTOIRE"]
+
+
+def when_ready(server):
+    # Objets créés au préchargement exclus du ramasse-miettes : ses passages ne modifient
+    # plus leurs en-têtes, et les pages restent partagées avec les workers
+    gc.collect()
+    gc.freeze()
+    server.log.info("Workers : %s (cœurs disponibles : %s), tables partagées : %s",
+                    workers, COEURS, os.environ["TABLES_PARTAGEES"])
+
+
+def on_exit(server):
+    if _repertoire:
+        shutil.rmtree(_repertoire, ignore_errors=True)
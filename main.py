@@ -1,6 +1,36 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.gzip import GZipMiddleware
-from routes import health, taxi, cpam, images
+from routes import health, taxi, cpam, communes, images, admin, reprise, metriques, facturation
+from compression.pool import pool_compression
+from serveur.cache_reponses import TAILLE_MIN_GZIP
+from serveur.metriques import registre as registre_metriques, MiddlewareMetriques
+from serveur.profilage import profileur, MiddlewareProfilage
+from serveur.admission import ADMISSION_ACTIVE, controleur_admission, MiddlewareAdmission
+from serveur.taille_corps import MARGE_FORMULAIRE, MiddlewareTailleCorps
+from compression.televersement import OCTETS_MAX, OCTETS_MAX_LOT
+from serveur import openapi
+from calculators import prechauffage, facturation_cpam
+
+
+# --- Cycle de vie ---
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sonde de la boucle d'événements et publication des métriques de ce worker
+    registre_metriques.demarrer()
+    # Caches de calcul amorcés avec les courses les plus fréquentes (PRECHAUFFAGE)
+    if prechauffage.PRECHAUFFAGE_ACTIF:
+        prechauffage.prechauffer()
+    # Schéma OpenAPI relu (ou construit) avant la première requête de documentation
+    app.openapi()
+    yield
+    registre_metriques.arreter()
+    # Arrêt propre des processus de compression d'images
+    pool_compression.arreter()
+    # et des processus de facturation CPAM
+    facturation_cpam.arreter()
+
 
 # --- Initialisation de l'API ---
 
@@ -8,19 +38,48 @@ app = FastAPI(
     title="API Taxi Vendée 2025 + CPAM",
     description="Une API pour calculer les tarifs de taxi en Vendée ET les tarifs de transport sanitaire selon la convention-cadre nationale CPAM 2025. La documentation est générée automatiquement par FastAPI.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Schéma OpenAPI pré-généré à la construction (python -m cli.openapi), s'il est à jour
+openapi.installer(app)
+
 # --- Middlewares pour les performances ---
 
 # Compression GZip pour réduire la taille des réponses (gain ~70%)
-app.add_middleware(GZipMiddleware, minimum_size=500)
+app.add_middleware(GZipMiddleware, minimum_size=TAILLE_MIN_GZIP)
+
+# Envois d'images bornés en octets (COMPRESSION_OCTETS_MAX, COMPRESSION_OCTETS_MAX_LOT) :
+# refus 413 sans lire ni stocker la suite du corps
+app.add_middleware(MiddlewareTailleCorps, limites={
+    "/compresser-image": OCTETS_MAX + MARGE_FORMULAIRE,
+    "/compresser-images": OCTETS_MAX_LOT,
+    "/decliner-image": OCTETS_MAX + MARGE_FORMULAIRE,
+})
+
+# Débits et concurrence par client et par classe de routes, refus 429/503 avant la lecture
+# du corps (ADMISSION=false pour désactiver)
+if ADMISSION_ACTIVE:
+    app.add_middleware(MiddlewareAdmission, controleur=controleur_admission)
+
+# Compteurs et durées des requêtes par route (ajouté après : englobe la compression et les refus)
+app.add_middleware(MiddlewareMetriques)
+
+# Profilage par échantillonnage des requêtes (PROFILAGE=true), le plus à l'extérieur
+if profileur is not None:
+    app.add_middleware(MiddlewareProfilage, profileur=profileur)
 
 # --- Enregistrement des routes ---
 
 app.include_router(health.router, tags=["Santé"])
 app.include_router(taxi.router, tags=["Taxi Vendée"])
 app.include_router(cpam.router, tags=["CPAM Transport Sanitaire"])
+app.include_router(facturation.router, tags=["CPAM Transport Sanitaire"])
+app.include_router(communes.router, tags=["Communes"])
+app.include_router(reprise.router, tags=["Reprise de tarifs"])
 app.include_router(images.router, tags=["Compression d'images"])
+app.include_router(admin.router, tags=["Administration"])
+app.include_router(metriques.router, tags=["Administration"])
 
 
 # Pour lancer l'application en ligne de commande :
@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+
+class CommuneReponse(BaseModel):
+    code_insee: str = Field(..., description="Code officiel géographique (vide si le référentiel ne le fournit pas)")
+    nom: str = Field(..., description="Nom de la commune")
+    departement: str = Field(..., description="Numéro du département")
+    latitude: float = Field(..., description="Latitude (degrés)")
+    longitude: float = Field(..., description="Longitude (degrés)")
+    population: int = Field(..., description="Population (0 si inconnue)")
+
+
+class AutocompletionReponse(BaseModel):
+    communes: List[CommuneReponse] = Field(..., description="Communes proposées, les plus probables d'abord")
+
+
+class CommuneProcheReponse(CommuneReponse):
+    distance_km: float = Field(..., description="Distance à vol d'oiseau du point demandé (km)")
+
+
+class CommunesProchesReponse(BaseModel):
+    communes: List[CommuneProcheReponse] = Field(..., description="Communes de la plus proche à la plus éloignée")
+
+
+class DistanceReponse(BaseModel):
+    depart: CommuneReponse = Field(..., description="Commune de départ reconnue")
+    arrivee: CommuneReponse = Field(..., description="Commune d'arrivée reconnue")
+    distance_vol_oiseau_km: float = Field(..., description="Distance à vol d'oiseau (km)")
+    coefficient_routier: float = Field(..., description="Rapport appliqué pour estimer la distance routière")
+    distance_estimee_km: float = Field(..., description="Distance routière estimée (km)")
@@ -1,7 +1,9 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
+from calculators.calendrier import verifier_date
+from models.taxi import TAILLE_MAX_LOT
 
 
 class TypeTransport(str, Enum):
@@ -10,16 +12,18 @@ class TypeTransport(str, Enum):
 
 
 class CourseCPAMRequete(BaseModel):
-    distance_km: float = Field(..., description="Distance en kilomètres", gt=0)
-    ville_depart: str = Field("", description="Ville de départ")
-    ville_arrivee: str = Field("", description="Ville d'arrivée")
+    distance_km: Optional[float] = Field(None, description="Distance en kilomètres (si absente, estimée à partir des villes de départ et d'arrivée)", gt=0)
+    ville_depart: str = Field("", description="Ville de départ (nom ou code INSEE)")
+    ville_arrivee: str = Field("", description="Ville d'arrivée (nom ou code INSEE)")
     tarif_nuit: bool = Field(False, description="Appliquer tarif nuit/weekend (+50%)")
     date_heure_transport: Optional[datetime] = Field(None, description="Date et heure du transport (optionnel, si tarif_nuit non spécifié)")
     type_transport: TypeTransport = Field(TypeTransport.SIMPLE, description="Type de transport")
     nb_patients: int = Field(1, description="Nombre de patients transportés", ge=1, le=8)
     tpmr: bool = Field(False, description="Transport PMR avec véhicule adapté")
     peages: float = Field(0.0, description="Frais de péage en euros", ge=0)
-    departement: str = Field("85", description="Numéro du département")
+    departement: str = Field("85", description="Numéro du département (si absent, celui de la ville de départ, à défaut 85)")
+
+    _verifier_date_heure_transport = field_validator("date_heure_transport")(verifier_date)
 
 
 class DetailsCPAMReponse(BaseModel):
@@ -46,4 +50,19 @@ class DetailsCPAMReponse(BaseModel):
 
 class CourseCPAMReponse(BaseModel):
     total: float = Field(..., description="Tarif total de la course (€)")
-    details: DetailsCPAMReponse = Field(..., description="Détail complet du calcul CPAM")
\ No newline at end of file
+    details: DetailsCPAMReponse = Field(..., description="Détail complet du calcul CPAM")
+
+
+class LotCoursesCPAMRequete(BaseModel):
+    courses: List[CourseCPAMRequete] = Field(..., description="Transports à calculer", min_length=1, max_length=TAILLE_MAX_LOT)
+
+
+class LotCoursesCPAMReponse(BaseModel):
+    nombre_courses: int = Field(..., description="Nombre de transports calculés")
+    resultats: List[CourseCPAMReponse] = Field(..., description="Résultats dans l'ordre des transports envoyés")
+
+
+class TransportFacturationCPAM(CourseCPAMRequete):
+    patient: str = Field(..., description="Identifiant du patient (une facture par patient)", min_length=1)
+    vehicule: str = Field("", description="Immatriculation ou identifiant du véhicule")
+    date_heure_transport: datetime = Field(..., description="Date et heure du transport, dans le mois facturé")
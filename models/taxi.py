@@ -1,6 +1,10 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+from calculators.calendrier import verifier_date
+
+# Nombre maximal de courses par lot
+TAILLE_MAX_LOT = 50000
 
 
 class CourseRequete(BaseModel):
@@ -12,6 +16,8 @@ class CourseRequete(BaseModel):
     date_heure_depart: Optional[datetime] = Field(None, description="Date et heure de depart (ISO 8601).")
     aller_retour: bool = Field(False, description="Indique s'il s'agit d'un aller-retour.")
 
+    _verifier_date_heure_depart = field_validator("date_heure_depart")(verifier_date)
+
 
 class CourseReponse(BaseModel):
     """
@@ -38,4 +44,19 @@ class EstimationRapideReponse(BaseModel):
     distance_km: float
     aller_retour: bool
     total_estime: float
-    type_tarif: str
\ No newline at end of file
+    type_tarif: str
+
+
+class LotCoursesRequete(BaseModel):
+    """
+    Lot de courses a calculer en une seule requete.
+    """
+    courses: List[CourseRequete] = Field(..., description="Courses a calculer.", min_length=1, max_length=TAILLE_MAX_LOT)
+
+
+class LotCoursesReponse(BaseModel):
+    """
+    Resultats d'un lot de courses, dans l'ordre des courses envoyees.
+    """
+    nombre_courses: int
+    resultats: List[CourseReponse]
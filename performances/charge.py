@@ -0,0 +1,328 @@
+"""
+Génération de charge en boucle ouverte : les requêtes partent à des instants fixés
+d'avance (débit constant ou arrivées de Poisson), qu'elles aient ou non reçu leur
+réponse. La latence est comptée depuis l'instant prévu et non depuis l'envoi effectif :
+une requête retardée par la saturation du serveur, des connexions ou du générateur
+lui-même compte ce retard (correction de l'omission coordonnée).
+"""
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+import httpx
+from performances.histogramme import HistogrammeLatences
+from performances.jeux_images import images_reference
+
+FORMAT_RAPPORT_CHARGE = 1
+# Latence maximale représentable dans les histogrammes (µs)
+LATENCE_MAX_US = 120_000_000
+# Un palier est saturé si le débit obtenu est inférieur à cette part du débit visé...
+PART_DEBIT_MIN = 0.95
+# ... ou si la part de requêtes en erreur la dépasse
+TAUX_ERREURS_MAX = 0.01
+DELAI_DEMARRAGE_SERVEUR = 30.0
+RACINE_PROJET = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Cible(NamedTuple):
+    nom: str
+    methode: str
+    chemin: str
+    # Options httpx de la requête, tirées avec le générateur pseudo-aléatoire
+    options: Callable[[random.Random], dict]
+
+
+def _calculer_tarif(alea: random.Random) -> dict:
+    return {"json": {"distance_km": round(alea.uniform(1, 80), 2), "minutes_attente": alea.choice((0, 5, 10)),
+                     "aller_retour": alea.random() < 0.3}}
+
+
+def _calculer_tarif_cpam(alea: random.Random) -> dict:
+    return {"json": {"distance_km": round(alea.uniform(1, 120), 2), "ville_depart": "La Roche-sur-Yon",
+                     "ville_arrivee": alea.choice(("Nantes", "Les Sables-d'Olonne", "Cholet")),
+                     "type_transport": alea.choice(("simple", "hospitalisation")),
+                     "nb_patients": alea.choice((1, 1, 1, 2, 3)), "departement": "85"}}
+
+
+def _estimation_rapide(alea: random.Random) -> dict:
+    # Distances rondes : comme en production, une bonne part des réponses vient du cache HTTP
+    return {"params": {"distance_km": alea.randint(1, 60), "aller_retour": alea.choice(("true", "false"))}}
+
+
+def _compresser_image(alea: random.Random) -> dict:
+    # Largeur tirée au hasard : la plupart des requêtes sont réellement encodées
+    vignette = images_reference()["vignette"]
+    return {"params": {"max_largeur": alea.randint(64, 640), "effort": 4},
+            "files": {"fichier": ("vignette.jpg", vignette, "image/jpeg")}}
+
+
+CIBLES = {cible.nom: cible for cible in (
+    Cible("calculer-tarif", "POST", "/calculer-tarif", _calculer_tarif),
+    Cible("calculer-tarif-cpam", "POST", "/calculer-tarif-cpam", _calculer_tarif_cpam),
+    Cible("estimation-rapide", "GET", "/estimation-rapide", _estimation_rapide),
+    Cible("compresser-image", "POST", "/compresser-image", _compresser_image),
+)}
+
+
+class Palier(NamedTuple):
+    debit: float  # requêtes par seconde visées
+    duree: float  # secondes
+
+
+class ResultatPalier(NamedTuple):
+    resume: dict
+    # Latences corrigées par cible, et toutes cibles confondues sous la clé "global"
+    histogrammes: Dict[str, HistogrammeLatences]
+
+
+class _Compteurs:
+    """Résultats d'une cible sur un palier"""
+    def __init__(self):
+        self.latences = HistogrammeLatences(LATENCE_MAX_US)  # depuis l'instant prévu
+        self.service = HistogrammeLatences(LATENCE_MAX_US)  # depuis l'envoi effectif
+        self.envoyees = 0
+        self.reussies = 0
+        self.statuts: Dict[str, int] = {}
+
+    def resume(self, duree: float) -> dict:
+        """`duree` : temps écoulé entre le début du palier et la dernière réponse"""
+        erreurs = self.envoyees - self.reussies
+        return {
+            "envoyees": self.envoyees,
+            "reussies": self.reussies,
+            "erreurs": erreurs,
+            "statuts": dict(sorted(self.statuts.items())),
+            "debit": round(self.reussies / duree, 2),
+            "latence_ms": self.latences.resume(),
+            "service_ms": self.service.resume(),
+        }
+
+
+def port_libre(hote: str = "127.0.0.1") -> int:
+    with socket.socket() as sock:
+        sock.bind((hote, 0))
+        return sock.getsockname()[1]
+
+
+class ServeurLocal:
+    """
+    Application lancée sous uvicorn (ou sous gunicorn avec gunicorn.conf.py, comme en
+    production) dans un sous-processus, le temps d'une série de paliers
+    """
+    def __init__(self, workers: int, hote: str = "127.0.0.1", port: Optional[int] = None,
+                 intervalle_sonde: float = 0.1, gunicorn: bool = False):
+        self.workers = workers
+        self.hote = hote
+        self.port = port or port_libre(hote)
+        self.gunicorn = gunicorn
+        # Intervalle d'interrogation de /verifier-sante pendant le démarrage (s)
+        self.intervalle_sonde = intervalle_sonde
+        self._processus: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.hote}:{self.port}"
+
+    def _commande(self) -> List[str]:
+        if self.gunicorn:
+            return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app",
+                    "--bind", f"{self.hote}:{self.port}", "--workers", str(self.workers), "--log-level", "warning"]
+        return [sys.executable, "-m", "uvicorn", "main:app", "--host", self.hote, "--port", str(self.port),
+                "--workers", str(self.workers), "--log-level", "warning", "--no-access-log"]
+
+    def demarrer(self):
+        # Le générateur est un client unique : sans limites par client, sauf ADMISSION explicite
+        environnement = dict(os.environ, ADMISSION=os.environ.get("ADMISSION", "false"))
+        self._processus = subprocess.Popen(self._commande(), cwd=RACINE_PROJET, env=environnement)
+        limite = time.monotonic() + DELAI_DEMARRAGE_SERVEUR
+        while time.monotonic() < limite:
+            if self._processus.poll() is not None:
+                raise RuntimeError(f"Le serveur s'est arrêté au démarrage (code {self._processus.returncode})")
+            try:
+                if httpx.get(f"{self.url}/verifier-sante", timeout=1.0).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(self.intervalle_sonde)
+        self.arreter()
+        raise RuntimeError(f"Le serveur ne répond pas après {DELAI_DEMARRAGE_SERVEUR:.0f} s")
+
+    def arreter(self):
+        if self._processus is None:
+            return
+        self._processus.terminate()
+        try:
+            self._processus.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self._processus.kill()
+            self._processus.wait()
+        self._processus = None
+
+    def __enter__(self):
+        self.demarrer()
+        return self
+
+    def __exit__(self, *exc):
+        self.arreter()
+
+
+class GenerateurCharge:
+    """
+    Envoie un mélange pondéré de requêtes au débit de chaque palier. Un palier n'est clos
+    qu'une fois toutes ses réponses reçues (ou leur délai expiré) : le suivant part d'une
+    file vide, et le débit obtenu est rapporté au temps réellement nécessaire.
+    """
+    def __init__(self, url: str, melange: Dict[str, float], connexions: int = 256,
+                 delai: float = 30.0, poisson: bool = False, graine: int = 1):
+        inconnues = set(melange) - set(CIBLES)
+        if inconnues:
+            raise ValueError(f"Cibles inconnues : {', '.join(sorted(inconnues))}")
+        self.url = url
+        self.cibles = [CIBLES[nom] for nom in melange]
+        self.poids = [melange[nom] for nom in melange]
+        self.connexions = connexions
+        self.delai = delai
+        self.poisson = poisson
+        self.alea = random.Random(graine)
+
+    async def _requete(self, client: httpx.AsyncClient, cible: Cible, options: dict,
+                       prevu: float, compteurs: _Compteurs, retards: HistogrammeLatences):
+        envoi = time.perf_counter()
+        retards.enregistrer(int((envoi - prevu) * 1e6))
+        try:
+            reponse = await client.request(cible.methode, cible.chemin, **options)
+            statut = str(reponse.status_code)
+            reussie = reponse.status_code < 400
+        except httpx.TimeoutException:
+            statut, reussie = "delai", False
+        except httpx.TransportError:
+            statut, reussie = "transport", False
+        fin = time.perf_counter()
+        compteurs.statuts[statut] = compteurs.statuts.get(statut, 0) + 1
+        compteurs.reussies += reussie
+        compteurs.latences.enregistrer(int((fin - prevu) * 1e6))
+        compteurs.service.enregistrer(int((fin - envoi) * 1e6))
+
+    def _intervalles(self, palier: Palier):
+        """Instants d'envoi relatifs au début du palier"""
+        if self.poisson:
+            instant = self.alea.expovariate(palier.debit)
+            while instant < palier.duree:
+                yield instant
+                instant += self.alea.expovariate(palier.debit)
+        else:
+            for numero in range(int(palier.debit * palier.duree)):
+                yield numero / palier.debit
+
+    async def _executer(self, paliers: Sequence[Palier], echauffement: float) -> List[ResultatPalier]:
+        limites = httpx.Limits(max_connections=self.connexions, max_keepalive_connections=self.connexions)
+        # Pas de délai sur l'attente d'une connexion libre : cette attente fait partie de la latence
+        delais = httpx.Timeout(self.delai, pool=None)
+        async with httpx.AsyncClient(base_url=self.url, limits=limites, timeout=delais) as client:
+            if echauffement > 0 and paliers:
+                await self._palier(client, Palier(paliers[0].debit, echauffement))
+            resultats = []
+            for palier in paliers:
+                resultats.append(await self._palier(client, palier))
+            return resultats
+
+    async def _palier(self, client: httpx.AsyncClient, palier: Palier) -> ResultatPalier:
+        compteurs = {cible.nom: _Compteurs() for cible in self.cibles}
+        retards = HistogrammeLatences(LATENCE_MAX_US)
+        taches = []
+        debut = time.perf_counter()
+        for decalage in self._intervalles(palier):
+            prevu = debut + decalage
+            attente = prevu - time.perf_counter()
+            if attente > 0:
+                await asyncio.sleep(attente)
+            cible = self.alea.choices(self.cibles, self.poids)[0]
+            options = cible.options(self.alea)
+            compteurs[cible.nom].envoyees += 1
+            taches.append(asyncio.ensure_future(
+                self._requete(client, cible, options, prevu, compteurs[cible.nom], retards)
+            ))
+        if taches:
+            await asyncio.gather(*taches)
+        return self._resumer(palier, compteurs, retards, time.perf_counter() - debut)
+
+    @staticmethod
+    def _resumer(palier: Palier, compteurs: Dict[str, _Compteurs], retards: HistogrammeLatences,
+                 duree_reelle: float) -> ResultatPalier:
+        ensemble = _Compteurs()
+        for compteur in compteurs.values():
+            ensemble.latences.fusionner(compteur.latences)
+            ensemble.service.fusionner(compteur.service)
+            ensemble.envoyees += compteur.envoyees
+            ensemble.reussies += compteur.reussies
+            for statut, nombre in compteur.statuts.items():
+                ensemble.statuts[statut] = ensemble.statuts.get(statut, 0) + nombre
+        duree = max(palier.duree, duree_reelle)
+        global_ = ensemble.resume(duree)
+        saturation = []
+        if global_["debit"] < PART_DEBIT_MIN * palier.debit:
+            saturation.append("debit")
+        if ensemble.envoyees and global_["erreurs"] / ensemble.envoyees > TAUX_ERREURS_MAX:
+            saturation.append("erreurs")
+        histogrammes = {nom: compteur.latences for nom, compteur in compteurs.items()}
+        histogrammes["global"] = ensemble.latences
+        return ResultatPalier(
+            {
+                "debit_vise": palier.debit,
+                "duree_s": palier.duree,
+                # Au-delà de la durée du palier si une file s'est formée
+                "duree_reelle_s": round(duree_reelle, 3),
+                "global": global_,
+                # Retard des envois sur leur instant prévu : s'il croît, le générateur est le goulot
+                "retard_generateur_ms": retards.resume(),
+                "saturation": saturation,
+                "cibles": {nom: compteur.resume(duree) for nom, compteur in compteurs.items()},
+            },
+            histogrammes
+        )
+
+    def executer(self, paliers: Sequence[Palier], echauffement: float = 0.0) -> List[ResultatPalier]:
+        """Exécute les paliers, précédés de `echauffement` secondes non comptées au premier débit"""
+        return asyncio.run(self._executer(paliers, echauffement))
+
+
+def genou(resultats: Sequence[dict], slo_p99_ms: Optional[float] = None) -> Optional[float]:
+    """
+    Plus haut débit tenu avant le premier palier saturé (débit non atteint, erreurs ou,
+    si `slo_p99_ms` est donné, p99 corrigé au-delà) ; None si le premier palier l'est déjà.
+    """
+    tenu = None
+    for resultat in resultats:
+        sature = bool(resultat["saturation"])
+        if slo_p99_ms is not None and resultat["global"]["latence_ms"]["p99"] > slo_p99_ms:
+            sature = True
+        if sature:
+            break
+        tenu = resultat["debit_vise"]
+    return tenu
+
+
+def rampe(debut: float, fin: float, pas: float, duree: float) -> List[Palier]:
+    if debut <= 0 or pas <= 0 or fin < debut:
+        raise ValueError("Rampe invalide : il faut 0 < début <= fin et un pas > 0")
+    paliers = []
+    debit = debut
+    while debit <= fin + 1e-9:
+        paliers.append(Palier(debit, duree))
+        debit += pas
+    return paliers
+
+
+def rapport_charge(series: List[dict], configuration: dict, environnement: dict) -> dict:
+    return {
+        "format": FORMAT_RAPPORT_CHARGE,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "environnement": environnement,
+        "configuration": configuration,
+        "series": series,
+    }
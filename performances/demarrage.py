@@ -0,0 +1,148 @@
+"""
+Démarrage à froid : temps d'import de l'application (python -X importtime, dans un
+interpréteur neuf) et délais jusqu'aux premières réponses d'un serveur uvicorn
+fraîchement lancé. Chaque mesure est répétée et la médiane retenue.
+"""
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, NamedTuple
+import httpx
+from performances.charge import CIBLES, RACINE_PROJET, Cible, ServeurLocal
+from performances.suite import Regression, TOLERANCE_DEFAUT, environnement
+
+FORMAT_RAPPORT_DEMARRAGE = 1
+# Interrogation de /verifier-sante pendant le démarrage : assez fine pour le mesurer
+INTERVALLE_SONDE = 0.005
+# Écart absolu en deçà duquel une différence de durée est tenue pour du bruit
+ECART_MIN_MS = 5.0
+# Modules et paquets les plus coûteux retenus dans le rapport
+MODULES_RAPPORT = 15
+
+# Requêtes chronométrées, dans cet ordre, sur le serveur fraîchement démarré
+PREMIERES_REQUETES = [CIBLES[nom] for nom in ("calculer-tarif", "calculer-tarif-cpam", "estimation-rapide")] + [
+    Cible("openapi", "GET", "/openapi.json", lambda alea: {}),
+    CIBLES["compresser-image"],
+]
+
+
+class ImportModule(NamedTuple):
+    module: str
+    propre_us: int  # import du module seul
+    cumule_us: int  # avec les modules qu'il importe
+
+
+def analyser_importtime(sortie: str) -> List[ImportModule]:
+    """Lignes « import time: propre | cumulé | module » de python -X importtime"""
+    modules = []
+    for ligne in sortie.splitlines():
+        if not ligne.startswith("import time:"):
+            continue
+        propre, cumule, module = ligne[len("import time:"):].split("|")
+        if not propre.strip().isdigit():
+            continue  # en-tête
+        modules.append(ImportModule(module.strip(), int(propre), int(cumule)))
+    return modules
+
+
+def mesurer_import(module: str = "main") -> dict:
+    """Temps d'import de `module` et des paquets qu'il charge, dans un interpréteur neuf"""
+    processus = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=RACINE_PROJET, capture_output=True, text=True, check=True
+    )
+    modules = analyser_importtime(processus.stderr)
+    par_paquet: Dict[str, int] = defaultdict(int)
+    for importe in modules:
+        par_paquet[importe.module.split(".")[0]] += importe.propre_us
+    total = next(importe.cumule_us for importe in reversed(modules) if importe.module == module)
+    return {
+        "total_ms": total / 1000,
+        "modules": len(modules),
+        "paquets_ms": {nom: duree / 1000 for nom, duree in par_paquet.items()},
+    }
+
+
+def mesurer_serveur() -> dict:
+    """
+    Délai entre le lancement d'uvicorn et sa première réponse à /verifier-sante (import,
+    cycle de vie compris), puis durées de la première et de la seconde requête de chaque cible.
+    """
+    alea = random.Random(1)
+    serveur = ServeurLocal(1, intervalle_sonde=INTERVALLE_SONDE)
+    debut = time.perf_counter()
+    serveur.demarrer()
+    try:
+        pret_ms = (time.perf_counter() - debut) * 1000
+        requetes = {}
+        with httpx.Client(base_url=serveur.url, timeout=60.0) as client:
+            for cible in PREMIERES_REQUETES:
+                durees = []
+                for _ in range(2):
+                    debut = time.perf_counter()
+                    reponse = client.request(cible.methode, cible.chemin, **cible.options(alea))
+                    durees.append((time.perf_counter() - debut) * 1000)
+                    reponse.raise_for_status()
+                requetes[cible.nom] = {"premiere_ms": durees[0], "seconde_ms": durees[1]}
+    finally:
+        serveur.arreter()
+    return {"pret_ms": pret_ms, "requetes": requetes}
+
+
+def _mediane(mesures: List[dict]) -> dict:
+    """Médiane, clé par clé, de mesures de même structure"""
+    premiere = mesures[0]
+    if isinstance(premiere, dict):
+        return {cle: _mediane([mesure[cle] for mesure in mesures if cle in mesure]) for cle in premiere}
+    if isinstance(premiere, float):
+        return round(statistics.median(mesures), 3)
+    return premiere
+
+
+def executer_demarrage(repetitions: int = 5, progression=None) -> dict:
+    imports, serveurs = [], []
+    for numero in range(repetitions + 1):
+        # Premier passage non compté : compilation des .pyc, caches disque froids
+        mesure_import, mesure_serveur = mesurer_import(), mesurer_serveur()
+        if numero:
+            imports.append(mesure_import)
+            serveurs.append(mesure_serveur)
+        if progression:
+            progression(numero, repetitions)
+    mesures_import = _mediane(imports)
+    paquets = sorted(mesures_import["paquets_ms"].items(), key=lambda paquet: -paquet[1])
+    mesures_import["paquets_ms"] = dict(paquets[:MODULES_RAPPORT])
+    return {
+        "format": FORMAT_RAPPORT_DEMARRAGE,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "environnement": dict(environnement(), prechauffage=os.environ.get("PRECHAUFFAGE", "")),
+        "repetitions": repetitions,
+        "import": mesures_import,
+        "serveur": _mediane(serveurs),
+    }
+
+
+def _indicateurs(rapport: dict) -> Dict[str, float]:
+    indicateurs = {"import.total_ms": rapport["import"]["total_ms"], "serveur.pret_ms": rapport["serveur"]["pret_ms"]}
+    for nom, durees in rapport["serveur"]["requetes"].items():
+        indicateurs[f"{nom}.premiere_ms"] = durees["premiere_ms"]
+    return indicateurs
+
+
+def comparer_demarrage(rapport: dict, reference: dict, tolerance: float = TOLERANCE_DEFAUT) -> List[Regression]:
+    """Durées de démarrage dégradées de plus de `tolerance` (et de plus de ECART_MIN_MS)"""
+    regressions = []
+    indicateurs_reference = _indicateurs(reference)
+    for nom, valeur in _indicateurs(rapport).items():
+        valeur_reference = indicateurs_reference.get(nom)
+        if valeur_reference is None:
+            continue
+        if valeur > valeur_reference * (1 + tolerance) and valeur - valeur_reference > ECART_MIN_MS:
+            groupe, indicateur = nom.split(".")
+            regressions.append(Regression(groupe, indicateur, valeur_reference, valeur))
+    return regressions
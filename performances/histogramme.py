@@ -0,0 +1,118 @@
+import math
+from typing import Iterator, Tuple
+import numpy as np
+
+# Précision relative : 2**BITS_SOUS_SEAUX sous-seaux par puissance de deux, soit une
+# erreur de moins de 0,1 % sur toute la plage (trois chiffres significatifs)
+BITS_SOUS_SEAUX = 11
+# Demi-distances à 100 % découpées en autant de paliers dans l'export (comme HdrHistogram)
+PALIERS_PAR_DEMI_DISTANCE = 5
+
+
+class HistogrammeLatences:
+    """
+    Histogramme à précision relative constante, sur le modèle de HdrHistogram : les
+    valeurs entières (µs) sont rangées dans des seaux dont la largeur double à chaque
+    puissance de deux, découpés en sous-seaux égaux. Taille fixe, enregistrement en
+    temps constant, centiles exacts à la précision près.
+    """
+    def __init__(self, valeur_max: int):
+        self.valeur_max = valeur_max
+        self._sous_seaux = 1 << BITS_SOUS_SEAUX
+        self._moitie = self._sous_seaux >> 1
+        self.comptes = np.zeros(self._indice(valeur_max) + 1, dtype=np.int64)
+        self.total = 0
+        self.somme = 0
+        self.somme_carres = 0
+        self.maximum = 0
+        self.hors_plage = 0  # valeurs écrêtées à valeur_max
+
+    def _indice(self, valeur: int) -> int:
+        seau = max(0, valeur.bit_length() - BITS_SOUS_SEAUX)
+        return seau * self._moitie + (valeur >> seau)
+
+    def _bornes(self, indice: int) -> Tuple[int, int]:
+        """Plus petite et plus grande valeur rangées à cet indice"""
+        if indice < self._sous_seaux:
+            return indice, indice
+        seau = indice // self._moitie - 1
+        bas = (indice - seau * self._moitie) << seau
+        return bas, bas + (1 << seau) - 1
+
+    def enregistrer(self, valeur: int):
+        valeur = max(0, int(valeur))
+        if valeur > self.valeur_max:
+            self.hors_plage += 1
+            valeur = self.valeur_max
+        self.comptes[self._indice(valeur)] += 1
+        self.total += 1
+        self.somme += valeur
+        self.somme_carres += valeur * valeur
+        self.maximum = max(self.maximum, valeur)
+
+    def fusionner(self, autre: "HistogrammeLatences"):
+        if autre.valeur_max != self.valeur_max:
+            raise ValueError("Histogrammes de plages différentes")
+        self.comptes += autre.comptes
+        self.total += autre.total
+        self.somme += autre.somme
+        self.somme_carres += autre.somme_carres
+        self.maximum = max(self.maximum, autre.maximum)
+        self.hors_plage += autre.hors_plage
+
+    @property
+    def moyenne(self) -> float:
+        return self.somme / self.total if self.total else 0.0
+
+    @property
+    def ecart_type(self) -> float:
+        if not self.total:
+            return 0.0
+        return math.sqrt(max(0.0, self.somme_carres / self.total - self.moyenne ** 2))
+
+    def centile(self, p: float) -> int:
+        """Plus petite valeur (à la précision près, borne haute) dont le rang atteint p %"""
+        if not self.total:
+            return 0
+        rang = max(1, math.ceil(p / 100 * self.total))
+        indice = int(np.searchsorted(np.cumsum(self.comptes), rang))
+        return min(self._bornes(indice)[1], self.maximum)
+
+    def _centiles_export(self) -> Iterator[float]:
+        """Centiles de plus en plus resserrés vers 100 %, comme HdrHistogram"""
+        p = 0.0
+        # Au-delà, l'écart à 100 % est inférieur à une seule valeur enregistrée
+        resolution = 100.0 / max(self.total, 1)
+        while 100.0 - p >= resolution:
+            yield p
+            demi_distances = int(math.log2(100.0 / (100.0 - p))) + 1
+            p += 100.0 / (PALIERS_PAR_DEMI_DISTANCE * 2 ** demi_distances)
+        yield 100.0
+
+    def exporter_hgrm(self, echelle: float = 1000.0) -> str:
+        """
+        Distribution au format texte de HdrHistogram (.hgrm), lisible par ses outils de
+        tracé ; les valeurs sont divisées par `echelle` (µs -> ms par défaut).
+        """
+        lignes = [f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}", ""]
+        cumul = np.cumsum(self.comptes)
+        for p in self._centiles_export():
+            valeur = self.centile(p)
+            compte = int(cumul[self._indice(min(valeur, self.valeur_max))]) if self.total else 0
+            inverse = f"{1 / (1 - p / 100):14.2f}" if p < 100.0 else f"{'inf':>14}"
+            lignes.append(f"{valeur / echelle:12.3f} {p / 100:14.12f} {compte:10d} {inverse}")
+        lignes.append(f"#[Mean    = {self.moyenne / echelle:12.3f}, StdDeviation   = {self.ecart_type / echelle:12.3f}]")
+        lignes.append(f"#[Max     = {self.maximum / echelle:12.3f}, Total count    = {self.total:12d}]")
+        lignes.append(f"#[Buckets = {len(self.comptes) // self._moitie - 1:12d}, SubBuckets     = {self._sous_seaux:12d}]")
+        return "\n".join(lignes) + "\n"
+
+    def resume(self, echelle: float = 1000.0) -> dict:
+        """Centiles usuels, en ms par défaut"""
+        return {
+            "p50": self.centile(50) / echelle,
+            "p90": self.centile(90) / echelle,
+            "p99": self.centile(99) / echelle,
+            "p999": self.centile(99.9) / echelle,
+            "max": self.maximum / echelle,
+            "moyenne": round(self.moyenne / echelle, 3),
+        }
@@ -0,0 +1,62 @@
+"""
+Images de référence des mesures de compression, générées de façon déterministe
+(pas de fichier binaire dans le dépôt, pas de téléchargement) : une photo haute
+résolution avec orientation EXIF, une vignette JPEG et un PNG transparent.
+"""
+import io
+from functools import lru_cache
+from typing import Dict
+import numpy as np
+from PIL import Image
+
+# Balise EXIF Orientation
+_BALISE_ORIENTATION = 0x0112
+
+
+def _scene(largeur: int, hauteur: int, graine: int) -> np.ndarray:
+    """Dégradés, motifs périodiques et grain : un contenu proche d'une photo pour l'encodeur"""
+    generateur = np.random.default_rng(graine)
+    y, x = np.mgrid[0:hauteur, 0:largeur].astype(np.float32)
+    x /= largeur
+    y /= hauteur
+    canaux = []
+    for phase in (0.0, 2.1, 4.2):
+        canal = (
+            110 + 70 * np.sin(6.0 * x + phase) * np.cos(4.0 * y - phase)
+            + 40 * np.sin(90.0 * x * y + phase)
+            + generateur.normal(0, 9, (hauteur, largeur))
+        )
+        canaux.append(canal)
+    return np.clip(np.stack(canaux, axis=-1), 0, 255).astype(np.uint8)
+
+
+def _jpeg(largeur: int, hauteur: int, graine: int, orientation: int = 1) -> bytes:
+    image = Image.fromarray(_scene(largeur, hauteur, graine), "RGB")
+    exif = Image.Exif()
+    if orientation != 1:
+        exif[_BALISE_ORIENTATION] = orientation
+    tampon = io.BytesIO()
+    image.save(tampon, format="JPEG", quality=90, exif=exif.tobytes())
+    return tampon.getvalue()
+
+
+def _png_transparent(largeur: int, hauteur: int, graine: int) -> bytes:
+    pixels = _scene(largeur, hauteur, graine)
+    y, x = np.mgrid[0:hauteur, 0:largeur]
+    # Disque opaque aux bords adoucis sur fond transparent (logo détouré)
+    rayon = np.hypot(x - largeur / 2, y - hauteur / 2) / (min(largeur, hauteur) / 2)
+    alpha = np.clip((1.0 - rayon) * 4 * 255, 0, 255).astype(np.uint8)
+    image = Image.fromarray(np.dstack([pixels, alpha]), "RGBA")
+    tampon = io.BytesIO()
+    image.save(tampon, format="PNG")
+    return tampon.getvalue()
+
+
+@lru_cache(maxsize=None)
+def images_reference() -> Dict[str, bytes]:
+    return {
+        # Photo de smartphone 6 Mpx tenue en portrait (rotation d'un quart de tour à l'affichage)
+        "photo": _jpeg(3000, 2000, graine=1, orientation=6),
+        "vignette": _jpeg(640, 480, graine=2),
+        "logo": _png_transparent(800, 600, graine=3),
+    }
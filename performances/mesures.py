@@ -0,0 +1,187 @@
+import ctypes
+import gc
+import inspect
+import time
+import tracemalloc
+from typing import Awaitable, Callable, List, NamedTuple, Sequence, Union
+
+# Appel mesuré : fonction sans argument, synchrone ou coroutine
+Appel = Callable[[], Union[object, Awaitable[object]]]
+
+
+class Mesure(NamedTuple):
+    iterations: int
+    p50_us: float
+    p95_us: float
+    p99_us: float
+    moyenne_us: float
+    max_us: float
+    octets_retenus_par_appel: float  # mémoire conservée après l'appel (caches, fuites)
+    pic_octets: int  # pic médian d'allocation pendant un appel
+    pic_rss_octets: int  # pic médian de mémoire résidente ajoutée par un appel, allocations natives comprises (0 si non mesurable)
+
+
+def centile(durees_triees: Sequence[float], p: float) -> float:
+    """Centile p (0-100) par interpolation linéaire entre les rangs encadrants"""
+    if not durees_triees:
+        return 0.0
+    rang = (len(durees_triees) - 1) * p / 100
+    bas = int(rang)
+    haut = min(bas + 1, len(durees_triees) - 1)
+    return durees_triees[bas] + (durees_triees[haut] - durees_triees[bas]) * (rang - bas)
+
+
+async def _chronometrer_async(appel: Appel, iterations: int) -> List[int]:
+    durees = []
+    horloge = time.perf_counter_ns
+    for _ in range(iterations):
+        debut = horloge()
+        await appel()
+        durees.append(horloge() - debut)
+    return durees
+
+
+def _chronometrer(appel: Appel, iterations: int, executer) -> List[int]:
+    if executer is not None:
+        return executer(_chronometrer_async(appel, iterations))
+    durees = []
+    horloge = time.perf_counter_ns
+    for _ in range(iterations):
+        debut = horloge()
+        appel()
+        durees.append(horloge() - debut)
+    return durees
+
+
+_malloc_trim = None
+
+
+def _lire_status(champ: str) -> int:
+    """Valeur en octets d'un champ (VmRSS, VmHWM) de /proc/self/status"""
+    with open("/proc/self/status", "rb") as status:
+        for ligne in status:
+            if ligne.startswith(champ.encode()):
+                return int(ligne.split()[1]) * 1024
+    raise OSError(f"{champ} absent de /proc/self/status")
+
+
+def _liberer_tas():
+    """Rend au système la mémoire libre conservée par malloc (glibc), pour partir de la mémoire réellement utilisée"""
+    global _malloc_trim
+    if _malloc_trim is None:
+        try:
+            _malloc_trim = ctypes.CDLL("libc.so.6").malloc_trim
+        except (OSError, AttributeError):
+            _malloc_trim = False
+    if _malloc_trim:
+        _malloc_trim(0)
+
+
+def _reinitialiser_pic_rss() -> bool:
+    """Ramène le pic de mémoire résidente (VmHWM) à la valeur courante (Linux >= 4.0)"""
+    _liberer_tas()
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+async def _pics_rss_async(appel: Appel, iterations: int) -> List[int]:
+    pics = []
+    for _ in range(iterations):
+        _reinitialiser_pic_rss()
+        avant = _lire_status("VmRSS")
+        await appel()
+        pics.append(_lire_status("VmHWM") - avant)
+    return pics
+
+
+def _pics_rss(appel: Appel, iterations: int, executer) -> List[int]:
+    """
+    Pic de mémoire résidente de chaque appel au-delà de celle d'avant l'appel : contrairement
+    à tracemalloc, compte les tampons natifs (pixels décodés par Pillow, encodeurs)
+    """
+    if not _reinitialiser_pic_rss():
+        return []
+    if executer is not None:
+        return executer(_pics_rss_async(appel, iterations))
+    pics = []
+    for _ in range(iterations):
+        _reinitialiser_pic_rss()
+        avant = _lire_status("VmRSS")
+        appel()
+        pics.append(_lire_status("VmHWM") - avant)
+    return pics
+
+
+async def _allouer_async(appel: Appel, iterations: int) -> List[int]:
+    pics = []
+    for _ in range(iterations):
+        avant = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        await appel()
+        pics.append(tracemalloc.get_traced_memory()[1] - avant)
+    return pics
+
+
+def _allouer(appel: Appel, iterations: int, executer) -> List[int]:
+    if executer is not None:
+        return executer(_allouer_async(appel, iterations))
+    pics = []
+    for _ in range(iterations):
+        avant = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        appel()
+        pics.append(tracemalloc.get_traced_memory()[1] - avant)
+    return pics
+
+
+def mesurer(appel: Appel, iterations: int, echauffement: int, iterations_memoire: int,
+            executer: Callable[[Awaitable], object] = None) -> Mesure:
+    """
+    Mesure `appel` : `echauffement` appels non comptés, puis `iterations` appels
+    chronométrés un à un, puis `iterations_memoire` appels sous tracemalloc (qui
+    ralentit fortement l'exécution, d'où une passe séparée) et autant pour le pic de
+    mémoire résidente. Une coroutine est exécutée par `executer` (run_until_complete
+    d'une boucle d'événements).
+    """
+    if inspect.iscoroutinefunction(appel) and executer is None:
+        raise ValueError("Un appel asynchrone nécessite une boucle d'événements (executer)")
+
+    _chronometrer(appel, echauffement, executer)
+    gc.collect()
+    durees = sorted(duree / 1000 for duree in _chronometrer(appel, iterations, executer))
+
+    retenus = 0.0
+    pic = 0
+    if iterations_memoire:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            depart = tracemalloc.get_traced_memory()[0]
+            pics = sorted(_allouer(appel, iterations_memoire, executer))
+            retenus = (tracemalloc.get_traced_memory()[0] - depart) / iterations_memoire
+        finally:
+            tracemalloc.stop()
+        pic = pics[len(pics) // 2]
+
+    pic_rss = 0
+    if iterations_memoire:
+        gc.collect()
+        pics_rss = sorted(_pics_rss(appel, iterations_memoire, executer))
+        if pics_rss:
+            pic_rss = pics_rss[len(pics_rss) // 2]
+
+    return Mesure(
+        iterations=iterations,
+        p50_us=round(centile(durees, 50), 2),
+        p95_us=round(centile(durees, 95), 2),
+        p99_us=round(centile(durees, 99), 2),
+        moyenne_us=round(sum(durees) / len(durees), 2),
+        max_us=round(durees[-1], 2),
+        octets_retenus_par_appel=round(retenus, 1),
+        pic_octets=pic,
+        pic_rss_octets=pic_rss
+    )
@@ -0,0 +1,220 @@
+import asyncio
+import atexit
+import itertools
+import os
+import tempfile
+from datetime import datetime
+from typing import Callable, NamedTuple, Optional
+import numpy as np
+from performances.jeux_images import images_reference
+from performances.mesures import Appel
+
+# Départ un mercredi après-midi : tarif de jour, sans jour férié
+DATE_REFERENCE = datetime(2025, 3, 12, 14, 30)
+# Valeurs distinctes parcourues par les scénarios « varie » (au-delà de la taille des caches)
+NOMBRE_VALEURS_VARIEES = 4096
+
+
+class ContexteMesures:
+    """
+    Ressources partagées par les scénarios : boucle d'événements et client HTTP
+    branché directement sur l'application ASGI (aucune socket, aucun serveur).
+    """
+    def __init__(self):
+        self._boucle: Optional[asyncio.AbstractEventLoop] = None
+        self._client = None
+
+    @property
+    def boucle(self) -> asyncio.AbstractEventLoop:
+        if self._boucle is None:
+            self._boucle = asyncio.new_event_loop()
+        return self._boucle
+
+    def executer(self, coroutine):
+        return self.boucle.run_until_complete(coroutine)
+
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx
+            # Toutes les requêtes viennent d'un même client : pas de limites de débit par client
+            os.environ.setdefault("ADMISSION", "false")
+            from main import app
+            self._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://mesures")
+        return self._client
+
+    def fermer(self):
+        if self._client is not None:
+            from compression.pool import pool_compression
+            self.executer(self._client.aclose())
+            self._client = None
+            pool_compression.arreter()
+        if self._boucle is not None:
+            self._boucle.close()
+            self._boucle = None
+
+
+class Scenario(NamedTuple):
+    nom: str
+    categorie: str
+    iterations: int
+    preparer: Callable[[ContexteMesures], Appel]
+    asynchrone: bool = False
+
+
+def _valeurs_variees(graine: int, bas: float, haut: float):
+    generateur = np.random.default_rng(graine)
+    return itertools.cycle(generateur.uniform(bas, haut, NOMBRE_VALEURS_VARIEES).round(2).tolist())
+
+
+# --- Calculateurs ---
+
+def _taxi_cache(_contexte):
+    from calculators.taxi_calculator import CalculateurTarifsTaxi
+    calculateur = CalculateurTarifsTaxi()
+    return lambda: calculateur.calculer_tarif_course(25.5, 5, DATE_REFERENCE, True)
+
+
+def _taxi_varie(_contexte):
+    from calculators.taxi_calculator import CalculateurTarifsTaxi
+    calculateur = CalculateurTarifsTaxi()
+    distances = _valeurs_variees(1, 1, 80)
+    return lambda: calculateur.calculer_tarif_course(next(distances), 5, DATE_REFERENCE, False)
+
+
+def _taxi_lot(_contexte):
+    from calculators.taxi_calculator import CalculateurTarifsTaxi
+    calculateur = CalculateurTarifsTaxi()
+    distances = list(itertools.islice(_valeurs_variees(2, 1, 80), 1000))
+    attentes = [5.0] * len(distances)
+    dates = [DATE_REFERENCE] * len(distances)
+    allers_retours = [numero % 2 == 0 for numero in range(len(distances))]
+    return lambda: calculateur.calculer_tarifs_lot(distances, attentes, dates, allers_retours)
+
+
+def _cpam_cache(_contexte):
+    from calculators.cpam_calculator import CalculateurTarifsCPAM
+    from models.cpam import TypeTransport
+    calculateur = CalculateurTarifsCPAM("85")
+    return lambda: calculateur.calculer_tarif_cpam(
+        30.0, "La Roche-sur-Yon", "Nantes", False, DATE_REFERENCE, TypeTransport.SIMPLE, 2, True, 5.5
+    )
+
+
+def _cpam_varie(_contexte):
+    from calculators.cpam_calculator import CalculateurTarifsCPAM
+    from models.cpam import TypeTransport
+    calculateur = CalculateurTarifsCPAM("85")
+    distances = _valeurs_variees(3, 1, 120)
+    return lambda: calculateur.calculer_tarif_cpam(
+        next(distances), "La Roche-sur-Yon", "Nantes", False, DATE_REFERENCE, TypeTransport.HOSPITALISATION
+    )
+
+
+def _facturation_cpam(taille: int):
+    """Facturation d'un mois de transports, tarifés dans le processus courant (sans pool)"""
+    def preparer(_contexte):
+        from calculators.facturation_cpam import facturer_mois
+        distances = list(itertools.islice(_valeurs_variees(5, 1, 120), taille))
+        types = ("simple", "hospitalisation")
+        enregistrements = [
+            (numero, dict(_COURSE_CPAM, distance_km=distance, patient=f"P{numero % 500:04d}", vehicule=f"V{numero % 12:02d}",
+                          type_transport=types[numero % len(types)], nb_patients=1 + numero % 2,
+                          date_heure_transport=DATE_REFERENCE.replace(day=1 + numero % 28).isoformat()))
+            for numero, distance in enumerate(distances, start=2)
+        ]
+        return lambda: facturer_mois(enregistrements, "2025-03", lignes=False, processus=1)
+    return preparer
+
+
+# --- Routes, via le transport ASGI ---
+
+def _requete(methode: str, chemin: str, **options):
+    def preparer(contexte: ContexteMesures):
+        client = contexte.client
+
+        async def appel():
+            reponse = await client.request(methode, chemin, **options)
+            reponse.raise_for_status()
+        return appel
+    return preparer
+
+
+_COURSE_TAXI = {"distance_km": 25.5, "minutes_attente": 5, "aller_retour": True,
+                "date_heure_depart": DATE_REFERENCE.isoformat()}
+_COURSE_CPAM = {"distance_km": 30.0, "ville_depart": "La Roche-sur-Yon", "ville_arrivee": "Nantes",
+                "date_heure_transport": DATE_REFERENCE.isoformat(), "type_transport": "simple",
+                "nb_patients": 2, "tpmr": True, "peages": 5.5, "departement": "85"}
+
+
+def _lot_taxi_json(taille: int) -> dict:
+    distances = itertools.islice(_valeurs_variees(4, 1, 80), taille)
+    return {"courses": [dict(_COURSE_TAXI, distance_km=distance) for distance in distances]}
+
+
+def _compresser_image(contexte: ContexteMesures):
+    # Même image à chaque appel : après l'échauffement, la réponse vient du cache d'images
+    return _requete(
+        "POST", "/compresser-image",
+        files={"fichier": ("vignette.jpg", images_reference()["vignette"], "image/jpeg")}
+    )(contexte)
+
+
+# --- Pipeline d'images, dans le processus courant (sans pool) ---
+
+def _image(nom_image: str, *parametres):
+    def preparer(_contexte):
+        from compression.pipeline import compresser_webp
+        contenu = images_reference()[nom_image]
+        return lambda: compresser_webp(contenu, *parametres)
+    return preparer
+
+
+def _image_fichier(nom_image: str, *parametres):
+    """Image décodée depuis un fichier, comme un envoi volumineux reçu dans un fichier temporaire"""
+    def preparer(_contexte):
+        from compression.pipeline import compresser_webp
+        with tempfile.NamedTemporaryFile(prefix="taxi-image-", suffix=".jpg", delete=False) as fichier:
+            fichier.write(images_reference()[nom_image])
+        atexit.register(os.unlink, fichier.name)
+        return lambda: compresser_webp(fichier.name, *parametres)
+    return preparer
+
+
+def _declinaisons(nom_image: str, textes, effort: int):
+    """Plusieurs déclinaisons WebP d'une image en un seul décodage"""
+    def preparer(_contexte):
+        from compression.declinaisons import analyser_declinaison, decliner_image
+        contenu = images_reference()[nom_image]
+        declinaisons = [analyser_declinaison(texte)._replace(format="webp", qualite=80) for texte in textes]
+        return lambda: decliner_image(contenu, declinaisons, effort)
+    return preparer
+
+
+SCENARIOS = (
+    Scenario("calculs.taxi_cache", "calculs", 20000, _taxi_cache),
+    Scenario("calculs.taxi_varie", "calculs", 20000, _taxi_varie),
+    Scenario("calculs.taxi_lot_1000", "calculs", 100, _taxi_lot),
+    Scenario("calculs.cpam_cache", "calculs", 20000, _cpam_cache),
+    Scenario("calculs.cpam_varie", "calculs", 20000, _cpam_varie),
+    Scenario("calculs.facturation_cpam_10000", "calculs", 5, _facturation_cpam(10000)),
+    Scenario("asgi.verifier_sante", "asgi", 2000, _requete("GET", "/verifier-sante"), True),
+    Scenario("asgi.calculer_tarif", "asgi", 2000, _requete("POST", "/calculer-tarif", json=_COURSE_TAXI), True),
+    Scenario("asgi.calculer_tarif_cpam", "asgi", 2000,
+             _requete("POST", "/calculer-tarif-cpam", json=_COURSE_CPAM), True),
+    Scenario("asgi.calculer_tarifs_lot_100", "asgi", 200,
+             _requete("POST", "/calculer-tarifs-lot", json=_lot_taxi_json(100)), True),
+    Scenario("asgi.tarifs", "asgi", 2000, _requete("GET", "/tarifs"), True),
+    Scenario("asgi.estimation_rapide", "asgi", 2000,
+             _requete("GET", "/estimation-rapide", params={"distance_km": 12.5, "aller_retour": "true"}), True),
+    Scenario("asgi.compresser_image_cache", "asgi", 500, _compresser_image, True),
+    Scenario("images.photo_reduite", "images", 20, _image("photo", 80, 1280, 1280, None, 4)),
+    Scenario("images.photo_fichier", "images", 20, _image_fichier("photo", 80, 1280, 1280, None, 4)),
+    Scenario("images.vignette", "images", 30, _image("vignette", 80)),
+    Scenario("images.logo_transparent", "images", 20, _image("logo", 80, None, None, None, 4)),
+    Scenario("images.taille_cible", "images", 10, _image("photo", 85, 1600, 1600, 80, 4)),
+    Scenario("images.declinaisons", "images", 10,
+             _declinaisons("photo", ("vignette:320x320", "apercu:1280x1280"), 4)),
+)
+
+CATEGORIES = ("calculs", "asgi", "images")
@@ -0,0 +1,125 @@
+import fnmatch
+import os
+import platform
+from datetime import datetime
+from typing import Callable, Iterable, List, NamedTuple, Optional
+from performances.mesures import mesurer
+from performances.scenarios import SCENARIOS, CATEGORIES, ContexteMesures
+
+# Version du format des rapports JSON
+FORMAT_RAPPORT = 1
+# Passe tracemalloc : nombre maximal d'appels mesurés
+ITERATIONS_MEMOIRE_MAX = 200
+# Écart relatif toléré par rapport à la référence avant de signaler une régression
+TOLERANCE_DEFAUT = 0.25
+# Écarts absolus en deçà desquels une différence est tenue pour du bruit
+ECART_MIN_US = 2.0
+ECART_MIN_OCTETS = 64
+
+# Indicateurs comparés à la référence
+INDICATEURS_DUREE = ("p50_us", "p95_us")
+INDICATEURS_MEMOIRE = ("octets_retenus_par_appel",)
+
+
+class Regression(NamedTuple):
+    scenario: str
+    indicateur: str
+    reference: float
+    mesure: float
+
+    @property
+    def ecart(self) -> float:
+        return self.mesure / self.reference - 1 if self.reference else float("inf")
+
+
+def _version(module: str) -> Optional[str]:
+    try:
+        return __import__(module).__version__
+    except ImportError:
+        return None
+
+
+def environnement() -> dict:
+    """Machine et versions : deux rapports ne sont comparables que sur le même environnement"""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "plateforme": platform.platform(),
+        "processeur": platform.processor() or platform.machine(),
+        "coeurs": os.cpu_count(),
+        "numpy": _version("numpy"),
+        "pillow": _version("PIL"),
+        "orjson": _version("orjson"),
+        "reponses_rapides": os.environ.get("REPONSES_RAPIDES", ""),
+    }
+
+
+def selectionner(categories: Iterable[str] = CATEGORIES, motifs: Iterable[str] = ()) -> list:
+    """Scénarios des catégories demandées dont le nom correspond à l'un des motifs (fnmatch)"""
+    categories = set(categories)
+    motifs = list(motifs)
+    return [
+        scenario for scenario in SCENARIOS
+        if scenario.categorie in categories
+        and (not motifs or any(fnmatch.fnmatchcase(scenario.nom, motif) for motif in motifs))
+    ]
+
+
+def executer_suite(scenarios: list, facteur: float = 1.0,
+                   progression: Optional[Callable[[str, dict], None]] = None) -> dict:
+    """
+    Exécute les scénarios dans ce processus et retourne le rapport : environnement et,
+    par scénario, centiles de durée (µs) et allocations Python (tracemalloc).
+    `facteur` ajuste le nombre d'itérations (0.1 pour un contrôle rapide).
+    """
+    contexte = ContexteMesures()
+    resultats = {}
+    try:
+        for scenario in scenarios:
+            iterations = max(1, int(scenario.iterations * facteur))
+            appel = scenario.preparer(contexte)
+            mesure = mesurer(
+                appel,
+                iterations=iterations,
+                echauffement=max(2, iterations // 10),
+                iterations_memoire=min(iterations, ITERATIONS_MEMOIRE_MAX),
+                executer=contexte.executer if scenario.asynchrone else None
+            )
+            resultats[scenario.nom] = mesure._asdict()
+            if progression is not None:
+                progression(scenario.nom, resultats[scenario.nom])
+    finally:
+        contexte.fermer()
+    return {
+        "format": FORMAT_RAPPORT,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "environnement": environnement(),
+        "scenarios": resultats
+    }
+
+
+def comparer(rapport: dict, reference: dict, tolerance: float = TOLERANCE_DEFAUT) -> List[Regression]:
+    """
+    Indicateurs dégradés de plus de `tolerance` (et d'un écart absolu significatif) par
+    rapport à la référence. Les scénarios absents de l'un des rapports sont ignorés.
+    """
+    regressions = []
+    for nom, mesure in rapport["scenarios"].items():
+        mesure_reference = reference.get("scenarios", {}).get(nom)
+        if mesure_reference is None:
+            continue
+        for indicateurs, ecart_min in ((INDICATEURS_DUREE, ECART_MIN_US), (INDICATEURS_MEMOIRE, ECART_MIN_OCTETS)):
+            for indicateur in indicateurs:
+                valeur, valeur_reference = mesure[indicateur], mesure_reference[indicateur]
+                if valeur > valeur_reference * (1 + tolerance) and valeur - valeur_reference > ecart_min:
+                    regressions.append(Regression(nom, indicateur, valeur_reference, valeur))
+    return regressions
+
+
+def differences_environnement(rapport: dict, reference: dict) -> List[str]:
+    """Caractéristiques d'environnement qui diffèrent entre le rapport et la référence"""
+    actuel, precedent = rapport["environnement"], reference.get("environnement", {})
+    return [
+        f"{cle}: {precedent.get(cle)!r} -> {valeur!r}"
+        for cle, valeur in actuel.items() if precedent.get(cle) != valeur
+    ]
@@ -0,0 +1,111 @@
+import os
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from calculators.cpam_calculator import statistiques_registre_cpam
+from calculators.taxi_calculator import calculateur_taxi
+from calculators.grilles import referentiel_tarifs
+from calculators import prechauffage
+from compression.cache import cache_images
+from serveur.cache_reponses import cache_reponses
+from serveur import profilage
+from geographie.communes import referentiel_communes
+from routes.communes import cache_communes
+
+# Jeton exigé sur /admin/* (Authorization: Bearer <jeton>) ; à défaut, celui du profilage.
+# Sans aucun des deux, l'administration est fermée.
+JETON_ADMIN = os.environ.get("ADMIN_JETON") or os.environ.get("PROFILAGE_JETON") or None
+
+_porteur = HTTPBearer(auto_error=False, description="Jeton ADMIN_JETON")
+
+
+def verifier_jeton(identifiants: Optional[HTTPAuthorizationCredentials] = Depends(_porteur)):
+    """401 sans jeton, 403 si le jeton est faux ou si aucun jeton n'est configuré"""
+    if JETON_ADMIN is None:
+        raise HTTPException(status_code=403, detail="Administration désactivée (ADMIN_JETON non défini)")
+    if identifiants is None:
+        raise HTTPException(status_code=401, detail="Jeton d'administration requis",
+                            headers={"WWW-Authenticate": "Bearer"})
+    if not secrets.compare_digest(identifiants.credentials.encode(), JETON_ADMIN.encode()):
+        raise HTTPException(status_code=403, detail="Jeton d'administration invalide")
+
+
+router = APIRouter(dependencies=[Depends(verifier_jeton)])
+
+
+@router.get("/admin/caches", summary="Statistiques des caches de calcul")
+async def statistiques_caches():
+    """
+    Retourne les compteurs (succès, échecs, évictions, taille, mémoire estimée) des caches de calcul,
+    par calculateur (taxi, CPAM par département), ceux des caches d'images et de réponses HTTP,
+    l'état du référentiel des communes et le bilan du préchauffage effectué au démarrage.
+    """
+    return {
+        "taxi": calculateur_taxi.statistiques_cache(),
+        "cpam": statistiques_registre_cpam(),
+        "images": cache_images.statistiques(),
+        "http": cache_reponses.statistiques(),
+        "communes": dict(referentiel_communes().statistiques(), http=cache_communes.statistiques()),
+        "prechauffage": prechauffage.dernier_prechauffage
+    }
+
+
+@router.get("/admin/tarifs", summary="Grilles tarifaires chargées")
+async def etat_tarifs():
+    """
+    Retourne la version du catalogue de tarifs, ses grilles et dates d'entrée en vigueur,
+    le nombre de rechargements et la dernière erreur de chargement éventuelle.
+    """
+    return referentiel_tarifs.statistiques()
+
+
+@router.post("/admin/tarifs/recharger", summary="Rechargement des grilles tarifaires")
+async def recharger_tarifs():
+    """
+    Relit immédiatement le fichier de tarifs dans ce processus (les autres processus le
+    relisent d'eux-mêmes dès qu'il est modifié). Un fichier invalide est refusé et les
+    grilles en service sont conservées.
+    """
+    try:
+        referentiel_tarifs.recharger()
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return referentiel_tarifs.statistiques()
+
+
+def _profileur() -> profilage.Profileur:
+    if profilage.profileur is None:
+        raise HTTPException(status_code=404, detail="Profilage désactivé (PROFILAGE=true pour l'activer)")
+    return profilage.profileur
+
+
+@router.get("/admin/profils", summary="Profils des dernières requêtes échantillonnées")
+async def lister_profils():
+    """
+    Retourne la configuration du profileur et le résumé des derniers profils conservés
+    (route, durée, statut, motif : taux, en-tête X-Profilage ou seuil de latence dépassé),
+    du plus récent au plus ancien.
+    """
+    profileur = _profileur()
+    return {**profileur.statistiques(), "profils": profileur.liste()}
+
+
+@router.get("/admin/profils/piles", summary="Piles repliées de tous les profils", response_class=PlainTextResponse)
+async def piles_profils(route: Optional[str] = None):
+    """
+    Piles repliées (une ligne « racine;...;feuille nombre » par pile) de tous les profils
+    conservés, ou de ceux d'une route (par ex. /calculer-tarif) : entrée directe de
+    flamegraph.pl ou de speedscope.
+    """
+    return _profileur().piles_repliees(route)
+
+
+@router.get("/admin/profils/{numero}", summary="Piles repliées d'un profil", response_class=PlainTextResponse)
+async def piles_profil(numero: int):
+    """Piles repliées d'un profil conservé, au même format que /admin/profils/piles"""
+    profil = _profileur().profil(numero)
+    if profil is None:
+        raise HTTPException(status_code=404, detail=f"Profil {numero} introuvable (déjà sorti du tampon ?)")
+    return "".join(f"{pile} {nombre}\n" for pile, nombre in profil.piles_repliees().most_common())
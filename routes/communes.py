@@ -0,0 +1,95 @@
+import os
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from models.communes import AutocompletionReponse, CommuneReponse, CommunesProchesReponse, DistanceReponse
+from geographie.communes import COEFFICIENT_ROUTIER, distance_orthodromique_km, estimer_distance_km, referentiel_communes
+from geographie.texte import plier
+from serveur.cache_reponses import CacheReponses
+from serveur.reponses_rapides import reponse_json
+
+router = APIRouter()
+
+# Le référentiel ne change qu'au redémarrage : les propositions se gardent longtemps,
+# à part des réponses tarifaires pour ne pas les évincer à chaque frappe
+cache_communes = CacheReponses(
+    entrees_max=int(os.environ.get("COMMUNES_CACHE_HTTP_ENTREES", 4096)),
+    max_age=int(os.environ.get("COMMUNES_CACHE_HTTP_MAX_AGE", 86400))
+)
+
+
+def _commune_introuvable(nom: str) -> HTTPException:
+    return HTTPException(status_code=404, detail=f"Commune introuvable : {nom}")
+
+
+@router.get("/communes/autocompletion", summary="Autocomplétion des noms de communes", response_model=AutocompletionReponse)
+async def autocompleter_communes(
+    request: Request,
+    q: str = Query(..., description="Début du nom, ou d'un mot du nom (accents, casse et tirets indifférents)", max_length=100),
+    limite: int = Query(10, description="Nombre maximal de propositions", ge=1, le=50),
+    departement: Optional[str] = Query(None, description="Restreindre à un département")
+):
+    """
+    Propose les communes dont le nom, ou l'un de ses mots, commence par `q` : d'abord les
+    noms commençant par `q`, puis les autres, chacun par population décroissante.
+    Conçue pour être appelée à chaque frappe (réponses en cache, ETag, Cache-Control).
+    """
+    prefixe = plier(q)
+
+    def produire():
+        return {"communes": [commune._asdict() for commune in
+                             referentiel_communes().autocompleter(prefixe, limite, departement)]}
+
+    return cache_communes.repondre(request, ("autocompletion", prefixe, limite, departement), produire)
+
+
+@router.get("/communes/resoudre", summary="Commune désignée par un nom libre", response_model=CommuneReponse)
+async def resoudre_commune(
+    nom: str = Query(..., description="Nom de la commune (ou code INSEE)", max_length=100),
+    departement: Optional[str] = Query(None, description="Département préféré parmi les homonymes")
+):
+    """
+    Retourne la commune désignée par `nom` (« saint etienne », « ST-ÉTIENNE », « Roche-sur-Yon »...) :
+    parmi les homonymes, celle du département demandé, sinon la plus peuplée.
+    """
+    commune = referentiel_communes().resoudre(nom, departement)
+    if commune is None:
+        raise _commune_introuvable(nom)
+    return reponse_json(CommuneReponse, commune)
+
+
+@router.get("/communes/proches", summary="Communes les plus proches d'un point", response_model=CommunesProchesReponse)
+async def communes_proches(
+    latitude: float = Query(..., description="Latitude (degrés)", ge=-90, le=90),
+    longitude: float = Query(..., description="Longitude (degrés)", ge=-180, le=180),
+    nombre: int = Query(5, description="Nombre de communes", ge=1, le=50)
+):
+    """
+    Retourne les communes les plus proches du point, avec leur distance à vol d'oiseau.
+    """
+    return {"communes": [dict(commune._asdict(), distance_km=distance)
+                         for commune, distance in referentiel_communes().plus_proches(latitude, longitude, nombre)]}
+
+
+@router.get("/communes/distance", summary="Distance estimée entre deux communes", response_model=DistanceReponse)
+async def distance_communes(
+    depart: str = Query(..., description="Commune de départ (nom ou code INSEE)", max_length=100),
+    arrivee: str = Query(..., description="Commune d'arrivée (nom ou code INSEE)", max_length=100)
+):
+    """
+    Distance à vol d'oiseau entre deux communes et distance routière estimée
+    (vol d'oiseau × coefficient routier), celle retenue par /calculer-tarif-cpam
+    quand `distance_km` est absente.
+    """
+    communes = referentiel_communes()
+    commune_depart, commune_arrivee = communes.resoudre(depart), communes.resoudre(arrivee)
+    if commune_depart is None:
+        raise _commune_introuvable(depart)
+    if commune_arrivee is None:
+        raise _commune_introuvable(arrivee)
+    return {
+        "depart": commune_depart._asdict(),
+        "arrivee": commune_arrivee._asdict(),
+        "distance_vol_oiseau_km": round(distance_orthodromique_km(commune_depart, commune_arrivee), 3),
+        "coefficient_routier": COEFFICIENT_ROUTIER,
+        "distance_estimee_km": estimer_distance_km(commune_depart, commune_arrivee)
+    }
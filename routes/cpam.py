@@ -1,17 +1,29 @@
-from fastapi import APIRouter
-from models.cpam import CourseCPAMRequete, CourseCPAMReponse
-from calculators.cpam_calculator import CalculateurTarifsCPAM
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from models.cpam import CourseCPAMRequete, CourseCPAMReponse, LotCoursesCPAMRequete, LotCoursesCPAMReponse
+from calculators.cpam_calculator import obtenir_calculateur_cpam, calculer_courses_cpam, completer_course_cpam
+from serveur.reponses_rapides import reponse_json
 
 router = APIRouter()
 
 
+def _completer_course(requete: CourseCPAMRequete, numero: Optional[int] = None) -> CourseCPAMRequete:
+    try:
+        return completer_course_cpam(requete, numero)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/calculer-tarif-cpam", summary="Calcul tarif selon convention CPAM 2025", response_model=CourseCPAMReponse)
 async def calculer_tarif_cpam(requete: CourseCPAMRequete):
     """
     Calcule le tarif d'une course selon la convention-cadre nationale CPAM 2025.
     Inclut forfaits, majorations, suppléments et abattements transport partagé.
+    Sans distance_km, la distance est estimée entre les villes de départ et d'arrivée ;
+    sans département, c'est celui de la ville de départ.
     """
-    calculateur_cpam_instance = CalculateurTarifsCPAM(departement=requete.departement)
+    requete = _completer_course(requete)
+    calculateur_cpam_instance = obtenir_calculateur_cpam(requete.departement)
 
     resultat = calculateur_cpam_instance.calculer_tarif_cpam(
         distance_km=requete.distance_km,
@@ -25,4 +37,16 @@ async def calculer_tarif_cpam(requete: CourseCPAMRequete):
         peages=requete.peages
     )
 
-    return resultat
\ No newline at end of file
+    return reponse_json(CourseCPAMReponse, resultat)
+
+
+# Fonction synchrone, exécutée dans le pool de threads de FastAPI (lot calculé hors de la boucle d'événements)
+@router.post("/calculer-tarifs-cpam-lot", summary="Calcul CPAM d'un lot de transports", response_model=LotCoursesCPAMReponse)
+def calculer_tarifs_cpam_lot(lot: LotCoursesCPAMRequete):
+    """
+    Calcule en une seule requête un lot de transports sanitaires (mêmes résultats que /calculer-tarif-cpam).
+    Les transports sont regroupés par département puis calculés en colonnes.
+    """
+    courses = [_completer_course(course, numero) for numero, course in enumerate(lot.courses)]
+    resultats = calculer_courses_cpam(courses)
+    return {"nombre_courses": len(resultats), "resultats": resultats}
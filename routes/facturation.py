@@ -0,0 +1,37 @@
+import asyncio
+import io
+import json
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query, Response
+from calculators.facturation_cpam import facturer_fichier
+from calculators.reprise_tarifs import FORMATS
+from routes.reprise import detecter_format
+
+router = APIRouter()
+
+
+@router.post("/facturation-cpam", summary="Facturation mensuelle CPAM d'un export de transports (CSV ou NDJSON)")
+async def facturation_cpam(
+    fichier: UploadFile = File(..., description="Transports du mois au format CSV (avec en-tête) ou NDJSON"),
+    mois: str = Query(..., description="Mois facturé (AAAA-MM)", pattern=r"^[0-9]{4}-(0[1-9]|1[0-2])$"),
+    lignes: bool = Query(True, description="Détailler les transports de chaque facture"),
+    format_fichier: str = Query(None, alias="format", description="csv ou ndjson (déduit du nom du fichier par défaut)")
+):
+    """
+    Tarifie les transports sanitaires d'un mois et renvoie une facture par patient, les
+    totaux par véhicule et par jour et une synthèse du mois.
+
+    Chaque ligne porte les champs de /calculer-tarif-cpam, plus `patient`, `vehicule`
+    (facultatif) et `date_heure_transport`. Un transport partagé figure une fois, sur la
+    facture du patient de sa ligne. Les lignes invalides ou hors du mois sont listées
+    dans `erreurs` sans interrompre la facturation.
+    """
+    format_fichier = format_fichier or detecter_format(fichier)
+    if format_fichier not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Le format doit être l'un de : {', '.join(FORMATS)}")
+
+    # Lecture, tarification (répartie entre processus) et totaux hors de la boucle d'événements
+    contenu = io.TextIOWrapper(fichier.file, encoding="utf-8-sig", errors="surrogateescape", newline="")
+    rapport = await asyncio.get_running_loop().run_in_executor(
+        None, lambda: facturer_fichier(contenu, mois, format_fichier, lignes_factures=lignes)
+    )
+    return Response(json.dumps(rapport, ensure_ascii=False), media_type="application/json")
@@ -1,6 +1,8 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 from datetime import datetime
 import pytz
+from serveur.admission import controleur_admission
 
 router = APIRouter()
 
@@ -17,4 +19,18 @@ async def verifier_sante():
         "statut": "OK",
         "message": "L'API est démarrée",
         "horodatage": heure_france.isoformat()
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/verifier-disponibilite", summary="Disponibilite du worker pour de nouvelles requetes")
+async def verifier_disponibilite():
+    """
+    Sonde de disponibilite pour le repartiteur de charge : 200 si ce worker accepte de
+    nouvelles requetes, 503 (avec Retry-After) si sa boucle d'evenements prend du retard
+    ou si une classe de routes refuse deja des requetes. Le detail de la saturation de
+    chaque classe est joint. /verifier-sante ne dit que si le processus repond.
+    """
+    etat = controleur_admission.etat()
+    if etat["pret"]:
+        return etat
+    return JSONResponse(etat, status_code=503, headers={"Retry-After": "1"})
@@ -1,31 +1,109 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from fastapi.responses import Response
-from PIL import Image, ExifTags
-import io
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query, Request
+from functools import lru_cache
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from fastapi.responses import Response, StreamingResponse
 from urllib.parse import quote
+import asyncio
+import json
+import posixpath
+import secrets
+import zipfile
+from compression.pipeline import compresser_webp, ImageCompressee, ImageRefusee, EFFORT_MAX
+from compression.pool import pool_compression, PoolSaturee
+from compression.cache import cache_images
+from compression.declinaisons import (
+    DECLINAISONS_DEFAUT, DECLINAISONS_MAX, FORMAT_AUTO, FORMATS, Declinaison, analyser_declinaison, decliner_image
+)
+from compression.televersement import OCTETS_MAX, Televersement, recevoir
+from compression.zip_flux import FluxZip
+from serveur import metriques
+from serveur.negociation import choisir
 
 router = APIRouter()
 
+# Nombre maximal d'images par lot (fichiers envoyés ou entrées d'archive)
+NOMBRE_MAX_IMAGES_LOT = 1000
+# Nouvelles tentatives d'une image du lot quand le pool de compression est saturé
+TENTATIVES_MAX_LOT = 5
+
+
+async def _recevoir(flux) -> Televersement:
+    """Lecture, hachage et éventuelle mise en fichier de l'image, hors de la boucle d'événements"""
+    return await asyncio.get_running_loop().run_in_executor(None, recevoir, flux, OCTETS_MAX)
+
+
+async def _compresser(televersement: Televersement, *parametres) -> Tuple[ImageCompressee, str, str]:
+    """
+    Compresse via le cache adressé par contenu ; retourne (image, statut du cache, clé).
+    Les paramètres sont ceux de compresser_webp après la source.
+    """
+    # Une image déjà reçue avec les mêmes paramètres n'est pas réencodée
+    cle = cache_images.cle(televersement.empreinte, *parametres)
+    # Décodage et encodage hors de la boucle d'événements ; une image volumineuse est
+    # transmise par le chemin de son fichier temporaire, pas par ses octets
+    image_compressee, statut_cache = await cache_images.obtenir(
+        cle,
+        lambda: pool_compression.executer(compresser_webp, televersement.source, *parametres)
+    )
+    metriques.images.inc((statut_cache,))
+    metriques.octets_images_entree.inc(valeur=televersement.taille)
+    metriques.octets_images_sortie.inc(valeur=len(image_compressee.donnees))
+    if statut_cache == "MISS":
+        metriques.duree_encodage.observer(image_compressee.duree_encodage_ms / 1000)
+    return image_compressee, statut_cache, cle
+
+
+def _liberer(televersement: Televersement, *parametres):
+    """
+    Supprime le fichier reçu ; si la requête a été annulée pendant sa compression, celle-ci
+    se poursuit pour les demandes coalescées et le fichier n'est supprimé qu'à sa fin
+    """
+    cache_images.apres_production(cache_images.cle(televersement.empreinte, *parametres), televersement.supprimer)
+
+
+def _entetes_encodage(image_compressee: ImageCompressee) -> dict:
+    """En-têtes décrivant l'encodage retenu, pour l'ajustement en production"""
+    return {
+        "X-Quality": str(image_compressee.qualite),
+        "X-Effort": str(image_compressee.effort),
+        "X-Encode-Time-Ms": f"{image_compressee.duree_encodage_ms:.1f}"
+    }
+
+
+def _valider_qualite(qualite: int):
+    if not 1 <= qualite <= 100:
+        raise HTTPException(
+            status_code=400,
+            detail="La qualité doit être comprise entre 1 et 100"
+        )
+
 
 @router.post("/compresser-image", summary="Compression d'image au format WebP")
 async def compresser_image(
     fichier: UploadFile = File(..., description="Image à compresser (JPEG, PNG, etc.)"),
-    qualite: int = 80
+    qualite: int = 80,
+    max_largeur: Optional[int] = Query(None, ge=1, description="Largeur maximale en pixels (proportions conservées)"),
+    max_hauteur: Optional[int] = Query(None, ge=1, description="Hauteur maximale en pixels (proportions conservées)"),
+    taille_cible_ko: Optional[int] = Query(None, ge=1, description="Taille cible en Ko : plus haute qualité (<= qualite) qui tient dans ce budget"),
+    effort: int = Query(EFFORT_MAX, ge=0, le=EFFORT_MAX, description="Effort d'encodage WebP (0 = rapide, 6 = plus compact)")
 ):
     """
     Compresse une image au format WebP pour un meilleur gain de place.
 
     - **fichier**: L'image à compresser (formats supportés: JPEG, PNG, BMP, TIFF, etc.)
     - **qualite**: Qualité de compression WebP (1-100, défaut: 80). Plus la valeur est élevée, meilleure est la qualité mais plus le fichier est lourd.
+    - **max_largeur** / **max_hauteur**: Dimensions maximales (optionnelles). Les JPEG sont réduits dès le décodage, ce qui accélère fortement le traitement des photos haute résolution.
+    - **taille_cible_ko**: Taille visée en Ko (optionnelle). La qualité retenue est la plus haute, sans dépasser **qualite**, dont le fichier tient dans ce budget.
+    - **effort**: Effort d'encodage WebP de 0 à 6 (défaut: 6). Un effort de 2 à 4 est plusieurs fois plus rapide pour quelques pourcents de taille en plus, adapté aux envois interactifs.
+
+    Les en-têtes X-Quality, X-Effort et X-Encode-Time-Ms indiquent la qualité retenue, l'effort et la durée d'encodage.
+
+    Une image de plus de COMPRESSION_OCTETS_MAX octets (20 Mo par défaut) ou de plus de COMPRESSION_PIXELS_MAX pixels décodés (50 millions) est refusée (413).
 
     Retourne l'image compressée au format WebP.
     """
     # Validation de la qualité
-    if not 1 <= qualite <= 100:
-        raise HTTPException(
-            status_code=400,
-            detail="La qualité doit être comprise entre 1 et 100"
-        )
+    _valider_qualite(qualite)
 
     # Vérification du type de fichier
     if not fichier.content_type or not fichier.content_type.startswith("image/"):
@@ -34,76 +112,388 @@ async def compresser_image(
             detail="Le fichier doit être une image"
         )
 
+    # Lecture de l'image (bornée à COMPRESSION_OCTETS_MAX)
     try:
-        # Lecture de l'image
-        contenu = await fichier.read()
-        image = Image.open(io.BytesIO(contenu))
-
-        # Corriger l'orientation EXIF si présente
-        try:
-            # Chercher la balise d'orientation dans les données EXIF
-            exif = image.getexif()
-            if exif:
-                # Trouver le code de la balise Orientation
-                orientation_key = None
-                for key, val in ExifTags.TAGS.items():
-                    if val == 'Orientation':
-                        orientation_key = key
-                        break
-
-                if orientation_key and orientation_key in exif:
-                    orientation = exif[orientation_key]
-
-                    # Appliquer la rotation selon la valeur d'orientation
-                    if orientation == 3:
-                        image = image.rotate(180, expand=True)
-                    elif orientation == 6:
-                        image = image.rotate(270, expand=True)
-                    elif orientation == 8:
-                        image = image.rotate(90, expand=True)
-        except (AttributeError, KeyError, IndexError):
-            # Pas de données EXIF ou orientation, continuer normalement
-            pass
-
-        # Conversion en RGB si nécessaire (WebP ne supporte pas certains modes)
-        if image.mode in ("RGBA", "LA", "P"):
-            # Créer un fond blanc pour les images avec transparence
-            fond = Image.new("RGB", image.size, (255, 255, 255))
-            if image.mode == "P":
-                image = image.convert("RGBA")
-            fond.paste(image, mask=image.split()[-1] if image.mode in ("RGBA", "LA") else None)
-            image = fond
-        elif image.mode != "RGB":
-            image = image.convert("RGB")
-
-        # Compression en WebP
-        tampon = io.BytesIO()
-        image.save(tampon, format="WEBP", quality=qualite, method=6)
-        tampon.seek(0)
-
-        # Calcul de la réduction de taille
-        taille_originale = len(contenu)
-        taille_compressee = len(tampon.getvalue())
-        reduction_pourcentage = ((taille_originale - taille_compressee) / taille_originale) * 100
-
-        # Préparer le nom de fichier encodé pour le header Content-Disposition
-        nom_base = fichier.filename.rsplit('.', 1)[0] if fichier.filename else "image"
-        nom_fichier_encode = quote(f"{nom_base}.webp")
-
-        # Retour de l'image compressée avec des en-têtes informatifs
-        return Response(
-            content=tampon.getvalue(),
-            media_type="image/webp",
-            headers={
-                "X-Original-Size": str(taille_originale),
-                "X-Compressed-Size": str(taille_compressee),
-                "X-Reduction-Percentage": f"{reduction_pourcentage:.2f}",
-                "Content-Disposition": f"attachment; filename*=UTF-8''{nom_fichier_encode}"
-            }
-        )
+        televersement = await _recevoir(fichier.file)
+    except ImageRefusee as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
+    try:
+        image_compressee, statut_cache, cle = await _compresser(
+            televersement, qualite, max_largeur, max_hauteur, taille_cible_ko, effort
+        )
+    except PoolSaturee as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.reessayer_apres)}
+        )
+    except ImageRefusee as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Erreur lors de la compression de l'image: {str(e)}"
-        )
\ No newline at end of file
+        )
+    finally:
+        _liberer(televersement, qualite, max_largeur, max_hauteur, taille_cible_ko, effort)
+
+    # Calcul de la réduction de taille
+    taille_originale = televersement.taille
+    taille_compressee = len(image_compressee.donnees)
+    reduction_pourcentage = ((taille_originale - taille_compressee) / taille_originale) * 100
+
+    # Préparer le nom de fichier encodé pour le header Content-Disposition
+    nom_base = fichier.filename.rsplit('.', 1)[0] if fichier.filename else "image"
+    nom_fichier_encode = quote(f"{nom_base}.webp")
+
+    # Retour de l'image compressée avec des en-têtes informatifs
+    return Response(
+        content=image_compressee.donnees,
+        media_type="image/webp",
+        headers={
+            **_entetes_encodage(image_compressee),
+            "X-Original-Size": str(taille_originale),
+            "X-Compressed-Size": str(taille_compressee),
+            "X-Reduction-Percentage": f"{reduction_pourcentage:.2f}",
+            "X-Cache-Status": statut_cache,
+            "ETag": f'"{cle}"',
+            "Content-Disposition": f"attachment; filename*=UTF-8''{nom_fichier_encode}"
+        }
+    )
+
+
+def _est_archive_zip(fichier: UploadFile) -> bool:
+    return (fichier.content_type in ("application/zip", "application/x-zip-compressed")
+            or (fichier.filename or "").lower().endswith(".zip"))
+
+
+def _recevoir_entree(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> Televersement:
+    """Décompresse une entrée d'archive par blocs, bornée à COMPRESSION_OCTETS_MAX"""
+    if info.file_size > OCTETS_MAX:
+        # Taille annoncée par l'archive : refus sans rien décompresser
+        raise ImageRefusee(f"Image trop volumineuse : plus de {OCTETS_MAX} octets")
+    with archive.open(info) as flux:
+        return recevoir(flux, OCTETS_MAX)
+
+
+def _sources_lot(fichiers: List[UploadFile]) -> List[Tuple[str, Callable[[], Awaitable[Televersement]]]]:
+    """
+    Liste (nom, lecture différée) des images du lot. Les archives ZIP sont développées ;
+    aucune image n'est lue avant qu'un processus soit prêt à la traiter.
+    """
+    boucle = asyncio.get_running_loop()
+    sources = []
+    for fichier in fichiers:
+        if _est_archive_zip(fichier):
+            try:
+                archive = zipfile.ZipFile(fichier.file)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"Archive ZIP invalide: {fichier.filename}")
+            for info in archive.infolist():
+                if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                    continue
+                sources.append((info.filename,
+                                lambda archive=archive, info=info: boucle.run_in_executor(None, _recevoir_entree, archive, info)))
+        else:
+            if not fichier.content_type or not fichier.content_type.startswith("image/"):
+                raise HTTPException(status_code=400, detail=f"Le fichier doit être une image: {fichier.filename}")
+            sources.append((fichier.filename or "image", lambda fichier=fichier: _recevoir(fichier.file)))
+    if len(sources) > NOMBRE_MAX_IMAGES_LOT:
+        raise HTTPException(status_code=400, detail=f"Le lot est limité à {NOMBRE_MAX_IMAGES_LOT} images")
+    return sources
+
+
+def _nom_sortie(nom: str, deja_utilises: set) -> str:
+    # Chemin relatif propre : pas de racine ni de remontée hors de l'archive
+    chemin = "/".join(partie for partie in nom.replace("\\", "/").split("/") if partie not in ("", ".", ".."))
+    base = posixpath.splitext(chemin)[0] or "image"
+    candidat = f"{base}.webp"
+    suffixe = 1
+    while candidat in deja_utilises:
+        candidat = f"{base}_{suffixe}.webp"
+        suffixe += 1
+    deja_utilises.add(candidat)
+    return candidat
+
+
+async def _traiter_image(nom: str, lire: Callable[[], Awaitable[Televersement]], parametres: tuple) -> Tuple[dict, Optional[bytes]]:
+    """Compresse une image du lot ; une erreur est consignée dans le manifeste au lieu d'interrompre le lot"""
+    entree = {"fichier": nom}
+    televersement = None
+    try:
+        televersement = await lire()
+        for tentative in range(TENTATIVES_MAX_LOT):
+            try:
+                image_compressee, statut_cache, _ = await _compresser(televersement, *parametres)
+                break
+            except PoolSaturee as e:
+                if tentative == TENTATIVES_MAX_LOT - 1:
+                    raise
+                await asyncio.sleep(e.reessayer_apres)
+    except Exception as e:
+        entree.update(statut="erreur", erreur=f"Erreur lors de la compression de l'image: {str(e)}")
+        return entree, None
+    finally:
+        if televersement is not None:
+            _liberer(televersement, *parametres)
+
+    taille_originale = televersement.taille
+    taille_compressee = len(image_compressee.donnees)
+    entree.update(
+        statut="ok",
+        taille_originale=taille_originale,
+        taille_compressee=taille_compressee,
+        reduction_pourcentage=round((taille_originale - taille_compressee) / taille_originale * 100, 2),
+        qualite=image_compressee.qualite,
+        effort=image_compressee.effort,
+        duree_encodage_ms=round(image_compressee.duree_encodage_ms, 1),
+        cache=statut_cache
+    )
+    return entree, image_compressee.donnees
+
+
+async def _produire_zip(sources, parametres: tuple) -> AsyncIterator[bytes]:
+    """
+    Compresse les images en parallèle (autant de tâches que de processus) et écrit
+    chaque entrée de l'archive dès qu'elle est prête, puis le manifeste.
+    """
+    paralleles = max(1, min(pool_compression.processus, len(sources)))
+    resultats: asyncio.Queue = asyncio.Queue(maxsize=paralleles)
+    a_traiter = iter(sources)
+
+    async def travailleur():
+        for nom, lire in a_traiter:
+            await resultats.put(await _traiter_image(nom, lire, parametres))
+
+    taches = [asyncio.ensure_future(travailleur()) for _ in range(paralleles)]
+    flux = FluxZip()
+    manifeste = []
+    noms_utilises = set()
+    try:
+        for _ in range(len(sources)):
+            entree, image_compressee = await resultats.get()
+            if image_compressee is not None:
+                entree["sortie"] = _nom_sortie(entree["fichier"], noms_utilises)
+                yield flux.ajouter(entree["sortie"], image_compressee)
+            manifeste.append(entree)
+        manifeste_json = json.dumps({"images": manifeste}, ensure_ascii=False, indent=2)
+        yield flux.ajouter("manifeste.json", manifeste_json.encode("utf-8"), compresser=True)
+        yield flux.fermer()
+    finally:
+        for tache in taches:
+            tache.cancel()
+
+
+@router.post("/compresser-images", summary="Compression d'un lot d'images en WebP (archive ZIP)")
+async def compresser_images(
+    fichiers: List[UploadFile] = File(..., description="Images à compresser, ou archive(s) ZIP d'images"),
+    qualite: int = 80,
+    max_largeur: Optional[int] = Query(None, ge=1, description="Largeur maximale en pixels (proportions conservées)"),
+    max_hauteur: Optional[int] = Query(None, ge=1, description="Hauteur maximale en pixels (proportions conservées)"),
+    taille_cible_ko: Optional[int] = Query(None, ge=1, description="Taille cible en Ko : plus haute qualité (<= qualite) qui tient dans ce budget"),
+    effort: int = Query(EFFORT_MAX, ge=0, le=EFFORT_MAX, description="Effort d'encodage WebP (0 = rapide, 6 = plus compact)")
+):
+    """
+    Compresse un lot d'images en WebP, en parallèle, et renvoie une archive ZIP
+    transmise au fil de l'eau : chaque image est ajoutée dès qu'elle est prête.
+
+    L'archive se termine par **manifeste.json** donnant pour chaque image les tailles
+    d'origine et compressée et le pourcentage de réduction (équivalents des en-têtes
+    X-Original-Size / X-Compressed-Size / X-Reduction-Percentage), la qualité, l'effort et la
+    durée d'encodage, ou l'erreur rencontrée. Les paramètres sont ceux de /compresser-image.
+    """
+    _valider_qualite(qualite)
+    sources = _sources_lot(fichiers)
+
+    return StreamingResponse(
+        _produire_zip(sources, (qualite, max_largeur, max_hauteur, taille_cible_ko, effort)),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=images.zip"}
+    )
+
+
+# --- Déclinaisons d'une image ---
+
+# Format des déclinaisons « auto » : à poids égal dans l'en-tête Accept, WebP (le plus rapide
+# à encoder), puis AVIF, puis JPEG
+ORDRE_FORMATS = ("webp", "avif", "jpeg")
+CONTENEURS = ("application/zip", "multipart/mixed")
+
+
+@lru_cache(maxsize=None)
+def _formats_disponibles() -> Tuple[str, ...]:
+    """Formats de sortie pris en charge par le Pillow installé (AVIF depuis Pillow 11.2)"""
+    from PIL import features
+    return tuple(format_ for format_ in ORDRE_FORMATS if format_ != "avif" or features.check("avif"))
+
+
+def _resoudre_declinaisons(textes: List[str], accept: Optional[str], qualite: int) -> List[Declinaison]:
+    """Déclinaisons demandées, format « auto » négocié avec l'en-tête Accept et qualité par défaut appliqués"""
+    if not textes:
+        raise HTTPException(status_code=400, detail="Au moins une déclinaison est attendue")
+    if len(textes) > DECLINAISONS_MAX:
+        raise HTTPException(status_code=400, detail=f"{DECLINAISONS_MAX} déclinaisons au plus par image")
+    try:
+        declinaisons = [analyser_declinaison(texte) for texte in textes]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    noms = [declinaison.nom for declinaison in declinaisons]
+    if len(set(noms)) != len(noms):
+        raise HTTPException(status_code=400, detail="Chaque déclinaison doit porter un nom différent")
+
+    formats = _formats_disponibles()
+    type_negocie = choisir(accept, [FORMATS[format_][1] for format_ in formats])
+    format_negocie = next((format_ for format_ in formats if FORMATS[format_][1] == type_negocie), "webp")
+    resolues = []
+    for declinaison in declinaisons:
+        format_ = format_negocie if declinaison.format == FORMAT_AUTO else declinaison.format
+        if format_ not in formats:
+            raise HTTPException(status_code=400, detail=f"Format {format_} non pris en charge par ce serveur")
+        resolues.append(declinaison._replace(format=format_, qualite=declinaison.qualite or qualite))
+    return resolues
+
+
+def _cle_declinaison(televersement: Televersement, declinaison: Declinaison,
+                     boites: Tuple, effort: int) -> str:
+    # Chaque déclinaison est réduite depuis la précédente : ses pixels dépendent aussi des
+    # dimensions des autres déclinaisons de la requête
+    return cache_images.cle(televersement.empreinte, "declinaison", declinaison.max_largeur,
+                            declinaison.max_hauteur, declinaison.format, declinaison.qualite, effort, boites)
+
+
+def _corps_multipart(parties: List[Tuple[Declinaison, ImageCompressee, str]], nom_base: str) -> Tuple[bytes, str]:
+    """Corps multipart/mixed (une partie par déclinaison, en-têtes de la partie compris) et sa frontière"""
+    frontiere = secrets.token_hex(16)
+    morceaux = []
+    for declinaison, image_compressee, statut_cache in parties:
+        _, type_media, extension = FORMATS[declinaison.format]
+        entetes = {
+            "Content-Type": type_media,
+            "Content-Disposition": f"attachment; name=\"{declinaison.nom}\"; "
+                                   f"filename*=UTF-8''{quote(f'{nom_base}-{declinaison.nom}.{extension}')}",
+            "Content-Length": str(len(image_compressee.donnees)),
+            **_entetes_encodage(image_compressee),
+            "X-Cache-Status": statut_cache,
+        }
+        morceaux.append(f"--{frontiere}\r\n".encode())
+        morceaux.append("".join(f"{nom}: {valeur}\r\n" for nom, valeur in entetes.items()).encode() + b"\r\n")
+        morceaux.append(image_compressee.donnees)
+        morceaux.append(b"\r\n")
+    morceaux.append(f"--{frontiere}--\r\n".encode())
+    return b"".join(morceaux), frontiere
+
+
+def _corps_zip(parties: List[Tuple[Declinaison, ImageCompressee, str]], taille_originale: int) -> bytes:
+    """Archive des déclinaisons (nom.extension) suivie de manifeste.json"""
+    flux = FluxZip()
+    morceaux = []
+    manifeste = []
+    for declinaison, image_compressee, statut_cache in parties:
+        _, type_media, extension = FORMATS[declinaison.format]
+        fichier = f"{declinaison.nom}.{extension}"
+        morceaux.append(flux.ajouter(fichier, image_compressee.donnees))
+        manifeste.append({
+            "declinaison": declinaison.nom,
+            "fichier": fichier,
+            "type": type_media,
+            "max_largeur": declinaison.max_largeur,
+            "max_hauteur": declinaison.max_hauteur,
+            "taille_compressee": len(image_compressee.donnees),
+            "qualite": image_compressee.qualite,
+            "effort": image_compressee.effort,
+            "duree_encodage_ms": round(image_compressee.duree_encodage_ms, 1),
+            "cache": statut_cache,
+        })
+    manifeste_json = json.dumps({"taille_originale": taille_originale, "declinaisons": manifeste},
+                                ensure_ascii=False, indent=2)
+    morceaux.append(flux.ajouter("manifeste.json", manifeste_json.encode("utf-8"), compresser=True))
+    morceaux.append(flux.fermer())
+    return b"".join(morceaux)
+
+
+@router.post("/decliner-image", summary="Déclinaisons d'une image en plusieurs tailles et formats, en un seul décodage")
+async def decliner_image_route(
+    requete: Request,
+    fichier: UploadFile = File(..., description="Image à décliner (JPEG, PNG, etc.)"),
+    declinaisons: List[str] = Query(
+        list(DECLINAISONS_DEFAUT),
+        description="Déclinaisons « nom[:LARGEURxHAUTEUR][:format][:qualite] » (format webp, avif, jpeg ou auto), "
+                    "par exemple vignette:320x320, apercu:1280x1280:avif:60, complete:jpeg"
+    ),
+    qualite: int = Query(80, description="Qualité des déclinaisons qui n'en précisent pas (1-100)"),
+    effort: int = Query(EFFORT_MAX, ge=0, le=EFFORT_MAX, description="Effort d'encodage (0 = rapide, 6 = plus compact)")
+):
+    """
+    Produit plusieurs déclinaisons d'une même image (par défaut vignette 320 px, aperçu
+    1 280 px et pleine taille) en ne la décodant qu'une fois : chaque déclinaison est réduite
+    depuis la précédente, de la plus grande à la plus petite, et les encodages se font en parallèle.
+
+    - **Format** : une déclinaison sans format (ou « auto ») prend celui que l'en-tête **Accept**
+      préfère parmi image/webp, image/avif et image/jpeg ; WebP à poids égal ou sans préférence.
+    - **Réponse** : archive ZIP (une entrée par déclinaison, puis manifeste.json) par défaut, ou
+      multipart/mixed si l'en-tête Accept le préfère (une partie par déclinaison, avec ses en-têtes
+      Content-Type, Content-Disposition, X-Quality et X-Cache-Status).
+
+    Les limites d'envoi sont celles de /compresser-image (413 au-delà).
+    """
+    _valider_qualite(qualite)
+    if not fichier.content_type or not fichier.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="Le fichier doit être une image")
+    accept = requete.headers.get("accept")
+    declinaisons_resolues = _resoudre_declinaisons(declinaisons, accept, qualite)
+    conteneur = choisir(accept, CONTENEURS) or CONTENEURS[0]
+
+    try:
+        televersement = await _recevoir(fichier.file)
+    except ImageRefusee as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    try:
+        boites = tuple(sorted({(d.max_largeur or 0, d.max_hauteur or 0) for d in declinaisons_resolues}))
+        cles = [_cle_declinaison(televersement, declinaison, boites, effort) for declinaison in declinaisons_resolues]
+        # Déclinaisons déjà produites pour cette image ; les autres en un seul décodage
+        en_cache = [await cache_images.consulter(cle) for cle in cles]
+        manquantes = [indice for indice, (valeur, _) in enumerate(en_cache) if valeur is None]
+        if manquantes:
+            produites = await pool_compression.executer(
+                decliner_image, televersement.source,
+                [declinaisons_resolues[indice] for indice in manquantes], effort
+            )
+            for indice, image_compressee in zip(manquantes, produites):
+                cache_images.enregistrer(cles[indice], image_compressee)
+                en_cache[indice] = (image_compressee, "MISS")
+                metriques.duree_encodage.observer(image_compressee.duree_encodage_ms / 1000)
+    except PoolSaturee as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.reessayer_apres)}
+        )
+    except ImageRefusee as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de la déclinaison de l'image: {str(e)}"
+        )
+    finally:
+        televersement.supprimer()
+
+    parties = [(declinaison, image_compressee, statut_cache)
+               for declinaison, (image_compressee, statut_cache) in zip(declinaisons_resolues, en_cache)]
+    metriques.octets_images_entree.inc(valeur=televersement.taille)
+    for _, image_compressee, statut_cache in parties:
+        metriques.images.inc((statut_cache,))
+        metriques.octets_images_sortie.inc(valeur=len(image_compressee.donnees))
+
+    nom_base = fichier.filename.rsplit('.', 1)[0] if fichier.filename else "image"
+    entetes = {"Vary": "Accept", "X-Original-Size": str(televersement.taille)}
+    if conteneur == "multipart/mixed":
+        corps, frontiere = _corps_multipart(parties, nom_base)
+        return Response(content=corps, media_type=f"multipart/mixed; boundary={frontiere}", headers=entetes)
+    return Response(
+        content=_corps_zip(parties, televersement.taille),
+        media_type="application/zip",
+        headers={**entetes, "Content-Disposition": f"attachment; filename*=UTF-8''{quote(f'{nom_base}.zip')}"}
+    )
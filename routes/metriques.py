@@ -0,0 +1,20 @@
+import asyncio
+from fastapi import APIRouter
+from fastapi.responses import Response
+from serveur.metriques import registre, TYPE_CONTENU
+
+router = APIRouter()
+
+
+@router.get("/metriques", summary="Métriques au format Prometheus")
+async def metriques():
+    """
+    Expose au format texte de Prometheus les compteurs et durées des requêtes par route,
+    les requêtes en cours, les caches (succès, échecs, évictions, taux de succès), les
+    images compressées (octets reçus et produits, durée d'encodage) et le retard de la
+    boucle d'événements. Avec METRIQUES_REPERTOIRE, les valeurs couvrent tous les workers.
+    """
+    # Instantané de ce worker pris sur la boucle ; lecture des autres et mise en forme dans un thread
+    local = registre.instantane()
+    texte = await asyncio.get_running_loop().run_in_executor(None, registre.exposer, local)
+    return Response(content=texte, media_type=TYPE_CONTENU)
@@ -0,0 +1,49 @@
+import io
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from calculators.reprise_tarifs import reprendre_tarifs, GRILLES, FORMATS, TAILLE_PAQUET_DEFAUT
+
+router = APIRouter()
+
+TYPES_MEDIA = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson"
+}
+
+
+def detecter_format(fichier: UploadFile) -> str:
+    nom = (fichier.filename or "").lower()
+    type_contenu = fichier.content_type or ""
+    if nom.endswith((".ndjson", ".jsonl")) or "ndjson" in type_contenu or "jsonl" in type_contenu:
+        return "ndjson"
+    return "csv"
+
+
+@router.post("/reprise-tarifs", summary="Recalcul en masse d'un export de courses (CSV ou NDJSON)")
+async def reprise_tarifs(
+    fichier: UploadFile = File(..., description="Export de courses au format CSV (avec en-tête) ou NDJSON"),
+    grille: str = Query("taxi", description="Grille tarifaire : taxi (Vendée 2025) ou cpam"),
+    format_fichier: str = Query(None, alias="format", description="csv ou ndjson (déduit du nom du fichier par défaut)"),
+    taille_paquet: int = Query(TAILLE_PAQUET_DEFAUT, description="Nombre de lignes calculées ensemble", ge=1, le=10000)
+):
+    """
+    Recalcule chaque ligne de l'export avec la grille demandée et renvoie les lignes
+    calculées au fil de l'eau, dans le même format que le fichier reçu.
+
+    Les colonnes/champs attendus sont ceux de /calculer-tarif (taxi) ou /calculer-tarif-cpam (cpam).
+    Une ligne invalide est signalée (statut "erreur") sans interrompre le traitement.
+    """
+    if grille not in GRILLES:
+        raise HTTPException(status_code=400, detail=f"La grille doit être l'une de : {', '.join(GRILLES)}")
+    format_fichier = format_fichier or detecter_format(fichier)
+    if format_fichier not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Le format doit être l'un de : {', '.join(FORMATS)}")
+
+    # Le fichier reçu est déjà mis en tampon sur disque par Starlette : on le relit
+    # ligne par ligne, et le générateur synchrone est exécuté hors de la boucle d'événements
+    lignes = io.TextIOWrapper(fichier.file, encoding="utf-8-sig", errors="surrogateescape", newline="")
+    return StreamingResponse(
+        reprendre_tarifs(lignes, grille=grille, format_fichier=format_fichier, taille_paquet=taille_paquet),
+        media_type=TYPES_MEDIA[format_fichier],
+        headers={"Content-Disposition": f"attachment; filename=reprise_{grille}.{format_fichier}"}
+    )
@@ -1,9 +1,22 @@
-from fastapi import APIRouter, HTTPException, Body, Query
-from models.taxi import CourseRequete, CourseReponse, EstimationRapideReponse
-from calculators.taxi_calculator import CalculateurTarifsTaxi
+from datetime import datetime, time
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Body, Query, Request
+from models.taxi import (
+    CourseRequete, CourseReponse, EstimationRapideReponse, LotCoursesRequete, LotCoursesReponse
+)
+from calculators.calendrier import localiser_france
+from calculators.grilles import Chronologie
+from calculators.taxi_calculator import calculateur_taxi as calculateur
+from serveur.cache_reponses import cache_reponses
+from serveur.reponses_rapides import reponse_json
 
 router = APIRouter()
-calculateur = CalculateurTarifsTaxi()
+
+
+def _entree_en_vigueur_suivante(chronologie: Chronologie, maintenant: datetime) -> Optional[datetime]:
+    """Instant où la grille active cède la place à la suivante, ou None"""
+    debut = chronologie.prochain_debut(maintenant.date())
+    return localiser_france(datetime.combine(debut, time())) if debut else None
 
 
 @router.post("/calculer-tarif", summary="Calcul du tarif detaille d'une course", response_model=CourseReponse)
@@ -20,44 +33,97 @@ async def calculer_tarif_course(course_requete: CourseRequete = Body(...)):
         date_heure_depart=course_requete.date_heure_depart,
         aller_retour=course_requete.aller_retour
     )
-    return resultat
+    return reponse_json(CourseReponse, resultat)
+
+
+# Fonction synchrone : FastAPI l'execute dans son pool de threads, un lot de 50 000 courses
+# (de l'ordre de la seconde) ne bloque pas la boucle d'evenements
+@router.post("/calculer-tarifs-lot", summary="Calcul des tarifs d'un lot de courses", response_model=LotCoursesReponse)
+def calculer_tarifs_lot(lot: LotCoursesRequete = Body(...)):
+    """
+    Calcule en une seule requete le tarif de chaque course du lot (memes resultats que /calculer-tarif).
+    """
+    courses = lot.courses
+    for numero, course in enumerate(courses):
+        if course.distance_km < 0:
+            raise HTTPException(status_code=400, detail=f"La distance ne peut pas etre negative (course {numero}).")
+
+    resultats = calculateur.calculer_tarifs_lot(
+        distances_km=[course.distance_km for course in courses],
+        minutes_attente=[course.minutes_attente for course in courses],
+        dates_heures_depart=[course.date_heure_depart for course in courses],
+        allers_retours=[course.aller_retour for course in courses]
+    )
+    return {"nombre_courses": len(resultats), "resultats": resultats}
 
 
 @router.get("/tarifs", summary="Recuperation des tarifs actuels")
-async def recuperer_tarifs_actuels():
+async def recuperer_tarifs_actuels(request: Request):
     """
-    Retourne les tarifs officiels actuels utilises pour les calculs.
+    Retourne les tarifs officiels actuels utilises pour les calculs, avec la version de la grille en vigueur.
+    Reponse mise en cache (ETag, Cache-Control) jusqu'au prochain changement de grille.
     """
-    return {
-        "prix_base": calculateur.prix_base,
-        "tarif_a_aller_retour_jour": calculateur.tarif_a_jour,
-        "tarif_b_aller_retour_nuit": calculateur.tarif_b_nuit,
-        "tarif_c_simple_jour": calculateur.tarif_c_jour,
-        "tarif_d_simple_nuit": calculateur.tarif_d_nuit,
-        "prix_par_minute_attente": calculateur.prix_par_minute_attente,
-        "heures_de_nuit": f"{calculateur.debut_nuit} - {calculateur.fin_nuit}",
-        "tarif_minimum": calculateur.tarif_minimum
-    }
+    catalogue = calculateur.referentiel.catalogue
+    maintenant = calculateur.obtenir_heure_france()
+    grille = catalogue.taxi.grille_au(maintenant.date())
+
+    def produire():
+        return {
+            "version": grille.version,
+            "en_vigueur_depuis": grille.debut.isoformat(),
+            "version_catalogue": catalogue.version,
+            "prix_base": grille.prix_base,
+            "tarif_a_aller_retour_jour": grille.tarif_a_jour,
+            "tarif_b_aller_retour_nuit": grille.tarif_b_nuit,
+            "tarif_c_simple_jour": grille.tarif_c_jour,
+            "tarif_d_simple_nuit": grille.tarif_d_nuit,
+            "prix_par_minute_attente": grille.prix_par_minute_attente,
+            "heures_de_nuit": f"{grille.debut_nuit} - {grille.fin_nuit}",
+            "tarif_minimum": grille.tarif_minimum
+        }
+
+    return cache_reponses.repondre(
+        request, ("tarifs", grille, catalogue.version), produire,
+        expire_a=_entree_en_vigueur_suivante(catalogue.taxi, maintenant)
+    )
 
 
 @router.get("/estimation-rapide", summary="Estimation rapide via parametres GET", response_model=EstimationRapideReponse)
 async def estimation_rapide(
+    request: Request,
     distance_km: float = Query(..., description="Distance de la course en kilometres.", gt=0),
     minutes_attente: float = Query(0, description="Temps d'attente en minutes.", ge=0),
     aller_retour: bool = Query(False, description="Indique s'il s'agit d'un aller-retour.")
 ):
     """
     Fournit une estimation rapide du tarif d'une course.
+    Reponse mise en cache (ETag, Cache-Control) jusqu'au prochain changement de periode tarifaire.
     """
-    resultat = calculateur.calculer_tarif_course(
-        distance_km=distance_km,
-        minutes_attente=minutes_attente,
-        aller_retour=aller_retour
-    )
+    chronologie = calculateur.referentiel.catalogue.taxi
+    maintenant = calculateur.obtenir_heure_france()
+    grille = chronologie.grille_au(maintenant.date())
+    periode = grille.calendrier.periode(maintenant)
+
+    def produire():
+        resultat = calculateur.calculer_tarif_course(
+            distance_km=distance_km,
+            minutes_attente=minutes_attente,
+            date_heure_depart=maintenant,
+            aller_retour=aller_retour
+        )
+        return {
+            "distance_km": distance_km,
+            "aller_retour": aller_retour,
+            "total_estime": resultat.total,
+            "type_tarif": resultat.type_tarif
+        }
 
-    return {
-        "distance_km": distance_km,
-        "aller_retour": aller_retour,
-        "total_estime": resultat["total"],
-        "type_tarif": resultat["type_tarif"]
-    }
\ No newline at end of file
+    # La reponse ne depend que des parametres, de la grille et de la periode en cours
+    expire_a = grille.calendrier.prochain_changement(maintenant)
+    changement_grille = _entree_en_vigueur_suivante(chronologie, maintenant)
+    if changement_grille is not None:
+        expire_a = min(expire_a, changement_grille)
+    return cache_reponses.repondre(
+        request, ("estimation-rapide", grille, periode, distance_km, minutes_attente, aller_retour),
+        produire, expire_a=expire_a, modele=EstimationRapideReponse
+    )
@@ -0,0 +1,353 @@
+"""
+Contrôle d'admission : chaque route coûteuse appartient à une classe (calculs unitaires,
+lots, images) qui borne, par worker, le débit de chaque client (seau à jetons), ses
+requêtes simultanées et les requêtes simultanées de la classe au-delà desquelles les
+suivantes patientent dans une file bornée. Une requête refusée reçoit aussitôt un 429
+(limite du client) ou un 503 (worker saturé) avec Retry-After, avant que son corps ne
+soit lu ; un client qui boucle sur les images ne prive donc plus les calculs de tarifs.
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, NamedTuple, Optional
+from compression.pool import pool_compression
+from serveur import metriques
+from serveur.environnement import actif, entier_env, flottant_env
+
+# Seaux à jetons conservés par classe (les clients les plus anciens sont oubliés)
+CLIENTS_MAX = 10000
+# Poids d'une nouvelle durée dans la moyenne glissante des durées de traitement
+POIDS_DUREE = 0.1
+
+# Classe de chaque route limitée ; les autres (santé, documentation, administration) passent
+ROUTES_CLASSES = {
+    "/calculer-tarif": "calcul",
+    "/calculer-tarif-cpam": "calcul",
+    "/estimation-rapide": "calcul",
+    "/tarifs": "calcul",
+    "/calculer-tarifs-lot": "lot",
+    "/calculer-tarifs-cpam-lot": "lot",
+    "/reprise-tarifs": "lot",
+    "/facturation-cpam": "lot",
+    "/compresser-image": "image",
+    "/compresser-images": "image",
+    "/decliner-image": "image",
+}
+PREFIXES_CLASSES = (("/communes/", "calcul"),)
+
+
+class Refus(NamedTuple):
+    statut: int  # 429 : limite du client ; 503 : worker saturé
+    motif: str
+    reessayer_apres: int  # secondes
+    message: str
+
+
+class Limites(NamedTuple):
+    debit: float  # requêtes par seconde et par client
+    rafale: float  # capacité du seau : requêtes consécutives permises au-delà du débit
+    concurrence: int  # requêtes simultanées de la classe
+    client: int  # requêtes simultanées (en cours ou en file) d'un même client
+    file: int  # requêtes en attente d'une place au-delà de `concurrence`
+    delai: float  # attente maximale en file, en secondes
+    retard: float  # retard de la boucle d'événements au-delà duquel la classe est refusée
+
+
+class SeauJetons:
+    """Seau de `capacite` jetons regarni de `debit` jetons par seconde"""
+    __slots__ = ("jetons", "horodatage")
+
+    def __init__(self, capacite: float, maintenant: float):
+        self.jetons = capacite
+        self.horodatage = maintenant
+
+    def prendre(self, debit: float, capacite: float, maintenant: float) -> float:
+        """Prend un jeton ; retourne 0, ou le délai en secondes avant qu'un jeton soit disponible"""
+        self.jetons = min(capacite, self.jetons + (maintenant - self.horodatage) * debit)
+        self.horodatage = maintenant
+        if self.jetons >= 1:
+            self.jetons -= 1
+            return 0.0
+        return (1 - self.jetons) / debit
+
+
+class ClasseAdmission:
+    """
+    État d'une classe de routes dans ce worker. Tout se passe sur la boucle d'événements :
+    pas de verrou. Une place libérée est transmise directement à la première requête en file.
+    """
+    def __init__(self, nom: str, limites: Limites, duree_initiale: float):
+        self.nom = nom
+        self.limites = limites
+        self.en_cours = 0
+        self.file: Deque[asyncio.Future] = deque()
+        self._seaux: "OrderedDict[str, SeauJetons]" = OrderedDict()
+        self._par_client: Dict[str, int] = {}
+        # Moyenne glissante de la durée des requêtes admises, pour estimer Retry-After
+        self.duree_moyenne = duree_initiale
+        self.admises = 0
+
+    def _reessayer_apres(self, secondes: float) -> int:
+        return max(1, math.ceil(secondes))
+
+    def _controler(self, client: str, maintenant: float, retard_boucle: float) -> Optional[Refus]:
+        limites = self.limites
+        if retard_boucle > limites.retard:
+            return Refus(503, "retard_boucle", self._reessayer_apres(retard_boucle),
+                         "Serveur surchargé, réessayez plus tard")
+        if self._par_client.get(client, 0) >= limites.client:
+            return Refus(429, "concurrence_client", self._reessayer_apres(self.duree_moyenne),
+                         f"Trop de requêtes simultanées ({limites.client} au plus)")
+        seau = self._seaux.get(client)
+        if seau is None:
+            seau = self._seaux[client] = SeauJetons(limites.rafale, maintenant)
+            if len(self._seaux) > CLIENTS_MAX:
+                self._seaux.popitem(last=False)
+        else:
+            self._seaux.move_to_end(client)
+        attente = seau.prendre(limites.debit, limites.rafale, maintenant)
+        if attente:
+            return Refus(429, "debit", self._reessayer_apres(attente),
+                         f"Trop de requêtes ({limites.debit:g} par seconde au plus)")
+        if self.en_cours >= limites.concurrence and len(self.file) >= limites.file:
+            # Temps pour écouler la file, à raison de `concurrence` requêtes à la fois
+            ecoulement = self.duree_moyenne * (len(self.file) + 1) / limites.concurrence
+            return Refus(503, "file_pleine", self._reessayer_apres(ecoulement),
+                         "Serveur saturé, réessayez plus tard")
+        return None
+
+    async def admettre(self, client: str, retard_boucle: float) -> Optional[Refus]:
+        """Réserve une place (après attente éventuelle en file) ou retourne le refus"""
+        refus = self._controler(client, time.monotonic(), retard_boucle)
+        if refus is not None:
+            return refus
+        self._par_client[client] = self._par_client.get(client, 0) + 1
+        if self.en_cours < self.limites.concurrence:
+            self.en_cours += 1
+            return None
+
+        debut = time.perf_counter()
+        place = asyncio.get_running_loop().create_future()
+        self.file.append(place)
+        try:
+            await asyncio.wait_for(place, timeout=self.limites.delai)
+        except asyncio.TimeoutError:
+            if place.done() and not place.cancelled():
+                self._liberer_place()
+            self._retirer_client(client)
+            return Refus(503, "delai_file", self._reessayer_apres(self.duree_moyenne),
+                         "Serveur saturé, réessayez plus tard")
+        except BaseException:
+            # Requête abandonnée en file : une place déjà transmise est rendue
+            if place.done() and not place.cancelled():
+                self._liberer_place()
+            self._retirer_client(client)
+            raise
+        finally:
+            if not place.done():
+                place.cancel()
+            if place.cancelled():
+                # Déjà dépilée si une place s'est libérée entre l'expiration et la reprise
+                try:
+                    self.file.remove(place)
+                except ValueError:
+                    pass
+        metriques.admission_attente.observer(time.perf_counter() - debut, (self.nom,))
+        return None
+
+    def _retirer_client(self, client: str):
+        restantes = self._par_client[client] - 1
+        if restantes:
+            self._par_client[client] = restantes
+        else:
+            del self._par_client[client]
+
+    def _liberer_place(self):
+        while self.file:
+            suivante = self.file.popleft()
+            if not suivante.done():
+                suivante.set_result(None)
+                return
+        self.en_cours -= 1
+
+    def liberer(self, client: str, duree: float):
+        """Fin d'une requête admise : sa place passe à la suivante en file"""
+        self._retirer_client(client)
+        self._liberer_place()
+        self.admises += 1
+        self.duree_moyenne += POIDS_DUREE * (duree - self.duree_moyenne)
+
+    @property
+    def saturee(self) -> bool:
+        """File pleine : les nouvelles requêtes de la classe sont refusées"""
+        return self.en_cours >= self.limites.concurrence and len(self.file) >= self.limites.file
+
+    def etat(self) -> dict:
+        limites = self.limites
+        return {
+            "en_cours": self.en_cours,
+            "en_attente": len(self.file),
+            "saturation": round((self.en_cours + len(self.file)) / (limites.concurrence + limites.file), 3),
+            "saturee": self.saturee,
+            "clients_actifs": len(self._par_client),
+            "duree_moyenne_ms": round(self.duree_moyenne * 1000, 2),
+            "admises": self.admises,
+            "limites": limites._asdict(),
+        }
+
+
+class ControleurAdmission:
+    """Classes de routes de ce worker et identification des clients"""
+    def __init__(self, classes: Dict[str, ClasseAdmission], entete_client: Optional[str] = None,
+                 retard_pret: float = 0.5, proxies_confiance: int = 1):
+        self.classes = classes
+        # En-tête portant l'adresse du client derrière un proxy (ex. x-forwarded-for)
+        self.entete_client = entete_client.lower().encode("latin-1") if entete_client else None
+        # Proxies de confiance devant le serveur, chacun ajoutant à droite l'adresse de son client
+        self.proxies_confiance = max(1, proxies_confiance)
+        self.retard_pret = retard_pret
+        self.refus: Dict[str, int] = {}
+
+    def classe(self, chemin: str) -> Optional[ClasseAdmission]:
+        nom = ROUTES_CLASSES.get(chemin)
+        if nom is None:
+            for prefixe, nom_prefixe in PREFIXES_CLASSES:
+                if chemin.startswith(prefixe):
+                    nom = nom_prefixe
+                    break
+        return self.classes.get(nom) if nom is not None else None
+
+    def client(self, scope) -> str:
+        if self.entete_client is not None:
+            adresses = []
+            for nom, valeur in scope["headers"]:
+                if nom == self.entete_client:
+                    adresses.extend(adresse.strip() for adresse in valeur.decode("latin-1").split(","))
+            if adresses:
+                # Les éléments de gauche viennent du client et peuvent être forgés : l'adresse
+                # retenue est celle ajoutée par le proxy de confiance le plus éloigné
+                return adresses[max(0, len(adresses) - self.proxies_confiance)]
+        adresse = scope.get("client")
+        return adresse[0] if adresse else "inconnu"
+
+    def compter_refus(self, classe: ClasseAdmission, refus: Refus):
+        cle = f"{classe.nom}:{refus.motif}"
+        self.refus[cle] = self.refus.get(cle, 0) + 1
+        metriques.admission_refus.inc((classe.nom, refus.motif))
+
+    def etat(self) -> dict:
+        """Disponibilité du worker : boucle d'événements réactive et aucune classe saturée"""
+        retard = metriques.registre.retard_boucle
+        classes = {nom: classe.etat() for nom, classe in self.classes.items()}
+        pret = retard <= self.retard_pret and not any(etat["saturee"] for etat in classes.values())
+        return {
+            "pret": pret,
+            "pid": os.getpid(),
+            "retard_boucle_ms": round(retard * 1000, 2),
+            "classes": classes,
+            "refus": dict(self.refus),
+        }
+
+    def statistiques_metriques(self):
+        for nom, classe in self.classes.items():
+            yield metriques.admission_en_cours.nom, (nom,), classe.en_cours
+            yield metriques.admission_en_attente.nom, (nom,), len(classe.file)
+
+
+async def _repondre_refus(send, refus: Refus):
+    corps = json.dumps({"detail": refus.message}, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": refus.statut,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(corps)).encode()),
+            (b"retry-after", str(refus.reessayer_apres).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": corps})
+
+
+class MiddlewareAdmission:
+    """
+    Middleware ASGI : admet ou refuse chaque requête des routes limitées avant de la
+    transmettre à l'application ; la place est rendue une fois la réponse entièrement envoyée.
+    """
+    def __init__(self, app, controleur: "ControleurAdmission"):
+        self.app = app
+        self.controleur = controleur
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        classe = self.controleur.classe(scope["path"])
+        if classe is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = self.controleur.client(scope)
+        refus = await classe.admettre(client, metriques.registre.retard_boucle)
+        if refus is not None:
+            self.controleur.compter_refus(classe, refus)
+            await _repondre_refus(send, refus)
+            return
+
+        debut = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            classe.liberer(client, time.perf_counter() - debut)
+
+
+def _limites_env(nom: str, defauts: Limites) -> Limites:
+    """
+    Limites d'une classe, modifiables par ADMISSION_<NOM> : liste « champ=valeur » séparés
+    par des virgules, par exemple ADMISSION_IMAGE="debit=1,rafale=5,client=1".
+    """
+    valeur = os.environ.get(f"ADMISSION_{nom.upper()}", "").strip()
+    if not valeur:
+        return defauts
+    modifications = {}
+    for element in valeur.split(","):
+        champ, _, texte = element.partition("=")
+        champ = champ.strip()
+        if champ not in Limites._fields:
+            raise ValueError(f"ADMISSION_{nom.upper()}: champ inconnu {champ!r} (attendus : {', '.join(Limites._fields)})")
+        type_champ = int if champ in ("concurrence", "client", "file") else float
+        modifications[champ] = type_champ(texte)
+    return defauts._replace(**modifications)
+
+
+def _creer_controleur() -> ControleurAdmission:
+    processus = pool_compression.processus
+    classes = {
+        # Calculs unitaires et communes : quelques dizaines de µs, bornés surtout en débit
+        "calcul": ClasseAdmission("calcul", _limites_env("calcul", Limites(
+            debit=100, rafale=200, concurrence=256, client=32, file=1024, delai=2.0, retard=1.0)), 0.001),
+        # Lots et reprises : jusqu'à des secondes de calcul sur la boucle ou en flux
+        "lot": ClasseAdmission("lot", _limites_env("lot", Limites(
+            debit=2, rafale=10, concurrence=4, client=2, file=16, delai=10.0, retard=0.5)), 0.5),
+        # Images : autant de requêtes simultanées que de processus de compression,
+        # les suivantes patientent ici avant l'envoi de leur fichier
+        "image": ClasseAdmission("image", _limites_env("image", Limites(
+            debit=2, rafale=10, concurrence=processus, client=max(2, processus), file=4 * processus,
+            delai=15.0, retard=0.25)), 0.5),
+    }
+    return ControleurAdmission(
+        classes,
+        entete_client=os.environ.get("ADMISSION_ENTETE_CLIENT") or None,
+        retard_pret=flottant_env("ADMISSION_RETARD_PRET", 0.5),
+        proxies_confiance=entier_env("ADMISSION_PROXIES_CONFIANCE", 1)
+    )
+
+
+# Contrôleur de ce processus ; ADMISSION=false pour ne rien limiter (la sonde de
+# disponibilité ne tient alors compte que du retard de la boucle d'événements)
+controleur_admission = _creer_controleur()
+ADMISSION_ACTIVE = actif("ADMISSION", "true")
+if ADMISSION_ACTIVE:
+    metriques.registre.collecteurs.append(controleur_admission.statistiques_metriques)
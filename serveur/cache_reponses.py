@@ -0,0 +1,170 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Hashable, NamedTuple, Optional, Type
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from pydantic import BaseModel
+from serveur import reponses_rapides
+
+# Taille en dessous de laquelle une réponse n'est pas compressée (comme GZipMiddleware)
+TAILLE_MIN_GZIP = 500
+# Seuil des réponses en cache : compressées une seule fois par entrée, elles le sont dès
+# que le gain couvre l'en-tête gzip (/tarifs passe ainsi d'environ 330 à 210 octets)
+TAILLE_MIN_GZIP_CACHE = 150
+
+
+class ReponseCachee(NamedTuple):
+    corps: bytes
+    corps_gzip: Optional[bytes]  # None si la compression ne ferait rien gagner
+    etag: str  # empreinte du corps, sans guillemets
+    expire_a: float  # horodatage Unix
+
+
+def _corps_json(contenu) -> bytes:
+    # Même sérialisation que JSONResponse
+    return json.dumps(jsonable_encoder(contenu), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def _accepte_gzip(requete: Request) -> bool:
+    for codage in requete.headers.get("accept-encoding", "").split(","):
+        nom, _, parametres = codage.strip().partition(";")
+        if nom.strip().lower() in ("gzip", "*"):
+            return parametres.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def _correspond(if_none_match: str, etag: str) -> bool:
+    """Comparaison faible de If-None-Match (RFC 9110), quelle que soit la représentation"""
+    if if_none_match.strip() == "*":
+        return True
+    for candidat in if_none_match.split(","):
+        candidat = candidat.strip()
+        if candidat.startswith("W/"):
+            candidat = candidat[2:]
+        if candidat.strip('"') in (etag, etag + "-gzip"):
+            return True
+    return False
+
+
+class CacheReponses:
+    """
+    Cache des réponses des routes GET idempotentes. Le corps est stocké sérialisé, et
+    compressé en gzip, une fois pour toutes ; chaque entrée porte un ETag fort et une
+    date d'expiration au-delà de laquelle son contenu peut changer (changement de
+    période tarifaire, entrée en vigueur d'une nouvelle grille). La clé doit contenir
+    tout ce dont dépend la réponse, en particulier la grille tarifaire utilisée :
+    un rechargement des tarifs produit ainsi de nouvelles entrées.
+    """
+    def __init__(self, entrees_max: int, max_age: int):
+        self.entrees_max = entrees_max
+        self.max_age = max_age
+        self._entrees: "OrderedDict[Hashable, ReponseCachee]" = OrderedDict()
+        self._verrou = threading.Lock()
+        self.succes = 0
+        self.echecs = 0
+        self.non_modifiees = 0
+        self.evictions = 0
+
+    def _lire(self, cle: Hashable) -> Optional[ReponseCachee]:
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                return None
+            if entree.expire_a <= time.time():
+                del self._entrees[cle]
+                return None
+            self._entrees.move_to_end(cle)
+            return entree
+
+    def _ecrire(self, cle: Hashable, entree: ReponseCachee):
+        with self._verrou:
+            self._entrees[cle] = entree
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.entrees_max:
+                self._entrees.popitem(last=False)
+                self.evictions += 1
+
+    @staticmethod
+    def _serialiser(contenu, modele: Optional[Type[BaseModel]]) -> bytes:
+        if modele is None:
+            return _corps_json(contenu)
+        if reponses_rapides.REPONSES_RAPIDES or reponses_rapides.REPONSES_RAPIDES_VERIFICATION:
+            return reponses_rapides.serialiser(modele, contenu)
+        return reponses_rapides.serialiser_pydantic(modele, contenu)
+
+    def _produire(self, produire: Callable[[], object], expire_a: float,
+                  modele: Optional[Type[BaseModel]]) -> ReponseCachee:
+        corps = self._serialiser(produire(), modele)
+        corps_gzip = None
+        if len(corps) >= TAILLE_MIN_GZIP_CACHE:
+            compresse = gzip.compress(corps, compresslevel=9, mtime=0)
+            if len(compresse) < len(corps):
+                corps_gzip = compresse
+        etag = hashlib.blake2b(corps, digest_size=16).hexdigest()
+        return ReponseCachee(corps, corps_gzip, etag, expire_a)
+
+    def repondre(self, requete: Request, cle: Hashable, produire: Callable[[], object],
+                 expire_a: Optional[datetime] = None,
+                 modele: Optional[Type[BaseModel]] = None) -> Response:
+        """
+        Réponse JSON de `produire()` servie depuis le cache. `expire_a` (avec fuseau) borne
+        la durée de validité ; à défaut, elle vaut max_age. `modele` est le response_model
+        de la route, appliqué au corps comme le ferait FastAPI. Répond 304 si le client
+        possède déjà cette version.
+        """
+        maintenant = time.time()
+        limite = maintenant + self.max_age
+        if expire_a is not None:
+            limite = min(limite, expire_a.timestamp())
+
+        entree = self._lire(cle)
+        if entree is None:
+            self.echecs += 1
+            entree = self._produire(produire, limite, modele)
+            self._ecrire(cle, entree)
+        else:
+            self.succes += 1
+
+        avec_gzip = entree.corps_gzip is not None and _accepte_gzip(requete)
+        entetes = {
+            "ETag": f'"{entree.etag}-gzip"' if avec_gzip else f'"{entree.etag}"',
+            "Cache-Control": f"public, max-age={max(0, int(entree.expire_a - maintenant))}",
+            "Vary": "Accept-Encoding"
+        }
+
+        if_none_match = requete.headers.get("if-none-match")
+        if if_none_match and _correspond(if_none_match, entree.etag):
+            self.non_modifiees += 1
+            return Response(status_code=304, headers=entetes)
+
+        if avec_gzip:
+            entetes["Content-Encoding"] = "gzip"
+            return Response(content=entree.corps_gzip, media_type="application/json", headers=entetes)
+        return Response(content=entree.corps, media_type="application/json", headers=entetes)
+
+    def statistiques(self) -> dict:
+        with self._verrou:
+            taille = len(self._entrees)
+        return {
+            "succes": self.succes,
+            "echecs": self.echecs,
+            "non_modifiees": self.non_modifiees,
+            "evictions": self.evictions,
+            "taille": taille,
+            "taille_max": self.entrees_max,
+            "max_age": self.max_age
+        }
+
+
+cache_reponses = CacheReponses(
+    entrees_max=int(os.environ.get("CACHE_HTTP_ENTREES", 1024)),
+    max_age=int(os.environ.get("CACHE_HTTP_MAX_AGE", 300))
+)
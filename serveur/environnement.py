@@ -0,0 +1,22 @@
+"""
+Lecture de la configuration dans les variables d'environnement : une variable absente ou
+vide prend la valeur par défaut.
+"""
+import os
+from typing import Optional
+
+VALEURS_VRAIES = ("1", "true", "oui")
+
+
+def actif(variable: str, defaut: str = "false") -> bool:
+    return (os.environ.get(variable) or defaut).strip().lower() in VALEURS_VRAIES
+
+
+def entier_env(variable: str, defaut: int) -> int:
+    valeur = os.environ.get(variable)
+    return int(valeur) if valeur else defaut
+
+
+def flottant_env(variable: str, defaut: Optional[float] = None) -> Optional[float]:
+    valeur = os.environ.get(variable)
+    return float(valeur) if valeur else defaut
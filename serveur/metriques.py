@@ -0,0 +1,449 @@
+import asyncio
+import glob
+import json
+import os
+import tempfile
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from serveur.environnement import flottant_env
+
+# Bornes des histogrammes de durée des requêtes, en secondes
+BORNES_DUREE_REQUETE = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BORNES_ENCODAGE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BORNES_RETARD_BOUCLE = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+# Période d'échantillonnage du retard de la boucle d'événements, en secondes
+PERIODE_SONDE_BOUCLE = 0.5
+
+TYPE_CONTENU = "text/plain; version=0.0.4; charset=utf-8"
+
+Etiquettes = Tuple[str, ...]
+
+
+class Famille:
+    """Métrique et ses séries, une par combinaison de valeurs d'étiquettes"""
+    type = ""
+
+    def __init__(self, nom: str, aide: str, etiquettes: Sequence[str] = ()):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = tuple(etiquettes)
+        self.series: Dict[Etiquettes, object] = {}
+
+
+class Compteur(Famille):
+    type = "counter"
+
+    def inc(self, etiquettes: Etiquettes = (), valeur: float = 1):
+        self.series[etiquettes] = self.series.get(etiquettes, 0) + valeur
+
+
+class Jauge(Famille):
+    type = "gauge"
+
+    def fixer(self, etiquettes: Etiquettes, valeur: float):
+        self.series[etiquettes] = valeur
+
+    def inc(self, etiquettes: Etiquettes = (), valeur: float = 1):
+        self.series[etiquettes] = self.series.get(etiquettes, 0) + valeur
+
+
+class Histogramme(Famille):
+    """Série : [compte par seau (le dernier pour +Inf)..., somme des observations]"""
+    type = "histogram"
+
+    def __init__(self, nom: str, aide: str, bornes: Sequence[float], etiquettes: Sequence[str] = ()):
+        super().__init__(nom, aide, etiquettes)
+        self.bornes = tuple(bornes)
+
+    def observer(self, valeur: float, etiquettes: Etiquettes = ()):
+        serie = self.series.get(etiquettes)
+        if serie is None:
+            serie = self.series[etiquettes] = [0] * (len(self.bornes) + 1) + [0.0]
+        serie[bisect_left(self.bornes, valeur)] += 1
+        serie[-1] += valeur
+
+
+class Registre:
+    """
+    Métriques du processus. Les mises à jour se font depuis la boucle d'événements,
+    sans verrou. Les `collecteurs` sont appelés à chaque instantané pour les valeurs
+    tenues ailleurs (compteurs des caches) : rien n'est fait pour elles pendant les requêtes.
+
+    Avec plusieurs workers, chaque processus écrit périodiquement son instantané dans
+    `repertoire` ; l'exposition, servie par n'importe lequel d'entre eux, additionne les
+    instantanés. Les compteurs et histogrammes des processus arrêtés restent comptés
+    (ils ne doivent pas décroître) ; leurs jauges sont ignorées. Leurs instantanés sont
+    fondus dans un fichier cumulé unique, pour que le nombre de fichiers lus à chaque
+    exposition ne croisse pas avec le remplacement des workers.
+
+    Les instantanés sont pris sur la boucle d'événements (seule à modifier les séries) ;
+    seules l'écriture et la lecture des fichiers se font dans un thread.
+    """
+    def __init__(self, repertoire: Optional[str] = None, intervalle: float = 5.0):
+        self.repertoire = repertoire
+        self.intervalle = intervalle
+        self.familles: Dict[str, Famille] = {}
+        self.collecteurs: List[Callable[[], Iterable[Tuple[str, Etiquettes, float]]]] = []
+        # Taux dérivés après agrégation : nom -> (aide, famille des succès, famille des échecs)
+        self.taux: Dict[str, Tuple[str, str, str]] = {}
+        # Dernier retard mesuré par la sonde de la boucle d'événements (contrôle d'admission)
+        self.retard_boucle = 0.0
+        self._taches: List[asyncio.Task] = []
+        # Identifiant de l'instance (processus) : un pid réutilisé n'écrase pas le fichier d'un worker arrêté
+        self._pid: Optional[int] = None
+        self._instance = ""
+
+    def _ajouter(self, famille: Famille) -> Famille:
+        self.familles[famille.nom] = famille
+        return famille
+
+    def compteur(self, nom: str, aide: str, etiquettes: Sequence[str] = ()) -> Compteur:
+        return self._ajouter(Compteur(nom, aide, etiquettes))
+
+    def jauge(self, nom: str, aide: str, etiquettes: Sequence[str] = ()) -> Jauge:
+        return self._ajouter(Jauge(nom, aide, etiquettes))
+
+    def histogramme(self, nom: str, aide: str, bornes: Sequence[float], etiquettes: Sequence[str] = ()) -> Histogramme:
+        return self._ajouter(Histogramme(nom, aide, bornes, etiquettes))
+
+    # --- Instantanés ---
+
+    @property
+    def instance(self) -> str:
+        # Calculé dans chaque worker : le registre est créé par le maître avant le fork
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._instance = f"{self._pid}-{time.time_ns()}"
+        return self._instance
+
+    def instantane(self, actif: bool = True) -> dict:
+        """Copie des séries, à prendre sur la boucle d'événements"""
+        for collecteur in self.collecteurs:
+            for nom, etiquettes, valeur in collecteur():
+                self.familles[nom].series[etiquettes] = valeur
+        return {
+            "pid": os.getpid(),
+            "instance": self.instance,
+            "actif": actif,
+            "familles": {
+                nom: [[list(etiquettes), list(valeur) if isinstance(valeur, list) else valeur]
+                      for etiquettes, valeur in list(famille.series.items())]
+                for nom, famille in self.familles.items()
+            }
+        }
+
+    def _chemin(self, instance: str) -> str:
+        return os.path.join(self.repertoire, f"metriques-{instance}.json")
+
+    def _ecrire(self, instantane: dict, chemin: str):
+        descripteur, temporaire = tempfile.mkstemp(dir=self.repertoire, prefix=".metriques-")
+        with os.fdopen(descripteur, "w") as fichier:
+            json.dump(instantane, fichier)
+        os.replace(temporaire, chemin)
+
+    def ecrire_instantane(self, instantane: Optional[dict] = None):
+        """Écrit l'instantané (pris maintenant par défaut) de ce processus ; bloquant"""
+        if not self.repertoire:
+            return
+        instantane = instantane or self.instantane()
+        self._ecrire(instantane, self._chemin(instantane["instance"]))
+
+    @staticmethod
+    def _processus_vivant(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    @staticmethod
+    def _lire(chemin: str) -> Optional[dict]:
+        try:
+            with open(chemin) as fichier:
+                return json.load(fichier)
+        except (OSError, ValueError):
+            return None
+
+    def _ajouter_series(self, totaux: Dict[str, Dict[Etiquettes, object]], instantane: dict):
+        for nom, series in instantane["familles"].items():
+            famille = self.familles.get(nom)
+            if famille is None or (famille.type == "gauge" and not instantane["actif"]):
+                continue
+            total = totaux.setdefault(nom, {})
+            for etiquettes, valeur in series:
+                etiquettes = tuple(etiquettes)
+                precedent = total.get(etiquettes)
+                if precedent is None:
+                    total[etiquettes] = list(valeur) if isinstance(valeur, list) else valeur
+                elif isinstance(valeur, list):
+                    total[etiquettes] = [a + b for a, b in zip(precedent, valeur)]
+                else:
+                    total[etiquettes] = precedent + valeur
+
+    def _fondre_arretes(self, arretes: List[Tuple[str, dict]]) -> Optional[dict]:
+        """
+        Fond les instantanés des processus arrêtés dans le fichier cumulé, sous verrou
+        (plusieurs workers peuvent exposer en même temps), puis supprime leurs fichiers.
+        Le cumul retient les instances qu'il vient d'absorber : après un arrêt entre son
+        écriture et les suppressions, les fichiers restants ne sont pas comptés deux fois.
+        """
+        import fcntl  # Répertoire partagé : déploiement multi-workers gunicorn, donc Unix
+        chemin_cumul = os.path.join(self.repertoire, "cumul.json")
+        with open(os.path.join(self.repertoire, ".verrou"), "w") as verrou:
+            fcntl.flock(verrou, fcntl.LOCK_EX)
+            cumul = self._lire(chemin_cumul) or {"instances": [], "familles": {}}
+            deja_fondues = set(cumul["instances"])
+            totaux: Dict[str, Dict[Etiquettes, object]] = {}
+            self._ajouter_series(totaux, {"actif": False, "familles": cumul["familles"]})
+            fondues = []
+            for chemin, instantane in arretes:
+                if not os.path.exists(chemin):
+                    continue  # fondu entre-temps par un autre worker
+                instance = instantane.get("instance", chemin)
+                if instance not in deja_fondues:
+                    self._ajouter_series(totaux, dict(instantane, actif=False))
+                fondues.append(instance)
+            if fondues:
+                cumul = {
+                    "instances": fondues,
+                    "familles": {nom: [[list(etiquettes), valeur] for etiquettes, valeur in series.items()]
+                                 for nom, series in totaux.items()},
+                }
+                self._ecrire(cumul, chemin_cumul)
+                for chemin, _ in arretes:
+                    try:
+                        os.unlink(chemin)
+                    except OSError:
+                        pass
+        return dict(cumul, actif=False)
+
+    def _instantanes(self, local: dict) -> List[dict]:
+        if not self.repertoire:
+            return [local]
+        self.ecrire_instantane(local)
+        instantanes = [local]
+        arretes = []
+        for chemin in glob.glob(os.path.join(self.repertoire, "metriques-*.json")):
+            instantane = self._lire(chemin)
+            if instantane is None or instantane.get("instance") == local["instance"]:
+                continue
+            if instantane["actif"] and self._processus_vivant(instantane["pid"]):
+                instantanes.append(instantane)
+            else:
+                arretes.append((chemin, instantane))
+        if arretes or os.path.exists(os.path.join(self.repertoire, "cumul.json")):
+            cumul = self._fondre_arretes(arretes) if arretes else dict(self._lire(
+                os.path.join(self.repertoire, "cumul.json")) or {"familles": {}}, actif=False)
+            instantanes.append(cumul)
+        return instantanes
+
+    def agreger(self, local: Optional[dict] = None) -> Dict[str, Dict[Etiquettes, object]]:
+        """
+        Séries de toutes les familles, additionnées sur les processus. `local` : instantané
+        de ce processus, pris sur la boucle d'événements (la lecture des autres est bloquante).
+        """
+        totaux: Dict[str, Dict[Etiquettes, object]] = {nom: {} for nom in self.familles}
+        for instantane in self._instantanes(local or self.instantane()):
+            self._ajouter_series(totaux, instantane)
+        return totaux
+
+    # --- Exposition au format texte de Prometheus ---
+
+    @staticmethod
+    def _etiquettes(noms: Sequence[str], valeurs: Sequence[str], supplement: str = "") -> str:
+        paires = [f'{nom}="{_echapper(valeur)}"' for nom, valeur in zip(noms, valeurs)]
+        if supplement:
+            paires.append(supplement)
+        return "{" + ",".join(paires) + "}" if paires else ""
+
+    def exposer(self, local: Optional[dict] = None) -> str:
+        totaux = self.agreger(local)
+        lignes = []
+        for nom, famille in self.familles.items():
+            lignes.append(f"# HELP {nom} {famille.aide}")
+            lignes.append(f"# TYPE {nom} {famille.type}")
+            for etiquettes, valeur in sorted(totaux[nom].items()):
+                if famille.type == "histogram":
+                    cumul = 0
+                    for borne, compte in zip(famille.bornes + (float("inf"),), valeur[:-1]):
+                        cumul += compte
+                        le = 'le="+Inf"' if borne == float("inf") else f'le="{borne!r}"'
+                        lignes.append(f"{nom}_bucket{self._etiquettes(famille.etiquettes, etiquettes, le)} {cumul}")
+                    texte = self._etiquettes(famille.etiquettes, etiquettes)
+                    lignes.append(f"{nom}_sum{texte} {_nombre(valeur[-1])}")
+                    lignes.append(f"{nom}_count{texte} {cumul}")
+                else:
+                    lignes.append(f"{nom}{self._etiquettes(famille.etiquettes, etiquettes)} {_nombre(valeur)}")
+        for nom, (aide, nom_succes, nom_echecs) in self.taux.items():
+            famille = self.familles[nom_succes]
+            lignes.append(f"# HELP {nom} {aide}")
+            lignes.append(f"# TYPE {nom} gauge")
+            for etiquettes, succes in sorted(totaux[nom_succes].items()):
+                appels = succes + totaux[nom_echecs].get(etiquettes, 0)
+                taux = succes / appels if appels else 0.0
+                lignes.append(f"{nom}{self._etiquettes(famille.etiquettes, etiquettes)} {_nombre(taux)}")
+        return "\n".join(lignes) + "\n"
+
+    # --- Tâches de fond (une boucle d'événements par worker) ---
+
+    async def _sonder_boucle(self):
+        boucle = asyncio.get_running_loop()
+        while True:
+            debut = boucle.time()
+            await asyncio.sleep(PERIODE_SONDE_BOUCLE)
+            self.retard_boucle = max(0.0, boucle.time() - debut - PERIODE_SONDE_BOUCLE)
+            retard_boucle.observer(self.retard_boucle)
+
+    async def _publier(self):
+        boucle = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.intervalle)
+            # Instantané pris sur la boucle : le thread n'écrit qu'une copie
+            await boucle.run_in_executor(None, self.ecrire_instantane, self.instantane())
+
+    def demarrer(self):
+        self._taches.append(asyncio.ensure_future(self._sonder_boucle()))
+        if self.repertoire:
+            os.makedirs(self.repertoire, exist_ok=True)
+            self._taches.append(asyncio.ensure_future(self._publier()))
+
+    def arreter(self):
+        for tache in self._taches:
+            tache.cancel()
+        self._taches.clear()
+        # Dernier instantané : les compteurs de ce processus restent dans les totaux
+        self.ecrire_instantane(self.instantane(actif=False))
+
+
+def _echapper(valeur: str) -> str:
+    return str(valeur).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _nombre(valeur: float) -> str:
+    if isinstance(valeur, int) or float(valeur).is_integer():
+        return str(int(valeur))
+    return repr(float(valeur))
+
+
+registre = Registre(
+    repertoire=os.environ.get("METRIQUES_REPERTOIRE") or None,
+    intervalle=flottant_env("METRIQUES_INTERVALLE", 5.0)
+)
+
+# --- Requêtes HTTP ---
+
+requetes = registre.compteur("taxi_http_requetes_total", "Requêtes HTTP traitées", ("route", "methode", "statut"))
+duree_requetes = registre.histogramme("taxi_http_duree_requete_secondes", "Durée des requêtes HTTP",
+                                      BORNES_DUREE_REQUETE, ("route", "methode"))
+requetes_en_cours = registre.jauge("taxi_http_requetes_en_cours", "Requêtes HTTP en cours de traitement")
+requetes_en_cours.fixer((), 0)
+
+# --- Images ---
+
+images = registre.compteur("taxi_images_total", "Images compressées, par statut du cache", ("cache",))
+octets_images_entree = registre.compteur("taxi_images_octets_entree_total", "Octets des images reçues")
+octets_images_sortie = registre.compteur("taxi_images_octets_sortie_total", "Octets des images WebP produites")
+duree_encodage = registre.histogramme("taxi_images_encodage_secondes",
+                                      "Durée d'encodage WebP des images réellement compressées", BORNES_ENCODAGE)
+
+# --- Boucle d'événements ---
+
+retard_boucle = registre.histogramme("taxi_boucle_retard_secondes",
+                                     "Retard de réveil de la boucle d'événements (sonde périodique)",
+                                     BORNES_RETARD_BOUCLE)
+
+# --- Contrôle d'admission ---
+
+admission_refus = registre.compteur("taxi_admission_refus_total", "Requêtes refusées par le contrôle d'admission",
+                                    ("classe", "motif"))
+admission_attente = registre.histogramme("taxi_admission_attente_secondes", "Attente en file avant admission",
+                                         BORNES_DUREE_REQUETE, ("classe",))
+admission_en_cours = registre.jauge("taxi_admission_en_cours", "Requêtes admises en cours, par classe", ("classe",))
+admission_en_attente = registre.jauge("taxi_admission_en_attente", "Requêtes en file d'attente, par classe", ("classe",))
+
+# --- Caches (valeurs relevées à chaque instantané) ---
+
+cache_succes = registre.compteur("taxi_cache_succes_total", "Succès des caches", ("cache",))
+cache_echecs = registre.compteur("taxi_cache_echecs_total", "Échecs des caches", ("cache",))
+cache_evictions = registre.compteur("taxi_cache_evictions_total", "Évictions des caches", ("cache",))
+cache_entrees = registre.jauge("taxi_cache_entrees", "Entrées présentes dans les caches", ("cache",))
+registre.taux["taxi_cache_taux_succes"] = (
+    "Part des succès des caches depuis le démarrage, tous workers confondus",
+    "taxi_cache_succes_total", "taxi_cache_echecs_total"
+)
+
+
+def _statistiques_caches():
+    # Imports différés : le registre ne dépend pas des calculateurs
+    from calculators.taxi_calculator import calculateur_taxi
+    from calculators.cpam_calculator import statistiques_registre_cpam
+    from compression.cache import cache_images
+    from serveur.cache_reponses import cache_reponses
+
+    caches = {"taxi": calculateur_taxi.statistiques_cache(), "http": cache_reponses.statistiques()}
+    departements = statistiques_registre_cpam()["departements"].values()
+    caches["cpam"] = {
+        cle: sum(statistiques[cle] for statistiques in departements)
+        for cle in ("succes", "echecs", "evictions", "taille")
+    }
+    statistiques_images = cache_images.statistiques()
+    caches["images"] = dict(statistiques_images,
+                            succes=statistiques_images["succes"] + statistiques_images["succes_disque"])
+    for nom, statistiques in caches.items():
+        yield cache_succes.nom, (nom,), statistiques["succes"]
+        yield cache_echecs.nom, (nom,), statistiques["echecs"]
+        yield cache_evictions.nom, (nom,), statistiques["evictions"]
+        yield cache_entrees.nom, (nom,), statistiques["taille"]
+
+
+registre.collecteurs.append(_statistiques_caches)
+
+
+class MiddlewareMetriques:
+    """
+    Middleware ASGI minimal : compte les requêtes par modèle de route (pas par chemin,
+    pour borner le nombre de séries), mesure leur durée jusqu'au dernier octet envoyé
+    et suit les requêtes en cours. Deux lectures d'horloge et quelques opérations de
+    dictionnaire par requête.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        debut = time.perf_counter()
+        statut = "500"
+        termine = False
+        en_cours = requetes_en_cours.series
+        en_cours[()] += 1
+
+        def finir():
+            nonlocal termine
+            if termine:
+                return
+            termine = True
+            en_cours[()] -= 1
+            route = scope.get("route")
+            modele = route.path if route is not None else "autre"
+            methode = scope["method"]
+            requetes.inc((modele, methode, statut))
+            duree_requetes.observer(time.perf_counter() - debut, (modele, methode))
+
+        async def envoyer(message):
+            nonlocal statut
+            if message["type"] == "http.response.start":
+                statut = str(message["status"])
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finir()
+
+        try:
+            await self.app(scope, receive, envoyer)
+        finally:
+            finir()
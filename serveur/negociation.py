@@ -0,0 +1,49 @@
+"""
+Négociation du type de réponse d'après l'en-tête Accept : poids q de chaque type de
+média, le type exact l'emportant sur « type/* », lui-même l'emportant sur « */* ».
+"""
+from typing import Dict, Optional, Sequence, Tuple
+
+
+def preferences(accept: str) -> Dict[str, float]:
+    """Poids q de chaque type de média (ou intervalle « type/* », « */* ») de l'en-tête Accept"""
+    poids = {}
+    for element in accept.split(","):
+        type_media, *parametres = element.split(";")
+        type_media = type_media.strip().lower()
+        if not type_media:
+            continue
+        q = 1.0
+        for parametre in parametres:
+            nom, _, valeur = parametre.partition("=")
+            if nom.strip().lower() == "q":
+                try:
+                    q = min(1.0, max(0.0, float(valeur)))
+                except ValueError:
+                    q = 0.0
+        poids.setdefault(type_media, q)
+    return poids
+
+
+def _poids(preferences_accept: Dict[str, float], type_media: str) -> Tuple[float, int]:
+    """(poids, précision) du type : entrée exacte (2), sinon « type/* » (1), sinon « */* » (0)"""
+    for precision, cle in ((2, type_media), (1, type_media.split("/")[0] + "/*"), (0, "*/*")):
+        if cle in preferences_accept:
+            return preferences_accept[cle], precision
+    return 0.0, 0
+
+
+def choisir(accept: Optional[str], proposes: Sequence[str]) -> Optional[str]:
+    """
+    Type proposé que le client préfère : plus grand poids, puis mention la plus précise,
+    puis ordre de `proposes`. Le premier proposé sans en-tête Accept ; None si aucun n'est accepté.
+    """
+    if not accept:
+        return proposes[0] if proposes else None
+    preferences_accept = preferences(accept)
+    meilleur, meilleur_poids = None, (0.0, 0)
+    for type_media in proposes:
+        poids = _poids(preferences_accept, type_media)
+        if poids[0] > 0 and poids > meilleur_poids:
+            meilleur, meilleur_poids = type_media, poids
+    return meilleur
@@ -0,0 +1,8 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def creer_executeur(processus: int) -> ProcessPoolExecutor:
+    """Pool de processus auxiliaires d'un worker (compression d'images, facturation)"""
+    # "spawn" : pas de fork d'un processus serveur multi-threadé
+    return ProcessPoolExecutor(max_workers=processus, mp_context=multiprocessing.get_context("spawn"))
@@ -0,0 +1,296 @@
+import asyncio
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+from serveur.environnement import actif, entier_env, flottant_env
+
+# Racine des piles des échantillons pris pendant que la requête ne s'exécutait pas sur la
+# boucle d'événements (attente d'E/S, du pool de compression, d'un thread, ou d'une autre requête) ;
+# elle est suivie de la chaîne des coroutines suspendues de la requête, jusqu'à l'attente
+PILE_ATTENTE = "(en attente)"
+# Garde-fou contre une chaîne d'attente anormalement longue (ou cyclique)
+PROFONDEUR_MAX_ATTENTE = 200
+
+
+class ProfilRequete:
+    """Échantillons de pile d'une requête, comptés par pile"""
+    def __init__(self, numero: int, scope: dict, cadre_racine, raison: Optional[str],
+                 tache: Optional[asyncio.Task] = None):
+        self.numero = numero
+        self.methode = scope["method"]
+        self.chemin = scope["path"]
+        self.route: Optional[str] = None
+        self.raison = raison  # None : retenu seulement s'il dépasse le seuil
+        self.cadre_racine = cadre_racine
+        self.tache = tache
+        self.thread = threading.get_ident()
+        self.debut = time.time()
+        self.duree_ms = 0.0
+        self.statut: Optional[int] = None
+        self.piles: Counter = Counter()
+
+    @property
+    def echantillons(self) -> int:
+        return sum(self.piles.values())
+
+    def resume(self) -> dict:
+        return {
+            "numero": self.numero,
+            "methode": self.methode,
+            "chemin": self.chemin,
+            "route": self.route,
+            "statut": self.statut,
+            "raison": self.raison,
+            "debut": datetime.fromtimestamp(self.debut).isoformat(timespec="milliseconds"),
+            "duree_ms": round(self.duree_ms, 2),
+            "echantillons": self.echantillons,
+            "echantillons_en_attente": sum(nombre for pile, nombre in self.piles.items()
+                                           if pile.split(";", 1)[0] == PILE_ATTENTE),
+        }
+
+    def piles_repliees(self, prefixe: str = "") -> Counter:
+        """Piles au format replié (racine;...;feuille), préfixées de la route"""
+        racine = f"{self.methode} {self.route or self.chemin}"
+        if prefixe:
+            racine = f"{prefixe};{racine}"
+        return Counter({f"{racine};{pile}": nombre for pile, nombre in self.piles.items()})
+
+
+class Profileur:
+    """
+    Profileur par échantillonnage des piles, requête par requête. Un thread relève à
+    intervalle fixe la pile du thread de la boucle d'événements et l'attribue aux
+    requêtes suivies dont la coroutine y figure (la requête s'exécute) ; sinon
+    l'échantillon est compté « en attente », avec la chaîne des coroutines suspendues
+    de la requête (cr_await depuis sa tâche) qui montre où elle attend. Une requête est suivie si elle est tirée
+    au sort (`taux`), si elle porte l'en-tête de profilage, ou, quand un `seuil_ms` est
+    fixé, systématiquement : elle n'est alors conservée que si elle l'a dépassé.
+
+    Sans seuil, une requête non retenue ne coûte qu'un tirage et une lecture d'en-tête,
+    et le thread d'échantillonnage dort tant qu'aucune requête n'est suivie. Les derniers
+    profils sont gardés dans un tampon circulaire.
+    """
+    def __init__(self, taux: float = 0.0, seuil_ms: Optional[float] = None, intervalle_ms: float = 5.0,
+                 profils_max: int = 50, entete: str = "x-profilage", jeton: Optional[str] = None):
+        self.taux = taux
+        self.seuil_ms = seuil_ms
+        self.intervalle = intervalle_ms / 1000
+        self.entete = entete.lower().encode("latin-1")
+        self.jeton = jeton
+        self.profils: Deque[ProfilRequete] = deque(maxlen=profils_max)
+        self._suivis: Dict[int, ProfilRequete] = {}
+        self._numeros = itertools.count(1)
+        self._verrou = threading.Lock()
+        self._reveil = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._libelles: Dict[object, str] = {}
+        self.requetes_suivies = 0
+        self.profils_retenus = 0
+
+    # --- Décision de suivi ---
+
+    def raison(self, scope: dict) -> Optional[str]:
+        """Motif de profilage d'une requête (taux ou en-tête), None sinon"""
+        if self.taux and random.random() < self.taux:
+            return "taux"
+        for nom, valeur in scope["headers"]:
+            if nom == self.entete:
+                valeur = valeur.decode("latin-1").strip()
+                if (valeur == self.jeton) if self.jeton else valeur.lower() in ("1", "true", "oui"):
+                    return "entete"
+        return None
+
+    # --- Suivi des requêtes ---
+
+    def suivre(self, scope: dict, cadre_racine, raison: Optional[str],
+               tache: Optional[asyncio.Task] = None) -> ProfilRequete:
+        profil = ProfilRequete(next(self._numeros), scope, cadre_racine, raison, tache)
+        with self._verrou:
+            self._suivis[profil.numero] = profil
+            self.requetes_suivies += 1
+        self._demarrer_thread()
+        self._reveil.set()
+        return profil
+
+    def terminer(self, profil: ProfilRequete, duree_ms: float, statut: Optional[int], route: Optional[str]):
+        with self._verrou:
+            del self._suivis[profil.numero]
+        profil.cadre_racine = None
+        profil.tache = None
+        profil.duree_ms = duree_ms
+        profil.statut = statut
+        profil.route = route
+        if profil.raison is None:
+            if self.seuil_ms is None or duree_ms < self.seuil_ms:
+                return
+            profil.raison = "seuil"
+        self.profils_retenus += 1
+        self.profils.append(profil)
+
+    # --- Échantillonnage ---
+
+    def _demarrer_thread(self):
+        if self._thread is None:
+            with self._verrou:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._boucle, name="profileur", daemon=True)
+                    self._thread.start()
+
+    def _libelle(self, cadre) -> str:
+        code = cadre.f_code
+        libelle = self._libelles.get(code)
+        if libelle is None:
+            fichier = code.co_filename
+            for prefixe in sys.path:
+                if prefixe and fichier.startswith(prefixe):
+                    fichier = fichier[len(prefixe):].lstrip(os.sep)
+                    break
+            libelle = f"{code.co_name} ({fichier}:{code.co_firstlineno})"
+            self._libelles[code] = libelle
+        return libelle
+
+    def _pile_attente(self, profil: ProfilRequete) -> str:
+        """
+        Pile d'un échantillon « en attente » : coroutines suspendues sous celle de la requête
+        (exclue), en suivant cr_await depuis la coroutine de sa tâche jusqu'à l'objet attendu.
+        La chaîne est lue depuis le thread d'échantillonnage pendant que la boucle tourne : une
+        chaîne incohérente (coroutine reprise entre-temps) ne fausse qu'un échantillon.
+        """
+        tache = profil.tache
+        if tache is None or tache.done():
+            return PILE_ATTENTE
+        libelles = [PILE_ATTENTE]
+        sous_requete = False
+        attendu = tache.get_coro()
+        for _ in range(PROFONDEUR_MAX_ATTENTE):
+            # Coroutine, générateur (yield from) ou générateur asynchrone
+            cadre = (getattr(attendu, "cr_frame", None) or getattr(attendu, "gi_frame", None)
+                     or getattr(attendu, "ag_frame", None))
+            if cadre is None:
+                break
+            if sous_requete:
+                libelles.append(self._libelle(cadre))
+            elif cadre is profil.cadre_racine:
+                sous_requete = True
+            attendu = (getattr(attendu, "cr_await", None) or getattr(attendu, "gi_yieldfrom", None)
+                       or getattr(attendu, "ag_await", None))
+        return ";".join(libelles)
+
+    def _echantillonner(self):
+        # Sous verrou : un profil terminé n'est plus modifié
+        with self._verrou:
+            if self._suivis:
+                self._attribuer(list(self._suivis.values()))
+
+    def _attribuer(self, suivis: List[ProfilRequete]):
+        cadres_threads = sys._current_frames()
+        piles = {}
+        for profil in suivis:
+            if profil.thread not in piles:
+                pile = []
+                cadre = cadres_threads.get(profil.thread)
+                while cadre is not None:
+                    pile.append(cadre)
+                    cadre = cadre.f_back
+                piles[profil.thread] = (pile, {id(cadre): position for position, cadre in enumerate(pile)})
+            pile, positions = piles[profil.thread]
+            position = positions.get(id(profil.cadre_racine))
+            if position is None:
+                profil.piles[self._pile_attente(profil)] += 1
+            else:
+                # De la coroutine de la requête (exclue) jusqu'à la feuille
+                profil.piles[";".join(self._libelle(cadre) for cadre in reversed(pile[:position]))] += 1
+
+    def _boucle(self):
+        while True:
+            self._reveil.wait()
+            debut = time.perf_counter()
+            self._echantillonner()
+            with self._verrou:
+                if not self._suivis:
+                    self._reveil.clear()
+                    continue
+            time.sleep(max(0.0, self.intervalle - (time.perf_counter() - debut)))
+
+    # --- Consultation ---
+
+    def liste(self) -> List[dict]:
+        return [profil.resume() for profil in reversed(self.profils)]
+
+    def profil(self, numero: int) -> Optional[ProfilRequete]:
+        for profil in self.profils:
+            if profil.numero == numero:
+                return profil
+        return None
+
+    def piles_repliees(self, route: Optional[str] = None) -> str:
+        """Piles repliées de tous les profils retenus (d'une route), prêtes pour flamegraph.pl"""
+        total = Counter()
+        for profil in list(self.profils):
+            if route is None or profil.route == route:
+                total.update(profil.piles_repliees())
+        return "".join(f"{pile} {nombre}\n" for pile, nombre in total.most_common())
+
+    def statistiques(self) -> dict:
+        return {
+            "actif": True,
+            "taux": self.taux,
+            "seuil_ms": self.seuil_ms,
+            "intervalle_ms": self.intervalle * 1000,
+            "requetes_suivies": self.requetes_suivies,
+            "profils_retenus": self.profils_retenus,
+            "profils_conserves": len(self.profils),
+            "profils_max": self.profils.maxlen,
+        }
+
+
+class MiddlewareProfilage:
+    """Middleware ASGI : suit les requêtes retenues par le profileur"""
+    def __init__(self, app, profileur: Profileur):
+        self.app = app
+        self.profileur = profileur
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        raison = self.profileur.raison(scope)
+        if raison is None and self.profileur.seuil_ms is None:
+            await self.app(scope, receive, send)
+            return
+
+        statut = None
+
+        async def envoyer(message):
+            nonlocal statut
+            if message["type"] == "http.response.start":
+                statut = message["status"]
+            await send(message)
+
+        debut = time.perf_counter()
+        # Cadre de cette coroutine : présent dans la pile du thread tant que la requête s'exécute
+        profil = self.profileur.suivre(scope, sys._getframe(), raison, asyncio.current_task())
+        try:
+            await self.app(scope, receive, envoyer)
+        finally:
+            route = scope.get("route")
+            self.profileur.terminer(profil, (time.perf_counter() - debut) * 1000, statut,
+                                    route.path if route is not None else None)
+
+
+# Profileur de ce processus, None si le profilage n'est pas activé (PROFILAGE)
+profileur: Optional[Profileur] = None
+if actif("PROFILAGE"):
+    profileur = Profileur(
+        taux=flottant_env("PROFILAGE_TAUX", 0.0),
+        seuil_ms=flottant_env("PROFILAGE_SEUIL_MS"),
+        intervalle_ms=flottant_env("PROFILAGE_INTERVALLE_MS") or 5.0,
+        profils_max=entier_env("PROFILAGE_PROFILS", 50),
+        jeton=os.environ.get("PROFILAGE_JETON") or None
+    )
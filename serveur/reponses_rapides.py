@@ -0,0 +1,97 @@
+import json
+from functools import lru_cache
+from typing import Tuple, Type, get_origin
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from pydantic import BaseModel
+from serveur.environnement import actif
+
+try:
+    import orjson
+except ImportError:  # Dépendance optionnelle : repli sur le module json
+    orjson = None
+
+
+# Sérialisation directe des résultats des calculateurs, sans revalidation par response_model
+REPONSES_RAPIDES = actif("REPONSES_RAPIDES")
+# Mode de test : chaque réponse rapide est comparée à celle du chemin Pydantic
+REPONSES_RAPIDES_VERIFICATION = actif("REPONSES_RAPIDES_VERIFICATION")
+
+
+class EcartSerialisation(ValueError):
+    """Réponse rapide différente de celle du chemin Pydantic (mode de vérification)"""
+
+
+@lru_cache(maxsize=None)
+def _plan(modele: Type[BaseModel]) -> Tuple:
+    """
+    Champs du modèle dans l'ordre de sérialisation, avec la conversion appliquée par
+    Pydantic : float() pour les champs float, plan imbriqué pour les sous-modèles.
+    """
+    plan = []
+    for nom, champ in modele.model_fields.items():
+        annotation = champ.annotation
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            conversion = _plan(annotation)
+        elif annotation is float:
+            conversion = float
+        elif get_origin(annotation) is None and annotation in (str, int, bool):
+            conversion = None
+        else:
+            raise TypeError(f"{modele.__name__}.{nom}: type non pris en charge par la sérialisation rapide")
+        plan.append((nom, conversion))
+    return tuple(plan)
+
+
+def _ordonner(plan: Tuple, valeurs) -> dict:
+    """Champs du plan lus dans un dict ou, pour les résultats des calculateurs, par attribut"""
+    lire = valeurs.__getitem__ if isinstance(valeurs, dict) else valeurs.__getattribute__
+    resultat = {}
+    for nom, conversion in plan:
+        valeur = lire(nom)
+        if conversion is float:
+            valeur = float(valeur)
+        elif conversion is not None:
+            valeur = _ordonner(conversion, valeur)
+        resultat[nom] = valeur
+    return resultat
+
+
+def serialiser_pydantic(modele: Type[BaseModel], contenu) -> bytes:
+    """Octets produits par FastAPI pour `contenu` déclaré avec response_model=modele"""
+    # FastAPI valide les réponses avec from_attributes : dict ou objet à attributs
+    valide = modele.model_validate(contenu, from_attributes=True).model_dump(mode="json")
+    return json.dumps(jsonable_encoder(valide), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def serialiser_rapide(modele: Type[BaseModel], contenu) -> bytes:
+    """Sérialise un résultat de calculateur, déjà conforme à `modele`, sans validation"""
+    ordonne = _ordonner(_plan(modele), contenu)
+    if orjson is not None:
+        return orjson.dumps(ordonne)
+    return json.dumps(ordonne, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def serialiser(modele: Type[BaseModel], contenu) -> bytes:
+    corps = serialiser_rapide(modele, contenu)
+    if REPONSES_RAPIDES_VERIFICATION:
+        reference = serialiser_pydantic(modele, contenu)
+        # Mêmes champs, dans le même ordre, avec les mêmes valeurs (l'écriture des
+        # nombres peut différer entre encodeurs, pas leur valeur)
+        if json.loads(corps, object_pairs_hook=list) != json.loads(reference, object_pairs_hook=list):
+            raise EcartSerialisation(
+                f"{modele.__name__}: réponse rapide {corps!r} différente de la réponse Pydantic {reference!r}"
+            )
+    return corps
+
+
+def reponse_json(modele: Type[BaseModel], contenu):
+    """
+    Réponse d'une route déclarée avec response_model=modele. Hors mode rapide, le
+    résultat est rendu tel quel à FastAPI (validation puis sérialisation habituelles) ;
+    en mode rapide, il est sérialisé directement. Le schéma OpenAPI est inchangé.
+    """
+    if not (REPONSES_RAPIDES or REPONSES_RAPIDES_VERIFICATION):
+        return contenu
+    return Response(content=serialiser(modele, contenu), media_type="application/json")
@@ -0,0 +1,65 @@
+"""
+Taille maximale du corps des requêtes d'envoi d'images. Un Content-Length annoncé trop
+grand est refusé (413) avant toute lecture ; sinon les octets sont comptés au fil de la
+réception et la lecture s'interrompt dès que la limite est franchie (corps transmis par
+morceaux, ou Content-Length mensonger), au lieu d'écrire tout l'envoi dans un fichier
+temporaire avant de le refuser.
+"""
+import json
+from typing import Dict
+from fastapi import HTTPException
+
+# En-têtes multipart et champs du formulaire autour du fichier envoyé
+MARGE_FORMULAIRE = 64 * 1024
+
+
+def _message(limite: int) -> str:
+    return f"Corps de la requête trop volumineux ({limite} octets au plus)"
+
+
+async def _repondre_413(send, limite: int):
+    corps = json.dumps({"detail": _message(limite)}, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(corps)).encode()),
+            (b"connection", b"close"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": corps})
+
+
+class MiddlewareTailleCorps:
+    """Middleware ASGI : borne en octets le corps des requêtes des chemins de `limites`"""
+    def __init__(self, app, limites: Dict[str, int]):
+        self.app = app
+        self.limites = limites
+
+    async def __call__(self, scope, receive, send):
+        limite = self.limites.get(scope["path"]) if scope["type"] == "http" else None
+        if limite is None:
+            await self.app(scope, receive, send)
+            return
+
+        for nom, valeur in scope["headers"]:
+            if nom == b"content-length":
+                if valeur.isdigit() and int(valeur) > limite:
+                    await _repondre_413(send, limite)
+                    return
+                break
+
+        recus = 0
+
+        async def recevoir_borne():
+            nonlocal recus
+            message = await receive()
+            if message["type"] == "http.request":
+                recus += len(message.get("body", b""))
+                if recus > limite:
+                    # Levée pendant l'analyse du formulaire : FastAPI la transmet telle quelle
+                    raise HTTPException(status_code=413, detail=_message(limite))
+            return message
+
+        await self.app(scope, recevoir_borne, send)
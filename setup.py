@@ -13,6 +13,10 @@ setup(
     long_description_content_type="text/markdown",
     url="https://github.com/benjamin/taxi-fastapi-vendee",
     packages=find_packages(),
+    package_data={
+        "calculators": ["tarifs.json", "courses_frequentes.json"],
+        "geographie": ["communes.csv.gz"],
+    },
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Intended Audience :: Developers",
@@ -33,8 +37,13 @@ setup(
         "fastapi>=0.100.0",
         "uvicorn[standard]>=0.20.0",
         "pydantic>=2.0.0",
+        "numpy>=1.21.0",
     ],
     extras_require={
+        # Sérialisation des réponses rapides (REPONSES_RAPIDES=true)
+        "rapide": [
+            "orjson>=3.9.0",
+        ],
         "dev": [
             "pytest>=7.0.0",
             "pytest-asyncio>=0.21.0",
@@ -47,6 +56,13 @@ setup(
     entry_points={
         "console_scripts": [
             "taxi-api=main:app",
+            "taxi-reprise-tarifs=cli.reprise_tarifs:main",
+            "taxi-facturation-cpam=cli.facturation_cpam:main",
+            "taxi-performances=cli.performances:main",
+            "taxi-charge=cli.charge:main",
+            "taxi-demarrage=cli.demarrage:main",
+            "taxi-openapi=cli.openapi:main",
+            "taxi-communes=cli.communes:main",
         ],
     },
 )
\ No newline at end of file
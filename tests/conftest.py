@@ -0,0 +1,28 @@
+import os
+import pytest
+
+# Toutes les requêtes de test viennent du même client : pas de limites de débit par client
+os.environ.setdefault("ADMISSION", "false")
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def image_png():
+    """Fabrique d'images PNG de test (dégradé bruité, pour que l'encodage ait du détail à traiter)"""
+    import io
+    from PIL import Image
+
+    def fabriquer(largeur: int = 320, hauteur: int = 240, format_: str = "PNG", **options) -> bytes:
+        bruit = Image.effect_noise((largeur, hauteur), 40).convert("RGB")
+        degrade = Image.linear_gradient("L").resize((largeur, hauteur)).convert("RGB")
+        tampon = io.BytesIO()
+        Image.blend(bruit, degrade, 0.5).save(tampon, format=format_, **options)
+        return tampon.getvalue()
+    return fabriquer
@@ -0,0 +1,30 @@
+"""
+Routes d'administration : fermées sans jeton configuré, 401 sans jeton, 403 avec un faux.
+"""
+import pytest
+from routes import admin
+
+ROUTES = [("get", "/admin/caches"), ("get", "/admin/tarifs"), ("post", "/admin/tarifs/recharger"),
+          ("get", "/admin/profils"), ("get", "/admin/profils/piles"), ("get", "/admin/profils/1")]
+
+
+@pytest.mark.parametrize("methode, chemin", ROUTES)
+def test_sans_jeton_refuse(client, monkeypatch, methode, chemin):
+    monkeypatch.setattr(admin, "JETON_ADMIN", "secret")
+    reponse = getattr(client, methode)(chemin)
+    assert reponse.status_code == 401
+    assert reponse.headers["www-authenticate"] == "Bearer"
+    faux = getattr(client, methode)(chemin, headers={"Authorization": "Bearer autre"})
+    assert faux.status_code == 403
+
+
+def test_administration_fermee_sans_jeton_configure(client, monkeypatch):
+    monkeypatch.setattr(admin, "JETON_ADMIN", None)
+    assert client.get("/admin/caches", headers={"Authorization": "Bearer secret"}).status_code == 403
+
+
+def test_jeton_valide(client, monkeypatch):
+    monkeypatch.setattr(admin, "JETON_ADMIN", "secret")
+    reponse = client.get("/admin/tarifs", headers={"Authorization": "Bearer secret"})
+    assert reponse.status_code == 200
+    assert reponse.json()["taxi"]
@@ -0,0 +1,57 @@
+"""
+Identification des clients derrière un proxy : seuls les éléments ajoutés par les proxies
+de confiance sont pris en compte dans X-Forwarded-For. File d'attente d'une classe :
+une requête dont le délai expire est refusée en 503 même si une place se libère alors.
+"""
+import asyncio
+import pytest
+from serveur import admission
+from serveur.admission import ClasseAdmission, ControleurAdmission, Limites
+
+
+def _scope(*valeurs: str) -> dict:
+    return {"headers": [(b"x-forwarded-for", valeur.encode("latin-1")) for valeur in valeurs],
+            "client": ("10.0.0.1", 1234)}
+
+
+@pytest.mark.parametrize("proxies, valeurs, attendu", [
+    (1, ["203.0.113.7"], "203.0.113.7"),
+    # Élément forgé par le client à gauche de celui du proxy
+    (1, ["1.2.3.4, 203.0.113.7"], "203.0.113.7"),
+    (2, ["1.2.3.4, 203.0.113.7, 10.0.0.2"], "203.0.113.7"),
+    # En-tête répété : les occurrences se suivent
+    (2, ["1.2.3.4, 203.0.113.7", "10.0.0.2"], "203.0.113.7"),
+    (3, ["203.0.113.7"], "203.0.113.7"),
+])
+def test_client_derriere_proxies(proxies, valeurs, attendu):
+    controleur = ControleurAdmission({}, entete_client="X-Forwarded-For", proxies_confiance=proxies)
+    assert controleur.client(_scope(*valeurs)) == attendu
+
+
+def test_client_sans_entete():
+    controleur = ControleurAdmission({}, entete_client="x-forwarded-for")
+    assert controleur.client(_scope()) == "10.0.0.1"
+
+
+def test_delai_file_expire_pendant_une_liberation(monkeypatch):
+    classe = ClasseAdmission("image", Limites(debit=100, rafale=100, concurrence=1, client=4, file=4, delai=0.05,
+                                              retard=10), 0.01)
+    attendre = asyncio.wait_for
+
+    async def expirer_pendant_liberation(place, timeout):
+        if not classe.file:
+            return await attendre(place, timeout)
+        # Délai expiré, puis la requête en cours se termine avant la reprise de celle en file
+        place.cancel()
+        classe.liberer("a", 0.01)
+        raise asyncio.TimeoutError
+
+    monkeypatch.setattr(admission.asyncio, "wait_for", expirer_pendant_liberation)
+
+    async def scenario():
+        assert await classe.admettre("a", 0.0) is None
+        return await classe.admettre("b", 0.0)
+
+    refus = asyncio.run(scenario())
+    assert (refus.statut, refus.motif) == (503, "delai_file")
+    assert (classe.en_cours, len(classe.file), classe.etat()["clients_actifs"]) == (0, 0, 0)
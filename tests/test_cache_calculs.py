@@ -0,0 +1,88 @@
+"""
+Clés canoniques des caches de calcul : le bruit flottant partage une entrée, et un
+résultat servi par le cache est toujours celui du calcul exact, même près d'un arrondi.
+"""
+import random
+from datetime import datetime
+import pytest
+from calculators.cache_calculs import bornes_classe, canoniser
+from calculators.calendrier import JOUR, localiser_france
+from calculators.cpam_calculator import CalculateurTarifsCPAM
+from calculators.taxi_calculator import CalculateurTarifsTaxi
+from routes import admin
+
+DATE = datetime(2025, 3, 12, 10)
+
+
+def test_classe_canonique():
+    assert canoniser(25.500000001) == canoniser(25.5) == 25.5
+    bas, haut = bornes_classe(25.5)
+    assert bas < 25.4999995 and haut > 25.5000005
+    assert bornes_classe(0.0)[0] == 0.0
+
+
+def test_bruit_flottant_meme_entree():
+    taxi = CalculateurTarifsTaxi()
+    assert taxi.calculer_tarif_course(25.500000001, 0, DATE).total == taxi.calculer_tarif_course(25.5, 0, DATE).total
+    cpam = CalculateurTarifsCPAM("85")
+    assert cpam.calculer_tarif_cpam(25.500000001, date_heure_transport=DATE).total == \
+        cpam.calculer_tarif_cpam(25.5, date_heure_transport=DATE).total
+    for calculateur in (taxi, cpam):
+        statistiques = calculateur.statistiques_cache()
+        assert (statistiques["echecs"], statistiques["succes"], statistiques["taux_succes"]) == (1, 1, 0.5)
+
+
+def test_taxi_cache_identique_au_calcul_exact():
+    calculateur = CalculateurTarifsTaxi(taille_cache=64)
+    grille = calculateur.referentiel.catalogue.taxi.grille_au(DATE.date())
+    nuit = grille.calendrier.periode(localiser_france(DATE)) != JOUR
+    generateur = random.Random(2)
+    for _ in range(20000):
+        # Distances dont le coût tombe à moins d'un millionième d'un demi-centime
+        centimes = generateur.randrange(100, 20000) + 0.5
+        distance = centimes / 100 / grille.tarif_c_jour + generateur.uniform(-1e-6, 1e-6)
+        attente = generateur.choice([0, 0, 1.5, 7.25])
+        resultat = calculateur.calculer_tarif_course(distance, attente, DATE)
+        exact = calculateur._calculer_tarif_exact(grille, distance, attente, nuit, False)
+        assert resultat.total == exact.total and resultat.cout_distance == exact.cout_distance, distance
+    assert calculateur.statistiques_cache()["calculs_exacts"] > 0
+
+
+def test_cpam_cache_identique_au_calcul_exact():
+    calculateur = CalculateurTarifsCPAM("85", taille_cache=64)
+    grille = calculateur.referentiel.catalogue.cpam.grille_au(DATE.date())
+    generateur = random.Random(3)
+    for _ in range(20000):
+        # Autour des demi-centimes et du seuil d'hospitalisation longue
+        distance = generateur.choice([
+            grille.km_franchise + (generateur.randrange(100, 20000) + 0.5) / 100 / grille.tarif_km("85"),
+            grille.seuil_hospitalisation_longue_km,
+        ]) + generateur.uniform(-1e-6, 1e-6)
+        resultat = calculateur.calculer_tarif_cpam(distance, date_heure_transport=DATE)
+        exact = calculateur._calculer_base_cpam_exact(grille, distance, False, False, "simple", 1, False, 0.0)
+        assert resultat.total == exact.total, distance
+
+
+def test_evictions_comptees():
+    calculateur = CalculateurTarifsTaxi(taille_cache=2)
+    for distance in (1, 2, 3, 4):
+        calculateur.calculer_tarif_course(distance * 10, 0, DATE)
+    statistiques = calculateur.statistiques_cache()
+    assert (statistiques["taille"], statistiques["evictions"]) == (2, 2)
+    assert statistiques["octets_estimes"] > 0
+
+
+def test_route_statistiques(client, monkeypatch):
+    monkeypatch.setattr(admin, "JETON_ADMIN", "secret")
+    client.get("/estimation-rapide", params={"distance_km": 3})
+    reponse = client.get("/admin/caches", headers={"Authorization": "Bearer secret"})
+    assert reponse.status_code == 200
+    caches = reponse.json()
+    assert {"taxi", "cpam", "images", "http", "communes", "prechauffage"} <= set(caches)
+    assert {"succes", "echecs", "evictions", "taux_succes", "calculs_exacts", "octets_estimes"} <= set(caches["taxi"])
+
+
+@pytest.mark.parametrize("valeur", [0.0, 1e-7, 3.14159265, 1234.5678901])
+def test_bornes_contiennent_la_classe(valeur):
+    bas, haut = bornes_classe(canoniser(valeur))
+    assert bas <= valeur <= haut
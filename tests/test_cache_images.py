@@ -0,0 +1,72 @@
+"""
+Cache des images compressées : production partagée par les demandes coalescées malgré
+l'annulation de celle qui l'a lancée, et niveau disque borné en octets.
+"""
+import asyncio
+import os
+from compression.cache import CacheImages
+from compression.pipeline import ImageCompressee
+
+IMAGE = ImageCompressee(b"webp" * 100, 80, 4, 1.0)
+
+
+def test_annulation_du_meneur_sans_effet_sur_les_demandes_coalescees():
+    async def scenario():
+        cache = CacheImages(octets_max=1024 * 1024)
+        liberation = asyncio.Event()
+        suppressions = []
+
+        async def produire():
+            await liberation.wait()
+            return IMAGE
+
+        meneur = asyncio.ensure_future(cache.obtenir("cle", produire))
+        await asyncio.sleep(0)
+        suiveur = asyncio.ensure_future(cache.obtenir("cle", produire))
+        await asyncio.sleep(0)
+        meneur.cancel()
+        await asyncio.sleep(0)
+        cache.apres_production("cle", lambda: suppressions.append("cle"))
+        assert meneur.cancelled() and suppressions == []
+
+        liberation.set()
+        assert await suiveur == (IMAGE, "COALESCED")
+        assert suppressions == ["cle"]
+        # Le résultat a été conservé pour les demandes suivantes
+        assert await cache.obtenir("cle", produire) == (IMAGE, "HIT")
+
+    asyncio.run(scenario())
+
+
+def test_erreur_de_production_propagee_aux_demandes_coalescees():
+    async def scenario():
+        cache = CacheImages(octets_max=1024 * 1024)
+
+        async def produire():
+            await asyncio.sleep(0.01)
+            raise ValueError("image illisible")
+
+        resultats = await asyncio.gather(cache.obtenir("cle", produire), cache.obtenir("cle", produire),
+                                         return_exceptions=True)
+        assert [str(resultat) for resultat in resultats] == ["image illisible"] * 2
+
+    asyncio.run(scenario())
+
+
+def test_disque_elague_des_moins_recemment_utilises(tmp_path):
+    taille_fichier = len(IMAGE.donnees) + 60
+    cache = CacheImages(octets_max=1024 * 1024, repertoire=str(tmp_path), octets_max_disque=5 * taille_fichier)
+    for numero in range(12):
+        cle = f"{numero:02d}" + "a" * 38
+        cache._ecrire_disque(cle, IMAGE)
+        os.utime(cache._chemin(cle), (1000 + numero, 1000 + numero))
+    # Une lecture rafraîchit l'entrée la plus ancienne encore présente
+    restants = sorted(nom for _, _, noms in os.walk(tmp_path) for nom in noms)
+    cache._lire_disque(restants[0])
+    cache._ecrire_disque("ff" + "b" * 38, IMAGE)
+
+    fichiers = cache._fichiers_disque()
+    assert sum(taille for _, taille, _ in fichiers) <= 5 * taille_fichier
+    noms = {os.path.basename(chemin) for _, _, chemin in fichiers}
+    assert restants[0] in noms and "ff" + "b" * 38 in noms
+    assert cache.evictions_disque > 0
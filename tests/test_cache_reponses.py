@@ -0,0 +1,77 @@
+"""
+Cache HTTP des routes en lecture seule : ETag et 304, corps gzip stocké pour les
+clients qui l'acceptent, durée de validité bornée au prochain changement de période.
+"""
+import gzip
+from datetime import datetime, timedelta, timezone
+from starlette.requests import Request
+from serveur.cache_reponses import CacheReponses, cache_reponses
+
+SANS_GZIP = {"Accept-Encoding": "identity"}
+
+
+def _requete(**entetes) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"",
+                    "headers": [(nom.lower().encode(), valeur.encode()) for nom, valeur in entetes.items()]})
+
+
+def test_if_none_match_304(client):
+    premiere = client.get("/tarifs", headers=SANS_GZIP)
+    assert premiere.status_code == 200
+    etag = premiere.headers["etag"]
+    non_modifiees = cache_reponses.statistiques()["non_modifiees"]
+    seconde = client.get("/tarifs", headers={**SANS_GZIP, "If-None-Match": etag})
+    assert seconde.status_code == 304 and seconde.content == b""
+    assert seconde.headers["etag"] == etag
+    assert cache_reponses.statistiques()["non_modifiees"] == non_modifiees + 1
+    # Comparaison faible, liste d'ETags
+    assert client.get("/tarifs", headers={**SANS_GZIP, "If-None-Match": f'"autre", W/{etag}'}).status_code == 304
+    assert client.get("/tarifs", headers={**SANS_GZIP, "If-None-Match": '"autre"'}).status_code == 200
+
+
+def test_gzip_stocke_pour_tarifs(client):
+    identite = client.get("/tarifs", headers=SANS_GZIP)
+    reponse = client.get("/tarifs", headers={"Accept-Encoding": "gzip"})
+    assert reponse.headers["content-encoding"] == "gzip"
+    assert reponse.headers["vary"] == "Accept-Encoding"
+    assert reponse.headers["etag"] == identite.headers["etag"][:-1] + '-gzip"'
+    assert reponse.json() == identite.json()
+    # L'ETag de la variante gzip vaut aussi pour un client qui la possède déjà
+    assert client.get("/tarifs", headers={"Accept-Encoding": "gzip",
+                                          "If-None-Match": reponse.headers["etag"]}).status_code == 304
+
+
+def test_corps_gzip_precalcule():
+    cache = CacheReponses(entrees_max=4, max_age=60)
+    contenu = {"libelle": "tarif de nuit " * 20}
+    reponse = cache.repondre(_requete(**{"accept-encoding": "gzip, br"}), "cle", lambda: contenu)
+    assert reponse.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(reponse.body) == cache.repondre(_requete(), "cle", lambda: None).body
+    assert cache.statistiques()["succes"] == 1
+    # Corps trop court pour y gagner : pas de variante gzip
+    courte = cache.repondre(_requete(**{"accept-encoding": "gzip"}), "courte", lambda: {"a": 1})
+    assert "content-encoding" not in courte.headers
+    refus = cache.repondre(_requete(**{"accept-encoding": "gzip;q=0"}), "cle", lambda: None)
+    assert "content-encoding" not in refus.headers
+
+
+def test_validite_bornee_par_expire_a_et_max_age():
+    cache = CacheReponses(entrees_max=2, max_age=300)
+    bientot = datetime.now(timezone.utc) + timedelta(seconds=30)
+    reponse = cache.repondre(_requete(), "cle", lambda: {"a": 1}, expire_a=bientot)
+    assert 28 <= int(reponse.headers["cache-control"].rsplit("=", 1)[1]) <= 30
+    lointain = cache.repondre(_requete(), "autre", lambda: {"a": 2}, expire_a=bientot + timedelta(days=1))
+    assert lointain.headers["cache-control"] == "public, max-age=300"
+    # Entrée expirée : recalculée
+    cache.repondre(_requete(), "passee", lambda: {"a": 3}, expire_a=datetime.now(timezone.utc) - timedelta(seconds=1))
+    assert cache.repondre(_requete(), "passee", lambda: {"a": 4}).body == b'{"a":4}'
+    assert cache.statistiques()["evictions"] >= 1
+
+
+def test_estimation_rapide_mise_en_cache(client):
+    parametres = {"distance_km": 12.5, "aller_retour": True}
+    premiere = client.get("/estimation-rapide", params=parametres, headers=SANS_GZIP)
+    seconde = client.get("/estimation-rapide", params=parametres, headers=SANS_GZIP)
+    assert premiere.status_code == seconde.status_code == 200
+    assert premiere.headers["etag"] == seconde.headers["etag"]
+    assert premiere.json()["distance_km"] == 12.5
@@ -0,0 +1,65 @@
+"""
+Calendrier tarifaire : jours fériés (fixes et mobiles), bornes de nuit, dimanches et
+heure d'été, identiques aux règles appliquées course par course.
+"""
+from datetime import date, datetime, time, timedelta
+import pytest
+from calculators.calendrier import (
+    DIMANCHE_FERIE, FUSEAU_FRANCE, JOUR, NUIT, CalendrierTarifaire, bornes_heure_ete, est_ferie, jours_feries,
+    localiser_france, preparer_horodatages
+)
+from calculators.taxi_calculator import CalculateurTarifsTaxi
+
+CALENDRIER = CalendrierTarifaire(time(19, 0), time(7, 0))
+
+
+def test_jours_feries_mobiles():
+    feries = jours_feries(2025)
+    # Pâques le 20 avril 2025
+    assert {date(2025, 4, 21), date(2025, 5, 29), date(2025, 6, 9)} <= feries
+    assert len(feries) == 11
+    assert est_ferie(date(2025, 7, 14)) and not est_ferie(date(2025, 7, 15))
+    # Hors de la table précalculée
+    assert est_ferie(date(2100, 12, 25)) and not est_ferie(date(2100, 12, 24))
+
+
+@pytest.mark.parametrize("date_heure, periode", [
+    (datetime(2025, 7, 14, 10), DIMANCHE_FERIE),  # Fête nationale, un lundi
+    (datetime(2025, 7, 13, 10), DIMANCHE_FERIE),  # dimanche
+    (datetime(2025, 7, 15, 10), JOUR),
+    (datetime(2025, 7, 15, 7, 0), NUIT),  # instant exact de fin de nuit
+    (datetime(2025, 7, 15, 7, 0, 1), JOUR),
+    (datetime(2025, 7, 15, 18, 59, 59), JOUR),
+    (datetime(2025, 7, 15, 19, 0), NUIT),
+])
+def test_periode(date_heure, periode):
+    assert CALENDRIER.periode(date_heure) == periode
+    assert CALENDRIER.periodes_lot(preparer_horodatages([date_heure])).tolist() == [periode]
+
+
+def test_taxi_tarif_ferie_le_14_juillet():
+    calculateur = CalculateurTarifsTaxi()
+    ferie = calculateur.calculer_tarif_course(10, 0, datetime(2025, 7, 14, 10))
+    ouvre = calculateur.calculer_tarif_course(10, 0, datetime(2025, 7, 15, 10))
+    assert ferie.type_tarif == "dimanche/ferie aller simple (tarif D)"
+    assert ouvre.type_tarif == "jour aller simple (tarif C)"
+    assert ferie.total > ouvre.total
+
+
+def test_heure_ete_identique_a_pytz():
+    assert bornes_heure_ete(2025) == (datetime(2025, 3, 30, 3), datetime(2025, 10, 26, 2))
+    date_heure = datetime(1996, 1, 1)
+    while date_heure.year < 2038:
+        assert localiser_france(date_heure).utcoffset() == FUSEAU_FRANCE.localize(date_heure).utcoffset(), date_heure
+        date_heure += timedelta(hours=7)
+
+
+def test_prochain_changement():
+    samedi = localiser_france(datetime(2025, 7, 12, 18, 30))
+    assert CALENDRIER.prochain_changement(samedi) == localiser_france(datetime(2025, 7, 12, 19))
+    # Nuit du samedi, puis dimanche entier
+    assert CALENDRIER.prochain_changement(localiser_france(datetime(2025, 7, 12, 23))) == \
+        localiser_france(datetime(2025, 7, 13))
+    # Veille du 14 juillet : du dimanche au lundi férié sans changement, jusqu'au mardi 00:00 (nuit)
+    assert CALENDRIER.prochain_changement(localiser_france(datetime(2025, 7, 13, 12))) == \
+        localiser_france(datetime(2025, 7, 15))
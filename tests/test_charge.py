@@ -0,0 +1,87 @@
+"""
+Générateur de charge en boucle ouverte : histogrammes à précision relative constante,
+paliers et rampes, détection du genou et court essai contre un serveur local.
+"""
+import math
+import random
+import pytest
+from performances.charge import (
+    GenerateurCharge, Palier, ServeurLocal, genou, rampe, rapport_charge, FORMAT_RAPPORT_CHARGE
+)
+from performances.histogramme import HistogrammeLatences
+
+
+def test_histogramme_precision_relative():
+    histogramme = HistogrammeLatences(10_000_000)
+    alea = random.Random(3)
+    valeurs = sorted(alea.randint(1, 5_000_000) for _ in range(10_000))
+    for valeur in valeurs:
+        histogramme.enregistrer(valeur)
+    for p in (50, 90, 99, 99.9):
+        exact = valeurs[max(1, math.ceil(p / 100 * len(valeurs))) - 1]
+        assert abs(histogramme.centile(p) - exact) <= exact * 0.001, p
+    assert histogramme.centile(100) == histogramme.maximum == valeurs[-1]
+    assert histogramme.moyenne == pytest.approx(sum(valeurs) / len(valeurs))
+
+
+def test_histogramme_ecretage_et_fusion():
+    premier, second = HistogrammeLatences(1000), HistogrammeLatences(1000)
+    premier.enregistrer(10)
+    second.enregistrer(5000)
+    premier.fusionner(second)
+    assert (premier.total, premier.hors_plage, premier.maximum) == (2, 1, 1000)
+    with pytest.raises(ValueError):
+        premier.fusionner(HistogrammeLatences(2000))
+
+
+def test_export_hgrm():
+    histogramme = HistogrammeLatences(1_000_000)
+    for valeur in range(1, 1001):
+        histogramme.enregistrer(valeur * 100)
+    lignes = histogramme.exporter_hgrm().splitlines()
+    assert lignes[0].split() == ["Value", "Percentile", "TotalCount", "1/(1-Percentile)"]
+    derniere = lignes[-4].split()
+    assert (float(derniere[0]), float(derniere[1]), int(derniere[2])) == (100.0, 1.0, 1000)
+    assert "Total count    =         1000" in lignes[-2]
+
+
+def test_rampe():
+    assert rampe(50, 200, 50, 5) == [Palier(50, 5), Palier(100, 5), Palier(150, 5), Palier(200, 5)]
+    assert [palier.debit for palier in rampe(0.1, 0.3, 0.1, 1)] == pytest.approx([0.1, 0.2, 0.3])
+    with pytest.raises(ValueError):
+        rampe(100, 50, 10, 5)
+
+
+def _resultat(debit: float, p99: float, saturation=()) -> dict:
+    return {"debit_vise": debit, "saturation": list(saturation), "global": {"latence_ms": {"p99": p99}}}
+
+
+def test_genou():
+    resultats = [_resultat(100, 5), _resultat(200, 12), _resultat(300, 40, ["debit"]), _resultat(400, 9)]
+    assert genou(resultats) == 200
+    assert genou(resultats, slo_p99_ms=10) == 100
+    assert genou([_resultat(100, 5, ["erreurs"])]) is None
+
+
+def test_intervalles():
+    constant = GenerateurCharge("http://test", {"estimation-rapide": 1})
+    assert list(constant._intervalles(Palier(4, 1))) == [0, 0.25, 0.5, 0.75]
+    poisson = GenerateurCharge("http://test", {"estimation-rapide": 1}, poisson=True, graine=7)
+    instants = list(poisson._intervalles(Palier(1000, 2)))
+    assert instants == sorted(instants) and all(instant < 2 for instant in instants)
+    assert 1800 < len(instants) < 2200
+    with pytest.raises(ValueError):
+        GenerateurCharge("http://test", {"inconnue": 1})
+
+
+def test_essai_contre_serveur_local():
+    with ServeurLocal(workers=1) as serveur:
+        generateur = GenerateurCharge(serveur.url, {"estimation-rapide": 3, "calculer-tarif": 1}, connexions=8)
+        resultats = generateur.executer([Palier(20, 0.5), Palier(40, 0.5)])
+    resumes = [resultat.resume for resultat in resultats]
+    assert [resume["global"]["envoyees"] for resume in resumes] == [10, 20]
+    assert all(resume["global"]["erreurs"] == 0 for resume in resumes)
+    assert set(resumes[0]["cibles"]) == {"estimation-rapide", "calculer-tarif"}
+    assert resultats[1].histogrammes["global"].total == 20
+    rapport = rapport_charge([{"workers": 1, "paliers": resumes}], {"melange": "test"}, {})
+    assert rapport["format"] == FORMAT_RAPPORT_CHARGE and rapport["series"][0]["paliers"] == resumes
@@ -0,0 +1,109 @@
+"""
+Référentiel des communes : résolution des noms libres et des homonymes, autocomplétion
+par préfixe, plus proches voisines et distance estimée retenue pour les transports CPAM.
+"""
+import pytest
+from geographie.communes import (
+    COEFFICIENT_ROUTIER, Commune, ReferentielCommunes, distance_orthodromique_km, ecrire_communes,
+    estimer_distance_km, referentiel_communes
+)
+from geographie.texte import plier
+
+COMMUNES = [
+    Commune("85191", "La Roche-sur-Yon", "85", 46.67, -1.43, 59410),
+    Commune("17300", "La Rochelle", "17", 46.16, -1.15, 76810),
+    Commune("42218", "Saint-Étienne", "42", 45.43, 4.39, 176280),
+    Commune("", "Saint-Étienne", "07", 44.9, 4.4, 0),
+    Commune("85194", "Les Sables-d'Olonne", "85", 46.5, -1.78, 48740),
+    Commune("85047", "Challans", "85", 46.85, -1.88, 21400),
+]
+
+
+@pytest.fixture
+def referentiel():
+    return ReferentielCommunes(COMMUNES)
+
+
+def test_plier():
+    assert plier("ST-ÉTIENNE") == plier("saint etienne") == "saint etienne"
+    assert plier("Les Sables-d’Olonne") == "les sables d olonne"
+
+
+@pytest.mark.parametrize("texte, departement, attendu", [
+    ("saint etienne", None, "42"),  # la plus peuplée des homonymes
+    ("Saint-Étienne", "07", "07"),
+    ("Roche-sur-Yon", None, "85"),  # fin du nom à partir d'un mot
+    ("85047", None, "85"),  # code INSEE
+])
+def test_resoudre(referentiel, texte, departement, attendu):
+    assert referentiel.resoudre(texte, departement).departement == attendu
+
+
+def test_resoudre_inconnue(referentiel):
+    assert referentiel.resoudre("Atlantis") is None
+    assert referentiel.resoudre("  ") is None
+    # Fin de nom qui ne commence pas à un mot
+    assert referentiel.resoudre("oche sur yon") is None
+
+
+def test_autocompleter(referentiel):
+    # Noms commençant par le préfixe avant ceux dont un mot y commence, article initial facultatif
+    assert [commune.nom for commune in referentiel.autocompleter("roche")] == ["La Rochelle", "La Roche-sur-Yon"]
+    assert [commune.nom for commune in referentiel.autocompleter("sa", 10, "85")] == ["Les Sables-d'Olonne"]
+    # Mots vides : « sur » ne propose pas les communes en « -sur- »
+    assert referentiel.autocompleter("sur") == ()
+    assert len(referentiel.autocompleter("s", 1)) == 1
+
+
+def test_plus_proches(referentiel):
+    proches = referentiel.plus_proches(46.66, -1.44, 2)
+    assert [commune.nom for commune, _ in proches] == ["La Roche-sur-Yon", "Les Sables-d'Olonne"]
+    assert proches[0][1] == pytest.approx(distance_orthodromique_km(Commune("", "", "", 46.66, -1.44, 0), COMMUNES[0]),
+                                          abs=1e-3)
+    # Plus de communes demandées qu'il n'y en a
+    assert len(referentiel.plus_proches(46.66, -1.44, 50)) == len(COMMUNES)
+
+
+def test_distance_estimee():
+    vol_oiseau = distance_orthodromique_km(COMMUNES[0], COMMUNES[4])
+    assert 25 < vol_oiseau < 35
+    assert estimer_distance_km(COMMUNES[0], COMMUNES[4]) == round(vol_oiseau * COEFFICIENT_ROUTIER, 1)
+
+
+def test_aller_retour_fichier(tmp_path):
+    chemin = tmp_path / "communes.csv.gz"
+    ecrire_communes(chemin, COMMUNES)
+    assert sorted(ReferentielCommunes.charger(chemin).communes) == sorted(COMMUNES)
+    (tmp_path / "incomplet.csv").write_text("nom;departement\nChallans;85\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="colonnes manquantes"):
+        ReferentielCommunes.charger(tmp_path / "incomplet.csv")
+
+
+def test_referentiel_livre():
+    communes = referentiel_communes()
+    assert communes is referentiel_communes()
+    assert communes.resoudre("ST-ÉTIENNE").departement == "42"
+    assert communes.resoudre("la roche sur yon").departement == "85"
+
+
+def test_routes(client):
+    reponse = client.get("/communes/distance", params={"depart": "La Roche-sur-Yon", "arrivee": "Nantes"})
+    assert reponse.status_code == 200
+    corps = reponse.json()
+    assert corps["distance_estimee_km"] == round(corps["distance_vol_oiseau_km"] * COEFFICIENT_ROUTIER, 1)
+    assert client.get("/communes/resoudre", params={"nom": "Atlantis"}).status_code == 404
+    propositions = client.get("/communes/autocompletion", params={"q": "sables", "departement": "85"})
+    assert propositions.json()["communes"][0]["nom"] == "Les Sables-d'Olonne"
+    assert "etag" in propositions.headers
+
+
+def test_cpam_sans_distance(client):
+    reponse = client.post("/calculer-tarif-cpam", json={
+        "ville_depart": "La Roche-sur-Yon", "ville_arrivee": "Nantes", "date_heure_transport": "2025-03-12T10:00:00"
+    })
+    assert reponse.status_code == 200
+    attendu = client.get("/communes/distance", params={"depart": "La Roche-sur-Yon", "arrivee": "Nantes"}).json()
+    assert reponse.json()["details"]["distance_km"] == attendu["distance_estimee_km"]
+    assert reponse.json()["details"]["departement"] == "85"
+    introuvable = client.post("/calculer-tarif-cpam", json={"ville_depart": "Atlantis", "ville_arrivee": "Nantes"})
+    assert introuvable.status_code == 400
@@ -0,0 +1,56 @@
+"""
+Compression d'un lot d'images : archive ZIP lisible transmise au fil de l'eau,
+archives d'entrée développées, noms de sortie sûrs et erreurs consignées au manifeste.
+"""
+import io
+import json
+import zipfile
+from compression.zip_flux import FluxZip
+from routes.images import _nom_sortie
+
+
+def test_flux_zip_lisible():
+    flux = FluxZip()
+    morceaux = [flux.ajouter("a.webp", b"RIFF" + b"\x00" * 100), flux.ajouter("m.json", b"{}" * 50, compresser=True)]
+    assert all(morceaux)
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(morceaux) + flux.fermer()))
+    assert archive.testzip() is None
+    assert archive.read("m.json") == b"{}" * 50
+    assert archive.getinfo("a.webp").compress_type == zipfile.ZIP_STORED
+
+
+def test_noms_de_sortie_surs_et_uniques():
+    utilises = set()
+    assert _nom_sortie("../../etc/passwd.png", utilises) == "etc/passwd.webp"
+    assert _nom_sortie("/photos\\ete.jpg", utilises) == "photos/ete.webp"
+    assert _nom_sortie("photos/ete.png", utilises) == "photos/ete_1.webp"
+    assert _nom_sortie("..", utilises) == "image.webp"
+
+
+def test_lot_fichiers_et_archive(client, image_png):
+    entree = io.BytesIO()
+    with zipfile.ZipFile(entree, "w") as archive:
+        archive.writestr("album/une.png", image_png(64, 48))
+        archive.writestr("album/illisible.png", b"pas une image")
+        archive.writestr("__MACOSX/album/._une.png", b"")
+    fichiers = [
+        ("fichiers", ("une.png", image_png(80, 60), "image/png")),
+        ("fichiers", ("album.zip", entree.getvalue(), "application/zip")),
+    ]
+    reponse = client.post("/compresser-images", params={"effort": 0, "max_largeur": 40}, files=fichiers)
+    assert reponse.status_code == 200
+    assert reponse.headers["content-type"] == "application/zip"
+
+    archive = zipfile.ZipFile(io.BytesIO(reponse.content))
+    manifeste = {image["fichier"]: image for image in json.loads(archive.read("manifeste.json"))["images"]}
+    assert set(manifeste) == {"une.png", "album/une.png", "album/illisible.png"}
+    assert manifeste["album/illisible.png"]["statut"] == "erreur"
+    sorties = sorted(image["sortie"] for image in manifeste.values() if image["statut"] == "ok")
+    assert sorties == ["album/une.webp", "une.webp"]
+    assert sorted(archive.namelist()) == sorted(sorties + ["manifeste.json"])
+    assert archive.read("une.webp")[8:12] == b"WEBP"
+
+
+def test_lot_refuse_un_fichier_qui_n_est_pas_une_image(client):
+    reponse = client.post("/compresser-images", files=[("fichiers", ("notes.txt", b"texte", "text/plain"))])
+    assert reponse.status_code == 400
@@ -0,0 +1,21 @@
+"""
+Formats des déclinaisons : l'AVIF n'est proposé que si le Pillow installé sait l'encoder.
+"""
+import pytest
+from fastapi import HTTPException
+from routes import images
+
+
+def test_avif_indisponible(monkeypatch):
+    monkeypatch.setattr(images, "_formats_disponibles", lambda: ("webp", "jpeg"))
+    resolues = images._resoudre_declinaisons(["vignette:320x320"], "image/avif, image/webp;q=0.5", 80)
+    assert resolues[0].format == "webp"
+    with pytest.raises(HTTPException) as erreur:
+        images._resoudre_declinaisons(["vignette:320x320:avif"], None, 80)
+    assert erreur.value.status_code == 400
+
+
+def test_avif_negocie(monkeypatch):
+    monkeypatch.setattr(images, "_formats_disponibles", lambda: images.ORDRE_FORMATS)
+    resolues = images._resoudre_declinaisons(["vignette:320x320", "complete:jpeg"], "image/avif, image/webp;q=0.5", 80)
+    assert [declinaison.format for declinaison in resolues] == ["avif", "jpeg"]
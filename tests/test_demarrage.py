@@ -0,0 +1,80 @@
+"""
+Démarrage à froid : Pillow n'est pas importé avec l'application, le schéma OpenAPI
+pré-généré est relu tant qu'il correspond aux sources, et le préchauffage remplit les
+caches de calcul.
+"""
+import json
+import os
+import subprocess
+import sys
+from fastapi import FastAPI
+from calculators import prechauffage
+from calculators.taxi_calculator import calculateur_taxi
+from serveur import openapi
+from serveur.openapi import RACINE_PROJET, generer, installer
+
+
+def test_pillow_non_importe_au_demarrage():
+    code = "import sys, main; print('PIL' in sys.modules)"
+    sortie = subprocess.run([sys.executable, "-c", code], cwd=RACINE_PROJET, capture_output=True, text=True,
+                            check=True).stdout
+    assert sortie.strip() == "False"
+
+
+def _application() -> FastAPI:
+    application = FastAPI(title="essai")
+
+    @application.get("/essai")
+    def essai() -> dict:
+        return {}
+
+    return application
+
+
+def test_schema_pre_genere_relu(tmp_path):
+    chemin = str(tmp_path / "openapi.json")
+    generer(_application(), chemin)
+    with open(chemin, encoding="utf-8") as fichier:
+        contenu = json.load(fichier)
+    contenu["schema"]["info"]["title"] = "relu depuis le fichier"
+    with open(chemin, "w", encoding="utf-8") as fichier:
+        json.dump(contenu, fichier)
+
+    application = _application()
+    installer(application, chemin)
+    assert application.openapi()["info"]["title"] == "relu depuis le fichier"
+    assert application.openapi() is application.openapi()
+
+
+def test_schema_perime_reconstruit(tmp_path, monkeypatch):
+    chemin = str(tmp_path / "openapi.json")
+    generer(_application(), chemin)
+    monkeypatch.setattr(openapi, "empreinte_sources", lambda: "sources modifiées")
+    application = _application()
+    installer(application, chemin)
+    assert application.openapi()["info"]["title"] == "essai"
+    # Fichier absent ou illisible : schéma construit par FastAPI
+    (tmp_path / "openapi.json").write_text("{", encoding="utf-8")
+    application = _application()
+    installer(application, chemin)
+    assert "/essai" in application.openapi()["paths"]
+
+
+def test_route_openapi(client):
+    reponse = client.get("/openapi.json")
+    assert reponse.status_code == 200
+    assert "/calculer-tarif" in reponse.json()["paths"]
+
+
+def test_prechauffage_remplit_les_caches():
+    bilan = prechauffage.prechauffer()
+    assert bilan["courses_taxi"] > 0 and bilan["courses_cpam"] > 0 and bilan["communes"] > 0
+    assert prechauffage.dernier_prechauffage is bilan
+    assert calculateur_taxi.statistiques_cache()["taille"] > 0
+
+
+def test_empreinte_couvre_les_constantes_du_schema():
+    sources = {os.path.relpath(fichier, RACINE_PROJET) for fichier in openapi.sources_schema()}
+    assert {"main.py", os.path.join("compression", "declinaisons.py"), os.path.join("compression", "pipeline.py"),
+            os.path.join("routes", "images.py"), os.path.join("models", "cpam.py")} <= sources
+    assert not any(source.startswith(("tests", "cli", "performances")) for source in sources)
@@ -0,0 +1,21 @@
+"""
+Configuration par variables d'environnement : une variable absente ou vide prend la
+valeur par défaut.
+"""
+import pytest
+from serveur.environnement import actif, entier_env, flottant_env
+
+
+@pytest.mark.parametrize("valeur, attendu", [("1", True), (" Oui ", True), ("TRUE", True), ("non", False), ("0", False)])
+def test_actif(monkeypatch, valeur, attendu):
+    monkeypatch.setenv("ESSAI_ACTIF", valeur)
+    assert actif("ESSAI_ACTIF") is attendu
+
+
+def test_valeurs_par_defaut(monkeypatch):
+    monkeypatch.setenv("ESSAI_VIDE", "")
+    monkeypatch.delenv("ESSAI_ABSENT", raising=False)
+    assert actif("ESSAI_VIDE", "true") and not actif("ESSAI_ABSENT")
+    assert entier_env("ESSAI_VIDE", 4) == 4 and flottant_env("ESSAI_ABSENT") is None
+    monkeypatch.setenv("ESSAI_NOMBRE", "12")
+    assert entier_env("ESSAI_NOMBRE", 4) == 12 and flottant_env("ESSAI_NOMBRE", 1.5) == 12.0
@@ -0,0 +1,63 @@
+"""
+Facturation CPAM : un transport en erreur figure dans les erreurs du rapport, sans
+empêcher la facturation des autres transports du mois.
+"""
+from calculators import facturation_cpam
+from calculators.facturation_cpam import facturer_fichier
+
+EN_TETE = "patient,vehicule,date_heure_transport,type_transport,distance_km,ville_depart,ville_arrivee\n"
+TRANSPORT_1 = "P1,V1,2025-03-03T10:00:00,simple,12,La Roche-sur-Yon,Challans\n"
+TRANSPORT_2 = "P2,V2,2025-03-04T10:00:00,hospitalisation,20,Les Sables-d'Olonne,La Roche-sur-Yon\n"
+EXPORT = EN_TETE + TRANSPORT_1 + "P1,V1,0001-01-01T00:00:00,simple,12,La Roche-sur-Yon,Challans\n" + TRANSPORT_2
+
+
+def _sans_erreurs(rapport: dict) -> dict:
+    synthese = {cle: valeur for cle, valeur in rapport["synthese"].items() if cle != "lignes_en_erreur"}
+    return {**{cle: valeur for cle, valeur in rapport.items() if cle != "erreurs"}, "synthese": synthese}
+
+
+def test_date_hors_limites_en_erreur():
+    rapport = facturer_fichier(EXPORT.splitlines(True), "2025-03", processus=1)
+    assert [erreur["ligne"] for erreur in rapport["erreurs"]] == [3]
+    assert "date_heure_transport" in rapport["erreurs"][0]["erreur"]
+    assert rapport["synthese"]["lignes_en_erreur"] == 1
+    # Mêmes factures que sans la ligne en erreur (numéros de ligne mis à part)
+    attendu = facturer_fichier((EN_TETE + TRANSPORT_1 + TRANSPORT_2).splitlines(True), "2025-03", processus=1,
+                               lignes_factures=False)
+    assert _sans_erreurs(facturer_fichier(EXPORT.splitlines(True), "2025-03", processus=1,
+                                          lignes_factures=False)) == _sans_erreurs(attendu)
+    assert rapport["synthese"]["nombre_transports"] == 2
+
+
+def test_route_date_hors_limites(client):
+    reponse = client.post("/facturation-cpam", params={"mois": "2025-03"},
+                          files={"fichier": ("transports.csv", EXPORT.encode(), "text/csv")})
+    assert reponse.status_code == 200
+    assert [erreur["ligne"] for erreur in reponse.json()["erreurs"]] == [3]
+
+
+def test_paquet_refuse_recalcule_transport_par_transport(monkeypatch):
+    calculer_courses_cpam = facturation_cpam.calculer_courses_cpam
+
+    def refuser_long(courses):
+        if any(course.distance_km == 666 for course in courses):
+            raise OverflowError("date value out of range")
+        return calculer_courses_cpam(courses)
+
+    monkeypatch.setattr(facturation_cpam, "calculer_courses_cpam", refuser_long)
+    export = EN_TETE + TRANSPORT_1 + "P3,V1,2025-03-05T10:00:00,simple,666,La Roche-sur-Yon,Challans\n" + TRANSPORT_2
+    rapport = facturer_fichier(export.splitlines(True), "2025-03", processus=1)
+    assert rapport["erreurs"] == [{"ligne": 3, "erreur": "date value out of range"}]
+    assert [facture["patient"] for facture in rapport["factures"]] == ["P1", "P2"]
+
+
+def test_mois_et_jour_en_heure_de_paris():
+    # 23h30 UTC le 31 janvier : 00h30 le 1er février à Paris
+    export = EN_TETE + "P1,V1,2025-01-31T23:30:00+00:00,simple,12,La Roche-sur-Yon,Challans\n"
+    janvier = facturer_fichier(export.splitlines(True), "2025-01", processus=1)
+    assert janvier["synthese"]["nombre_transports"] == 0
+    assert "hors du mois facturé 2025-01 (2025-02-01)" in janvier["erreurs"][0]["erreur"]
+    fevrier = facturer_fichier(export.splitlines(True), "2025-02", processus=1)
+    assert fevrier["erreurs"] == []
+    assert fevrier["factures"][0]["transports"][0]["date_heure_transport"] == "2025-02-01T00:30:00+01:00"
+    assert [jour["jour"] for jour in fevrier["jours"]] == ["2025-02-01"]
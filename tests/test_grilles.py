@@ -0,0 +1,81 @@
+"""
+Grilles tarifaires versionnées : chaque course est calculée avec la version en vigueur
+à sa date, le fichier est rechargé à chaud et un fichier invalide est refusé.
+"""
+import copy
+import json
+from datetime import date, datetime
+import pytest
+from calculators.grilles import FICHIER_TARIFS_DEFAUT, ReferentielTarifs, charger_catalogue
+from calculators.taxi_calculator import CalculateurTarifsTaxi
+
+with open(FICHIER_TARIFS_DEFAUT, encoding="utf-8") as f:
+    TARIFS = json.load(f)
+
+
+def _ecrire(chemin, donnees):
+    chemin.write_text(json.dumps(donnees), encoding="utf-8")
+    return chemin
+
+
+def _avec_version_2026(donnees=TARIFS):
+    donnees = copy.deepcopy(donnees)
+    nouvelle = dict(donnees["taxi"][0], version="vendee-2026", debut="2026-01-01", prix_base=3.5)
+    donnees["taxi"].append(nouvelle)
+    return donnees
+
+
+def test_fichier_livre_valide():
+    catalogue = charger_catalogue(FICHIER_TARIFS_DEFAUT)
+    assert catalogue.taxi.grille_au(date(2025, 6, 1)).prix_base == 2.94
+    assert catalogue.cpam.grille_au(date(2025, 6, 1)).tarif_km("85") == 1.07
+
+
+def test_version_en_vigueur_a_la_date_de_la_course(tmp_path):
+    referentiel = ReferentielTarifs(_ecrire(tmp_path / "tarifs.json", _avec_version_2026()), intervalle_verification=0)
+    calculateur = CalculateurTarifsTaxi(referentiel=referentiel)
+    dates = [datetime(2025, 12, 31, 10), datetime(2026, 1, 2, 10), datetime(2020, 1, 2, 10)]
+    unitaires = [calculateur.calculer_tarif_course(10, 0, date_heure) for date_heure in dates]
+    assert [tarif.prix_base for tarif in unitaires] == [2.94, 3.5, 2.94]
+    lot = calculateur.calculer_tarifs_lot([10] * 3, [0] * 3, dates, [False] * 3)
+    assert [resultat["total"] for resultat in lot] == [tarif.total for tarif in unitaires]
+    assert referentiel.catalogue.taxi.prochain_debut(date(2025, 6, 1)) == date(2026, 1, 1)
+
+
+def test_rechargement_a_chaud(tmp_path):
+    chemin = _ecrire(tmp_path / "tarifs.json", TARIFS)
+    referentiel = ReferentielTarifs(chemin, intervalle_verification=0)
+    ancienne = referentiel.catalogue.taxi.grilles[0]
+    _ecrire(chemin, _avec_version_2026())
+    catalogue = referentiel.recharger()
+    assert [grille.version for grille in catalogue.taxi.grilles] == ["vendee-2025", "vendee-2026"]
+    # Version inchangée : même objet, donc mêmes entrées dans les caches de calcul
+    assert catalogue.taxi.grilles[0] is ancienne
+    assert referentiel.rechargements == 1
+
+
+def test_fichier_invalide_refuse(tmp_path):
+    chemin = _ecrire(tmp_path / "tarifs.json", TARIFS)
+    referentiel = ReferentielTarifs(chemin, intervalle_verification=0)
+    catalogue = referentiel.catalogue
+    invalide = copy.deepcopy(TARIFS)
+    invalide["taxi"][0]["prix_base"] = -1
+    _ecrire(chemin, invalide)
+    with pytest.raises(ValueError, match="prix_base"):
+        referentiel.recharger()
+    assert referentiel.catalogue is catalogue
+    assert "prix_base" in referentiel.statistiques()["derniere_erreur"]
+
+
+@pytest.mark.parametrize("modifier, message", [
+    (lambda donnees: donnees["taxi"][1].update(version="vendee-2025"), "en double"),
+    (lambda donnees: donnees["taxi"][1].update(debut="2025-01-01"), "même jour"),
+    (lambda donnees: donnees["taxi"][1].pop("tarif_minimum"), "champ manquant"),
+    (lambda donnees: donnees["taxi"][1].update(fin_nuit="07:00:30"), "HH:MM"),
+    (lambda donnees: donnees.update(cpam=[]), "au moins une version"),
+])
+def test_validation(tmp_path, modifier, message):
+    donnees = _avec_version_2026()
+    modifier(donnees)
+    with pytest.raises(ValueError, match=message):
+        charger_catalogue(_ecrire(tmp_path / "tarifs.json", donnees))
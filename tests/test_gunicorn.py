@@ -0,0 +1,37 @@
+"""
+Configuration gunicorn : aucun fichier créé à l'import, répertoire commun aux workers
+créé au démarrage du maître, adopté par l'application préchargée, supprimé à l'arrêt.
+"""
+import importlib.util
+import os
+from types import SimpleNamespace
+from calculators import grilles
+from serveur.metriques import registre
+from serveur.openapi import RACINE_PROJET
+
+
+def _configuration():
+    spec = importlib.util.spec_from_file_location("configuration_gunicorn", os.path.join(RACINE_PROJET, "gunicorn.conf.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_repertoire_commun(monkeypatch):
+    for nom in ("TABLES_PARTAGEES", "METRIQUES_REPERTOIRE", "COMPRESSION_PROCESSUS"):
+        monkeypatch.delenv(nom, raising=False)
+    monkeypatch.setattr(registre, "repertoire", registre.repertoire)
+    tables = []
+    monkeypatch.setattr(grilles, "partager_tables", tables.append)
+
+    configuration = _configuration()
+    assert configuration._repertoire is None and "TABLES_PARTAGEES" not in os.environ
+
+    configuration.on_starting(SimpleNamespace(cfg=SimpleNamespace(preload_app=True)))
+    repertoire = configuration._repertoire
+    assert os.path.isdir(repertoire)
+    assert tables == [os.path.join(repertoire, "tables.bin")] == [os.environ["TABLES_PARTAGEES"]]
+    assert registre.repertoire == os.path.join(repertoire, "metriques")
+
+    configuration.on_exit(None)
+    assert not os.path.exists(repertoire)
@@ -0,0 +1,81 @@
+"""
+Calculs en lot : identiques, au centime et à la chaîne de date près, aux calculs
+unitaires, et une date impossible à localiser rejetée pour sa seule course.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+import pytest
+from calculators.calendrier import DateHorsLimites, preparer_horodatages
+from calculators.cpam_calculator import CalculateurTarifsCPAM
+from calculators.taxi_calculator import CalculateurTarifsTaxi
+from models.cpam import TypeTransport
+
+DATES_LIMITES = [
+    datetime(2025, 3, 30, 1, 59), datetime(2025, 3, 30, 3, 0),  # passage à l'heure d'été
+    datetime(2025, 10, 26, 1, 59), datetime(2025, 10, 26, 2, 30),  # retour à l'heure d'hiver
+    datetime(2025, 3, 12, 6, 59, 59), datetime(2025, 3, 12, 7, 0), datetime(2025, 3, 12, 19, 0),  # bornes de nuit
+    datetime(2025, 5, 1, 12), datetime(2025, 12, 25, 19), datetime(2025, 3, 16, 10),  # fériés, dimanche
+    datetime(1800, 6, 1), datetime(1911, 3, 11, 0, 5), datetime(1950, 7, 14, 22),  # hors règle européenne
+    datetime(2040, 7, 1, 10), datetime(2100, 1, 1), datetime(1, 1, 2), datetime(9999, 12, 31, 23, 59),
+    datetime(2025, 3, 12, 14, tzinfo=timezone.utc), datetime(2025, 7, 12, 14, tzinfo=timezone(timedelta(hours=-5))),
+]
+
+
+def _dates(nombre: int = 1000):
+    generateur = random.Random(1)
+    aleatoires = [datetime(2020, 1, 1) + timedelta(minutes=generateur.randrange(12 * 365 * 1440))
+                  for _ in range(nombre)]
+    return DATES_LIMITES + aleatoires, generateur
+
+
+def test_lot_taxi_identique_au_calcul_unitaire():
+    dates, generateur = _dates()
+    distances = [round(generateur.uniform(0.1, 150), 2) for _ in dates]
+    attentes = [generateur.choice([0, 3.5, 12]) for _ in dates]
+    allers_retours = [generateur.random() < 0.5 for _ in dates]
+    calculateur = CalculateurTarifsTaxi()
+
+    lot = calculateur.calculer_tarifs_lot(distances, attentes, dates, allers_retours)
+    for indice, date_heure in enumerate(dates):
+        unitaire = calculateur.calculer_tarif_course(distances[indice], attentes[indice], date_heure,
+                                                     allers_retours[indice])
+        assert {cle: getattr(unitaire, cle) for cle in lot[indice]} == lot[indice], date_heure
+
+
+def test_lot_cpam_identique_au_calcul_unitaire():
+    dates, generateur = _dates()
+    colonnes = {
+        "distances_km": [round(generateur.uniform(0.1, 150), 2) for _ in dates],
+        "villes_depart": ["La Roche-sur-Yon"] * len(dates),
+        "villes_arrivee": ["Nantes"] * len(dates),
+        "tarifs_nuit": [generateur.random() < 0.1 for _ in dates],
+        "dates_heures_transport": dates,
+        "types_transport": [generateur.choice(list(TypeTransport)) for _ in dates],
+        "nb_patients": [generateur.randint(1, 4) for _ in dates],
+        "tpmr": [generateur.random() < 0.3 for _ in dates],
+        "peages": [generateur.choice([0, 2.5]) for _ in dates],
+    }
+    calculateur = CalculateurTarifsCPAM("85")
+
+    lot = calculateur.calculer_tarifs_cpam_lot(**colonnes)
+    for indice, valeurs in enumerate(zip(*colonnes.values())):
+        unitaire = calculateur.calculer_tarif_cpam(*valeurs)
+        assert unitaire.total == lot[indice]["total"], valeurs
+        assert {cle: getattr(unitaire.details, cle) for cle in lot[indice]["details"]} == lot[indice]["details"], valeurs
+
+
+def test_date_hors_limites_signalee_avec_sa_position():
+    with pytest.raises(DateHorsLimites) as erreur:
+        preparer_horodatages([datetime(2025, 3, 12), datetime(1, 1, 1, 0, 0)])
+    assert erreur.value.indice == 1
+
+
+@pytest.mark.parametrize("chemin, champ, course", [
+    ("/calculer-tarifs-lot", "date_heure_depart", {"distance_km": 10}),
+    ("/calculer-tarifs-cpam-lot", "date_heure_transport", {"distance_km": 10, "departement": "85"}),
+])
+def test_lot_date_hors_limites_erreur_de_validation_par_course(client, chemin, champ, course):
+    courses = [dict(course, **{champ: "2025-03-12T10:00:00"}), dict(course, **{champ: "0001-01-01T00:00:00"})]
+    reponse = client.post(chemin, json={"courses": courses})
+    assert reponse.status_code == 422
+    assert [erreur["loc"] for erreur in reponse.json()["detail"]] == [["body", "courses", 1, champ]]
@@ -0,0 +1,49 @@
+"""
+Métriques multi-workers : instantanés copiés sur la boucle, et instantanés des workers
+arrêtés fondus une seule fois dans le fichier cumulé.
+"""
+import os
+from serveur.metriques import Registre
+
+
+def _registre(repertoire) -> Registre:
+    registre = Registre(repertoire=str(repertoire))
+    registre.compteur("requetes_total", "Requêtes", ("route",))
+    registre.histogramme("duree_secondes", "Durée", (0.1, 1.0))
+    registre.jauge("en_cours", "En cours")
+    return registre
+
+
+def _valeur(texte: str, serie: str) -> str:
+    return next(ligne.split(" ")[-1] for ligne in texte.splitlines() if ligne.startswith(serie + " "))
+
+
+def test_instantane_independant_des_mises_a_jour_suivantes(tmp_path):
+    registre = _registre(tmp_path)
+    registre.familles["duree_secondes"].observer(0.05)
+    instantane = registre.instantane()
+    registre.familles["duree_secondes"].observer(0.5)
+    registre.familles["requetes_total"].inc(("/nouvelle",))
+    assert instantane["familles"]["duree_secondes"] == [[[], [1, 0, 0, 0.05]]]
+    assert instantane["familles"]["requetes_total"] == []
+
+
+def test_workers_arretes_fondus_une_seule_fois(tmp_path):
+    actif, arrete = _registre(tmp_path), _registre(tmp_path)
+    actif.familles["requetes_total"].inc(("/a",), 3)
+    actif.familles["en_cours"].fixer((), 2)
+    arrete.familles["requetes_total"].inc(("/a",), 5)
+    arrete.familles["en_cours"].fixer((), 7)
+    instantane_arrete = arrete.instantane(actif=False)
+    arrete.ecrire_instantane(instantane_arrete)
+
+    for _ in range(2):
+        texte = actif.exposer()
+        assert _valeur(texte, 'requetes_total{route="/a"}') == "8"
+        assert _valeur(texte, "en_cours") == "2"
+    assert sorted(os.listdir(tmp_path)) == [".verrou", "cumul.json", f"metriques-{actif.instance}.json"]
+
+    # Arrêt entre l'écriture du cumul et la suppression : le fichier réapparu n'est pas recompté
+    arrete.ecrire_instantane(instantane_arrete)
+    assert _valeur(actif.exposer(), 'requetes_total{route="/a"}') == "8"
+    assert not os.path.exists(os.path.join(tmp_path, f"metriques-{arrete.instance}.json"))
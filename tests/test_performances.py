@@ -0,0 +1,68 @@
+"""
+Suite de mesures : centiles, mémoire retenue, sélection des scénarios et détection des
+régressions par rapport à une référence.
+"""
+import json
+import pytest
+from cli import performances as cli_performances
+from performances.mesures import centile, mesurer
+from performances.suite import comparer, differences_environnement, executer_suite, selectionner
+
+
+def test_centile():
+    assert centile([], 50) == 0.0
+    assert centile([1, 2, 3, 4, 5], 50) == 3
+    assert centile([0, 10], 95) == pytest.approx(9.5)
+    assert centile([7], 99) == 7
+
+
+def test_memoire_retenue_par_appel():
+    conserves = []
+    mesure = mesurer(lambda: conserves.append(bytearray(10_000)), iterations=50, echauffement=2,
+                     iterations_memoire=20)
+    assert mesure.iterations == 50
+    assert mesure.p50_us <= mesure.p95_us <= mesure.p99_us <= mesure.max_us
+    assert mesure.octets_retenus_par_appel >= 10_000
+
+
+def test_appel_asynchrone_sans_boucle_refuse():
+    async def appel():
+        pass
+    with pytest.raises(ValueError):
+        mesurer(appel, iterations=1, echauffement=0, iterations_memoire=0)
+
+
+def test_selection_par_categorie_et_motif():
+    noms = [scenario.nom for scenario in selectionner(["calculs"], ["calculs.taxi_*"])]
+    assert noms and all(nom.startswith("calculs.taxi_") for nom in noms)
+    assert all(scenario.categorie == "asgi" for scenario in selectionner(["asgi"]))
+
+
+def _rapport(**scenarios):
+    return {"environnement": {"python": "3.11"},
+            "scenarios": {nom: {"p50_us": p50, "p95_us": p50 * 2, "octets_retenus_par_appel": octets}
+                          for nom, (p50, octets) in scenarios.items()}}
+
+
+def test_regressions():
+    reference = _rapport(a=(100.0, 1000), b=(1.0, 0), c=(50.0, 0))
+    rapport = _rapport(a=(140.0, 1050), b=(2.0, 10), d=(1.0, 0))
+    regressions = comparer(rapport, reference, tolerance=0.25)
+    # b double mais l'écart absolu reste du bruit ; d n'a pas de référence
+    assert {(regression.scenario, regression.indicateur) for regression in regressions} == \
+        {("a", "p50_us"), ("a", "p95_us")}
+    assert regressions[0].ecart == pytest.approx(0.4)
+    assert differences_environnement({"environnement": {"python": "3.12"}}, reference) == ["python: '3.11' -> '3.12'"]
+
+
+def test_suite_et_comparaison_cli(tmp_path, capsys):
+    rapport = executer_suite(selectionner(["calculs"], ["calculs.taxi_cache"]), facteur=0.001)
+    assert rapport["format"] == 1 and set(rapport["scenarios"]) == {"calculs.taxi_cache"}
+
+    reference = tmp_path / "reference.json"
+    rapport["scenarios"]["calculs.taxi_cache"].update(p50_us=0.001, p95_us=0.001)
+    reference.write_text(json.dumps(rapport), encoding="utf-8")
+    assert cli_performances.main(["--scenario", "calculs.taxi_cache", "--facteur", "0.01",
+                                  "--reference", str(reference)]) == 1
+    assert "régression" in capsys.readouterr().err
+    assert cli_performances.main(["--lister", "--categorie", "images"]) == 0
@@ -0,0 +1,58 @@
+"""
+Pool de compression : traitements hors de la boucle d'événements, refus immédiat
+quand la file est pleine ou le délai dépassé, place rendue à la fin réelle du traitement.
+"""
+import asyncio
+import time
+import pytest
+from compression.pool import PoolCompression, PoolSaturee
+
+
+def test_file_pleine_refusee_immediatement():
+    pool = PoolCompression(processus=1, file_attente=0, delai_max=30)
+
+    async def scenario():
+        premier = asyncio.ensure_future(pool.executer(time.sleep, 0.5))
+        await asyncio.sleep(0)
+        with pytest.raises(PoolSaturee):
+            await pool.executer(time.sleep, 0)
+        await premier
+        assert pool.en_cours == 0
+        assert await pool.executer(abs, -3) == 3
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.arreter()
+
+
+def test_delai_depasse_place_rendue_a_la_fin_du_traitement():
+    pool = PoolCompression(processus=1, file_attente=0, delai_max=0.2)
+
+    async def scenario():
+        with pytest.raises(PoolSaturee) as erreur:
+            await pool.executer(time.sleep, 1.0)
+        assert erreur.value.reessayer_apres >= 1
+        # Le processus travaille encore : sa place n'est pas rendue
+        assert pool.en_cours == 1
+        await asyncio.sleep(1.5)
+        assert pool.en_cours == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.arreter()
+
+
+def test_route_compresse_en_webp(client, image_png):
+    reponse = client.post("/compresser-image", params={"qualite": 70, "effort": 2},
+                          files={"fichier": ("photo.png", image_png(), "image/png")})
+    assert reponse.status_code == 200
+    assert reponse.headers["content-type"] == "image/webp"
+    assert reponse.content[:4] == b"RIFF" and reponse.content[8:12] == b"WEBP"
+    assert reponse.headers["X-Quality"] == "70"
+
+
+def test_route_refuse_un_fichier_qui_n_est_pas_une_image(client):
+    reponse = client.post("/compresser-image", files={"fichier": ("notes.txt", b"texte", "text/plain")})
+    assert reponse.status_code == 400
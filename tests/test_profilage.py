@@ -0,0 +1,38 @@
+"""
+Profilage : un échantillon pris pendant que la requête attend porte la chaîne de ses
+coroutines suspendues, jusqu'à celle qui attend le thread.
+"""
+import asyncio
+import threading
+from serveur.profilage import PILE_ATTENTE, MiddlewareProfilage, Profileur
+
+
+def test_echantillon_en_attente_montre_la_coroutine_bloquee():
+    profileur = Profileur(intervalle_ms=60000)
+    libere = threading.Event()
+
+    async def attendre_thread():
+        await asyncio.get_running_loop().run_in_executor(None, libere.wait)
+
+    async def app(scope, receive, send):
+        await attendre_thread()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def envoyer(message):
+        pass
+
+    async def scenario():
+        scope = {"type": "http", "method": "GET", "path": "/lent", "headers": [(b"x-profilage", b"1")]}
+        requete = asyncio.ensure_future(MiddlewareProfilage(app, profileur)(scope, None, envoyer))
+        await asyncio.sleep(0.05)
+        # Échantillon pris depuis la boucle : la requête, suspendue, n'est pas dans la pile
+        profileur._echantillonner()
+        libere.set()
+        await requete
+
+    asyncio.run(scenario())
+    profil = profileur.profils[0]
+    piles = [pile for pile in profil.piles if pile.startswith(PILE_ATTENTE + ";")]
+    assert piles and all(pile.split(";")[-1].startswith("attendre_thread ") for pile in piles)
+    assert profil.resume()["echantillons_en_attente"] >= 1
@@ -0,0 +1,50 @@
+"""
+Réduction au décodage : proportions conservées, boîte exprimée après correction de
+l'orientation EXIF, transparence aplatie, limite de pixels décodés.
+"""
+import io
+import pytest
+from PIL import Image
+from compression import pipeline
+from compression.pipeline import ImageRefusee, preparer_image, taille_reduite
+
+
+@pytest.mark.parametrize("taille, boite, attendu", [
+    ((4000, 3000), (400, None), (400, 300)),
+    ((4000, 3000), (None, 300), (400, 300)),
+    ((4000, 3000), (1000, 300), (400, 300)),
+    ((400, 300), (800, 800), None),
+    ((10000, 1), (100, None), (100, 1)),
+])
+def test_taille_reduite(taille, boite, attendu):
+    assert taille_reduite(taille, *boite) == attendu
+
+
+def test_jpeg_reduit_des_le_decodage(image_png):
+    jpeg = image_png(4000, 3000, "JPEG", quality=90)
+    image = preparer_image(jpeg, 400, 400)
+    assert image.size == (400, 300) and image.mode == "RGB"
+
+
+def test_boite_apres_correction_de_l_orientation(image_png):
+    exif = Image.Exif()
+    exif[pipeline.BALISE_ORIENTATION] = 6  # quart de tour : l'image affichée est en portrait
+    jpeg = image_png(800, 600, "JPEG", exif=exif.tobytes())
+    assert preparer_image(jpeg, 150).size == (150, 200)
+    assert preparer_image(jpeg).size == (600, 800)
+
+
+def test_transparence_aplatie_sur_fond_blanc():
+    tampon = io.BytesIO()
+    Image.new("RGBA", (64, 64), (0, 0, 0, 0)).save(tampon, format="PNG")
+    image = preparer_image(tampon.getvalue(), 32)
+    assert image.mode == "RGB" and image.size == (32, 32)
+    assert image.getpixel((10, 10)) == (255, 255, 255)
+
+
+def test_trop_de_pixels_refuse(monkeypatch, image_png):
+    monkeypatch.setattr(pipeline, "PIXELS_MAX", 100 * 100)
+    with pytest.raises(ImageRefusee):
+        preparer_image(image_png(200, 200))
+    # Réduite au décodage sous la limite, la même image en JPEG passe
+    assert preparer_image(image_png(200, 200, "JPEG"), 50, 50).size == (50, 50)
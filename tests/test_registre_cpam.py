@@ -0,0 +1,49 @@
+"""
+Registre des calculateurs CPAM : un calculateur par département, partagé entre les
+requêtes, dont le cache de calcul est propre à l'instance ; registre borné.
+"""
+from collections import OrderedDict
+from datetime import datetime
+from calculators import cpam_calculator
+from calculators.cpam_calculator import CalculateurTarifsCPAM, obtenir_calculateur_cpam, statistiques_registre_cpam
+
+COURSE = {"distance_km": 42.0, "ville_depart": "La Roche-sur-Yon", "ville_arrivee": "Nantes",
+          "date_heure_transport": "2025-03-12T10:00:00", "departement": "85"}
+
+
+def test_calculateur_partage_par_departement(monkeypatch):
+    monkeypatch.setattr(cpam_calculator, "_registre_calculateurs", OrderedDict())
+    assert obtenir_calculateur_cpam("85") is obtenir_calculateur_cpam("85")
+    assert obtenir_calculateur_cpam("44") is not obtenir_calculateur_cpam("85")
+
+
+def test_cache_atteint_d_une_requete_a_l_autre(client, monkeypatch):
+    monkeypatch.setattr(cpam_calculator, "_registre_calculateurs", OrderedDict())
+    reponses = [client.post("/calculer-tarif-cpam", json=COURSE) for _ in range(3)]
+    assert all(reponse.status_code == 200 for reponse in reponses)
+    assert reponses[0].json() == reponses[2].json()
+    statistiques = statistiques_registre_cpam()["departements"]["85"]
+    assert (statistiques["echecs"], statistiques["succes"]) == (1, 2)
+
+
+def test_caches_propres_a_chaque_instance():
+    premier, second = CalculateurTarifsCPAM("85"), CalculateurTarifsCPAM("85")
+    date = datetime(2025, 3, 12, 10)
+    premier.calculer_tarif_cpam(42.0, date_heure_transport=date)
+    premier.calculer_tarif_cpam(42.0, date_heure_transport=date)
+    assert premier.statistiques_cache()["succes"] == 1
+    assert second.statistiques_cache()["taille"] == 0
+
+
+def test_registre_borne(monkeypatch):
+    monkeypatch.setattr(cpam_calculator, "_registre_calculateurs", OrderedDict())
+    monkeypatch.setattr(cpam_calculator, "_calculateurs_evinces", 0)
+    monkeypatch.setattr(cpam_calculator, "TAILLE_MAX_REGISTRE", 2)
+    premier = obtenir_calculateur_cpam("85")
+    obtenir_calculateur_cpam("44")
+    obtenir_calculateur_cpam("85")  # le plus récemment utilisé
+    obtenir_calculateur_cpam("49")
+    statistiques = statistiques_registre_cpam()
+    assert (statistiques["taille_registre"], statistiques["calculateurs_evinces"]) == (2, 1)
+    assert set(statistiques["departements"]) == {"85", "49"}
+    assert obtenir_calculateur_cpam("85") is premier
@@ -0,0 +1,26 @@
+"""Réponses rapides : octets identiques à ceux du chemin Pydantic, avec orjson comme sans"""
+from datetime import datetime
+import pytest
+from calculators.cpam_calculator import CalculateurTarifsCPAM
+from calculators.taxi_calculator import CalculateurTarifsTaxi
+from models.cpam import CourseCPAMReponse, TypeTransport
+from models.taxi import CourseReponse
+from serveur import reponses_rapides
+
+DATE = datetime(2025, 3, 12, 14, 30)
+
+
+@pytest.mark.parametrize("avec_orjson", [True, False])
+def test_serialisation_rapide_identique(monkeypatch, avec_orjson):
+    if avec_orjson:
+        if reponses_rapides.orjson is None:
+            pytest.skip("orjson non installé")
+    else:
+        monkeypatch.setattr(reponses_rapides, "orjson", None)
+    resultats = [
+        (CourseReponse, CalculateurTarifsTaxi().calculer_tarif_course(25.5, 5, DATE, True)),
+        (CourseCPAMReponse, CalculateurTarifsCPAM("85").calculer_tarif_cpam(
+            30.0, "La Roche-sur-Yon", "Nantes", False, DATE, TypeTransport.SIMPLE, 2, True, 5.5)),
+    ]
+    for modele, resultat in resultats:
+        assert reponses_rapides.serialiser_rapide(modele, resultat) == reponses_rapides.serialiser_pydantic(modele, resultat)
@@ -0,0 +1,90 @@
+"""
+Reprise de tarifs : une ligne en erreur (invalide, illisible ou mal encodée) est signalée
+sur sa ligne, sans interrompre le fichier ni couper la réponse en flux.
+"""
+import csv
+import io
+from calculators import reprise_tarifs
+from calculators.reprise_tarifs import ENCODAGE_INVALIDE, calculer_avec_repli, lire_csv, lire_ndjson, reprendre_tarifs
+from calculators.taxi_calculator import calculateur_taxi
+
+EXPORT_TAXI = "distance_km,date_heure_depart\n12,2025-03-12T10:00:00\n10,0001-01-01T00:00:00\n8,2025-03-12T22:00:00\n"
+
+
+def _lignes(contenu: str):
+    return list(csv.DictReader(io.StringIO(contenu)))
+
+
+def test_date_hors_limites_apres_le_premier_paquet():
+    lignes = _lignes("".join(reprendre_tarifs(io.StringIO(EXPORT_TAXI), taille_paquet=1)))
+    assert [(ligne["ligne"], ligne["statut"]) for ligne in lignes] == [("2", "ok"), ("3", "erreur"), ("4", "ok")]
+    assert "date_heure_depart" in lignes[1]["erreur"]
+
+
+def test_route_reprise_date_hors_limites(client):
+    reponse = client.post("/reprise-tarifs", params={"taille_paquet": 1},
+                          files={"fichier": ("courses.csv", EXPORT_TAXI.encode(), "text/csv")})
+    assert reponse.status_code == 200
+    assert [ligne["statut"] for ligne in _lignes(reponse.text)] == ["ok", "erreur", "ok"]
+
+
+def test_paquet_refuse_recalcule_course_par_course(monkeypatch):
+    calculer_tarifs_lot = calculateur_taxi.calculer_tarifs_lot
+
+    def refuser_666(distances_km, *colonnes, **options):
+        if 666 in distances_km:
+            raise OverflowError("date value out of range")
+        return calculer_tarifs_lot(distances_km, *colonnes, **options)
+
+    monkeypatch.setattr(reprise_tarifs.calculateur_taxi, "calculer_tarifs_lot", refuser_666)
+    export = "distance_km,date_heure_depart\n12,2025-03-12T10:00:00\n666,2025-03-12T10:00:00\n8,2025-03-12T22:00:00\n"
+    lignes = _lignes("".join(reprendre_tarifs(io.StringIO(export))))
+    assert [ligne["statut"] for ligne in lignes] == ["ok", "erreur", "ok"]
+    assert lignes[1]["erreur"] == "date value out of range"
+    assert lignes[0]["total"] and lignes[2]["total"]
+
+
+def test_calculer_avec_repli():
+    appels = []
+
+    def inverses(nombres):
+        appels.append(list(nombres))
+        return [1 / nombre for nombre in nombres]
+
+    assert calculer_avec_repli(inverses, [1, 2]) == [1.0, 0.5]
+    resultats = calculer_avec_repli(inverses, [1, 0, 4])
+    assert resultats[0] == 1.0 and resultats[2] == 0.25
+    assert isinstance(resultats[1], ZeroDivisionError)
+    assert appels[1:] == [[1, 0, 4], [1], [0], [4]]
+
+
+EXPORT_CORROMPU = (b"distance_km,date_heure_depart\n12,2025-03-12T10:00:00\n"
+                   b"10,2025-03-12T\xff\xfe10:00:00\n8,2025-03-12T22:00:00\n")
+
+
+def test_route_ligne_corrompue(client):
+    reponse = client.post("/reprise-tarifs", files={"fichier": ("courses.csv", EXPORT_CORROMPU, "text/csv")})
+    assert reponse.status_code == 200
+    lignes = _lignes(reponse.text)
+    assert [(ligne["ligne"], ligne["statut"]) for ligne in lignes] == [("2", "ok"), ("3", "erreur"), ("4", "ok")]
+    assert lignes[1]["erreur"] == ENCODAGE_INVALIDE
+
+
+def test_lire_csv_erreurs_par_ligne():
+    # Champ au-delà de la limite du module csv
+    export = "distance_km,ville\n1,a\n2,\"" + "x" * 200_000 + "\"\n3,c\n"
+    lignes = list(lire_csv(io.StringIO(export, newline="")))
+    assert [numero for numero, _ in lignes] == [2, 3, 4]
+    assert isinstance(lignes[1][1], ValueError) and "CSV illisible" in str(lignes[1][1])
+    assert lignes[2][1] == {"distance_km": "3", "ville": "c"}
+    # Décodage strict : l'erreur est signalée au lieu d'interrompre la lecture
+    strict = io.TextIOWrapper(io.BytesIO(EXPORT_CORROMPU), encoding="utf-8", newline="")
+    erreurs = [enregistrement for _, enregistrement in lire_csv(strict) if isinstance(enregistrement, Exception)]
+    assert len(erreurs) == 1 and "CSV illisible" in str(erreurs[0])
+
+
+def test_lire_ndjson_encodage_invalide():
+    contenu = b'{"distance_km": 1}\n{"ville": "\xff"}\n{"distance_km": 3}\n'
+    lignes = list(lire_ndjson(io.TextIOWrapper(io.BytesIO(contenu), encoding="utf-8", errors="surrogateescape")))
+    assert [numero for numero, _ in lignes] == [1, 2, 3]
+    assert str(lignes[1][1]) == ENCODAGE_INVALIDE and lignes[2][1] == {"distance_km": 3}
@@ -0,0 +1,54 @@
+"""
+Résultats des calculs unitaires : tuples immuables, partie de base partagée depuis le
+cache sans recopie, et réponses JSON inchangées.
+"""
+from datetime import datetime
+import pytest
+from calculators.cpam_calculator import CalculateurTarifsCPAM
+from calculators.taxi_calculator import CalculateurTarifsTaxi
+
+DATE = datetime(2025, 3, 12, 10)
+
+
+def test_resultats_immuables_et_base_partagee():
+    taxi = CalculateurTarifsTaxi()
+    premier = taxi.calculer_tarif_course(10, 0, DATE)
+    second = taxi.calculer_tarif_course(10, 0, datetime(2025, 3, 13, 11))
+    assert premier.base is second.base
+    assert premier.date_heure_depart != second.date_heure_depart
+    with pytest.raises(AttributeError):
+        premier.total = 0
+    with pytest.raises(AttributeError):
+        premier.base.total = 0
+
+    cpam = CalculateurTarifsCPAM("85")
+    resultat = cpam.calculer_tarif_cpam(30, date_heure_transport=DATE)
+    assert resultat.details.base is cpam.calculer_tarif_cpam(30, date_heure_transport=DATE).details.base
+    assert resultat.details.cout_kilometrique == resultat.details.base.cout_kilometrique
+    with pytest.raises(AttributeError):
+        resultat.details.majoration_taux = 1.0
+
+
+def test_reponse_taxi(client):
+    reponse = client.post("/calculer-tarif", json={"distance_km": 10, "date_heure_depart": "2025-03-12T10:00:00"})
+    assert reponse.json() == {
+        "prix_base": 2.94, "distance_km": 10.0, "distance_facturable": 10.0, "cout_distance": 21.6,
+        "minutes_attente": 0.0, "cout_attente": 0.0, "type_tarif": "jour aller simple (tarif C)",
+        "aller_retour": False, "tarif_km": 2.16, "tarif_minimum_applique": False, "total": 24.54,
+        "date_heure_depart": "2025-03-12T10:00:00+01:00",
+    }
+
+
+def test_reponse_cpam(client):
+    reponse = client.post("/calculer-tarif-cpam", json={
+        "distance_km": 30, "date_heure_transport": "2025-03-12T10:00:00", "nb_patients": 2, "tpmr": True,
+        "departement": "85"})
+    corps = reponse.json()
+    assert corps["total"] == 85.96
+    assert corps["details"] == {
+        "forfait_prise_charge": 13.0, "distance_km": 30.0, "nb_patients": 2, "forfait_grande_ville": 0.0,
+        "km_facturables": 26.0, "tarif_km": 1.07, "cout_kilometrique": 27.82, "base_tarifaire": 40.82,
+        "majoration_taux": 0.0, "majoration_type": "", "majoration_montant": 0.0, "supplement_tpmr": 30.0,
+        "supplement_drom": 0.0, "peages": 0.0, "total_supplements": 30.0, "abattement_partage_taux": 0.23,
+        "abattement_partage_montant": 25.68, "departement": "85", "date_heure_transport": "2025-03-12T10:00:00+01:00",
+    }
@@ -0,0 +1,72 @@
+"""
+Tables calendaires partagées entre workers : fichier écrit une fois puis projeté en
+mémoire, reconstruit s'il est invalide ou incomplet, mêmes périodes qu'avec les tables
+construites localement.
+"""
+import json
+from datetime import datetime, time
+import pytest
+from calculators import calendrier
+from calculators.calendrier import CalendrierTarifaire, nom_table_minutes, table_feries, table_minutes
+from calculators.grilles import FICHIER_TARIFS_DEFAUT
+from calculators.tables_partagees import ALIGNEMENT, TablesPartagees, construire_tables, ecrire_tables, ouvrir_tables
+
+TABLE_19_7 = nom_table_minutes(time(19, 0), time(7, 0))
+
+
+def test_aller_retour_fichier(tmp_path):
+    chemin = str(tmp_path / "tables.bin")
+    ecrire_tables(chemin, {"a": b"\x01\x02\x03", "b": bytes(range(100))})
+    tables = TablesPartagees(chemin)
+    assert dict((nom, bytes(table)) for nom, table in tables.items()) == {"a": b"\x01\x02\x03", "b": bytes(range(100))}
+    assert tables.octets >= 2 * ALIGNEMENT + 100
+    with pytest.raises(TypeError):
+        tables["a"][0] = 0  # lecture seule
+
+
+def test_tables_du_fichier_de_tarifs():
+    tables = construire_tables(FICHIER_TARIFS_DEFAUT)
+    assert tables["feries"] == table_feries()
+    assert tables[TABLE_19_7] == table_minutes(time(19, 0), time(7, 0))
+    # Fichier de tarifs illisible : jours fériés seulement
+    assert set(construire_tables("/inexistant/tarifs.json")) == {"feries"}
+
+
+def test_fichier_invalide_ou_incomplet_reconstruit(tmp_path):
+    chemin = str(tmp_path / "tables.bin")
+    (tmp_path / "tables.bin").write_bytes(b"pas un fichier de tables")
+    assert set(ouvrir_tables(chemin, FICHIER_TARIFS_DEFAUT)) == set(construire_tables(FICHIER_TARIFS_DEFAUT))
+
+    # Nouvelle grille aux bornes de nuit différentes : table ajoutée
+    tarifs = json.loads(FICHIER_TARIFS_DEFAUT.read_text(encoding="utf-8"))
+    tarifs["taxi"][0]["debut_nuit"] = "21:00"
+    fichier_tarifs = tmp_path / "tarifs.json"
+    fichier_tarifs.write_text(json.dumps(tarifs), encoding="utf-8")
+    assert nom_table_minutes(time(21, 0), time(7, 0)) in ouvrir_tables(chemin, fichier_tarifs)
+
+
+def test_memes_periodes_avec_tables_projetees(tmp_path, monkeypatch):
+    locales = CalendrierTarifaire(time(19, 0), time(7, 0))
+    monkeypatch.setattr(calendrier, "_feries", calendrier._feries)
+    monkeypatch.setattr(calendrier, "_feries_np", calendrier._feries_np)
+    monkeypatch.setattr(calendrier, "_tables_minutes", {})
+    calendrier.utiliser_tables(ouvrir_tables(str(tmp_path / "tables.bin"), FICHIER_TARIFS_DEFAUT))
+    projetees = CalendrierTarifaire(time(19, 0), time(7, 0))
+    assert isinstance(projetees._table, memoryview) and isinstance(calendrier._feries, memoryview)
+    for date_heure in (datetime(2025, 7, 14, 10), datetime(2025, 7, 15, 7), datetime(2025, 7, 15, 12),
+                       datetime(2025, 12, 24, 23, 30), datetime(2025, 12, 25, 12)):
+        assert projetees.periode(date_heure) == locales.periode(date_heure), date_heure
+
+
+def test_calendriers_existants_adoptent_les_tables(tmp_path, monkeypatch):
+    monkeypatch.setattr(calendrier, "_feries", calendrier._feries)
+    monkeypatch.setattr(calendrier, "_feries_np", calendrier._feries_np)
+    monkeypatch.setattr(calendrier, "_tables_minutes", {})
+    monkeypatch.setattr(calendrier, "_calendriers", {})
+    # Calendrier compilé avec les grilles, avant la projection (préchargement par gunicorn)
+    existant = calendrier.obtenir_calendrier(time(19, 0), time(7, 0))
+    assert not isinstance(existant._table, memoryview)
+    calendrier.utiliser_tables(ouvrir_tables(str(tmp_path / "tables.bin"), FICHIER_TARIFS_DEFAUT))
+    assert isinstance(existant._table, memoryview)
+    assert existant.periode(datetime(2025, 7, 15, 7)) == calendrier.NUIT
+    assert calendrier.obtenir_calendrier(time(19, 0), time(7, 0)) is existant
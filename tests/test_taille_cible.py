@@ -0,0 +1,37 @@
+"""
+Modes d'encodage WebP : taille cible (plus haute qualité tenant dans le budget) et effort.
+"""
+import pytest
+from compression.pipeline import compresser_webp
+
+
+@pytest.mark.parametrize("largeur, hauteur", [(320, 240), (1600, 1200)])
+def test_taille_cible_respectee(image_png, largeur, hauteur):
+    source = image_png(largeur, hauteur)
+    sans_cible = compresser_webp(source, 90, effort=2)
+    cible_ko = max(1, len(sans_cible.donnees) // 3 // 1024)
+    image = compresser_webp(source, 90, taille_cible_ko=cible_ko, effort=2)
+    assert len(image.donnees) <= cible_ko * 1024
+    assert 1 <= image.qualite < 90
+    # La qualité retenue est proche de la plus haute qui tient : quelques points au-dessus, ça déborde
+    assert len(compresser_webp(source, min(90, image.qualite + 5), effort=2).donnees) > cible_ko * 1024
+
+
+def test_cible_large_garde_la_qualite_demandee(image_png):
+    image = compresser_webp(image_png(), 75, taille_cible_ko=10_000, effort=1)
+    assert (image.qualite, image.effort) == (75, 1)
+
+
+def test_route_taille_cible(client, image_png):
+    reponse = client.post("/compresser-image", params={"qualite": 95, "taille_cible_ko": 8, "effort": 3},
+                          files={"fichier": ("photo.png", image_png(640, 480), "image/png")})
+    assert reponse.status_code == 200
+    assert len(reponse.content) <= 8 * 1024
+    assert int(reponse.headers["X-Quality"]) < 95 and reponse.headers["X-Effort"] == "3"
+
+
+@pytest.mark.parametrize("parametres", [{"effort": 7}, {"effort": -1}, {"taille_cible_ko": 0}])
+def test_parametres_invalides(client, image_png, parametres):
+    reponse = client.post("/compresser-image", params=parametres,
+                          files={"fichier": ("photo.png", image_png(), "image/png")})
+    assert reponse.status_code == 422
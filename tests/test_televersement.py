@@ -0,0 +1,95 @@
+"""
+Réception des images envoyées : lecture par blocs hachée au passage, petites images en
+mémoire et grandes dans un fichier temporaire, taille bornée (413) avant ou pendant la
+lecture du corps.
+"""
+import hashlib
+import io
+import os
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+from compression import televersement
+from compression.pipeline import ImageRefusee
+from compression.televersement import recevoir
+from serveur.taille_corps import MiddlewareTailleCorps
+
+
+@pytest.fixture
+def repertoire(tmp_path, monkeypatch):
+    monkeypatch.setattr(televersement, "REPERTOIRE_TEMPORAIRE", str(tmp_path))
+    monkeypatch.setattr(televersement, "SEUIL_FICHIER", 1000)
+    monkeypatch.setattr(televersement, "TAILLE_BLOC", 256)
+    return tmp_path
+
+
+def test_petite_image_en_memoire(repertoire):
+    contenu = os.urandom(900)
+    recu = recevoir(io.BytesIO(contenu))
+    assert recu.source == contenu and recu.taille == 900
+    assert recu.empreinte.digest() == hashlib.blake2b(contenu, digest_size=20).digest()
+    assert not os.listdir(repertoire)
+
+
+def test_grande_image_dans_un_fichier(repertoire):
+    contenu = os.urandom(5000)
+    recu = recevoir(io.BytesIO(contenu))
+    assert isinstance(recu.source, str) and os.path.dirname(recu.source) == str(repertoire)
+    with open(recu.source, "rb") as fichier:
+        assert fichier.read() == contenu
+    assert recu.empreinte.digest() == hashlib.blake2b(contenu, digest_size=20).digest()
+    recu.supprimer()
+    recu.supprimer()
+    assert not os.listdir(repertoire)
+
+
+def test_limite_depassee_sans_fichier_restant(repertoire):
+    flux = io.BytesIO(os.urandom(10_000))
+    with pytest.raises(ImageRefusee, match="trop volumineuse"):
+        recevoir(flux, octets_max=3000)
+    # Lecture interrompue au premier bloc au-delà de la limite
+    assert flux.tell() <= 3000 + 256
+    assert not os.listdir(repertoire)
+
+
+@pytest.fixture(scope="module")
+def client_borne():
+    application = FastAPI()
+
+    @application.post("/envoyer")
+    async def envoyer(fichier: UploadFile = File(...)):
+        return {"taille": len(await fichier.read())}
+
+    application.add_middleware(MiddlewareTailleCorps, limites={"/envoyer": 1000})
+    return TestClient(application)
+
+
+def test_corps_sous_la_limite(client_borne):
+    reponse = client_borne.post("/envoyer", files={"fichier": ("image.png", b"x" * 500, "image/png")})
+    assert reponse.json() == {"taille": 500}
+
+
+def test_content_length_trop_grand(client_borne):
+    reponse = client_borne.post("/envoyer", files={"fichier": ("image.png", b"x" * 2000, "image/png")})
+    assert reponse.status_code == 413
+    assert reponse.headers["connection"] == "close"
+
+
+def test_corps_par_morceaux_trop_grand(client_borne):
+    def morceaux():
+        for _ in range(10):
+            yield b"x" * 200
+
+    reponse = client_borne.post("/envoyer", content=morceaux(),
+                                headers={"content-type": "multipart/form-data; boundary=limite"})
+    assert reponse.status_code == 413
+    assert "1000 octets" in reponse.json()["detail"]
+
+
+def test_route_fichier_temporaire_supprime(client, image_png, repertoire):
+    image = image_png(400, 300)
+    assert len(image) > televersement.SEUIL_FICHIER
+    reponse = client.post("/compresser-image", params={"max_largeur": 200},
+                          files={"fichier": ("image.png", image, "image/png")})
+    assert reponse.status_code == 200
+    assert not os.listdir(repertoire)